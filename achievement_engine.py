@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+增量成就引擎
+成就声明自己依赖的统计键，引擎按键建立索引，只在相关统计变化时重新评估；
+每个玩家已获得的成就以位图 (int) 保存
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class AchievementDefinition:
+    """成就定义"""
+    achievement_id: str
+    name: str
+    description: str
+    condition: Callable[[Dict[str, Any]], bool]
+    depends_on: Tuple[str, ...]   # 条件读取的统计键
+
+
+class AchievementEngine:
+    """按统计键索引的成就评估引擎"""
+
+    def __init__(self, definitions: Iterable[AchievementDefinition] = ()):
+        self._definitions: List[AchievementDefinition] = []
+        self._bits: Dict[str, int] = {}          # achievement_id -> 位序号
+        self._index: Dict[str, int] = {}         # 统计键 -> 依赖该键的成就位掩码
+        self._earned: Dict[str, int] = {}        # player_id -> 已获得成就位图
+        for definition in definitions:
+            self.register(definition)
+
+    def register(self, definition: AchievementDefinition):
+        """注册成就（id重复时报错）"""
+        if definition.achievement_id in self._bits:
+            raise ValueError(f"成就已存在: {definition.achievement_id}")
+        if not definition.depends_on:
+            raise ValueError(f"成就 {definition.achievement_id} 必须声明依赖的统计键")
+        bit = len(self._definitions)
+        self._definitions.append(definition)
+        self._bits[definition.achievement_id] = bit
+        for key in definition.depends_on:
+            self._index[key] = self._index.get(key, 0) | (1 << bit)
+
+    def __len__(self) -> int:
+        return len(self._definitions)
+
+    def get(self, achievement_id: str) -> Optional[AchievementDefinition]:
+        bit = self._bits.get(achievement_id)
+        return self._definitions[bit] if bit is not None else None
+
+    # ==================== 评估 ====================
+
+    def update(self, player_id: str, stats: Dict[str, Any], changed_keys: Iterable[str]) -> List[str]:
+        """
+        统计值发生变化后调用，只评估依赖这些键且尚未获得的成就
+
+        Returns:
+            新获得的成就id列表
+        """
+        index = self._index
+        candidates = 0
+        for key in changed_keys:
+            candidates |= index.get(key, 0)
+        earned = self._earned.get(player_id, 0)
+        return self._evaluate(player_id, stats, candidates & ~earned, earned)
+
+    def evaluate_all(self, player_id: str, stats: Dict[str, Any]) -> List[str]:
+        """全量评估所有未获得的成就（初始化或导入旧存档时使用）"""
+        earned = self._earned.get(player_id, 0)
+        everything = (1 << len(self._definitions)) - 1
+        return self._evaluate(player_id, stats, everything & ~earned, earned)
+
+    def check(self, stats: Dict[str, Any], earned_mask: int = 0) -> List[str]:
+        """无状态全量评估：给定已获得位图，返回满足条件的新成就（不写入任何玩家记录）"""
+        everything = (1 << len(self._definitions)) - 1
+        return self._check_candidates(stats, everything & ~earned_mask)
+
+    def _check_candidates(self, stats: Dict[str, Any], candidates: int) -> List[str]:
+        newly_earned = []
+        while candidates:
+            lowest = candidates & -candidates
+            candidates ^= lowest
+            definition = self._definitions[lowest.bit_length() - 1]
+            if definition.condition(stats):
+                newly_earned.append(definition.achievement_id)
+        return newly_earned
+
+    def _evaluate(self, player_id: str, stats: Dict[str, Any], candidates: int, earned: int) -> List[str]:
+        newly_earned = self._check_candidates(stats, candidates)
+        if newly_earned:
+            self._earned[player_id] = earned | self.mask_for(newly_earned)
+        return newly_earned
+
+    # ==================== 位图读写 ====================
+
+    def grant(self, player_id: str, achievement_id: str) -> bool:
+        """直接授予成就，返回是否为新获得"""
+        mask = 1 << self._bits[achievement_id]
+        earned = self._earned.get(player_id, 0)
+        if earned & mask:
+            return False
+        self._earned[player_id] = earned | mask
+        return True
+
+    def has(self, player_id: str, achievement_id: str) -> bool:
+        bit = self._bits.get(achievement_id)
+        return bit is not None and bool(self._earned.get(player_id, 0) >> bit & 1)
+
+    def earned_bits(self, player_id: str) -> int:
+        return self._earned.get(player_id, 0)
+
+    def set_earned_bits(self, player_id: str, bits: int):
+        """恢复存档时写回位图"""
+        self._earned[player_id] = bits
+
+    def mask_for(self, achievement_ids: Iterable[str]) -> int:
+        mask = 0
+        for achievement_id in achievement_ids:
+            bit = self._bits.get(achievement_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def earned_ids(self, player_id: str) -> List[str]:
+        """按注册顺序返回已获得的成就id"""
+        earned = self._earned.get(player_id, 0)
+        ids = []
+        while earned:
+            lowest = earned & -earned
+            earned ^= lowest
+            ids.append(self._definitions[lowest.bit_length() - 1].achievement_id)
+        return ids
+
+    def earned_count(self, player_id: str) -> int:
+        return bin(self._earned.get(player_id, 0)).count("1")
+
+    def forget(self, player_id: str):
+        """移除玩家的成就记录"""
+        self._earned.pop(player_id, None)
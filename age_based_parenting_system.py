@@ -12,6 +12,10 @@ from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import random
 
+from concurrency import new_lock, synchronized
+from session_journal import SessionJournal, export_dataclass, import_dataclass, state_delta
+from task_history import RingBuffer
+
 
 class AgeStage(Enum):
     """年龄阶段"""
@@ -52,6 +56,7 @@ class ChildState:
     hunger_level: int = 0           # 饥饿程度 (0-100)
     sleep_debt: int = 0             # 睡眠债务 (0-100)
     comfort_level: int = 100        # 舒适度 (0-100)
+    diaper_wetness: int = 0         # 尿布湿润度 (0-100)
     
     # 发展状态 (按年龄逐步重要)
     curiosity: int = 50             # 好奇心 (0-100)
@@ -1014,6 +1019,10 @@ class SurpriseMomentTask(AgeBasedTask):
         }
     
     async def assess_need(self, child_state: ChildState, parent_state: ParentState) -> int:
+        return self.surprise_probability(child_state, parent_state)
+    
+    def surprise_probability(self, child_state: ChildState, parent_state: ParentState) -> int:
+        """惊喜时刻出现的概率（百分比）"""
         # 惊喜时刻是随机触发的，基于发展状态
         base_probability = 5  # 基础5%概率
         
@@ -1137,7 +1146,10 @@ class AgeBasedParentingManager:
         self.parent_state = ParentState()
         self.current_age_stage = self._determine_age_stage()
         self.available_tasks = self._initialize_tasks()
-        self.completed_surprises = []
+        self.completed_surprises = RingBuffer(capacity=50)  # 只保留最近50个惊喜时刻
+        self.journal: Optional[SessionJournal] = None
+        self._journal_shadow: Dict[str, Any] = {}
+        self._lock = new_lock()
         
     def _determine_age_stage(self) -> AgeStage:
         """根据月龄确定年龄阶段"""
@@ -1179,6 +1191,7 @@ class AgeBasedParentingManager:
         }
         return tasks
     
+    @synchronized
     async def assess_all_needs(self) -> Dict[str, Any]:
         """评估当前阶段所有任务需求"""
         current_tasks = self.available_tasks.get(self.current_age_stage, [])
@@ -1195,6 +1208,7 @@ class AgeBasedParentingManager:
         
         return needs_assessment
     
+    @synchronized
     async def get_priority_tasks(self, threshold: int = 50) -> List[Tuple[AgeBasedTask, int]]:
         """获取优先级任务列表"""
         current_tasks = self.available_tasks.get(self.current_age_stage, [])
@@ -1209,6 +1223,7 @@ class AgeBasedParentingManager:
         priority_tasks.sort(key=lambda x: x[1], reverse=True)
         return priority_tasks
     
+    @synchronized
     async def execute_task(self, task_class_name: str, action_data: Dict[str, Any]) -> Dict[str, Any]:
         """执行指定任务"""
         current_tasks = self.available_tasks.get(self.current_age_stage, [])
@@ -1267,6 +1282,9 @@ class AgeBasedParentingManager:
             # 检查是否需要升级到下一阶段
             self._check_age_progression()
             
+            if self.journal is not None:
+                self._journal_task(task_class_name, action_data, task_result["success"])
+            
             return {
                 "success": task_result["success"],
                 "message": task_result["message"],
@@ -1291,6 +1309,53 @@ class AgeBasedParentingManager:
                 "score_change": -5
             }
     
+    # ==================== 持久化 ====================
+    
+    @synchronized
+    def export_state(self) -> Dict[str, Any]:
+        """导出可持久化状态"""
+        return {
+            "child_state": export_dataclass(self.child_state),
+            "parent_state": export_dataclass(self.parent_state),
+            "surprises_total": self.completed_surprises.total,
+            "recent_surprises": [
+                {"moment": s["moment"], "timestamp": s["timestamp"].timestamp(), "age_stage": s["age_stage"]}
+                for s in self.completed_surprises
+            ]
+        }
+    
+    @synchronized
+    def import_state(self, data: Dict[str, Any]):
+        """从 export_state 的结果恢复状态"""
+        self.child_state = import_dataclass(ChildState, data.get("child_state", {}))
+        self.parent_state = import_dataclass(ParentState, data.get("parent_state", {}))
+        self.current_age_stage = self._determine_age_stage()
+        self.completed_surprises = RingBuffer(self.completed_surprises.capacity)
+        for s in data.get("recent_surprises", []):
+            self.completed_surprises.append(dict(s, timestamp=datetime.fromtimestamp(s["timestamp"])))
+        self.completed_surprises.total = data.get("surprises_total", len(self.completed_surprises))
+    
+    @synchronized
+    def attach_journal(self, journal: SessionJournal, recover: bool = True) -> int:
+        """挂载会话日志，日志已存在时先恢复，返回回放的日志条数"""
+        entries = journal.restore_into(self) if recover else []
+        self.journal = journal
+        self._journal_shadow = self.export_state()
+        journal.start(self._journal_shadow, len(entries))
+        return len(entries)
+    
+    def _journal_task(self, task_class_name: str, action_data: Dict[str, Any], success: bool):
+        current = self.export_state()
+        self.journal.append({
+            "task": task_class_name,
+            "args": action_data,
+            "ok": 1 if success else 0,
+            "d": state_delta(self._journal_shadow, current),
+        })
+        self._journal_shadow = current
+        if self.journal.should_snapshot():
+            self.journal.snapshot(current)
+    
     def _check_age_progression(self):
         """检查是否需要升级年龄阶段"""
         new_stage = self._determine_age_stage()
@@ -1298,24 +1363,37 @@ class AgeBasedParentingManager:
             self.current_age_stage = new_stage
             # 可以在这里触发阶段升级的特殊事件
     
-    async def trigger_surprise_moment(self) -> Optional[Dict[str, Any]]:
-        """尝试触发惊喜时刻"""
-        surprise_tasks = [task for task in self.available_tasks.get(self.current_age_stage, [])
-                         if isinstance(task, SurpriseMomentTask)]
-        
-        if not surprise_tasks:
+    @synchronized
+    def surprise_probability(self) -> int:
+        """当前阶段惊喜时刻出现的概率（百分比），该阶段没有惊喜任务时为0"""
+        for task in self.available_tasks.get(self.current_age_stage, []):
+            if isinstance(task, SurpriseMomentTask):
+                return task.surprise_probability(self.child_state, self.parent_state)
+        return 0
+    
+    @synchronized
+    async def trigger_surprise_moment(self, rolls: Optional[List[float]] = None) -> Optional[Dict[str, Any]]:
+        """
+        尝试触发惊喜时刻
+        
+        Args:
+            rolls: 3个 [0,1) 均匀随机数（是否触发、是否记录、是否分享），批量调度时由调用方统一生成
+        """
+        probability = self.surprise_probability()
+        if not probability:
             return None
         
-        surprise_task = surprise_tasks[0]
-        urgency = await surprise_task.assess_need(self.child_state, self.parent_state)
+        if rolls is None:
+            rolls = [random.random() for _ in range(3)]
+        trigger_roll, documentation_roll, sharing_roll = rolls
         
         # 惊喜时刻是随机触发的
-        if random.random() * 100 < urgency:
+        if trigger_roll * 100 < probability:
             action_data = {
                 "parent_recognition": True,
                 "celebration_level": "moderate",
-                "documentation": random.choice([True, False]),
-                "sharing_with_others": random.choice([True, False])
+                "documentation": documentation_roll < 0.5,
+                "sharing_with_others": sharing_roll < 0.5
             }
             
             result = await self.execute_task("SurpriseMomentTask", action_data)
@@ -1330,6 +1408,7 @@ class AgeBasedParentingManager:
         
         return None
     
+    @synchronized
     def get_comprehensive_status(self) -> Dict[str, Any]:
         """获取综合状态报告"""
         return {
@@ -1355,8 +1434,8 @@ class AgeBasedParentingManager:
                 "failed_interventions": self.parent_state.failed_interventions
             },
             "development_progress": self._calculate_development_progress(),
-            "completed_surprises": len(self.completed_surprises),
-            "recent_surprises": [s["moment"] for s in self.completed_surprises[-3:]]
+            "completed_surprises": self.completed_surprises.total,
+            "recent_surprises": [s["moment"] for s in self.completed_surprises.recent(3)]
         }
     
     def _calculate_development_progress(self) -> Dict[str, Any]:
@@ -1395,8 +1474,18 @@ class AgeBasedParentingManager:
             "ready_for_next_stage": overall_progress > 75
         }
     
+    @synchronized
     async def simulate_time_passage(self, hours: float):
         """模拟时间流逝"""
+        self.advance_time(hours)
+        
+        # 随机触发惊喜时刻
+        surprise_result = await self.trigger_surprise_moment()
+        return surprise_result
+    
+    @synchronized
+    def advance_time(self, hours: float):
+        """时间流逝中确定性的部分：生理需求、精力和父母状态的自然变化（不含随机惊喜）"""
         # 基础生理需求变化（主要影响0-3月）
         if self.current_age_stage == AgeStage.NEWBORN:
             self.child_state.hunger_level = min(100, self.child_state.hunger_level + hours * 20)
@@ -1413,10 +1502,6 @@ class AgeBasedParentingManager:
         
         if self.parent_state.patience < 100:
             self.parent_state.patience = min(100, self.parent_state.patience + hours * 3)
-        
-        # 随机触发惊喜时刻
-        surprise_result = await self.trigger_surprise_moment()
-        return surprise_result
 
 
 # 使用示例
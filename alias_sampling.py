@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+别名采样表 (Vose Alias Method)
+预计算后每次抽样只需要一次随机数 + 一次查表，适合高频事件抽取
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, List, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class AliasTable:
+    """不可变的别名表"""
+    outcomes: Tuple[Any, ...]
+    probabilities: Tuple[float, ...]   # 每个槽位保留自身结果的概率
+    aliases: Tuple[int, ...]           # 未保留时跳转的槽位
+
+    @classmethod
+    def build(cls, outcomes: Sequence[Any], weights: Sequence[float]) -> "AliasTable":
+        """根据权重构建别名表（权重无需归一化）"""
+        n = len(outcomes)
+        if n == 0 or n != len(weights):
+            raise ValueError("outcomes 和 weights 必须非空且长度一致")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("权重之和必须大于0")
+
+        scaled = [w * n / total for w in weights]
+        probabilities = [0.0] * n
+        aliases = list(range(n))
+        underfull = [i for i, p in enumerate(scaled) if p < 1.0]
+        overfull = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while underfull and overfull:
+            small = underfull.pop()
+            large = overfull.pop()
+            probabilities[small] = scaled[small]
+            aliases[small] = large
+            scaled[large] = scaled[large] + scaled[small] - 1.0
+            (underfull if scaled[large] < 1.0 else overfull).append(large)
+
+        # 剩余槽位由于浮点误差可能略偏离1，直接置为1
+        for i in overfull + underfull:
+            probabilities[i] = 1.0
+
+        return cls(tuple(outcomes), tuple(probabilities), tuple(aliases))
+
+    def draw(self, rand: Callable[[], float] = random.random) -> Any:
+        """抽取一个结果：一次随机数同时决定槽位和是否走别名"""
+        u = rand() * len(self.outcomes)
+        i = int(u)
+        if u - i < self.probabilities[i]:
+            return self.outcomes[i]
+        return self.outcomes[self.aliases[i]]
+
+    def draw_many(self, n: int, rand: Callable[[], float] = random.random) -> List[Any]:
+        """批量抽取n个结果"""
+        size = len(self.outcomes)
+        outcomes = self.outcomes
+        probabilities = self.probabilities
+        aliases = self.aliases
+        results = []
+        append = results.append
+        for _ in range(n):
+            u = rand() * size
+            i = int(u)
+            append(outcomes[i] if u - i < probabilities[i] else outcomes[aliases[i]])
+        return results
+
+    def outcome_probabilities(self) -> List[Tuple[Any, float]]:
+        """还原每个结果的精确概率（用于校验）"""
+        n = len(self.outcomes)
+        mass = [p / n for p in self.probabilities]
+        for i, alias in enumerate(self.aliases):
+            mass[alias] += (1.0 - self.probabilities[i]) / n
+        return list(zip(self.outcomes, mass))
@@ -9,22 +9,30 @@ import base64
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
-# 尝试导入 fal_client
-try:
-    import fal_client
-    FAL_AVAILABLE = True
-except ImportError:
-    FAL_AVAILABLE = False
+from feature_registry import features
+from provider_router import Route, router
+from providers import providers
+from tracing import traced
+
+# 通过 providers.get("fal") / providers.get("replicate") 生成（GENERATION_PROVIDER=fake 时走本地假服务，见 providers）
+FAL_AVAILABLE = features.available("fal")
+if not FAL_AVAILABLE:
     print("警告: fal_client 未安装")
 
-# 尝试导入 replicate
-try:
-    import replicate
-    REPLICATE_AVAILABLE = True
-except ImportError:
-    REPLICATE_AVAILABLE = False
+REPLICATE_AVAILABLE = features.available("replicate")
+if not REPLICATE_AVAILABLE:
     print("警告: replicate 未安装")
 
+FAL_FUSION_MODEL = "fal-ai/flux-lora"   # 支持参考图的模型
+REPLICATE_FUSION_MODEL = "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b"
+
+AGE_PROMPTS = {
+    "newborn": "newborn baby, 0-3 months old",
+    "6months": "6 months old baby, infant",
+    "1year": "1 year old baby, toddler",
+    "2years": "2 years old child, young toddler"
+}
+
 
 class BabyFaceFusion:
     """宝宝面部融合生成器"""
@@ -63,6 +71,115 @@ class BabyFaceFusion:
         # 返回本地路径，fal.ai 会自动处理
         return image_path
     
+    def _fal_arguments(self, parent1_image: str, baby_age: str, num_variations: int) -> Dict[str, Any]:
+        """fal.ai Flux LoRA 的请求参数"""
+        age_prompt = AGE_PROMPTS.get(baby_age, AGE_PROMPTS["newborn"])
+        
+        # 使用 Flux 模型 + IP-Adapter 进行面部融合
+        prompt = f"""
+        {age_prompt}, (pure Chinese baby:1.5), adorable baby portrait,
+        (single eyelid:1.2), (black straight hair:1.3), (dark brown eyes:1.3),
+        (flat nose bridge:1.1), round face, chubby cheeks,
+        professional baby photography, studio lighting, high quality, 8k
+        """
+        
+        negative_prompt = """
+        mixed race, caucasian, western features, adult, teenager,
+        (double eyelids:1.3), blue eyes, blonde hair, curly hair,
+        low quality, blurry, distorted
+        """
+        
+        return {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "image_size": "square_hd",
+            "num_inference_steps": 28,
+            "guidance_scale": 3.5,
+            "num_images": num_variations,
+            "enable_safety_checker": True,
+            # 参考图片（如果模型支持）
+            "image_url": parent1_image if parent1_image.startswith("http") else None
+        }
+    
+    def _replicate_arguments(self, parent1_image: str, baby_age: str) -> Dict[str, Any]:
+        """Replicate SDXL 的请求参数（本地照片读成字节，URL 直接传）"""
+        if parent1_image.startswith("http"):
+            image = parent1_image
+        else:
+            with open(parent1_image, "rb") as f:
+                image = f.read()
+        return {
+            "prompt": f"baby portrait, {baby_age}, Chinese baby, adorable",
+            "negative_prompt": "adult, western features, mixed race",
+            "image": image,
+            "num_outputs": 4
+        }
+    
+    @traced()
+    def generate_baby_from_parents(
+        self,
+        parent1_image: str,
+        parent2_image: str = None,
+        baby_age: str = "newborn",
+        num_variations: int = 4
+    ) -> Dict[str, Any]:
+        """
+        自动选择服务生成宝宝照片：fal.ai 优先，Replicate 备用
+        慢了发对冲请求、失败或熔断时切换到另一个服务，整个请求受截止时间限制（见 provider_router）
+        
+        Args:
+            parent1_image: 父母1的照片路径或 URL
+            parent2_image: 父母2的照片路径或 URL（可选）
+            baby_age: 宝宝年龄 ("newborn", "6months", "1year", "2years")
+            num_variations: 生成变体数量（fal.ai）
+        
+        Returns:
+            生成结果，metadata.provider 为实际使用的服务
+        """
+        try:
+            routes = []
+            if providers.get("fal").configured(self.fal_key):
+                routes.append(Route("fal", "flux_lora", FAL_FUSION_MODEL,
+                                    self._fal_arguments(parent1_image, baby_age, num_variations)))
+            if providers.get("replicate").configured(self.replicate_key):
+                routes.append(Route("replicate", "sdxl", REPLICATE_FUSION_MODEL,
+                                    self._replicate_arguments(parent1_image, baby_age)))
+            if not routes:
+                return {
+                    "success": False,
+                    "error": "没有可用的生成服务",
+                    "message": "请安装 fal-client 或 replicate，并设置 FAL_KEY / REPLICATE_API_TOKEN"
+                }
+            
+            result, route = router.generate(routes)
+            images = [img["url"] for img in result.get("images", [])]
+            if not images:
+                return {
+                    "success": False,
+                    "error": "生成失败",
+                    "message": "API 返回结果为空"
+                }
+            
+            return {
+                "success": True,
+                "images": images,
+                "metadata": {
+                    "baby_age": baby_age,
+                    "num_variations": len(images),
+                    "parent1_image": parent1_image,
+                    "parent2_image": parent2_image,
+                    "provider": route.provider
+                }
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": f"生成失败: {str(e)}"
+            }
+    
+    @traced()
     def generate_baby_from_parents_fal(
         self,
         parent1_image: str,
@@ -82,14 +199,15 @@ class BabyFaceFusion:
         Returns:
             生成结果
         """
-        if not FAL_AVAILABLE:
+        provider = providers.get("fal")
+        if not provider.available():
             return {
                 "success": False,
                 "error": "fal_client 未安装",
                 "message": "请运行: pip install fal-client"
             }
         
-        if not self.fal_key:
+        if not provider.configured(self.fal_key):
             return {
                 "success": False,
                 "error": "API 密钥未设置",
@@ -97,30 +215,6 @@ class BabyFaceFusion:
             }
         
         try:
-            # 构建提示词
-            age_prompts = {
-                "newborn": "newborn baby, 0-3 months old",
-                "6months": "6 months old baby, infant",
-                "1year": "1 year old baby, toddler",
-                "2years": "2 years old child, young toddler"
-            }
-            
-            age_prompt = age_prompts.get(baby_age, age_prompts["newborn"])
-            
-            # 使用 Flux 模型 + IP-Adapter 进行面部融合
-            prompt = f"""
-            {age_prompt}, (pure Chinese baby:1.5), adorable baby portrait,
-            (single eyelid:1.2), (black straight hair:1.3), (dark brown eyes:1.3),
-            (flat nose bridge:1.1), round face, chubby cheeks,
-            professional baby photography, studio lighting, high quality, 8k
-            """
-            
-            negative_prompt = """
-            mixed race, caucasian, western features, adult, teenager,
-            (double eyelids:1.3), blue eyes, blonde hair, curly hair,
-            low quality, blurry, distorted
-            """
-            
             print(f"正在生成宝宝照片...")
             print(f"父母照片1: {parent1_image}")
             if parent2_image:
@@ -129,20 +223,8 @@ class BabyFaceFusion:
             
             # 使用 fal.ai 的 Flux + ControlNet 模型
             # 注意：这里使用参考图片来引导生成
-            result = fal_client.subscribe(
-                "fal-ai/flux-lora",  # 使用支持参考图的模型
-                arguments={
-                    "prompt": prompt,
-                    "negative_prompt": negative_prompt,
-                    "image_size": "square_hd",
-                    "num_inference_steps": 28,
-                    "guidance_scale": 3.5,
-                    "num_images": num_variations,
-                    "enable_safety_checker": True,
-                    # 参考图片（如果模型支持）
-                    "image_url": parent1_image if parent1_image.startswith("http") else None
-                }
-            )
+            result = provider.generate("flux_lora", FAL_FUSION_MODEL,
+                                       self._fal_arguments(parent1_image, baby_age, num_variations))
             
             if result and "images" in result:
                 return {
@@ -169,6 +251,7 @@ class BabyFaceFusion:
                 "message": f"生成失败: {str(e)}"
             }
     
+    @traced()
     def generate_baby_from_parents_replicate(
         self,
         parent1_image: str,
@@ -186,14 +269,15 @@ class BabyFaceFusion:
         Returns:
             生成结果
         """
-        if not REPLICATE_AVAILABLE:
+        provider = providers.get("replicate")
+        if not provider.available():
             return {
                 "success": False,
                 "error": "replicate 未安装",
                 "message": "请运行: pip install replicate"
             }
         
-        if not self.replicate_key:
+        if not provider.configured(self.replicate_key):
             return {
                 "success": False,
                 "error": "API 密钥未设置",
@@ -201,30 +285,14 @@ class BabyFaceFusion:
             }
         
         try:
-            # 读取图片
-            with open(parent1_image, "rb") as f:
-                parent1_data = f.read()
-            
-            parent2_data = None
-            if parent2_image:
-                with open(parent2_image, "rb") as f:
-                    parent2_data = f.read()
-            
             # 使用 Replicate 的面部融合模型
             # 注意：这是示例，实际模型可能不同
-            output = replicate.run(
-                "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b",
-                input={
-                    "prompt": f"baby portrait, {baby_age}, Chinese baby, adorable",
-                    "negative_prompt": "adult, western features, mixed race",
-                    "image": parent1_data,
-                    "num_outputs": 4
-                }
-            )
+            result = provider.generate("sdxl", REPLICATE_FUSION_MODEL,
+                                       self._replicate_arguments(parent1_image, baby_age))
             
             return {
                 "success": True,
-                "images": list(output),
+                "images": [img["url"] for img in result["images"]],
                 "metadata": {
                     "baby_age": baby_age,
                     "parent1_image": parent1_image,
@@ -287,19 +355,12 @@ if __name__ == "__main__":
     
     print(f"\n开始生成 {baby_age} 宝宝照片...")
     
-    if FAL_AVAILABLE:
-        result = generator.generate_baby_from_parents_fal(
-            parent1_image=parent1,
-            parent2_image=parent2,
-            baby_age=baby_age,
-            num_variations=4
-        )
-    elif REPLICATE_AVAILABLE:
-        result = generator.generate_baby_from_parents_replicate(
-            parent1_image=parent1,
-            parent2_image=parent2,
-            baby_age=baby_age
-        )
+    result = generator.generate_baby_from_parents(
+        parent1_image=parent1,
+        parent2_image=parent2,
+        baby_age=baby_age,
+        num_variations=4
+    )
     
     if result["success"]:
         print("\n✅ 生成成功！")
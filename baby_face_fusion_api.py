@@ -7,7 +7,7 @@
 import os
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
-from baby_face_fusion import BabyFaceFusion
+from feature_registry import features
 
 # 创建 Blueprint
 baby_fusion_bp = Blueprint('baby_fusion', __name__, url_prefix='/api/baby-fusion')
@@ -16,11 +16,8 @@ baby_fusion_bp = Blueprint('baby_fusion', __name__, url_prefix='/api/baby-fusion
 UPLOAD_FOLDER = 'uploads/parents'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
 
-# 确保上传文件夹存在
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-# 创建面部融合生成器
-fusion_generator = BabyFaceFusion()
+# 面部融合生成器：第一次生成时才创建
+fusion_generator = features.lazy("fusion")
 
 
 def allowed_file(filename):
@@ -64,7 +61,8 @@ def upload_and_generate():
                 'error': f'不支持的文件类型，仅支持: {", ".join(ALLOWED_EXTENSIONS)}'
             }), 400
         
-        # 保存父母1的照片
+        # 保存父母1的照片（上传文件夹在第一次上传时创建）
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
         filename1 = secure_filename(parent1_file.filename)
         parent1_path = os.path.join(UPLOAD_FOLDER, f"parent1_{filename1}")
         parent1_file.save(parent1_path)
@@ -101,7 +99,7 @@ def upload_and_generate():
             }), 400
         
         # 生成宝宝照片
-        result = fusion_generator.generate_baby_from_parents_fal(
+        result = fusion_generator.generate_baby_from_parents(
             parent1_image=parent1_path,
             parent2_image=parent2_path,
             baby_age=baby_age,
@@ -150,7 +148,7 @@ def generate_from_urls():
         num_variations = int(data.get('num_variations', 4))
         
         # 生成宝宝照片
-        result = fusion_generator.generate_baby_from_parents_fal(
+        result = fusion_generator.generate_baby_from_parents(
             parent1_image=parent1_url,
             parent2_image=parent2_url,
             baby_age=baby_age,
@@ -170,13 +168,15 @@ def generate_from_urls():
 def health_check():
     """健康检查"""
     from baby_face_fusion import FAL_AVAILABLE, REPLICATE_AVAILABLE
+    from provider_router import router
     
     return jsonify({
         'status': 'healthy',
         'fal_available': FAL_AVAILABLE,
         'replicate_available': REPLICATE_AVAILABLE,
         'fal_key_configured': bool(os.environ.get('FAL_KEY')),
-        'replicate_key_configured': bool(os.environ.get('REPLICATE_API_TOKEN'))
+        'replicate_key_configured': bool(os.environ.get('REPLICATE_API_TOKEN')),
+        'providers': router.status()   # 各服务的熔断状态、成功/失败次数、p95
     })
 
 
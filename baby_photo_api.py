@@ -5,13 +5,13 @@
 """
 
 from flask import Blueprint, jsonify, request
-from baby_photo_integration import BabyPhotoGenerator
+from feature_registry import features
 
 # 创建 Blueprint
 baby_photo_bp = Blueprint('baby_photo', __name__, url_prefix='/api/baby-photo')
 
-# 创建照片生成器实例
-photo_generator = BabyPhotoGenerator()
+# 照片生成器实例：第一次生成照片时才创建
+photo_generator = features.lazy("photo")
 
 
 @baby_photo_bp.route('/generate', methods=['POST'])
@@ -7,13 +7,14 @@
 import os
 from typing import Dict, Any, Optional
 from chinese_baby_prompts import get_fal_ai_config, generate_prompt
+from feature_registry import features
+from provider_router import Route, router
+from providers import providers
+from tracing import traced
 
-# 尝试导入 fal_client
-try:
-    import fal_client
-    FAL_AVAILABLE = True
-except ImportError:
-    FAL_AVAILABLE = False
+# 照片通过 providers.get("fal") 生成（GENERATION_PROVIDER=fake 时走本地假服务，见 providers）
+FAL_AVAILABLE = features.available("fal")
+if not FAL_AVAILABLE:
     print("警告: fal_client 未安装，照片生成功能不可用")
 
 
@@ -35,6 +36,7 @@ class BabyPhotoGenerator:
         if not FAL_AVAILABLE:
             print("提示: 请运行 'pip install fal-client' 安装依赖")
     
+    @traced()
     def generate_baby_photo(
         self,
         age_months: int,
@@ -54,7 +56,8 @@ class BabyPhotoGenerator:
         Returns:
             包含照片URL和元数据的字典
         """
-        if not FAL_AVAILABLE or not self.api_key:
+        provider = providers.get("fal")
+        if not provider.configured(self.api_key):
             return {
                 "success": False,
                 "error": "照片生成功能不可用",
@@ -68,10 +71,12 @@ class BabyPhotoGenerator:
         config = get_fal_ai_config(age_stage, gender, expression, scene)
         
         try:
-            # 调用 fal.ai API
-            result = fal_client.subscribe(
+            # 调用 fal.ai API（经过路由：受请求截止时间限制，熔断时直接失败，慢时对冲，见 provider_router）
+            result, _ = router.generate([Route(
+                "fal",
+                "flux_schnell",
                 "fal-ai/flux/schnell",  # 使用快速模型
-                arguments={
+                {
                     "prompt": config["prompt"],
                     "negative_prompt": config["negative_prompt"],
                     "image_size": config["image_size"],
@@ -80,7 +85,7 @@ class BabyPhotoGenerator:
                     "num_images": 1,
                     "enable_safety_checker": True
                 }
-            )
+            )])
             
             # 提取图片URL
             if result and "images" in result and len(result["images"]) > 0:
@@ -123,6 +128,7 @@ class BabyPhotoGenerator:
         else:
             return "preschool_2_3"
     
+    @traced()
     def generate_for_game_state(self, game_state: Any) -> Dict[str, Any]:
         """
         根据游戏状态生成宝宝照片
@@ -7,12 +7,12 @@
 import os
 from pathlib import Path
 
-# 尝试导入 pygame
-try:
-    import pygame
-    PYGAME_AVAILABLE = True
-except ImportError:
-    PYGAME_AVAILABLE = False
+from feature_registry import features
+
+# pygame 在播放器初始化混音器时才导入（见 feature_registry）
+pygame = features.lazy("pygame")
+PYGAME_AVAILABLE = features.available("pygame")
+if not PYGAME_AVAILABLE:
     print("警告: pygame 未安装，音乐功能不可用")
 
 
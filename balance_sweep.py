@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+数值平衡参数扫描
+对 HardcoreParentingGame 的模式衰减速度 (decay_rate) 和性格事件权重 (event_weights)
+做网格 / 拉丁超立方采样，在多进程中批量模拟上千次“养娃生涯”，输出生存时长、平均快乐度和KPI
+
+用法示例:
+    python balance_sweep.py --grid decay_rate=0.5,1.0,1.5 --grid negative_weight=0.3,0.7
+    python balance_sweep.py --lhs 16 --range decay_rate=0.25:2.0 --range negative_weight=0.1:0.9 \\
+        --lifetimes 5000 --workers 8 --checkpoint sweep_checkpoint.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from hardcore_parenting_game import (
+    HardcoreParentingGame, GameMode, BabyPersonality, TaskType
+)
+
+
+# 可扫描参数的默认取值范围
+DEFAULT_RANGES = {
+    "decay_rate": (0.25, 2.0),
+    "negative_weight": (0.1, 0.9),
+}
+
+
+@dataclass(frozen=True)
+class SweepPoint:
+    """一个参数组合"""
+    mode: str
+    personality: str
+    decay_rate: float
+    negative_weight: float
+
+    def key(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+
+@dataclass
+class SweepSettings:
+    """单次生涯模拟设置"""
+    max_hours: int = 24 * 7          # 最长模拟时长（小时），默认一周
+    events_per_hour: float = 1.0     # 每小时平均事件数
+    player_skill: float = 0.7        # 机器人玩家每次操作正确的概率
+    age_months: int = 0              # 起始月龄
+    hours_per_month: Optional[int] = None  # 每多少小时长大一个月（None 表示不长大）
+
+
+# ==================== 机器人玩家 ====================
+
+def _feeding(game, rng, good):
+    if good:
+        return game.execute_feeding_task(rng.uniform(39, 41), rng.randint(3, 8), rng.randint(30, 60))
+    return game.execute_feeding_task(rng.uniform(30, 50), rng.randint(1, 10), rng.randint(10, 80))
+
+
+def _sleep(game, rng, good):
+    if good:
+        return game.execute_sleep_task(rng.uniform(1.5, 2.5), rng.randint(45, 90), False)
+    return game.execute_sleep_task(rng.uniform(0.5, 3.5), rng.randint(20, 90), rng.random() < 0.3)
+
+
+def _diaper(game, rng, good):
+    if good:
+        return game.execute_diaper_task(rng.uniform(1.0, 4.0), rng.randint(6, 9), "correct")
+    return game.execute_diaper_task(rng.uniform(3.0, 8.0), rng.randint(2, 10),
+                                    rng.choice(["correct", "wrong_order"]))
+
+
+def _medicine(game, rng, good):
+    return game.execute_medicine_task("fever_patch" if good else rng.choice(["antibiotic", "hot_water"]))
+
+
+def _hug(game, rng, good):
+    return game.execute_hug_task(rng.uniform(3.0, 6.0) if good else rng.uniform(0.5, 3.0))
+
+
+def _talk(game, rng, good):
+    if good:
+        return game.execute_talk_task(["宝宝", "乖"], rng.uniform(10, 60))
+    return game.execute_talk_task([], rng.uniform(2, 90))
+
+
+def _food(game, rng, good):
+    if good:
+        return game.execute_food_task("pumpkin", rng.randint(6, 9))
+    return game.execute_food_task(rng.choice(["carrot", "chili"]), rng.randint(2, 9))
+
+
+def _safety(game, rng, good):
+    if good:
+        return game.execute_safety_task(rng.uniform(0.5, 2.0), True)
+    return game.execute_safety_task(rng.uniform(1.5, 4.0), rng.random() < 0.5)
+
+
+def _first_word(game, rng, good):
+    if good:
+        return game.execute_first_word_task(True, rng.uniform(0.5, 3.0))
+    return game.execute_first_word_task(rng.random() < 0.5, rng.uniform(2.0, 6.0))
+
+
+def _danger_touch(game, rng, good):
+    return game.execute_danger_touch_task("away" if good else rng.choice(["same", "none"]), "插座")
+
+
+def _toy_conflict(game, rng, good):
+    if good:
+        best = "B" if game.state.baby_personality == BabyPersonality.ANGEL else "A"
+        return game.execute_toy_conflict_task(best)
+    return game.execute_toy_conflict_task(rng.choice(["A", "B", "C"]))
+
+
+def _bad_word(game, rng, good):
+    return game.execute_bad_word_task("B" if good else rng.choice(["A", "C"]), "卧槽")
+
+
+def _dressing(game, rng, good):
+    if good:
+        return game.execute_dressing_task(rng.randint(30, 96), 120)
+    return game.execute_dressing_task(rng.randint(100, 200), 120)
+
+
+def _emotion_talk(game, rng, good):
+    return game.execute_emotion_talk_task("A" if good else rng.choice(["B", "C"]))
+
+
+BOT_POLICIES: Dict[TaskType, Callable] = {
+    TaskType.FEEDING_HUNGRY: _feeding,
+    TaskType.SLEEP_TIRED: _sleep,
+    TaskType.DIAPER_DIRTY: _diaper,
+    TaskType.MEDICINE_SICK: _medicine,
+    TaskType.HUG_HAPPY: _hug,
+    TaskType.TALK_PLAY: _talk,
+    TaskType.FOOD_HUNGRY: _food,
+    TaskType.SAFETY_DANGER: _safety,
+    TaskType.FIRST_WORD: _first_word,
+    TaskType.DANGER_TOUCH: _danger_touch,
+    TaskType.TOY_CONFLICT: _toy_conflict,
+    TaskType.BAD_WORD: _bad_word,
+    TaskType.DRESSING_WILD: _dressing,
+    TaskType.EMOTION_TALK: _emotion_talk,
+}
+
+
+# ==================== 单次生涯模拟 ====================
+
+def apply_point(game: HardcoreParentingGame, point: SweepPoint):
+    """把参数组合写入游戏实例的配置"""
+    mode = GameMode(point.mode)
+    personality = BabyPersonality(point.personality)
+    game.mode_configs[mode] = dict(game.mode_configs[mode], decay_rate=point.decay_rate)
+    game.event_weights[personality] = {
+        "negative": point.negative_weight,
+        "positive": 1.0 - point.negative_weight,
+    }
+
+
+def simulate_lifetime(point: SweepPoint, settings: SweepSettings, seed: int) -> Dict[str, float]:
+    """
+    模拟一次完整的养娃生涯（使用模拟时钟，不依赖真实时间）
+
+    Returns:
+        dict: survival_hours, mean_happiness, successes, attempts
+    """
+    rng = random.Random(seed)
+
+    game = HardcoreParentingGame()
+    game.seed_rng(seed)  # 游戏内部随机数（事件抽取、任务随机性）同样可复现
+    apply_point(game, point)
+    game.start_game(GameMode(point.mode), BabyPersonality(point.personality), settings.age_months)
+
+    happiness_sum = 0
+    successes = 0
+    attempts = 0
+    hours = 0
+    whole_events = int(settings.events_per_hour)
+    extra_event_prob = settings.events_per_hour - whole_events
+
+    while hours < settings.max_hours:
+        hours += 1
+        game._apply_decay_hours(1.0)
+        if settings.hours_per_month and hours % settings.hours_per_month == 0:
+            game.state.baby_age_months += 1
+
+        n_events = whole_events + (1 if rng.random() < extra_event_prob else 0)
+        for _ in range(n_events):
+            task_type = game.get_random_event()
+            policy = BOT_POLICIES.get(task_type)
+            if policy is None:
+                continue
+            result = policy(game, rng, rng.random() < settings.player_skill)
+            attempts += 1
+            successes += 1 if result.success else 0
+
+        happiness_sum += game.state.happiness
+        if game.state.health <= 0 or game.state.happiness <= 0:
+            break
+
+    return {
+        "survival_hours": hours,
+        "mean_happiness": happiness_sum / max(hours, 1),
+        "successes": successes,
+        "attempts": attempts,
+    }
+
+
+def _run_chunk(point: SweepPoint, settings: SweepSettings, seeds: List[int]) -> Dict[str, float]:
+    """工作进程入口：模拟一批生涯并返回汇总值（只回传聚合结果，减少进程间传输）"""
+    totals = {"lifetimes": 0, "survival_hours": 0.0, "survived_full": 0,
+              "mean_happiness": 0.0, "successes": 0, "attempts": 0}
+    for seed in seeds:
+        life = simulate_lifetime(point, settings, seed)
+        totals["lifetimes"] += 1
+        totals["survival_hours"] += life["survival_hours"]
+        totals["survived_full"] += 1 if life["survival_hours"] >= settings.max_hours else 0
+        totals["mean_happiness"] += life["mean_happiness"]
+        totals["successes"] += life["successes"]
+        totals["attempts"] += life["attempts"]
+    return totals
+
+
+# ==================== 采样方案 ====================
+
+def grid_points(values: Dict[str, List[float]], modes: Iterable[GameMode],
+                personalities: Iterable[BabyPersonality]) -> List[SweepPoint]:
+    """网格采样：所有取值的笛卡尔积"""
+    decay_values = values.get("decay_rate") or [None]
+    weight_values = values.get("negative_weight") or [None]
+    points = []
+    for mode, personality, decay, weight in itertools.product(modes, personalities, decay_values, weight_values):
+        points.append(_make_point(mode, personality, decay, weight))
+    return points
+
+
+def latin_hypercube_points(n: int, ranges: Dict[str, Tuple[float, float]], modes: Iterable[GameMode],
+                           personalities: Iterable[BabyPersonality], seed: int = 0) -> List[SweepPoint]:
+    """拉丁超立方采样：每个维度切成n层，每层恰好取一个样本"""
+    rng = random.Random(seed)
+    columns = {}
+    for name, (low, high) in ranges.items():
+        strata = [(i + rng.random()) / n for i in range(n)]
+        rng.shuffle(strata)
+        columns[name] = [round(low + s * (high - low), 4) for s in strata]
+
+    points = []
+    for mode, personality in itertools.product(modes, personalities):
+        for i in range(n):
+            points.append(_make_point(
+                mode, personality,
+                columns["decay_rate"][i] if "decay_rate" in columns else None,
+                columns["negative_weight"][i] if "negative_weight" in columns else None
+            ))
+    return points
+
+
+def _make_point(mode: GameMode, personality: BabyPersonality,
+                decay_rate: Optional[float], negative_weight: Optional[float]) -> SweepPoint:
+    """未扫描的维度沿用游戏当前的硬编码默认值"""
+    defaults = HardcoreParentingGame()
+    if decay_rate is None:
+        decay_rate = defaults.mode_configs[mode]["decay_rate"]
+    if negative_weight is None:
+        negative_weight = defaults.event_weights[personality]["negative"]
+    return SweepPoint(mode.value, personality.value, float(decay_rate), float(negative_weight))
+
+
+# ==================== 扫描执行与断点续跑 ====================
+
+def _checkpoint_header(lifetimes: int, chunk_size: int, settings: SweepSettings, base_seed: int) -> Dict[str, Any]:
+    """断点文件首行：块编号只在这些参数不变时才对应同一批种子"""
+    return {"lifetimes": lifetimes, "chunk_size": chunk_size, "base_seed": base_seed,
+            "settings": asdict(settings)}
+
+
+def _load_checkpoint(path: Optional[str], header: Dict[str, Any]) -> Dict[Tuple[str, int], Dict[str, float]]:
+    """
+    读取已完成的块
+
+    Raises:
+        ValueError: 断点文件是用不同的生涯数/块大小/设置写的（块编号对不上，不能合并）
+    """
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 进程被杀时可能留下半行
+            if "header" in record:
+                if record["header"] != header:
+                    raise ValueError(f"断点文件 {path} 的扫描参数 {record['header']} 与本次 {header} 不一致，"
+                                     "请换一个断点文件或删除后重跑")
+                header = None   # 已校验
+                continue
+            if header is not None:
+                raise ValueError(f"断点文件 {path} 缺少参数头，无法确认块编号，请换一个断点文件或删除后重跑")
+            done[(record["point"], record["chunk"])] = record["totals"]
+    return done
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def run_sweep(points: List[SweepPoint], lifetimes: int = 1000, settings: Optional[SweepSettings] = None,
+              workers: Optional[int] = None, chunk_size: int = 250, checkpoint: Optional[str] = None,
+              base_seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    执行参数扫描
+
+    Args:
+        points: 参数组合列表
+        lifetimes: 每个组合模拟的生涯次数
+        settings: 单次生涯设置
+        workers: 工作进程数（默认CPU核数）
+        chunk_size: 每个任务块包含的生涯数，也是断点保存的粒度
+        checkpoint: 断点文件路径（JSONL），已完成的块重启后不再重算；首行记录
+            lifetimes / chunk_size / base_seed / settings，与本次不一致时拒绝续跑（ValueError）
+        base_seed: 随机种子基数
+
+    Returns:
+        每个组合的汇总结果列表
+    """
+    settings = settings or SweepSettings()
+    header = _checkpoint_header(lifetimes, chunk_size, settings, base_seed)
+    done = _load_checkpoint(checkpoint, header)
+    totals: Dict[str, Dict[str, float]] = {}
+
+    jobs = []
+    for point in points:
+        key = point.key()
+        for chunk_index, start in enumerate(range(0, lifetimes, chunk_size)):
+            if (key, chunk_index) in done:
+                _merge(totals, key, done[(key, chunk_index)])
+                continue
+            seeds = [base_seed + i for i in range(start, min(start + chunk_size, lifetimes))]
+            jobs.append((point, chunk_index, seeds))
+
+    if jobs:
+        checkpoint_file = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+        if checkpoint_file and checkpoint_file.tell() == 0:
+            checkpoint_file.write(json.dumps({"header": header}, ensure_ascii=False) + "\n")
+        elif checkpoint_file and not _ends_with_newline(checkpoint):
+            checkpoint_file.write("\n")   # 半行之后另起一行，新记录不会接在半行后面
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(_run_chunk, point, settings, seeds): (point, chunk_index)
+                    for point, chunk_index, seeds in jobs
+                }
+                for future in as_completed(futures):
+                    point, chunk_index = futures[future]
+                    chunk_totals = future.result()
+                    _merge(totals, point.key(), chunk_totals)
+                    if checkpoint_file:
+                        checkpoint_file.write(json.dumps(
+                            {"point": point.key(), "chunk": chunk_index, "totals": chunk_totals},
+                            ensure_ascii=False) + "\n")
+                        checkpoint_file.flush()
+        finally:
+            if checkpoint_file:
+                checkpoint_file.close()
+
+    results = []
+    for point in points:
+        t = totals.get(point.key())
+        if not t or not t["lifetimes"]:
+            continue
+        n = t["lifetimes"]
+        results.append({
+            **asdict(point),
+            "lifetimes": n,
+            "survival_hours": round(t["survival_hours"] / n, 2),
+            "survival_rate": round(t["survived_full"] / n, 4),
+            "mean_happiness": round(t["mean_happiness"] / n, 2),
+            "kpi": round(100.0 * t["successes"] / t["attempts"], 2) if t["attempts"] else 0.0,
+        })
+    return results
+
+
+def _merge(totals: Dict[str, Dict[str, float]], key: str, chunk: Dict[str, float]):
+    target = totals.setdefault(key, {k: 0 for k in chunk})
+    for k, v in chunk.items():
+        target[k] = target.get(k, 0) + v
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    """格式化为紧凑的结果表"""
+    columns = ["mode", "personality", "decay_rate", "negative_weight",
+               "lifetimes", "survival_hours", "survival_rate", "mean_happiness", "kpi"]
+    rows = [[str(r[c]) for c in columns] for r in results]
+    widths = [max(len(c), *(len(row[i]) for row in rows)) if rows else len(c) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths)),
+             "  ".join("-" * w for w in widths)]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(row, widths)) for row in rows]
+    return "\n".join(lines)
+
+
+# ==================== 命令行 ====================
+
+def _parse_values(specs: List[str]) -> Dict[str, List[float]]:
+    values = {}
+    for spec in specs or []:
+        name, _, raw = spec.partition("=")
+        values[name.strip()] = [float(v) for v in raw.split(",") if v.strip()]
+    return values
+
+
+def _parse_ranges(specs: List[str]) -> Dict[str, Tuple[float, float]]:
+    ranges = {}
+    for spec in specs or []:
+        name, _, raw = spec.partition("=")
+        low, _, high = raw.partition(":")
+        ranges[name.strip()] = (float(low), float(high))
+    return ranges
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="HardcoreParentingGame 数值平衡参数扫描")
+    parser.add_argument("--grid", action="append", help="网格取值，如 decay_rate=0.5,1.0,1.5")
+    parser.add_argument("--lhs", type=int, help="拉丁超立方采样点数")
+    parser.add_argument("--range", action="append", help="LHS取值范围，如 negative_weight=0.1:0.9")
+    parser.add_argument("--modes", default=",".join(m.value for m in GameMode))
+    parser.add_argument("--personalities", default=",".join(p.value for p in BabyPersonality))
+    parser.add_argument("--lifetimes", type=int, default=1000)
+    parser.add_argument("--max-hours", type=int, default=24 * 7)
+    parser.add_argument("--events-per-hour", type=float, default=1.0)
+    parser.add_argument("--skill", type=float, default=0.7)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    args = parser.parse_args(argv)
+
+    modes = [GameMode(m) for m in args.modes.split(",") if m]
+    personalities = [BabyPersonality(p) for p in args.personalities.split(",") if p]
+
+    if args.lhs:
+        ranges = dict(DEFAULT_RANGES)
+        ranges.update(_parse_ranges(args.range))
+        points = latin_hypercube_points(args.lhs, ranges, modes, personalities, seed=args.seed)
+    else:
+        points = grid_points(_parse_values(args.grid), modes, personalities)
+
+    settings = SweepSettings(max_hours=args.max_hours, events_per_hour=args.events_per_hour,
+                             player_skill=args.skill)
+    results = run_sweep(points, lifetimes=args.lifetimes, settings=settings, workers=args.workers,
+                        chunk_size=args.chunk_size, checkpoint=args.checkpoint, base_seed=args.seed)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
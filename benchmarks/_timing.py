@@ -0,0 +1,31 @@
+"""
+基准测试计时工具
+"""
+
+import time
+from typing import Any, Callable, Dict
+
+
+def measure(fn: Callable[[], Any], number: int = 10000, repeat: int = 5) -> Dict[str, float]:
+    """
+    多轮计时，取最快一轮（排除调度抖动）
+
+    Returns:
+        dict: per_call_us（单次耗时微秒）, ops_per_sec（每秒次数）
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    per_call = best / number
+    return {
+        "per_call_us": round(per_call * 1e6, 3),
+        "ops_per_sec": round(1.0 / per_call, 1) if per_call else float("inf"),
+    }
+
+
+def report(name: str, result: Dict[str, float]):
+    """打印一行基准结果"""
+    print(f"  {name:<40} {result['per_call_us']:>10.3f} µs/次  {result['ops_per_sec']:>14,.0f} 次/秒")
@@ -0,0 +1,52 @@
+"""
+成就检查微基准
+对比旧版每次动作全量评估所有成就，与按统计键索引的增量评估；
+目录规模从8个扩充到数百个时，增量评估的单次动作开销应基本不变
+"""
+
+from achievement_engine import AchievementDefinition, AchievementEngine
+from benchmarks._timing import measure, report
+from hardcore_parenting_simulator import AchievementSystem
+
+
+def build_catalog(size: int):
+    """在内置成就基础上扩充出 size 个成就，扩充的成就各自依赖独立的统计键"""
+    catalog = dict(AchievementSystem().achievements)
+    for i in range(size - len(catalog)):
+        key = f"extra_stat_{i}"
+        catalog[f"extra_{i}"] = {
+            "name": f"扩展成就{i}",
+            "description": "基准测试用",
+            "condition": lambda stats, key=key: stats.get(key, 0) >= 1_000_000,
+            "depends_on": (key,),
+        }
+    return catalog
+
+
+def legacy_check(catalog, stats):
+    """旧版实现：遍历全部成就，按列表判断是否已获得"""
+    earned = []
+    for achievement_id, achievement in catalog.items():
+        if achievement_id not in stats.get("earned_achievements", []):
+            if achievement["condition"](stats):
+                earned.append(achievement_id)
+    return earned
+
+
+def main():
+    stats = {"actions_taken": 10, "min_sanity": 40, "earned_achievements": []}
+    changed = ("actions_taken", "min_sanity")
+
+    print("🏆 成就检查基准（每次 process_action 的开销）")
+    for size in (8, 100, 400):
+        catalog = build_catalog(size)
+        engine = AchievementEngine(
+            AchievementDefinition(aid, a["name"], a["description"], a["condition"], a["depends_on"])
+            for aid, a in catalog.items()
+        )
+        report(f"旧版全量检查 ({size}个成就)", measure(lambda: legacy_check(catalog, stats), number=2000))
+        report(f"增量索引检查 ({size}个成就)", measure(lambda: engine.update("p1", stats, changed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+批量任务执行 vs 逐个请求
+模拟一个回放客户端提交 1000 个任务，会话上挂着一个观众（观战频道）：
+- 逐个请求：每个任务解析一次请求体、执行、序列化一次响应，最后再拉一次状态；
+  每个任务都会触发一次观战快照
+- /game/batch：解析一次请求体，整批在一次会话锁内执行，返回逐条结果 + 一份最终状态；
+  观战快照只在批次结束时生成一次
+这里只统计进程内的 CPU 开销，不含网络往返（逐个请求还要多出 N-1 次往返）
+"""
+
+import json
+
+from benchmarks._timing import measure, report
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from spectator import SpectatorChannel
+from task_batch import STREAM_THRESHOLD, TASK_METHODS, batch_response
+
+TASKS = 1000
+TASK_MIX = [
+    {"task": "talk_play", "args": {"speech_keywords": ["宝宝", "妈妈"], "voice_duration": 20.0}},
+    {"task": "hug_happy", "args": {"press_duration": 3.0}},
+    {"task": "food_hungry", "args": {"food_choice": "米糊", "cutting_skill": 8}},
+    {"task": "safety_danger", "args": {"reaction_time": 0.8, "button_clicked": True}},
+]
+
+
+class FakeRequest:
+    def __init__(self, headers=None):
+        self.args = {}
+        self.headers = headers or {}
+
+
+def new_game() -> HardcoreParentingGame:
+    game = HardcoreParentingGame()
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+    channel = SpectatorChannel(game)
+    channel.subscribe()
+    return game
+
+
+def workload():
+    return [TASK_MIX[i % len(TASK_MIX)] for i in range(TASKS)]
+
+
+def individual_requests():
+    game = new_game()
+    for item in workload():
+        data = json.loads(json.dumps(item["args"]))
+        result = getattr(game, TASK_METHODS[item["task"]][0])(**data)
+        json.dumps({"success": result.success, "message": result.message,
+                    "state_changes": result.state_changes}, ensure_ascii=False)
+    game.get_status_body()
+
+
+def batch_request(headers=None):
+    game = new_game()
+    data = json.loads(json.dumps({"tasks": workload()}))
+    body, _, _ = batch_response(game, data, FakeRequest(headers))
+    return body if isinstance(body, bytes) else b"".join(body)
+
+
+def main():
+    print("📦 批量任务执行")
+    print(f"  {TASKS} 个任务，会话挂一个观众；NDJSON 阈值 {STREAM_THRESHOLD} 个任务")
+    rows = [
+        (f"逐个请求（{TASKS} 次往返）", individual_requests),
+        ("/game/batch JSON（1 次往返）", lambda: batch_request({"Accept": "application/json"})),
+        ("/game/batch NDJSON（1 次往返）", lambda: batch_request({"Accept": "application/x-ndjson"})),
+    ]
+    for label, fn in rows:
+        result = measure(fn, number=1, repeat=5)
+        report(label, result)
+        per_task_us = result["per_call_us"] / TASKS
+        print(f"    每个任务 {per_task_us:.1f} µs  ≈ {1e6 / per_task_us:,.0f} 任务/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+双人协作推送延迟：5000 个双人会话（10000 个订阅者）在一个事件循环里
+- 每轮每个会话由一名玩家提交一个动作，两名玩家的订阅协程各自收到增量
+- 延迟 = 动作提交 -> 订阅者拿到帧（包含排在同一轮其它会话之后的排队时间）
+另外对比每条更新只编码一次与按订阅者分别编码的开销
+"""
+
+import asyncio
+import time
+
+from benchmarks._timing import measure, report
+from coop_hub import CoopHub, encode_frame
+from hardcore_parenting_simulator import ActionType, PlayerAction
+from streaming_stats import QuantileSketch
+
+SESSIONS = 5000
+ROUNDS = 20
+ROUND_INTERVAL = 0.05
+YIELD_EVERY = 50         # 每提交这么多个动作让出一次事件循环（模拟请求交错到达）
+
+
+def frame_seq(frame: bytes) -> int:
+    return int(frame[4:frame.index(b"\n")])
+
+
+async def run_sessions():
+    hub = CoopHub()
+    sessions = []
+    for i in range(SESSIONS):
+        session = hub.create(f"coop-{i}", f"mom-{i}", "妈妈")
+        session.join(f"dad-{i}", "爸爸")
+        session.read(f"mom-{i}")
+        session.read(f"dad-{i}")
+        sessions.append(session)
+
+    latency = QuantileSketch()
+    sent = [dict() for _ in range(SESSIONS)]
+    delivered = 0
+    expected = SESSIONS * ROUNDS * 2
+
+    async def subscriber(index: int, player_id: str, done: asyncio.Event):
+        nonlocal delivered
+        session, cursor, received = sessions[index], None, 0
+        while received < ROUNDS:
+            frames, cursor = await session.wait_async(player_id, cursor)
+            now = time.perf_counter()
+            for frame in frames:
+                latency.add((now - sent[index][frame_seq(frame)]) * 1000)
+            received += len(frames)
+            delivered += len(frames)
+        if delivered == expected:
+            done.set()
+
+    done = asyncio.Event()
+    tasks = [asyncio.ensure_future(subscriber(i, f"{role}-{i}", done))
+             for i in range(SESSIONS) for role in ("mom", "dad")]
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    for round_index in range(ROUNDS):
+        for i, session in enumerate(sessions):
+            player_id = f"{'mom' if round_index % 2 == 0 else 'dad'}-{i}"
+            sent_at = time.perf_counter()
+            result = session.submit(player_id, PlayerAction(ActionType.COMFORT, 5.0, True, player_id),
+                                    idempotency_key=f"r{round_index}")
+            sent[i][result["seq"]] = sent_at
+            if i % YIELD_EVERY == YIELD_EVERY - 1:
+                await asyncio.sleep(0)
+        await asyncio.sleep(ROUND_INTERVAL)
+    await asyncio.wait_for(done.wait(), 60)
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*tasks)
+
+    updates = SESSIONS * ROUNDS
+    print(f"  {SESSIONS} 个会话 x {ROUNDS} 轮，{updates:,} 个动作 / {delivered:,} 次推送，"
+          f"耗时 {elapsed:.2f} s（含每轮 {ROUND_INTERVAL * 1000:.0f} ms 间隔）")
+    print(f"  推送延迟 p50 {latency.quantile(0.5):.2f} ms  p90 {latency.quantile(0.9):.2f} ms  "
+          f"p99 {latency.quantile(0.99):.2f} ms")
+
+
+def bench_encoding():
+    payload = {"player_id": "mom-1", "action_type": "comfort", "resolved_event": None,
+               "delta": {"comfort": 80, "sanity": 95, "parenting_kpi": 105}, "individual_kpi": 100,
+               "actions_count": 12}
+    report("每条更新编码一次（2个订阅者共用）", measure(lambda: encode_frame(1, "action", payload), number=20000))
+    report("按订阅者各编码一次（2个订阅者）",
+           measure(lambda: [encode_frame(1, "action", payload) for _ in range(2)], number=20000))
+
+
+def main():
+    print("🤝 双人协作推送")
+    bench_encoding()
+    asyncio.run(run_sessions())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+随机事件抽取微基准
+对比旧版逐次构建列表的抽取方式与预计算别名表（单次 / 批量）
+"""
+
+import random
+
+from benchmarks._timing import measure, report
+from hardcore_parenting_game import (
+    HardcoreParentingGame, GameMode, BabyPersonality, AGE_STAGE_TASKS,
+    POSITIVE_EVENTS, NEGATIVE_EVENTS
+)
+
+
+def legacy_random_event(game: HardcoreParentingGame):
+    """旧版实现：每次调用重建可用任务和正负面事件列表"""
+    available_tasks = list(AGE_STAGE_TASKS[game._get_current_age_stage()])
+    personality_weights = game.event_weights[game.state.baby_personality]
+    positive_events = list(POSITIVE_EVENTS)
+    negative_events = list(NEGATIVE_EVENTS)
+    available_positive = [t for t in available_tasks if t in positive_events]
+    available_negative = [t for t in available_tasks if t in negative_events]
+    if random.random() < personality_weights["negative"] and available_negative:
+        return random.choice(available_negative)
+    elif available_positive:
+        return random.choice(available_positive)
+    return random.choice(available_tasks)
+
+
+def main():
+    game = HardcoreParentingGame()
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 0)
+    batch = 1000
+
+    print("🎲 随机事件抽取基准")
+    report("旧版 get_random_event", measure(lambda: legacy_random_event(game)))
+    report("别名表 get_random_event", measure(game.get_random_event))
+    batch_result = measure(lambda: game.draw_random_events(batch), number=200)
+    per_draw = {
+        "per_call_us": batch_result["per_call_us"] / batch,
+        "ops_per_sec": batch_result["ops_per_sec"] * batch,
+    }
+    report(f"别名表 draw_random_events({batch}) 单次摊销", per_draw)
+
+
+if __name__ == "__main__":
+    main()
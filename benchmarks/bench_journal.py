@@ -0,0 +1,81 @@
+"""
+会话日志基准
+- 日志写入吞吐（组提交）
+- 挂载日志后单次任务的额外开销（对应 /diaper/execute）
+- 10万条日志会话的恢复时间：无中间快照（全量回放） vs 每500条快照
+"""
+
+import tempfile
+import time
+
+from benchmarks._timing import measure, report
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from session_journal import GroupCommitWriter, SessionJournal
+
+SESSION_ENTRIES = 100_000
+
+
+def new_game() -> HardcoreParentingGame:
+    game = HardcoreParentingGame()
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 2)
+    return game
+
+
+def diaper(game: HardcoreParentingGame):
+    return game.execute_diaper_task(lift_speed=2.0, wipe_thoroughness=8, diaper_placement="correct")
+
+
+def bench_append(directory: str, writer: GroupCommitWriter):
+    journal = SessionJournal(directory, "append", snapshot_every=10 ** 9, writer=writer)
+    entry = {"task": "diaper_dirty", "fn": "execute_diaper_task", "args": [2.0, 8, "correct"],
+             "kw": {}, "seed": 12345, "ok": 1, "d": {"cleanliness": 100, "happiness": 90}}
+    batches_before = writer.batches
+    start = time.perf_counter()
+    for _ in range(SESSION_ENTRIES):
+        journal.append(dict(entry))
+    enqueued = time.perf_counter() - start
+    journal.sync()
+    total = time.perf_counter() - start
+    print(f"  写入 {SESSION_ENTRIES:,} 条: 入队 {enqueued * 1e6 / SESSION_ENTRIES:.2f} µs/条, "
+          f"含落盘 {SESSION_ENTRIES / total:,.0f} 条/秒, 组提交 {writer.batches - batches_before} 批")
+
+
+def bench_task_overhead(directory: str, writer: GroupCommitWriter):
+    plain = new_game()
+    journaled = new_game()
+    journaled.attach_journal(SessionJournal(directory, "overhead", writer=writer))
+    report("换尿布任务（无日志）", measure(lambda: diaper(plain), number=5000))
+    report("换尿布任务（挂载日志）", measure(lambda: diaper(journaled), number=5000))
+    journaled.journal.sync()
+
+
+def bench_recovery(directory: str, writer: GroupCommitWriter, snapshot_every: int, label: str):
+    game = new_game()
+    game.attach_journal(SessionJournal(directory, f"recover_{snapshot_every}", snapshot_every, writer))
+    for _ in range(SESSION_ENTRIES):
+        diaper(game)
+    game.journal.sync()
+
+    start = time.perf_counter()
+    restored = HardcoreParentingGame()
+    replayed = restored.attach_journal(
+        SessionJournal(directory, f"recover_{snapshot_every}", snapshot_every, writer)
+    )
+    elapsed = time.perf_counter() - start
+    assert restored.export_state() == game.export_state()
+    print(f"  恢复 {SESSION_ENTRIES:,} 次任务的会话（{label}）: {elapsed * 1000:.1f} ms，回放 {replayed:,} 条")
+
+
+def main():
+    writer = GroupCommitWriter()
+    with tempfile.TemporaryDirectory() as directory:
+        print("📝 会话日志基准")
+        bench_append(directory, writer)
+        bench_task_overhead(directory, writer)
+        bench_recovery(directory, writer, 10 ** 9, "无中间快照")
+        bench_recovery(directory, writer, 512, "每512条快照")
+    writer.close()
+
+
+if __name__ == "__main__":
+    main()
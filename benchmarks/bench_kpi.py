@@ -0,0 +1,35 @@
+"""
+KPI计算微基准
+对比传入完整历史列表逐次求和，与按玩家流式聚合（滑动窗口）的O(1)计算
+"""
+
+import random
+
+from benchmarks._timing import measure, report
+from hardcore_parenting_simulator import ActionType, GameState, PlayerAction, ScoringSystem
+
+
+def main():
+    rng = random.Random(7)
+    state = GameState(parenting_kpi=80, sanity=60)
+
+    print("📊 KPI计算基准")
+    for history in (20, 1000, 10000):
+        scoring = ScoringSystem()
+        actions = [
+            PlayerAction(ActionType.COMFORT, rng.uniform(5, 120), rng.random() < 0.7, "p1")
+            for _ in range(history)
+        ]
+        for action in actions:
+            scoring.record_action(action)
+        report(f"列表求和 (历史{history}条)", measure(lambda: scoring.calculate_kpi(state, actions), number=500))
+        report(f"流式聚合 (历史{history}条)", measure(lambda: scoring.calculate_kpi(state, player_id="p1")))
+
+    scoring = ScoringSystem()
+    action = actions[0]
+    report("record_action 单次开销", measure(lambda: scoring.record_action(action)))
+    report("get_player_metrics (含p50/p90)", measure(lambda: scoring.get_player_metrics("p1"), number=2000))
+
+
+if __name__ == "__main__":
+    main()
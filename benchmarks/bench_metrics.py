@@ -0,0 +1,57 @@
+"""
+指标埋点开销
+- 单次直方图 observe / 计数器 inc
+- 一次完整任务（records_task）带埋点 vs 去掉埋点
+- /metrics 汇总：WORKERS 个进程快照合并 + 文本输出
+"""
+
+import json
+import os
+import tempfile
+
+import hardcore_parenting_game
+import metrics
+from benchmarks._timing import measure, report
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+
+WORKERS = 8
+
+
+def new_game() -> HardcoreParentingGame:
+    game = HardcoreParentingGame()
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+    return game
+
+
+def main():
+    print("📈 指标埋点开销")
+    report("histogram.observe", measure(lambda: metrics.TASK_LATENCY.observe(0.003, "talk_play"), 100000))
+    report("counter.inc", measure(lambda: metrics.TASKS_TOTAL.inc("talk_play", "true"), 100000))
+    report("observe_task（一次任务的全部埋点）", measure(lambda: metrics.observe_task("talk_play", True, 0.003), 100000))
+
+    game = new_game()
+    task = lambda: game.execute_hug_task(3.0)
+    report("任务执行（带埋点）", measure(task, 20000))
+    original = hardcore_parenting_game.observe_task
+    hardcore_parenting_game.observe_task = lambda *args: None
+    try:
+        report("任务执行（去掉埋点）", measure(task, 20000))
+    finally:
+        hardcore_parenting_game.observe_task = original
+
+    with tempfile.TemporaryDirectory() as directory:
+        registry = metrics.MetricsRegistry(directory)
+        for name in ("a", "b"):
+            latency = registry.histogram(f"route_{name}_seconds", "延迟", ("route", "method", "status"))
+            for i in range(50):
+                latency.observe(0.01 * i, f"/route/{i}", "GET", "200")
+        snapshot = registry.snapshot()
+        for pid in range(WORKERS):
+            # 用本进程 pid 之外的编号模拟其它 worker（计数器/直方图不看存活）
+            with open(os.path.join(directory, f"{pid + 1}.json"), "w") as f:
+                f.write(json.dumps(dict(snapshot, pid=pid + 1)))
+        report(f"/metrics 渲染（{WORKERS} 个 worker，100 个序列）", measure(registry.render, 200))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+万人同时在线：一个事件循环里 10000 个玩家各自处理谈判事件
+- 每个玩家独立的游戏状态与事件管理器，互不覆盖
+- 任务处理器按事件从对象池借出，事件解决后重置归还
+"""
+
+import asyncio
+import time
+import tracemalloc
+
+from hardcore_parenting_simulator import (
+    ActionType, EventType, HardcoreParentingSimulator, PlayerAction
+)
+
+PLAYERS = 10000
+ROUNDS = 3
+
+
+async def main_async():
+    simulator = HardcoreParentingSimulator()
+    players = [f"player-{i}" for i in range(PLAYERS)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(simulator.start_game(player) for player in players))
+    elapsed = time.perf_counter() - start
+    print(f"  {PLAYERS} 个玩家开局 {elapsed * 1000:>10.1f} ms  {PLAYERS / elapsed:>12,.0f} 玩家/秒")
+
+    for round_index in range(ROUNDS):
+        for player in players:
+            simulator.get_player(player).event_manager.trigger_event(EventType.PICKY_EATER_NEGOTIATION)
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            simulator.process_action(player, PlayerAction(ActionType.NEGOTIATE, 5.0, True, player))
+            for player in players
+        ))
+        elapsed = time.perf_counter() - start
+        print(f"  第{round_index + 1}轮 并发处理 {PLAYERS} 个动作 {elapsed * 1000:>10.1f} ms  "
+              f"{PLAYERS / elapsed:>12,.0f} 动作/秒")
+
+    leaked = sum(1 for player in players if simulator.get_player(player).handlers)
+    print(f"  处理器对象池 {simulator.handler_pool.stats()}，未归还 {leaked}")
+
+
+async def measure_memory():
+    """单独统计开局后的内存占用（tracemalloc 会拖慢上面的计时，所以分开跑）"""
+    simulator = HardcoreParentingSimulator()
+    tracemalloc.start()
+    await asyncio.gather(*(simulator.start_game(f"player-{i}") for i in range(PLAYERS)))
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  玩家状态占用 {allocated / 1024 / 1024:.1f} MB（约 {allocated / PLAYERS / 1024:.1f} KB/玩家）")
+
+
+def main():
+    print("👥 多玩家隔离与处理器对象池")
+    asyncio.run(main_async())
+    asyncio.run(measure_memory())
+
+
+if __name__ == "__main__":
+    main()
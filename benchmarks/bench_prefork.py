@@ -0,0 +1,114 @@
+"""
+预 fork 热启动：每个 worker 的内存与首个请求耗时
+三种方式各在一个全新的解释器里运行，master fork 出 WORKERS 个 worker：
+- 冷启动：master 什么都不加载，worker 自己导入模块、构建目录（原来的 gunicorn 默认行为）
+- preload：master 导入并构建目录后 fork，不冻结
+- preload + gc.freeze：master 关闭 GC、构建、冻结后 fork，worker 里重新开启 GC
+
+worker 处理第一个请求（新建会话、执行任务、取状态、拼提示词、创建小游戏处理器），
+然后做一次完整 GC（模拟运行一段时间后的回收），读取 /proc/self/smaps_rollup：
+USS = Private_Clean + Private_Dirty，即这个 worker 独占、无法与 master 共享的内存。
+没有安装 Flask 时不包含页面预渲染和蓝图导入。仅支持 Linux。
+"""
+
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+WORKERS = 2
+MODES = (("cold", "冷启动（worker 各自导入）"),
+         ("preload", "preload，不冻结"),
+         ("freeze", "preload + gc.freeze"))
+
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def first_request():
+    """worker 收到的第一个请求要用到的东西"""
+    from chinese_baby_prompts import get_fal_ai_config
+    from game_sessions import GameSessionRegistry
+    from hardcore_parenting_game import GameMode, BabyPersonality
+    from hardcore_parenting_simulator import PickyEaterNegotiationTask, StrollerTetrisTask
+
+    game = GameSessionRegistry(journal_dir=None).get("first")
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+    game.execute_talk_task(["宝宝"], 20.0)
+    game.get_status_body()
+    get_fal_ai_config("infant_3_12", "girl", "happy", "home")
+    StrollerTetrisTask()
+    PickyEaterNegotiationTask()
+
+
+def worker(write_fd, mode):
+    if mode == "freeze":
+        gc.enable()
+    start = time.perf_counter()
+    if mode == "cold":
+        import warm_start
+        warm_start.warm()
+    first_request()
+    ttfr = (time.perf_counter() - start) * 1000
+    gc.collect()
+    result = dict(memory_kb(), ttfr_ms=round(ttfr, 2))
+    os.write(write_fd, (json.dumps(result) + "\n").encode())
+    os._exit(0)
+
+
+def run_master(mode):
+    """在当前（全新的）解释器里扮演 master"""
+    if mode != "cold":
+        if mode == "freeze":
+            gc.disable()
+        import warm_start
+        warm_start.warm()
+        if mode == "freeze":
+            warm_start.freeze()
+    master = memory_kb()
+    read_fd, write_fd = os.pipe()
+    pids = []
+    for _ in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            worker(write_fd, mode)
+        pids.append(pid)
+    os.close(write_fd)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    with os.fdopen(read_fd) as f:
+        workers = [json.loads(line) for line in f]
+    print(json.dumps({"master": master, "workers": workers}))
+
+
+def main():
+    print("🍴 预 fork 热启动")
+    print(f"  每种方式 fork {WORKERS} 个 worker，内存为首个请求 + 一次完整 GC 之后")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for mode, label in MODES:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_prefork", mode],
+                             cwd=root, capture_output=True, text=True, check=True).stdout
+        data = json.loads(out.strip().splitlines()[-1])
+        workers = data["workers"]
+        avg = {key: sum(w[key] for w in workers) / len(workers) for key in workers[0]}
+        print(f"  {label:<28} master RSS {data['master']['rss'] / 1024:>6.1f} MB  "
+              f"worker RSS {avg['rss'] / 1024:>6.1f} MB  USS {avg['uss'] / 1024:>6.1f} MB  "
+              f"首个请求 {avg['ttfr_ms']:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run_master(sys.argv[1])
+    else:
+        main()
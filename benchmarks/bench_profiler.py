@@ -0,0 +1,56 @@
+"""
+按需剖析的开销
+- 关闭（默认，不设置环境变量）：install() 不挂钩子，请求路径上没有任何额外代码
+- 开启但请求没带令牌：每个请求多一次 should_profile（查请求头/参数，按比例抽样时再取一次随机数）
+- 被剖析的请求：一个约 1000 次任务的请求，在采样 / cprofile 下的耗时
+"""
+
+import tempfile
+
+from benchmarks._timing import measure, report
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from request_profiler import RequestProfiler
+
+TASKS = 1000
+
+
+class FakeRequest:
+    path = "/game/status"
+    method = "GET"
+    url_rule = None
+
+    def __init__(self, args=None):
+        self.headers = {"User-Agent": "bench", "Accept": "application/json"}
+        self.args = args or {}
+
+
+def main():
+    print("🔬 按需剖析开销")
+    with tempfile.TemporaryDirectory() as directory:
+        request = FakeRequest()
+        report("关闭：无钩子", measure(lambda: None, 200000))
+        signed = RequestProfiler(secret="s3cret", directory=directory)
+        report("开启令牌，请求未带令牌", measure(lambda: signed.should_profile(request), 200000))
+        sampled = RequestProfiler(secret="s3cret", sample_rate=0.0001, directory=directory)
+        report("开启令牌 + 万分之一抽样", measure(lambda: sampled.should_profile(request), 200000))
+
+        game = HardcoreParentingGame()
+        game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+
+        def workload():
+            for _ in range(TASKS):
+                game.execute_hug_task(3.0)
+
+        profiler = RequestProfiler(sample_rate=1.0, directory=directory)
+        report(f"请求（{TASKS} 次任务），不剖析", measure(workload, 3))
+        for mode in ("sample", "cprofile"):
+            def profiled():
+                req = FakeRequest({"_profile_mode": mode})
+                active = profiler.start(req, "sample")
+                workload()
+                profiler.finish(active, req, 200)   # 含保存结果
+            report(f"请求（{TASKS} 次任务），{mode}", measure(profiled, 3))
+
+
+if __name__ == "__main__":
+    main()
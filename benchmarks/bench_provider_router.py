@@ -0,0 +1,85 @@
+"""
+生成服务路由的尾延迟（本地假服务 + 故障注入，时间按 1/20 缩放）
+- 抖动：fal 95% 请求 40-80 ms，5% 落后到 400 ms，另有 5% 返回 503；Replicate 60-120 ms
+- 故障：fal 全部超时（等 500 ms 才失败）
+每种场景对比 直接调用 fal / 路由（熔断 + 故障转移）/ 路由 + 对冲，THREADS 个线程共 REQUESTS 个请求
+"""
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from provider_router import ProviderRouter, Route
+from providers import Faults, FakeProvider, LatencyProfile, providers
+
+REQUESTS = 400
+THREADS = 8
+
+
+def jittery_fal() -> FakeProvider:
+    rng = random.Random(1)
+    samples = [rng.uniform(0.04, 0.08) for _ in range(95)] + [0.4] * 5
+    return FakeProvider(profiles={"*": LatencyProfile(samples=tuple(samples), error_rate=0.05)}, seed=1)
+
+
+def failing_fal() -> FakeProvider:
+    return FakeProvider(profiles={"*": LatencyProfile(samples=(0.05,))},
+                        faults=Faults(timeout_rate=1.0, timeout_s=0.5), seed=1)
+
+
+def healthy_replicate() -> FakeProvider:
+    rng = random.Random(2)
+    return FakeProvider(profiles={"*": LatencyProfile(samples=tuple(rng.uniform(0.06, 0.12) for _ in range(100)))},
+                        seed=2)
+
+
+ROUTES = [Route("fal", "flux_lora", "fal-ai/flux-lora", {"prompt": "baby", "num_images": 1}),
+          Route("replicate", "sdxl", "stability-ai/sdxl", {"prompt": "baby", "num_outputs": 1})]
+
+
+def run(call):
+    def one(_):
+        start = time.perf_counter()
+        try:
+            call()
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        results = list(pool.map(one, range(REQUESTS)))
+    latencies = sorted(latency for latency, _ in results)
+    pick = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    errors = sum(not ok for _, ok in results) / len(results)
+    return pick(0.5), pick(0.95), pick(0.99), errors
+
+
+def scenario(title, fal_factory):
+    print(f"\n{title}")
+    strategies = [
+        ("直接调用 fal", None),
+        ("路由（熔断 + 故障转移）", dict(hedge=False)),
+        ("路由 + 对冲", dict(hedge=True, min_hedge_samples=20)),
+    ]
+    for name, options in strategies:
+        with providers.override("fal", fal_factory()), providers.override("replicate", healthy_replicate()):
+            if options is None:
+                fal = providers.get("fal")
+                call = lambda: fal.generate("flux_lora", "fal-ai/flux-lora", {"prompt": "baby"})
+            else:
+                router = ProviderRouter(reset_timeout=2.0, **options)
+                call = lambda: router.generate(ROUTES, timeout=5.0)
+            p50, p95, p99, errors = run(call)
+        extra = f"  对冲 {router.hedges}" if options and options["hedge"] else ""
+        print(f"  {name:<24} p50 {p50:6.1f}  p95 {p95:6.1f}  p99 {p99:6.1f} ms  错误率 {errors:6.1%}{extra}")
+
+
+def main():
+    print("🔀 生成服务路由尾延迟")
+    scenario("抖动：fal 5% 落后 + 5% 503", jittery_fal)
+    scenario("故障：fal 全部超时", failing_fal)
+
+
+if __name__ == "__main__":
+    main()
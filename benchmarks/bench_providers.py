@@ -0,0 +1,47 @@
+"""
+生成服务假实现
+- FakeProvider 单次调用（零延迟：占位图 + 埋点）
+- BabyPhotoGenerator 整条照片链路（提示词 + 假服务）
+- 回放 LATENCY_MS 延迟时，不同线程数下每秒能生成多少张照片（离线评估并发上限用）
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from baby_photo_integration import BabyPhotoGenerator
+from benchmarks._timing import measure, report
+from providers import FakeProvider, LatencyProfile, providers
+
+LATENCY_MS = 50
+PHOTOS = 64
+
+
+def photos_per_second(generator: BabyPhotoGenerator, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(lambda i: generator.generate_baby_photo(i % 36, expression="happy"), range(PHOTOS)))
+    assert all(r["success"] for r in results)
+    return PHOTOS / (time.perf_counter() - start)
+
+
+def main():
+    print("🎭 生成服务假实现")
+    generator = BabyPhotoGenerator(api_key=None)
+    arguments = {"prompt": "baby", "image_size": "square_hd", "num_images": 1}
+
+    fake = FakeProvider()
+    report("FakeProvider.generate（零延迟）",
+           measure(lambda: fake.generate("flux_schnell", "fal-ai/flux/schnell", arguments), 20000))
+    with providers.override("fal", fake):
+        report("generate_baby_photo（零延迟假服务）",
+               measure(lambda: generator.generate_baby_photo(6, gender="girl"), 5000))
+
+    recorded = FakeProvider(profiles={"*": LatencyProfile(samples=(LATENCY_MS / 1000,))})
+    with providers.override("fal", recorded):
+        for threads in (1, 4, 16):
+            rate = photos_per_second(generator, threads)
+            print(f"  {threads:>2} 线程 × {LATENCY_MS} ms 延迟: {rate:8.1f} 张/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+会话分片基准：共享存储模式 vs 一致性哈希分片模式
+- 单请求处理开销：从共享存储读出/解码/执行/编码/写回 vs 所属 worker 内存中直接执行
+- 端到端吞吐：客户端 → worker（共享存储，任意 worker） vs 客户端 → 调度器 → 所属 worker（内存状态）
+  worker 用 asyncio 模拟（与调度器同一事件循环，调度器的转发开销完整计入分片模式）
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks._timing import measure, report
+from game_sessions import GameSessionRegistry
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from session_dispatcher import SessionDispatcher, build_head, header_value, parse_head
+from session_journal import safe_session_name
+import state_codec
+
+WORKERS = 4
+SESSIONS = 200
+CLIENTS = 16
+REQUESTS_PER_CLIENT = 250
+
+
+def new_game() -> HardcoreParentingGame:
+    game = HardcoreParentingGame()
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 2)
+    return game
+
+
+def diaper(game: HardcoreParentingGame):
+    return game.execute_diaper_task(lift_speed=2.0, wipe_thoroughness=8, diaper_placement="correct")
+
+
+class SharedStore:
+    """共享存储模式：每个请求从磁盘读取并解码会话，执行后编码写回"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, safe_session_name(session_id) + ".bin")
+
+    def handle(self, session_id: str):
+        path = self._path(session_id)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                game = state_codec.decode_game(f.read())
+        else:
+            game = new_game()
+        diaper(game)
+        with open(path + ".tmp", "wb") as f:
+            f.write(state_codec.encode_game(game))
+        os.replace(path + ".tmp", path)
+
+
+class InProcess:
+    """分片模式：会话常驻在所属 worker 的内存中"""
+
+    def __init__(self):
+        self.registry = GameSessionRegistry(factory=new_game)
+
+    def handle(self, session_id: str):
+        diaper(self.registry.get(session_id))
+
+
+async def worker_connection(handler, reader, writer):
+    head = await reader.readuntil(b"\r\n\r\n")
+    _, headers = parse_head(head)
+    handler(header_value(headers, "X-Session-Id"))
+    writer.write(build_head("HTTP/1.1 200 OK", [("Content-Length", "2"), ("Connection", "close")]) + b"ok")
+    await writer.drain()
+    writer.close()
+
+
+async def client(open_connection, client_id: int):
+    writer = None
+    for i in range(REQUESTS_PER_CLIENT):
+        if writer is None:
+            reader, writer = await open_connection(client_id)
+        session_id = f"player-{(client_id * 7919 + i) % SESSIONS}"
+        writer.write(build_head("POST /diaper/execute HTTP/1.1", [
+            ("Host", "bench"), ("X-Session-Id", session_id), ("Content-Length", "0"),
+        ]))
+        await writer.drain()
+        _, headers = parse_head(await reader.readuntil(b"\r\n\r\n"))
+        await reader.readexactly(int(header_value(headers, "Content-Length")))
+        if header_value(headers, "Connection") == "close":
+            # 直连 worker（sync worker）没有 keep-alive，每个请求新建连接
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_throughput(label: str, open_connection) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(client(open_connection, i) for i in range(CLIENTS)))
+    elapsed = time.perf_counter() - start
+    total = CLIENTS * REQUESTS_PER_CLIENT
+    print(f"  {label:<40} {total / elapsed:>10,.0f} 请求/秒")
+    return total / elapsed
+
+
+async def bench_throughput(directory: str):
+    # 共享存储：客户端直连任意 worker
+    store = SharedStore(os.path.join(directory, "store"))
+    os.makedirs(store.directory)
+    shared_sockets = []
+    servers = []
+    for i in range(WORKERS):
+        path = os.path.join(directory, f"shared-{i}.sock")
+        servers.append(await asyncio.start_unix_server(
+            lambda r, w: worker_connection(store.handle, r, w), path))
+        shared_sockets.append(path)
+    shared = await run_throughput(
+        "共享存储（任意 worker）",
+        lambda client_id: asyncio.open_unix_connection(shared_sockets[client_id % WORKERS]))
+
+    # 分片：客户端 → 调度器（keep-alive） → 所属 worker
+    shard_sockets = []
+    for i in range(WORKERS):
+        path = os.path.join(directory, f"shard-{i}.sock")
+        local = InProcess()
+        servers.append(await asyncio.start_unix_server(
+            lambda r, w, h=local.handle: worker_connection(h, r, w), path))
+        shard_sockets.append(path)
+    dispatcher = SessionDispatcher(shard_sockets)
+    front_path = os.path.join(directory, "dispatcher.sock")
+    servers.append(await asyncio.start_unix_server(dispatcher.handle_client, front_path))
+    sharded = await run_throughput(
+        "一致性哈希分片（经调度器）",
+        lambda client_id: asyncio.open_unix_connection(front_path))
+    print(f"  分片/共享存储 吞吐比: {sharded / shared:.2f}x")
+
+    for server in servers:
+        server.close()
+
+
+def bench_handler(directory: str):
+    store = SharedStore(os.path.join(directory, "handler"))
+    os.makedirs(store.directory)
+    local = InProcess()
+    store.handle("p")
+    local.handle("p")
+    report("单请求：共享存储读-解码-执行-编码-写", measure(lambda: store.handle("p"), number=2000))
+    report("单请求：worker内存中执行", measure(lambda: local.handle("p"), number=2000))
+
+
+def main():
+    print("🔀 会话分片基准")
+    with tempfile.TemporaryDirectory() as directory:
+        bench_handler(directory)
+        asyncio.run(bench_throughput(directory))
+
+
+if __name__ == "__main__":
+    main()
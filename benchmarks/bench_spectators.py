@@ -0,0 +1,97 @@
+"""
+观战推送：一局游戏 1000 个观众
+- 逐个轮询：每次状态变化，每个观众各自调用 get_game_status 并序列化
+- 观战频道：每次变化编码一次，1000 个观众共用同一份 bytes
+另有 10% 的观众从不读取，检验慢观众的队列是否有界
+"""
+
+import asyncio
+import json
+import time
+
+from benchmarks._timing import measure, report
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from spectator import SpectatorChannel
+from streaming_stats import QuantileSketch
+
+SPECTATORS = 1000
+CHANGES = 200
+SLOW_EVERY = 10          # 每10个观众里有1个从不读取
+
+
+def new_game() -> HardcoreParentingGame:
+    game = HardcoreParentingGame()
+    game.start_game(GameMode.HARD, BabyPersonality.FUSSY, 2)
+    return game
+
+
+def bench_per_change_cost():
+    game = new_game()
+
+    def poll_all():
+        for _ in range(SPECTATORS):
+            json.dumps(game.get_game_status(), ensure_ascii=False, default=str).encode("utf-8")
+
+    channel = SpectatorChannel(new_game())
+    viewers = [channel.subscribe() for _ in range(SPECTATORS)]
+
+    def publish_and_drain():
+        channel.publish()
+        for viewer in viewers:
+            viewer.queue.clear()
+
+    report(f"逐个轮询（{SPECTATORS} 个观众各序列化一次）", measure(poll_all, number=5, repeat=3))
+    report(f"观战频道（编码一次，分发 {SPECTATORS} 份）", measure(publish_and_drain, number=50, repeat=3))
+
+
+async def run_live():
+    game = new_game()
+    channel = SpectatorChannel(game, queue_size=4)
+    latency = QuantileSketch()
+    published_at = {}
+
+    async def watch(subscription, done):
+        while not done.is_set():
+            frames = await subscription.get_async(timeout=0.5)
+            now = time.perf_counter()
+            for frame in frames:
+                version = int(frame[4:frame.index(b"\n")])
+                if version in published_at:
+                    latency.add((now - published_at[version]) * 1000)
+
+    done = asyncio.Event()
+    subscriptions = [channel.subscribe() for _ in range(SPECTATORS)]
+    readers = [asyncio.ensure_future(watch(s, done))
+               for i, s in enumerate(subscriptions) if i % SLOW_EVERY]
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    for _ in range(CHANGES):
+        # 快照由被唤醒的观众生成：从状态变化算起，几次变化合并成一帧时取最早那次
+        published_at.setdefault(channel.version + 1, time.perf_counter())
+        game.execute_talk_task(["宝宝"], 20.0)
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.05)
+    done.set()
+    await asyncio.gather(*readers)
+
+    slow = [s for i, s in enumerate(subscriptions) if i % SLOW_EVERY == 0]
+    stats = channel.stats()
+    print(f"  {CHANGES} 次状态变化推送给 {SPECTATORS} 个观众，耗时 {elapsed:.2f} s，"
+          f"编码 {stats['encodes']} 次，送达 {stats['delivered']:,} 帧")
+    print(f"  推送延迟 p50 {latency.quantile(0.5):.2f} ms  p90 {latency.quantile(0.9):.2f} ms  "
+          f"p99 {latency.quantile(0.99):.2f} ms")
+    print(f"  慢观众 {len(slow)} 个：队列最长 {max(len(s.queue) for s in slow)}，"
+          f"丢弃 {sum(s.dropped for s in slow):,} 帧，最后一帧为最新快照 "
+          f"{all(s.queue[-1] is channel.latest for s in slow)}")
+
+
+def main():
+    print("👀 观战推送")
+    bench_per_change_cost()
+    asyncio.run(run_live())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+冷启动耗时：每个入口在全新的解释器里导入，取最快一次并扣掉空解释器的启动时间
+    python -m benchmarks.bench_startup           # 打印表格
+    python -m benchmarks.bench_startup --json    # 输出 {入口: 毫秒}，供 CI 记录趋势
+
+与 _timing.measure 一样取最快值：子进程启动的抖动很大，中位数在 CI 上不稳定。
+
+"预加载全部可选子系统" 一行对应原先导入即初始化的做法（fal/replicate/pygame 导入、
+照片生成器/面部融合/音乐播放器构造），与只导入模块的行对比即为延迟加载省下的时间。
+子进程在临时目录里运行，音乐播放器创建的目录不会落到仓库里。
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 9
+
+TARGETS = [
+    ("main", "import main"),
+    ("游戏核心 hardcore_parenting_game", "import hardcore_parenting_game"),
+    ("会话层 game_sessions", "import game_sessions"),
+    ("照片生成 baby_photo_integration", "import baby_photo_integration"),
+    ("面部融合 baby_face_fusion", "import baby_face_fusion"),
+    ("背景音乐 background_music", "import background_music"),
+    ("预加载全部可选子系统", "from feature_registry import features; features.preload()"),
+]
+
+
+def time_runs(code: str, cwd: str, runs: int) -> Optional[List[float]]:
+    """每次启动一个新解释器执行 code，返回各次耗时（ms）；执行失败返回 None"""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    samples = []
+    for i in range(runs + 1):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            return None
+        if i:   # 第一次可能在写 __pycache__，不计入
+            samples.append(elapsed)
+    return samples
+
+
+def measure_startup(runs: int = RUNS) -> Dict[str, Optional[float]]:
+    """入口 -> 扣除空解释器后的最快启动耗时（ms），导入失败的入口为 None"""
+    with tempfile.TemporaryDirectory() as cwd:
+        baseline = min(time_runs("pass", cwd, runs))
+        results = {}
+        for label, code in TARGETS:
+            samples = time_runs(code, cwd, runs)
+            results[label] = None if samples is None else round(min(samples) - baseline, 2)
+    results["空解释器"] = round(baseline, 2)
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="冷启动耗时")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args(argv)
+    results = measure_startup(args.runs)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print("🚀 冷启动耗时（新解释器导入，最快一次，已扣除空解释器启动）")
+    print(f"  空解释器 {results.pop('空解释器'):.1f} ms，每项 {args.runs} 次取最快")
+    for label, ms in results.items():
+        shown = "导入失败（缺少依赖）" if ms is None else f"{ms:>8.1f} ms"
+        print(f"  {label:<36} {shown}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+状态编码基准
+对比二进制编码与JSON（export_dataclass + json）的编码/解码耗时和每个快照的字节数
+"""
+
+import json
+
+import state_codec
+from age_based_parenting_system import ChildState, ParentState
+from benchmarks._timing import measure, report
+from hardcore_parenting_game import GameState
+from physiological_needs_tasks import PhysiologicalState
+from session_journal import export_dataclass, import_dataclass
+
+
+def main():
+    print("📦 状态编码基准")
+    for cls in (GameState, ChildState, ParentState, PhysiologicalState):
+        state = cls()
+        binary = state_codec.encode(state)
+        text = json.dumps(export_dataclass(state), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        print(f"  {cls.__name__}: 二进制 {len(binary)} 字节, JSON {len(text)} 字节 "
+              f"({len(text) / len(binary):.1f}x)")
+        report(f"{cls.__name__} 二进制编码", measure(lambda: state_codec.encode(state)))
+        report(f"{cls.__name__} JSON编码", measure(
+            lambda: json.dumps(export_dataclass(state), ensure_ascii=False, separators=(",", ":"))))
+        report(f"{cls.__name__} 二进制解码", measure(lambda: state_codec.decode(binary)))
+        report(f"{cls.__name__} JSON解码", measure(lambda: import_dataclass(cls, json.loads(text))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+/game/status 轮询：完整响应 vs 条件请求(ETag/304) vs 增量(?since=)
+模拟完整游戏页面的轮询方式：每10秒拉一次状态，玩家大约每分钟完成一个任务
+（即每6次轮询里有1次状态真的变了）
+"""
+
+import json
+import time
+
+from game_sessions import GameSessionRegistry, status_response
+from hardcore_parenting_game import GameMode, BabyPersonality
+
+POLLS = 6000
+POLLS_PER_CHANGE = 6
+
+
+class FakeRequest:
+    def __init__(self, args=None, headers=None):
+        self.args = args or {}
+        self.headers = headers or {}
+
+
+def new_game():
+    game = GameSessionRegistry().get("player")
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+    return game
+
+
+def run(poll):
+    """返回 (每次轮询 CPU µs, 每次轮询平均响应字节, 304 比例)"""
+    game = new_game()
+    state = {}
+    total_bytes = not_modified = 0
+    cpu = 0.0
+    for i in range(POLLS):
+        if i % POLLS_PER_CHANGE == 0:
+            game.execute_talk_task(["宝宝"], 20.0)
+        start = time.process_time()
+        body, status = poll(game, state)
+        cpu += time.process_time() - start
+        total_bytes += len(body)
+        not_modified += status == 304
+    return cpu / POLLS * 1e6, total_bytes / POLLS, not_modified / POLLS
+
+
+def poll_full(game, state):
+    """原来的做法：每次 get_game_status + 序列化"""
+    return json.dumps(game.get_game_status(), ensure_ascii=False).encode("utf-8"), 200
+
+
+def poll_etag(game, state):
+    headers = {"If-None-Match": state["etag"]} if "etag" in state else {}
+    body, status, response_headers = status_response(game, FakeRequest(headers=headers))
+    state["etag"] = response_headers["ETag"]
+    return body, status
+
+
+def poll_since(game, state):
+    args = {"since": state["version"]} if "version" in state else {}
+    body, status, headers = status_response(game, FakeRequest(args=args))
+    state["version"] = headers["ETag"].strip('"')
+    return body, status
+
+
+def main():
+    print("📡 /game/status 轮询")
+    print(f"  {POLLS} 次轮询，每 {POLLS_PER_CHANGE} 次轮询状态变化一次")
+    for label, poll in (("完整响应（原实现）", poll_full),
+                        ("ETag / If-None-Match", poll_etag),
+                        ("增量 ?since=", poll_since)):
+        cpu_us, avg_bytes, ratio = run(poll)
+        print(f"  {label:<22} {cpu_us:>8.1f} µs/次  {avg_bytes:>8.0f} 字节/次  304 比例 {ratio:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+时间推进：每会话一个协程+定时器 vs 单循环批量 tick
+- 每会话协程：每个会话自己 while 循环 await asyncio.sleep(周期) 后调用 async 接口
+- 批量 tick：TickDriver 每个 tick 取出到期会话，整批生成随机数后同步推进
+用 CPU 时间（process_time）折算成每核每秒推进的会话数
+"""
+
+import asyncio
+import time
+
+from age_based_parenting_system import AgeBasedParentingManager
+from hardcore_parenting_simulator import GameMode, HardcoreParentingSimulator
+from physiological_needs_tasks import PhysiologicalNeedsManager
+from tick_driver import AGE_MANAGER, NUMPY_AVAILABLE, PHYSIOLOGY, SIMULATOR_PLAYER, TickDriver
+
+SESSIONS = 3000          # 每类会话的数量
+TICKS = 20
+PERIOD = 0.05            # 每会话的推进周期（秒）
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def build_sessions():
+    simulator = HardcoreParentingSimulator()
+    players = [f"player-{i}" for i in range(SESSIONS)]
+    for player in players:
+        simulator.get_player(player).game_state.game_mode = GameMode.NORMAL
+    ages = [AgeBasedParentingManager() for _ in range(SESSIONS)]
+    bodies = [PhysiologicalNeedsManager() for _ in range(SESSIONS)]
+    return simulator, players, ages, bodies
+
+
+def run_per_session_coroutines() -> float:
+    """每个会话一个协程，各自 sleep 到期后推进；返回每核每秒推进的会话数"""
+    simulator, players, ages, bodies = build_sessions()
+    hours = PERIOD / 3600
+
+    async def loop_player(player):
+        for _ in range(TICKS):
+            await asyncio.sleep(PERIOD)
+            await simulator.trigger_random_event(player)
+
+    async def loop_manager(manager):
+        for _ in range(TICKS):
+            await asyncio.sleep(PERIOD)
+            await manager.simulate_time_passage(hours)
+
+    async def main():
+        await asyncio.gather(*(loop_player(p) for p in players),
+                             *(loop_manager(m) for m in ages),
+                             *(loop_manager(m) for m in bodies))
+
+    start = time.process_time()
+    asyncio.run(main())
+    return SESSIONS * 3 * TICKS / (time.process_time() - start)
+
+
+def run_tick_driver(use_numpy: bool) -> float:
+    """同样的会话交给 TickDriver；时钟直接拨到下一个周期，只统计推进本身的开销"""
+    simulator, players, ages, bodies = build_sessions()
+    clock = FakeClock()
+    driver = TickDriver(tick_seconds=PERIOD, seed=1, use_numpy=use_numpy, clock=clock)
+    for player in players:
+        driver.register(("player", player), SIMULATOR_PLAYER, (simulator, player), PERIOD)
+    for i, manager in enumerate(ages):
+        driver.register(("age", i), AGE_MANAGER, manager, PERIOD)
+    for i, manager in enumerate(bodies):
+        driver.register(("body", i), PHYSIOLOGY, manager, PERIOD)
+
+    async def main():
+        for _ in range(TICKS):
+            clock.now += PERIOD
+            await driver.tick()
+
+    start = time.process_time()
+    asyncio.run(main())
+    elapsed = time.process_time() - start
+    assert driver.advanced == SESSIONS * 3 * TICKS, driver.stats()
+    return driver.advanced / elapsed
+
+
+def main():
+    print("⏱️ 时间推进调度对比")
+    print(f"  每类 {SESSIONS} 个会话（模拟器玩家 / 分龄管理器 / 生理需求管理器），共 {TICKS} 轮")
+    results = [("每会话协程 + 定时器", run_per_session_coroutines()),
+               ("批量 tick（random）", run_tick_driver(use_numpy=False))]
+    if NUMPY_AVAILABLE:
+        results.append(("批量 tick（numpy）", run_tick_driver(use_numpy=True)))
+    else:
+        print("  （未安装 numpy，跳过 numpy 随机数后端）")
+    for label, rate in results:
+        print(f"  {label:<24} {rate:>12,.0f} 会话/秒/核")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+链路追踪开销（满负载：请求一个接一个，不含网络）
+一个"请求" = 根 span + 5 次游戏任务 + 取一次状态，对比：
+- 去掉埋点：任务装饰器里的 span 换成直接返回不记录的 span
+- 关闭（TRACE_SAMPLE_RATE=0，默认）
+- 1% / 10% / 100% 采样，span 由后台线程批量写入临时 JSONL 文件
+游戏状态会随任务变化，每一轮里各方式轮流从同一个种子的新游戏开始跑同样的请求，取最快一轮。
+低采样比例的差异小于单核机器上的抖动，另外按 100% 采样时每个请求多出的耗时线性推算。
+目标：常用采样比例下开销 < 2%
+"""
+
+import os
+import tempfile
+
+import hardcore_parenting_game
+import tracing
+from benchmarks._timing import measure, report
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+
+REQUESTS = 200
+ROUNDS = 30
+MODES = (("去掉埋点", None), ("关闭", 0), ("1% 采样", 0.01), ("10% 采样", 0.1), ("100% 采样", 1.0))
+
+
+def run_requests():
+    game = HardcoreParentingGame()
+    game.seed_rng(42)
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+    for _ in range(REQUESTS):
+        with tracing.span("POST /game/task"):
+            for _ in range(5):
+                game.execute_hug_task(3.0)
+            game.get_status_body()
+
+
+def run_mode(rate):
+    original = hardcore_parenting_game.span
+    if rate is None:
+        hardcore_parenting_game.span = lambda name: tracing.NOOP_SPAN
+    tracing.tracer.sample_rate = rate or 0
+    try:
+        return measure(run_requests, number=1, repeat=1)["per_call_us"] / REQUESTS
+    finally:
+        hardcore_parenting_game.span = original
+        tracing.tracer.sample_rate = 0
+
+
+def main():
+    print("🧵 链路追踪开销")
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        tracing.tracer.configure(exporter=tracing.JsonlExporter(os.path.join(directory, "traces.jsonl")))
+        best = {label: float("inf") for label, _ in MODES}
+        for _ in range(ROUNDS):
+            for label, rate in MODES:
+                best[label] = min(best[label], run_mode(rate))
+        baseline = best["去掉埋点"]
+        for label, _ in MODES:
+            per_request = best[label]
+            suffix = "" if label == "去掉埋点" else f"（{(per_request / baseline - 1) * 100:+.1f}%）"
+            report(label + suffix, {"per_call_us": round(per_request, 3), "ops_per_sec": 1e6 / per_request})
+        per_sampled = best["100% 采样"] - best["关闭"]
+        print(f"  每个被采样的请求多 {per_sampled:.1f} µs，推算：" + "，".join(
+            f"{rate:.0%} 采样 {per_sampled * rate / baseline * 100:+.2f}%" for rate in (0.01, 0.05, 0.1)))
+        tracing.tracer.flush()
+        print(f"  导出失败/丢弃的 span：{tracing.tracer.processor.dropped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+worker 类型吞吐对比（单进程内模拟 gunicorn 的 sync / gthread / 异步 worker）
+每个请求 = 持会话锁执行一次游戏任务（CPU） + 锁外的 IO 等待（网络回写、日志落盘、外部API等）
+- sync：一次处理一个请求
+- gthread：线程池并发，同一会话由会话锁串行
+- async：事件循环并发（对应 gevent / uvicorn 一类 worker）
+分两种负载：请求分散在多个会话 / 全部打到同一个热点会话
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._timing import measure, report
+from game_sessions import GameSessionRegistry
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+
+REQUESTS = 2000
+IO_SECONDS = 0.002
+THREADS = 8
+ASYNC_CONCURRENCY = 64
+
+
+def new_game() -> HardcoreParentingGame:
+    game = HardcoreParentingGame()
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 2)
+    return game
+
+
+def session_ids(sessions: int):
+    return [f"player-{i % sessions}" for i in range(REQUESTS)]
+
+
+def handle(registry: GameSessionRegistry, session_id: str):
+    registry.get(session_id).execute_diaper_task(2.0, 8, "correct")
+    time.sleep(IO_SECONDS)
+
+
+def run_sync(ids) -> float:
+    registry = GameSessionRegistry(factory=new_game)
+    start = time.perf_counter()
+    for session_id in ids:
+        handle(registry, session_id)
+    return time.perf_counter() - start
+
+
+def run_gthread(ids) -> float:
+    registry = GameSessionRegistry(factory=new_game)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(lambda session_id: handle(registry, session_id), ids))
+    return time.perf_counter() - start
+
+
+def run_async(ids) -> float:
+    registry = GameSessionRegistry(factory=new_game)
+
+    async def one(semaphore, session_id):
+        async with semaphore:
+            registry.get(session_id).execute_diaper_task(2.0, 8, "correct")
+            await asyncio.sleep(IO_SECONDS)
+
+    async def main():
+        semaphore = asyncio.Semaphore(ASYNC_CONCURRENCY)
+        await asyncio.gather(*(one(semaphore, session_id) for session_id in ids))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - start
+
+
+def bench_lock_overhead():
+    game = new_game()
+    lock = threading.RLock()
+
+    def acquire_release():
+        with lock:
+            pass
+
+    report("会话锁 acquire/release（无竞争）", measure(acquire_release, number=100000))
+    report("换尿布任务（含会话锁）", measure(lambda: game.execute_diaper_task(2.0, 8, "correct"), number=5000))
+
+
+def main():
+    print("🧵 worker 类型吞吐对比")
+    bench_lock_overhead()
+    print(f"  每请求 IO 等待 {IO_SECONDS * 1000:.0f} ms，gthread {THREADS} 线程，async 并发 {ASYNC_CONCURRENCY}")
+    for label, sessions in (("200 个会话", 200), ("单个热点会话", 1)):
+        ids = session_ids(sessions)
+        for worker, runner in (("sync", run_sync), ("gthread", run_gthread), ("async", run_async)):
+            elapsed = runner(ids)
+            print(f"  {label:<12} {worker:<8} {REQUESTS / elapsed:>10,.0f} 请求/秒")
+
+
+if __name__ == "__main__":
+    main()
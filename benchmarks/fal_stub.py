@@ -0,0 +1,91 @@
+"""
+fal.ai 模拟服务：按设定的延迟分布和失败率返回假图片
+    python -m benchmarks.fal_stub --port 9100 --latency-ms 1500 --error-rate 0.02
+配合 benchmarks/stubs/fal_client.py 使用（见 benchmarks/loadtest.py）。
+延迟为对数正态分布，中位数 latency_ms，sigma 控制长尾。
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FalStub:
+    def __init__(self, latency_ms: float = 1500.0, sigma: float = 0.35, error_rate: float = 0.0,
+                 port: int = 0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                delay, fail, seq = stub._roll()
+                time.sleep(delay)
+                if fail:
+                    payload, status = {"detail": "simulated failure"}, 500
+                else:
+                    size = (json.loads(body or b"{}").get("image_size") or "square_hd")
+                    payload, status = {"images": [{"url": f"https://fal-stub.local/{seq}.png",
+                                                   "content_type": "image/png", "size": size}],
+                                       "seed": seq, "timings": {"inference": delay}}, 200
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _roll(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_ms / 1000 * math.exp(self._rng.gauss(0, self.sigma))
+            return delay, self._rng.random() < self.error_rate, self.calls
+
+    def start(self) -> "FalStub":
+        threading.Thread(target=self.server.serve_forever, name="fal-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fal.ai 模拟服务")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=1500)
+    parser.add_argument("--sigma", type=float, default=0.35)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    stub = FalStub(args.latency_ms, args.sigma, args.error_rate, args.port)
+    print(f"🎭 fal 模拟服务 {stub.url}（延迟中位数 {args.latency_ms:.0f} ms，失败率 {args.error_rate:.0%}）")
+    print(f"   应用端：PYTHONPATH=benchmarks/stubs FAL_STUB_URL={stub.url} FAL_KEY=stub")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+导入耗时报告：汇总 python -X importtime 的输出
+    python -m benchmarks.importtime_report                  # 默认检查各个应用入口
+    python -m benchmarks.importtime_report main music_api --top 20
+
+每个模块在独立的新解释器里导入（没有已缓存的 sys.modules），按累计耗时和自身耗时
+各列出前 N 名，再按顶层包汇总自身耗时；本仓库的模块标 *。
+导入失败（例如缺少 Flask）时仍然汇总失败前已经完成的导入。
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["main", "music_api", "baby_photo_api", "baby_face_fusion_api"]
+
+
+class ImportRecord(NamedTuple):
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def run_importtime(module: str) -> Tuple[List[ImportRecord], Optional[str]]:
+    """在新解释器里导入模块，返回 (导入记录, 失败信息)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    records, other = [], []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue   # 表头
+        raw_name = fields[2][1:]   # 去掉分隔符后的一个空格，剩下的缩进表示嵌套层级
+        name = raw_name.lstrip()
+        records.append(ImportRecord(name, int(fields[0]), int(fields[1]),
+                                    (len(raw_name) - len(name)) // 2))
+    error = None
+    if proc.returncode != 0:
+        error = other[-1] if other else f"退出码 {proc.returncode}"
+    return records, error
+
+
+def is_first_party(name: str) -> bool:
+    top = name.split(".")[0]
+    return (os.path.exists(os.path.join(REPO_ROOT, f"{top}.py"))
+            or os.path.isdir(os.path.join(REPO_ROOT, top)))
+
+
+def summarize(records: List[ImportRecord]) -> Dict[str, int]:
+    """按顶层包汇总自身耗时（微秒）"""
+    totals: Dict[str, int] = defaultdict(int)
+    for record in records:
+        totals[record.name.split(".")[0]] += record.self_us
+    return dict(totals)
+
+
+def print_report(module: str, records: List[ImportRecord], error: Optional[str], top: int):
+    total_ms = sum(r.cumulative_us for r in records if r.depth == 0) / 1000
+    first_party_ms = sum(r.self_us for r in records if is_first_party(r.name)) / 1000
+    print(f"\n📦 import {module}：共 {len(records)} 个模块，{total_ms:.1f} ms"
+          f"（本仓库模块自身 {first_party_ms:.1f} ms）")
+    if error:
+        print(f"  ⚠️ 导入失败: {error}")
+
+    def mark(name: str) -> str:
+        return f"{'*' if is_first_party(name) else ' '} {name}"
+
+    print(f"  累计耗时前 {top}：")
+    for r in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[:top]:
+        print(f"    {r.cumulative_us / 1000:>8.2f} ms  {mark(r.name)}")
+    print(f"  自身耗时前 {top}：")
+    for r in sorted(records, key=lambda r: r.self_us, reverse=True)[:top]:
+        print(f"    {r.self_us / 1000:>8.2f} ms  {mark(r.name)}")
+    print("  按顶层包汇总（自身耗时）：")
+    for name, us in sorted(summarize(records).items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"    {us / 1000:>8.2f} ms  {mark(name)}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="汇总 python -X importtime 的输出")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+    print("⏱️ 导入耗时报告（* 为本仓库模块）")
+    for module in args.modules:
+        records, error = run_importtime(module)
+        print_report(module, records, error, args.top)
+
+
+if __name__ == "__main__":
+    main()
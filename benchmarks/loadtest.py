@@ -0,0 +1,375 @@
+"""
+HTTP 压测：用真实的 gunicorn 进程跑 main:app，估算单个实例能撑多少并发玩家
+
+    python -m benchmarks.loadtest --worker-class gthread --workers 2 --threads 8
+    python -m benchmarks.loadtest --levels 1,2,4,8,16,32 --duration 15 --json load.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000      # 压已经在跑的服务
+
+流程：
+1. 本进程内启动 fal 模拟服务（benchmarks/fal_stub.py），gunicorn 子进程的 PYTHONPATH 最前面
+   是 benchmarks/stubs，应用里的 fal_client 换成请求模拟服务的替身，生图延迟可调、不花钱
+2. 按 --levels 逐级增加并发玩家，每级跑 --duration 秒（前 --warmup 秒不计入）
+3. 每个玩家是一个线程（闭环：等上一个请求返回、思考一会儿再发下一个），有自己的会话
+   和长连接，脚本为：开局 → 循环 [轮询状态 / 喂奶 / 换尿布 / 哄睡（/game/batch）/ 偶尔生成照片]
+4. 每级输出吞吐量、错误率和各接口 p50/p95/p99，最后给出饱和点：
+   吞吐增长低于 --min-gain、错误率超过 --max-errors，或状态轮询 p95 超过 --slo-ms 的第一级
+
+sync worker 生成照片时整个 worker 被 fal 调用阻塞，照片比例和 fal 延迟对饱和点影响很大，
+对比 --worker-class sync / gthread 时保持这两个参数不变。
+压测端本身是 Python 线程，玩家数到几百时压测端会先成为瓶颈，这时看 "压测端CPU" 一列。
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.fal_stub import FalStub
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS_DIR = os.path.join(REPO_ROOT, "benchmarks", "stubs")
+
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32, 64)
+PERCENTILES = (50, 95, 99)
+STATUS_LABEL = "GET /game/status"
+
+# 玩家每轮动作的权重（轮询状态最多，照片按 --photo-rate 另算）
+ACTION_WEIGHTS = {"status": 6, "feeding": 2, "diaper": 2, "sleep": 1}
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """最近秩百分位，sorted_values 须已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: List[Tuple[str, float, bool]], elapsed: float) -> Dict[str, Any]:
+    """
+    汇总一级压测的样本
+
+    Args:
+        samples: (接口, 耗时秒, 是否成功)
+        elapsed: 计入统计的时长（秒）
+    """
+    by_label: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for label, latency, ok in samples:
+        by_label.setdefault(label, []).append(latency)
+        if not ok:
+            errors[label] = errors.get(label, 0) + 1
+    endpoints = {}
+    for label, values in sorted(by_label.items()):
+        values.sort()
+        endpoints[label] = {
+            "count": len(values),
+            "errors": errors.get(label, 0),
+            "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            **{f"p{p}_ms": round(percentile(values, p) * 1000, 2) for p in PERCENTILES},
+        }
+    total = len(samples)
+    return {
+        "requests": total,
+        "throughput": round(total / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def find_saturation(levels: List[Dict[str, Any]], min_gain: float = 0.10,
+                    max_errors: float = 0.01, slo_ms: float = 500.0) -> Optional[Dict[str, Any]]:
+    """
+    找出饱和点：第一级满足任一条件——吞吐比上一级增长不到 min_gain、错误率超过 max_errors、
+    状态轮询 p95 超过 slo_ms。返回该级和上一级（可持续的最大并发）；都没触发返回 None
+    """
+    for i, level in enumerate(levels):
+        reasons = []
+        if level["error_rate"] > max_errors:
+            reasons.append(f"错误率 {level['error_rate']:.1%}")
+        status = level["endpoints"].get(STATUS_LABEL)
+        if status and status["p95_ms"] > slo_ms:
+            reasons.append(f"状态轮询 p95 {status['p95_ms']:.0f} ms")
+        if i > 0:
+            prev = levels[i - 1]["throughput"]
+            if prev and level["throughput"] < prev * (1 + min_gain):
+                reasons.append(f"吞吐只增长 {level['throughput'] / prev - 1:+.0%}")
+        if reasons:
+            sustainable = levels[i - 1] if i > 0 else None
+            return {
+                "concurrency": level["concurrency"],
+                "reasons": reasons,
+                "sustainable_concurrency": sustainable["concurrency"] if sustainable else 0,
+                "sustainable_throughput": sustainable["throughput"] if sustainable else 0.0,
+            }
+    return None
+
+
+class Player:
+    """一个虚拟玩家：独立会话 + 长连接，按脚本循环请求"""
+
+    def __init__(self, host: str, port: int, rng: random.Random, think_ms: float, photo_rate: float):
+        self.host, self.port = host, port
+        self.rng = rng
+        self.think_ms = think_ms
+        self.photo_rate = photo_rate
+        self.session_id = f"load-{uuid.uuid4().hex[:12]}"
+        self.etag = ""
+        self.conn: Optional[http.client.HTTPConnection] = None
+        self.samples: List[Tuple[float, str, float, bool]] = []
+
+    def request(self, method: str, path: str, body: Any = None, headers: Optional[Dict[str, str]] = None,
+                label: Optional[str] = None) -> Tuple[int, bytes, Dict[str, str]]:
+        hdrs = {"X-Session-Id": self.session_id}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            hdrs["Content-Type"] = "application/json"
+        hdrs.update(headers or {})
+        label = label or f"{method} {path}"
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=180)
+            self.conn.request(method, path, body=payload, headers=hdrs)
+            resp = self.conn.getresponse()
+            data = resp.read()
+            status, resp_headers = resp.status, {k.lower(): v for k, v in resp.getheaders()}
+            if resp.will_close:
+                self.conn.close()
+                self.conn = None
+        except (OSError, http.client.HTTPException):
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+            status, data, resp_headers = 0, b"", {}
+        self.samples.append((start, label, time.perf_counter() - start, 0 < status < 500))
+        return status, data, resp_headers
+
+    def start_game(self):
+        self.request("POST", "/game/start", {
+            "mode": "intern_parent",
+            "personality": self.rng.choice(["chill_angel", "fussy_crybaby"]),
+            "age": self.rng.randint(0, 12),
+        })
+
+    def poll_status(self):
+        headers = {"If-None-Match": self.etag} if self.etag else None
+        status, _, resp_headers = self.request("GET", "/game/status", headers=headers)
+        if status == 200:
+            self.etag = resp_headers.get("etag", "")
+
+    def step(self):
+        rng = self.rng
+        if rng.random() < self.photo_rate:
+            self.request("POST", "/api/baby-photo/generate-from-game", {
+                "baby_age_months": rng.randint(0, 12), "happiness": rng.randint(20, 100),
+                "health": rng.randint(50, 100), "is_sleeping": rng.random() < 0.3,
+            })
+            return
+        action = rng.choices(list(ACTION_WEIGHTS), weights=list(ACTION_WEIGHTS.values()))[0]
+        if action == "status":
+            self.poll_status()
+        elif action == "feeding":
+            self.request("POST", "/game/feeding/execute", {
+                "water_temp": round(rng.uniform(34, 40), 1),
+                "shake_intensity": rng.randint(3, 8), "tilt_angle": rng.randint(30, 60),
+            })
+        elif action == "diaper":
+            self.request("POST", "/diaper/execute", {
+                "lift_speed": round(rng.uniform(0.2, 0.9), 2),
+                "wipe_thoroughness": rng.randint(5, 10), "diaper_placement": "correct",
+            })
+        else:
+            self.request("POST", "/game/batch", {"tasks": [{"task": "sleep_tired", "args": {
+                "shake_frequency": round(rng.uniform(0.5, 1.5), 2),
+                "duration": rng.randint(10, 60), "app_switched": False,
+            }}]}, label="POST /game/batch (sleep)")
+
+    def run(self, deadline: float, stop: threading.Event):
+        self.start_game()
+        while not stop.is_set() and time.perf_counter() < deadline:
+            self.step()
+            if self.think_ms:
+                stop.wait(self.rng.expovariate(1000.0 / self.think_ms))
+        if self.conn is not None:
+            self.conn.close()
+
+
+def run_level(host: str, port: int, concurrency: int, duration: float, warmup: float,
+              think_ms: float, photo_rate: float, seed: int) -> Dict[str, Any]:
+    """跑一级并发，返回汇总（只统计预热之后发出的请求）"""
+    stop = threading.Event()
+    begin = time.perf_counter()
+    deadline = begin + warmup + duration
+    players = [Player(host, port, random.Random(seed * 10007 + i), think_ms, photo_rate)
+               for i in range(concurrency)]
+    threads = [threading.Thread(target=p.run, args=(deadline, stop), daemon=True) for p in players]
+    cpu_start = time.process_time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(max(0.0, deadline - time.perf_counter()) + 180)
+    stop.set()
+    cpu = time.process_time() - cpu_start
+    measured_from = begin + warmup
+    samples = [(label, latency, ok) for p in players
+               for start, label, latency, ok in p.samples if start >= measured_from]
+    result = summarize(samples, duration)
+    result["concurrency"] = concurrency
+    result["client_cpu"] = round(cpu / (time.perf_counter() - begin), 2)
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_healthy(host: str, port: int, timeout: float, proc: Optional[subprocess.Popen] = None) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            return False
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/health")
+            ok = conn.getresponse().status == 200
+            conn.close()
+            if ok:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def start_server(port: int, worker_class: str, workers: int, threads: int, fal_url: str,
+                 workdir: str) -> Tuple[subprocess.Popen, str]:
+    """启动 gunicorn main:app，fal_client 指向模拟服务；返回 (进程, 日志路径)"""
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [STUBS_DIR, REPO_ROOT, env.get("PYTHONPATH")])),
+        "FAL_KEY": "stub",
+        "FAL_STUB_URL": fal_url,
+        "ENABLE_PHOTO_API": "1",
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "PORT": str(port),
+    })
+    os.makedirs(env["METRICS_DIR"], exist_ok=True)
+    cmd = [sys.executable, "-m", "gunicorn", "main:app",
+           "-k", worker_class, "-w", str(workers), "-b", f"127.0.0.1:{port}"]
+    if worker_class == "gthread":
+        cmd += ["--threads", str(threads)]
+    log_path = os.path.join(workdir, "gunicorn.log")
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return proc, log_path
+
+
+def stop_server(proc: subprocess.Popen):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def print_level(level: Dict[str, Any]):
+    print(f"\n👥 {level['concurrency']:>4} 玩家  吞吐 {level['throughput']:>8.1f} req/s  "
+          f"错误率 {level['error_rate']:.2%}  压测端CPU {level['client_cpu']:.2f}")
+    for label, ep in level["endpoints"].items():
+        print(f"   {label:<42} {ep['rps']:>8.1f}/s  p50 {ep['p50_ms']:>8.1f}  "
+              f"p95 {ep['p95_ms']:>8.1f}  p99 {ep['p99_ms']:>8.1f} ms  错误 {ep['errors']}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="main:app HTTP 压测（fal 调用走本地模拟服务）")
+    parser.add_argument("--url", help="压已经在跑的服务，不启动 gunicorn / fal 模拟服务")
+    parser.add_argument("--worker-class", default="sync", help="gunicorn -k，如 sync / gthread / gevent")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4, help="gthread 每个 worker 的线程数")
+    parser.add_argument("--levels", default=",".join(map(str, DEFAULT_LEVELS)), help="逗号分隔的并发玩家数")
+    parser.add_argument("--duration", type=float, default=20.0, help="每级统计时长（秒）")
+    parser.add_argument("--warmup", type=float, default=3.0, help="每级预热时长（秒，不计入）")
+    parser.add_argument("--think-ms", type=float, default=300.0, help="玩家两次操作之间的平均思考时间")
+    parser.add_argument("--photo-rate", type=float, default=0.02, help="每次操作是生成照片的概率")
+    parser.add_argument("--fal-latency-ms", type=float, default=1500.0, help="模拟生图延迟中位数")
+    parser.add_argument("--fal-error-rate", type=float, default=0.0)
+    parser.add_argument("--min-gain", type=float, default=0.10, help="吞吐增长低于此比例视为饱和")
+    parser.add_argument("--max-errors", type=float, default=0.01, help="错误率超过此值视为饱和")
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="状态轮询 p95 超过此值视为饱和")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-going", action="store_true", help="到达饱和点后继续跑完剩下的级别")
+    parser.add_argument("--json", dest="json_path", help="结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    stub = proc = None
+    workdir = tempfile.mkdtemp(prefix="babysitter-load-")
+    if args.url:
+        parsed = urllib.parse.urlsplit(args.url)
+        host, port = parsed.hostname or "127.0.0.1", parsed.port or 80
+    else:
+        stub = FalStub(args.fal_latency_ms, error_rate=args.fal_error_rate, seed=args.seed).start()
+        host, port = "127.0.0.1", _free_port()
+        proc, log_path = start_server(port, args.worker_class, args.workers, args.threads, stub.url, workdir)
+        print(f"🚀 gunicorn -k {args.worker_class} -w {args.workers} @ {host}:{port}，"
+              f"fal 模拟服务 {stub.url}（{args.fal_latency_ms:.0f} ms）")
+
+    results: List[Dict[str, Any]] = []
+    saturation = None
+    try:
+        if not _wait_healthy(host, port, 60, proc):
+            print(f"❌ 服务没有就绪：{host}:{port}")
+            if proc is not None:
+                with open(log_path, errors="replace") as f:
+                    print(f.read()[-4000:])
+            return 2
+        for i, concurrency in enumerate(levels):
+            level = run_level(host, port, concurrency, args.duration, args.warmup,
+                              args.think_ms, args.photo_rate, args.seed + i)
+            results.append(level)
+            print_level(level)
+            saturation = find_saturation(results, args.min_gain, args.max_errors, args.slo_ms)
+            if saturation and not args.keep_going:
+                break
+    finally:
+        if proc is not None:
+            stop_server(proc)
+        if stub is not None:
+            stub.stop()
+
+    print()
+    if saturation:
+        print(f"📈 饱和点：{saturation['concurrency']} 玩家（{'，'.join(saturation['reasons'])}）；"
+              f"可持续 {saturation['sustainable_concurrency']} 玩家 / "
+              f"{saturation['sustainable_throughput']:.1f} req/s")
+    elif results:
+        print(f"📈 到 {results[-1]['concurrency']} 玩家仍未饱和（{results[-1]['throughput']:.1f} req/s），加大 --levels")
+
+    if args.json_path:
+        config = {k: v for k, v in vars(args).items() if k != "json_path"}
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "levels": results, "saturation": saturation},
+                      f, ensure_ascii=False, indent=2)
+        print(f"💾 已写入 {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+"""
+fal_client 的离线替身（仅用于压测）
+压测时把 benchmarks/stubs 放在 PYTHONPATH 最前面，应用里的 fal_client.subscribe
+会请求 FAL_STUB_URL 指向的本地模拟服务（benchmarks/fal_stub.py），
+不访问 fal.ai、不产生费用，延迟和失败率由模拟服务控制。
+"""
+
+import json
+import os
+import urllib.error
+import urllib.request
+
+
+class FalStubError(Exception):
+    pass
+
+
+def _post(path, payload, timeout):
+    url = os.environ.get("FAL_STUB_URL", "http://127.0.0.1:9100").rstrip("/") + "/" + path.lstrip("/")
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        raise FalStubError(f"模拟服务返回 {e.code}") from e
+
+
+def subscribe(application, arguments=None, with_logs=False, on_queue_update=None, timeout=120):
+    return _post(application, arguments or {}, timeout)
+
+
+def upload_file(path):
+    return f"https://fal-stub.local/uploads/{os.path.basename(path)}"
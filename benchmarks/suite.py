@@ -0,0 +1,371 @@
+"""
+基准测试套件：游戏引擎的全部热点路径，结果存为 JSON，并与基线比较
+    python -m benchmarks.suite                                  # 运行全部，打印表格
+    python -m benchmarks.suite -k tetris -k prompts             # 只运行名称包含关键字的用例
+    python -m benchmarks.suite --output results.json            # 保存结果
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+                                                                # 与基线比较，变慢超过阈值时退出码为 1
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+
+机器之间速度不同：每个用例计时前后穿插测一个固定的纯 Python 校准循环，
+结果里的 relative = 单次耗时 / 校准耗时，和基线比较时用 relative，
+开发机上生成的基线在 CI 机器上也能用。
+
+新增用例：写一个返回单步函数的准备函数，用 @case 登记；
+单步函数可以是协程函数，inner 为每次计时里连续执行的次数（分摊事件循环的开销）。
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks._timing import measure
+
+DEFAULT_THRESHOLD = 0.25    # relative 变慢超过 25% 算回归（云主机上单次运行的抖动可达 ±20%，疑似回归会重跑确认）
+SEED = 20240601
+CALIBRATION_CALLS = 100
+
+
+@dataclass
+class Case:
+    name: str
+    factory: Callable[[], Callable[[], Any]]
+    number: int = 2000
+    inner: int = 1
+
+
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str, number: int = 2000, inner: int = 1):
+    """登记一个用例：被装饰的函数做准备工作，返回要计时的单步函数"""
+    def decorator(factory):
+        CASES[name] = Case(name, factory, number, inner)
+        return factory
+    return decorator
+
+
+# ---------- 游戏核心 HardcoreParentingGame ----------
+
+def new_game():
+    from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+    game = HardcoreParentingGame()
+    game.seed_rng(SEED)
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+    return game
+
+
+# TaskType 值 -> 参数（取每个任务最常见的正确操作）
+GAME_TASK_ARGS: Dict[str, Dict[str, Any]] = {
+    "feeding_hungry": {"water_temp": 37.0, "shake_intensity": 5, "tilt_angle": 45},
+    "sleep_tired": {"shake_frequency": 1.0, "duration": 30, "app_switched": False},
+    "diaper_dirty": {"lift_speed": 0.5, "wipe_thoroughness": 8, "diaper_placement": "correct"},
+    "medicine_sick": {"medicine_choice": "fever_patch"},
+    "hug_happy": {"press_duration": 3.0},
+    "talk_play": {"speech_keywords": ["宝宝", "妈妈"], "voice_duration": 20.0},
+    "food_hungry": {"food_choice": "pumpkin", "cutting_skill": 8},
+    "safety_danger": {"reaction_time": 0.8, "button_clicked": True},
+    "first_word": {"recorded": True, "reaction_time": 1.0},
+    "danger_touch": {"swipe_direction": "away", "danger_type": "socket"},
+    "toy_conflict": {"solution_choice": "A"},
+    "bad_word": {"correction_method": "A", "bad_word": "卧槽"},
+    "dressing_wild": {"completion_time": 50, "time_limit": 60},
+    "emotion_talk": {"response_choice": "A"},
+}
+
+
+def _register_game_tasks():
+    from task_batch import TASK_METHODS
+    for task, (method_name, _) in TASK_METHODS.items():
+        kwargs = GAME_TASK_ARGS[task]
+
+        def factory(method_name=method_name, kwargs=kwargs):
+            method = getattr(new_game(), method_name)
+            return lambda: method(**kwargs)
+        case(f"game.{method_name}")(factory)
+
+
+_register_game_tasks()
+
+
+@case("game.get_game_status")
+def game_status():
+    return new_game().get_game_status
+
+
+@case("game.get_status_body")
+def game_status_body():
+    return new_game().get_status_body
+
+
+# ---------- 模拟器 HardcoreParentingSimulator ----------
+
+@case("simulator.process_action", number=20, inner=100)
+def simulator_process_action():
+    from hardcore_parenting_simulator import HardcoreParentingSimulator, PlayerAction, ActionType, EventType
+    random.seed(SEED)
+    simulator = HardcoreParentingSimulator()
+    asyncio.run(simulator.start_game("bench"))
+    events = simulator.get_player("bench").event_manager
+
+    async def step():
+        events.trigger_event(EventType.CRYING, severity=5, duration_roll=0.5)
+        await simulator.process_action("bench", PlayerAction(ActionType.COMFORT, 2.0, True, "bench"))
+    return step
+
+
+@case("simulator.tetris_pack_trunk", number=20, inner=50)
+def tetris_pack_trunk():
+    """整局打包：每步重置后备箱，按预先算好的位置放入全部物品"""
+    from hardcore_parenting_simulator import StrollerTetrisTask, GameState, PlayerAction, ActionType
+    task = StrollerTetrisTask()
+    placements = []
+    for item in list(task.items):
+        for x in range(task.trunk_size[0]):
+            spot = next((y for y in range(task.trunk_size[1]) if task._can_place_item(item, x, y)), None)
+            if spot is not None:
+                task._place_item(item, x, spot)
+                placements.append(PlayerAction(ActionType.PLACE_ITEM, 1.0, True, "bench",
+                                               extra_data={"item_name": item.name, "position": (x, spot)}))
+                break
+    state = GameState()
+
+    async def step():
+        task.reset()
+        for action in placements:
+            await task.execute(state, action)
+    return step
+
+
+@case("simulator.negotiation_play_cards", number=20, inner=50)
+def negotiation_play_cards():
+    """整轮谈判：每步重置后依次打出卡牌直到回合数用完"""
+    from hardcore_parenting_simulator import PickyEaterNegotiationTask, GameState, PlayerAction, ActionType
+    random.seed(SEED)
+    task = PickyEaterNegotiationTask()
+    actions = [PlayerAction(ActionType.PLAY_CARD, 1.0, True, "bench", extra_data={"card_name": card.name})
+               for card in task.cards_deck[:task.max_rounds]]
+    state = GameState()
+
+    async def step():
+        task.reset()
+        for action in actions:
+            await task.execute(state, action)
+    return step
+
+
+# ---------- 分龄育儿 / 生理需求 ----------
+
+@case("age_based.execute_task", number=20, inner=100)
+def age_based_execute_task():
+    from age_based_parenting_system import AgeBasedParentingManager
+    random.seed(SEED)
+    manager = AgeBasedParentingManager()
+    task_name = type(manager.available_tasks[manager.current_age_stage][0]).__name__
+    action = {"feeding_type": "formula", "temperature": 36.5, "response_time": 30}
+
+    async def step():
+        await manager.execute_task(task_name, action)
+    return step
+
+
+@case("physiological.simulate_time_passage", number=20, inner=100)
+def physiological_time_passage():
+    from physiological_needs_tasks import PhysiologicalNeedsManager
+    manager = PhysiologicalNeedsManager()
+
+    async def step():
+        await manager.simulate_time_passage(0.25)
+    return step
+
+
+# ---------- 提示词 ----------
+
+def _prompt_args() -> List[tuple]:
+    from chinese_baby_prompts import AGE_STAGE_PROMPTS, EXPRESSION_PROMPTS, SCENE_PROMPTS
+    return [(age, gender, expression, scene) for age in AGE_STAGE_PROMPTS for gender in ("boy", "girl", None)
+            for expression in EXPRESSION_PROMPTS for scene in SCENE_PROMPTS]
+
+
+@case("prompts.generate_prompt")
+def prompts_generate():
+    from chinese_baby_prompts import generate_prompt
+    combos = itertools.cycle(_prompt_args())
+    return lambda: generate_prompt(*next(combos))
+
+
+@case("prompts.get_fal_ai_config")
+def prompts_fal_config():
+    from chinese_baby_prompts import get_fal_ai_config
+    combos = itertools.cycle(_prompt_args())
+    return lambda: get_fal_ai_config(*next(combos))
+
+
+# ---------- 运行与比较 ----------
+
+class _Point:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x: int, y: int):
+        self.x = x
+        self.y = y
+
+
+def _calibration():
+    """固定的纯 Python 工作量：循环、字典读写、小对象创建、属性访问（只用小整数，分配稳定）"""
+    counts: Dict[int, int] = {}
+    total = 0
+    for i in range(200):
+        key = i % 17
+        counts[key] = counts.get(key, 0) + 1
+        point = _Point(key, i % 5)
+        total += point.x + point.y
+    return total, len(counts)
+
+
+def run_case(item: Case, repeat: int = 9) -> Dict[str, float]:
+    """
+    每一轮先跑一小段校准循环、紧接着跑用例：per_call_us 取最快一轮，
+    relative 取各轮 用例/校准 比值的中位数——同一轮里两者处在同一时间窗口，
+    云主机几百毫秒内的速度波动大部分能抵消。
+    计时期间关闭 GC（同 timeit），避免回收时机随堆的状态变化带来抖动
+    """
+    step = item.factory()
+    loop = None
+    if asyncio.iscoroutinefunction(step):
+        loop = asyncio.new_event_loop()
+        coroutine_step = step
+
+        async def batch():
+            for _ in range(item.inner):
+                await coroutine_step()
+        step = lambda: loop.run_until_complete(batch())
+    calibrations, timings = [], []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            calibrations.append(measure(_calibration, CALIBRATION_CALLS, 1)["per_call_us"])
+            timings.append(measure(step, item.number, 1)["per_call_us"] / item.inner)
+    finally:
+        gc.enable()
+        if loop is not None:
+            loop.close()
+    per_call = min(timings)
+    relative = statistics.median(t / c for t, c in zip(timings, calibrations))
+    return {"per_call_us": round(per_call, 3), "ops_per_sec": round(1e6 / per_call, 1),
+            "calibration_us": min(calibrations), "relative": round(relative, 4)}
+
+
+def run_suite(keywords: Optional[List[str]] = None, repeat: int = 9,
+              progress: Optional[Callable[[str, Dict[str, float]], None]] = None) -> Dict[str, Any]:
+    results = {}
+    for name, item in CASES.items():
+        if keywords and not any(k in name for k in keywords):
+            continue
+        results[name] = run_case(item, repeat)
+        if progress:
+            progress(name, results[name])
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "calibration_us": min((r["calibration_us"] for r in results.values()), default=None),
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> Dict[str, List]:
+    """按 relative 比较：regressions / improvements 为 (用例, 比值)，另列出新增和缺失的用例"""
+    report: Dict[str, List] = {"regressions": [], "improvements": [], "unchanged": [],
+                               "new": [], "missing": []}
+    old = baseline["results"]
+    for name, result in current["results"].items():
+        if name not in old:
+            report["new"].append(name)
+            continue
+        ratio = result["relative"] / old[name]["relative"]
+        if ratio > 1 + threshold:
+            report["regressions"].append((name, ratio))
+        elif ratio < 1 - threshold:
+            report["improvements"].append((name, ratio))
+        else:
+            report["unchanged"].append((name, ratio))
+    report["missing"] = [name for name in old if name not in current["results"]]
+    return report
+
+
+def confirm_regressions(current: Dict[str, Any], baseline: Dict[str, Any],
+                        threshold: float = DEFAULT_THRESHOLD, retries: int = 2, repeat: int = 9):
+    """
+    疑似回归的用例重跑，保留 relative 最小的一次：
+    机器抖动只会让结果变慢，真正的回归每次重跑都会超过阈值
+    """
+    for _ in range(retries):
+        suspects = [name for name, _ in compare(current, baseline, threshold)["regressions"]]
+        if not suspects:
+            return
+        for name in suspects:
+            rerun = run_case(CASES[name], repeat)
+            if rerun["relative"] < current["results"][name]["relative"]:
+                current["results"][name] = rerun
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="基准测试套件")
+    parser.add_argument("-k", dest="keywords", action="append", help="只运行名称包含关键字的用例（可重复）")
+    parser.add_argument("--repeat", type=int, default=9, help="每个用例计时轮数")
+    parser.add_argument("--output", help="结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="与基线 JSON 比较")
+    parser.add_argument("--save-baseline", help="结果同时写为新的基线")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回归阈值（比例）")
+    parser.add_argument("--retries", type=int, default=2, help="疑似回归的用例最多重跑几次")
+    parser.add_argument("--list", action="store_true", help="只列出用例")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+
+    print("📊 基准测试套件")
+    current = run_suite(args.keywords, args.repeat, progress=lambda name, r: print(
+        f"  {name:<44} {r['per_call_us']:>10.3f} µs/次  {r['ops_per_sec']:>12,.0f} 次/秒  ×{r['relative']:.3f}"))
+    print("  ×为相对校准循环的倍数，与基线比较时使用")
+
+    result = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        confirm_regressions(current, baseline, args.threshold, args.retries, args.repeat)
+        result = compare(current, baseline, args.threshold)
+        if args.keywords:
+            result["missing"] = []   # 只运行了部分用例
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(current, f, ensure_ascii=False, indent=2)
+            print(f"  结果已写入 {path}")
+    if result is None:
+        return 0
+    print(f"\n与基线比较（{baseline['created']}，{baseline['platform']}，阈值 ±{args.threshold:.0%}）")
+    for name, ratio in result["regressions"]:
+        print(f"  ❌ {name:<44} 慢了 {(ratio - 1) * 100:.1f}%")
+    for name, ratio in result["improvements"]:
+        print(f"  ✅ {name:<44} 快了 {(1 - ratio) * 100:.1f}%")
+    print(f"  持平 {len(result['unchanged'])} 个" + (f"，新增 {', '.join(result['new'])}" if result["new"] else "")
+          + (f"，基线中有但未运行 {', '.join(result['missing'])}" if result["missing"] else ""))
+    return 1 if result["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,11 @@
 确保生成纯正的中国宝宝特征
 """
 
+from functools import lru_cache
+from typing import Tuple
+
+from tracing import traced
+
 # 基础正面提示词 - 强化中国宝宝特征
 POSITIVE_PROMPT_BASE = """
 (pure Chinese baby:1.5), (single eyelid:1.2), (monolid:1.2),
@@ -100,6 +105,22 @@ SCENE_PROMPTS = {
 }
 
 
+@lru_cache(maxsize=None)
+def _compose_prompts(age_stage: str, gender, expression: str, scene: str) -> Tuple[str, str]:
+    """拼接 (正面, 负面) 提示词；参数已规范化，组合数有限，结果全部缓存"""
+    parts = [
+        AGE_STAGE_PROMPTS[age_stage],
+        EXPRESSION_PROMPTS[expression],
+        SCENE_PROMPTS[scene]
+    ]
+    if gender is not None:
+        parts.append(GENDER_PROMPTS[gender])
+    
+    positive_prompt = ", ".join([POSITIVE_PROMPT_BASE.strip()] + [p["positive"] for p in parts])
+    negative_prompt = ", ".join([NEGATIVE_PROMPT_BASE.strip()] + [p["negative"] for p in parts])
+    return positive_prompt, negative_prompt
+
+
 def generate_prompt(age_stage="newborn_0_3", gender=None, expression="happy", scene="studio"):
     """
     生成完整的提示词
@@ -113,31 +134,13 @@ def generate_prompt(age_stage="newborn_0_3", gender=None, expression="happy", sc
     Returns:
         dict: {"positive": str, "negative": str}
     """
-    # 组合正面提示词
-    positive_parts = [
-        POSITIVE_PROMPT_BASE.strip(),
-        AGE_STAGE_PROMPTS.get(age_stage, AGE_STAGE_PROMPTS["newborn_0_3"])["positive"],
-        EXPRESSION_PROMPTS.get(expression, EXPRESSION_PROMPTS["happy"])["positive"],
-        SCENE_PROMPTS.get(scene, SCENE_PROMPTS["studio"])["positive"]
-    ]
-    
-    if gender and gender in GENDER_PROMPTS:
-        positive_parts.append(GENDER_PROMPTS[gender]["positive"])
-    
-    positive_prompt = ", ".join(positive_parts)
-    
-    # 组合负面提示词
-    negative_parts = [
-        NEGATIVE_PROMPT_BASE.strip(),
-        AGE_STAGE_PROMPTS.get(age_stage, AGE_STAGE_PROMPTS["newborn_0_3"])["negative"],
-        EXPRESSION_PROMPTS.get(expression, EXPRESSION_PROMPTS["happy"])["negative"],
-        SCENE_PROMPTS.get(scene, SCENE_PROMPTS["studio"])["negative"]
-    ]
-    
-    if gender and gender in GENDER_PROMPTS:
-        negative_parts.append(GENDER_PROMPTS[gender]["negative"])
-    
-    negative_prompt = ", ".join(negative_parts)
+    # 未知取值按默认处理（与原先 dict.get 的回退一致），缓存键只会是目录里的组合
+    positive_prompt, negative_prompt = _compose_prompts(
+        age_stage if age_stage in AGE_STAGE_PROMPTS else "newborn_0_3",
+        gender if gender in GENDER_PROMPTS else None,
+        expression if expression in EXPRESSION_PROMPTS else "happy",
+        scene if scene in SCENE_PROMPTS else "studio",
+    )
     
     return {
         "positive": positive_prompt,
@@ -145,6 +148,17 @@ def generate_prompt(age_stage="newborn_0_3", gender=None, expression="happy", sc
     }
 
 
+def warm_prompt_catalog() -> int:
+    """预先生成全部提示词组合（gunicorn preload 时在 master 里调用），返回组合数"""
+    for age_stage in AGE_STAGE_PROMPTS:
+        for gender in (None, *GENDER_PROMPTS):
+            for expression in EXPRESSION_PROMPTS:
+                for scene in SCENE_PROMPTS:
+                    _compose_prompts(age_stage, gender, expression, scene)
+    return _compose_prompts.cache_info().currsize
+
+
+@traced()
 def get_fal_ai_config(age_stage="newborn_0_3", gender=None, expression="happy", scene="studio"):
     """
     获取 fal.ai API 的完整配置
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+会话级加锁
+每个游戏/管理器实例持有一把 RLock（实例即会话），公开的读改写方法用 @synchronized
+串行执行。不同会话之间互不阻塞，因此 gunicorn 切换到 gthread 后并发来自不同会话的请求，
+同一会话的请求按到达顺序依次执行。
+
+协程方法同样适用，但锁只在协程同步执行的每一段里持有：协程挂起（把事件循环让给
+其它协程）之前释放，恢复时重新获取。线程锁不会跨 await 持有，同一线程上的其它协程
+不会借可重入锁闯进来，也不会因为挂起期间占着锁卡住其它线程。需要跨 await 串行的
+流程由调用方的协程锁负责（如模拟器 _player_turn 的玩家锁）。
+"""
+
+import inspect
+import threading
+from functools import wraps
+
+
+def new_lock() -> threading.RLock:
+    """会话锁：可重入，方法之间可以互相调用"""
+    return threading.RLock()
+
+
+class _LockedSteps:
+    """等待协程：每一段同步执行在锁内，挂起前释放锁"""
+
+    def __init__(self, coro, lock):
+        self._coro = coro
+        self._lock = lock
+
+    def __await__(self):
+        coro, lock = self._coro, self._lock
+        step, value = coro.send, None
+        while True:
+            try:
+                with lock:
+                    yielded = step(value)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value, step = (yield yielded), coro.send
+            except GeneratorExit:
+                with lock:
+                    coro.close()
+                raise
+            except BaseException as e:   # 取消等异常原样抛回协程
+                value, step = e, coro.throw
+
+
+def synchronized(method):
+    """在实例的 _lock 下执行方法（同步或协程方法）"""
+    if inspect.iscoroutinefunction(method):
+        @wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            return await _LockedSteps(method(self, *args, **kwargs), self._lock)
+        return async_wrapper
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+双人协作 - Web 接口
+会话id 与单人游戏一样从 ?session= / X-Session-Id / Cookie 读取（分片模式下由此路由到同一 worker；
+多 worker 部署必须经过 session_dispatcher，见 coop_hub）。
+
+创建/加入会话时返回玩家令牌，之后的请求用请求头 X-Player-Token 或 ?token=（EventSource
+不能设置请求头）表明身份，服务端据此确定玩家id，不再信任客户端自报的 ?player=。
+
+    POST /coop/create    {player_id, name}                创建会话（创建者为侦察方），返回 token
+    POST /coop/join      {player_id, name, token?}        加入会话，返回 token（重连时带上原 token）
+    POST /coop/leave                                      离开会话，最后一人离开时回收会话
+    POST /coop/action    {action_type, ...}               提交动作，请求头 Idempotency-Key 可选
+    POST /coop/event     {event_type, severity}            触发共享事件（severity 为 1-10）
+    GET  /coop/state                                      完整快照，含每名玩家响应时间 p50/p90（无令牌时不含侦察方情报）
+    GET  /coop/stream                                     SSE 推送，断线重连时带 Last-Event-ID；
+                                                          单条流最长 STREAM_SECONDS，到期后客户端自动重连
+"""
+
+import os
+import time
+
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from coop_hub import hub, parse_action, parse_event
+from game_sessions import resolve_session_id
+
+coop_bp = Blueprint('coop', __name__, url_prefix='/coop')
+
+KEEPALIVE_SECONDS = 15
+STREAM_SECONDS = float(os.environ.get("COOP_STREAM_SECONDS", "60"))
+TOKEN_HEADER = 'X-Player-Token'
+
+
+def _player_id(data=None) -> str:
+    """创建/加入时客户端选择的玩家id"""
+    return (data or {}).get('player_id') or ''
+
+
+def _token(data=None) -> str:
+    return request.headers.get(TOKEN_HEADER) or request.args.get('token') or (data or {}).get('token') or ''
+
+
+def _session():
+    session_id = resolve_session_id(request)
+    return hub.find(session_id)
+
+
+@coop_bp.route('/create', methods=['POST'])
+def create():
+    data = request.get_json() or {}
+    player_id = _player_id(data)
+    if not player_id:
+        return jsonify({'success': False, 'message': '缺少 player_id'}), 400
+    session_id = resolve_session_id(request)
+    if session_id in hub:
+        return jsonify({'success': False, 'message': '会话已存在'}), 409
+    session = hub.create(session_id, player_id, data.get('name', '房主'))
+    token = session.tokens.get(player_id)
+    if session.scout_player_id != player_id or token is None:   # 并发创建时被别人抢先
+        return jsonify({'success': False, 'message': '会话已存在'}), 409
+    return jsonify({'success': True, 'session': session.session_id, 'scout': session.scout_player_id,
+                    'seq': session.seq, 'token': token})
+
+
+@coop_bp.route('/join', methods=['POST'])
+def join():
+    data = request.get_json() or {}
+    session = _session()
+    if session is None:
+        return jsonify({'success': False, 'message': '会话不存在'}), 404
+    player_id = _player_id(data)
+    if not player_id:
+        return jsonify({'success': False, 'message': '缺少 player_id'}), 400
+    result = session.join(player_id, data.get('name', '队友'), _token(data))
+    return jsonify(result), 200 if result['success'] else 409
+
+
+@coop_bp.route('/leave', methods=['POST'])
+def leave():
+    data = request.get_json(silent=True) or {}
+    session = _session()
+    if session is None:
+        return jsonify({'success': False, 'message': '会话不存在'}), 404
+    player_id = session.authenticate(_token(data))
+    if player_id is None:
+        return jsonify({'success': False, 'message': '无效的玩家令牌'}), 401
+    closed = hub.leave(session.session_id, player_id)
+    return jsonify({'success': True, 'closed': closed})
+
+
+@coop_bp.route('/action', methods=['POST'])
+def action():
+    data = request.get_json() or {}
+    session = _session()
+    if session is None:
+        return jsonify({'success': False, 'message': '会话不存在'}), 404
+    player_id = session.authenticate(_token(data))
+    if player_id is None:
+        return jsonify({'success': False, 'message': '无效的玩家令牌'}), 401
+    try:
+        player_action = parse_action(data, player_id)
+    except (KeyError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'无效的动作: {e}'}), 400
+    key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    result = session.submit(player_id, player_action, key)
+    return jsonify(result), 200 if result['success'] else 403
+
+
+@coop_bp.route('/event', methods=['POST'])
+def trigger_event():
+    data = request.get_json() or {}
+    session = _session()
+    if session is None:
+        return jsonify({'success': False, 'message': '会话不存在'}), 404
+    if session.authenticate(_token(data)) is None:
+        return jsonify({'success': False, 'message': '无效的玩家令牌'}), 401
+    try:
+        event_type, severity = parse_event(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'无效的事件: {e}'}), 400
+    event = session.trigger_event(event_type, severity)
+    return jsonify({'success': True, 'event_id': event.id, 'seq': session.seq})
+
+
+@coop_bp.route('/state')
+def state():
+    session = _session()
+    if session is None:
+        return jsonify({'success': False, 'message': '会话不存在'}), 404
+    return jsonify(session.snapshot(session.authenticate(_token()) or ''))
+
+
+@coop_bp.route('/stream')
+def stream():
+    session = _session()
+    if session is None:
+        return jsonify({'success': False, 'message': '会话不存在'}), 404
+    player_id = session.authenticate(_token())
+    if player_id is None:
+        return jsonify({'success': False, 'message': '无效的玩家令牌'}), 401
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    cursor = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    def events(cursor):
+        # 重连时从客户端的游标续传；首次连接从服务端记录的游标开始
+        # 流有时长上限，到期结束后 EventSource 带 Last-Event-ID 重连，不会长期占住 worker 线程
+        deadline = time.monotonic() + STREAM_SECONDS
+        yield b"retry: 2000\n\n"
+        while player_id in session.game.players and time.monotonic() < deadline:
+            timeout = min(KEEPALIVE_SECONDS, max(deadline - time.monotonic(), 0))
+            frames, cursor = session.wait(player_id, cursor, timeout=timeout)
+            if frames:
+                yield b"".join(frames)
+            else:
+                yield b": keepalive\n\n"
+
+    return Response(stream_with_context(events(cursor)), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+双人协作会话中心
+每个协作会话维护一条有序的事件日志（序号递增），两名玩家各有一个游标，
+推送时只发送游标之后、该玩家可见的条目。每条更新在写入日志时编码一次成
+SSE 帧（bytes），所有订阅者共用同一份字节，不按订阅者重复序列化。
+
+- 动作可带幂等键：同一玩家重复提交同一个键（网络重试）直接返回第一次的结果
+- 非对称信息：生化危机（炸屎）事件的处理要点只推给侦察方（房主），
+  另一名玩家只知道出事了，需要靠队友沟通
+- 游标落后到日志已被截断的位置时，先补发一帧完整快照再继续
+- 玩家身份以服务端在创建/加入时签发的令牌为准（见 authenticate），客户端自报的玩家id
+  不能拿到侦察方的私有情报
+- 最后一名玩家离开或空闲超过 idle_seconds 的会话由 CoopHub 回收
+
+会话只存在于进程内存中：多 worker 部署必须在前面运行 session_dispatcher（按会话id把
+请求固定到同一个 worker），否则同一会话的请求会落到不同进程、各自看到不同的会话。
+调度器扩缩容时只迁移单人游戏会话，换主的协作会话会丢失，需要玩家重新创建。
+
+订阅方式：
+    wait()        阻塞等待（Flask gthread worker 中的 SSE 生成器）
+    wait_async()  协程等待（asyncio 服务 / 基准测试）
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from concurrency import new_lock, synchronized
+from hardcore_parenting_simulator import (
+    ActionType, EventType, GameEvent, MultiplayerSession, PlayerAction, ScoringSystem
+)
+from session_journal import export_dataclass, state_delta
+
+MAX_PLAYERS = 2
+
+# 只推给侦察方的事件详情（非对称信息玩法）
+PRIVATE_EVENT_TYPES = {EventType.EXPLOSIVE_DIAPER}
+
+
+def encode_frame(seq: int, kind: str, payload: Dict[str, Any]) -> bytes:
+    """编码一条 SSE 帧"""
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {seq}\nevent: {kind}\ndata: {data}\n\n".encode("utf-8")
+
+
+def _event_payload(event: GameEvent, detailed: bool) -> Dict[str, Any]:
+    payload = {
+        "id": event.id,
+        "event_type": event.event_type.value,
+        "severity": event.severity,
+        "description": event.description,
+    }
+    if detailed:
+        payload["duration"] = event.duration
+        payload["required_actions"] = [action.value for action in event.required_actions]
+    return payload
+
+
+class CoopSession:
+    """一个双人协作会话：共享游戏状态 + 有序事件日志"""
+
+    def __init__(self, session_id: str, host_player_id: str, host_name: str = "房主",
+                 max_log: int = 1024, max_idempotency_keys: int = 256,
+                 clock: Callable[[], float] = time.monotonic):
+        self.session_id = session_id
+        self.game = MultiplayerSession(session_id, host_player_id)
+        self.game.add_player(host_player_id, host_name)
+        self.scoring = ScoringSystem()   # 每名玩家响应时间/成功率的流式聚合（快照里的 p50/p90）
+        self.max_idempotency_keys = max_idempotency_keys
+        self.clock = clock
+        self.last_active = clock()
+        self.seq = 0
+        self.cursors: Dict[str, int] = {host_player_id: 0}
+        self.tokens: Dict[str, str] = {host_player_id: secrets.token_urlsafe(16)}   # 玩家id -> 令牌
+        self._log: Deque[Tuple[int, Optional[str], bytes]] = deque(maxlen=max_log)   # (序号, 可见玩家, 帧)
+        self._results: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._shadow = export_dataclass(self.game.shared_state)
+        self._lock = threading.Condition(new_lock())
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.duplicates = 0
+
+    @property
+    def scout_player_id(self) -> str:
+        return self.game.host_player_id
+
+    def authenticate(self, token: Optional[str]) -> Optional[str]:
+        """令牌 -> 玩家id，无效时返回None"""
+        if not token:
+            return None
+        for player_id, expected in list(self.tokens.items()):
+            if secrets.compare_digest(token, expected):
+                return player_id
+        return None
+
+    # ---------- 写入 ----------
+
+    def _append(self, kind: str, payload: Dict[str, Any], audience: Optional[str] = None) -> int:
+        """追加一条日志并唤醒订阅者（调用方持有锁）"""
+        self.seq += 1
+        self._log.append((self.seq, audience, encode_frame(self.seq, kind, payload)))
+        self._lock.notify_all()
+        if self._async_waiters:
+            current = _running_loop()
+            for loop, future in self._async_waiters:
+                if loop is current:
+                    _wake(future)   # 同一线程内直接完成，省去自唤醒管道的写入
+                else:
+                    loop.call_soon_threadsafe(_wake, future)
+            self._async_waiters.clear()
+        return self.seq
+
+    @synchronized
+    def join(self, player_id: str, player_name: str, token: Optional[str] = None) -> Dict[str, Any]:
+        """加入会话，返回该玩家的令牌（已在会话中的玩家凭原令牌重连）"""
+        self.last_active = self.clock()
+        if player_id in self.game.players:
+            if self.authenticate(token) != player_id:
+                return {"success": False, "message": "玩家id已被占用"}
+            return {"success": True, "seq": self.seq, "rejoined": True, "token": token}
+        if not self.game.add_player(player_id, player_name):
+            return {"success": False, "message": f"会话已满（最多{MAX_PLAYERS}人）"}
+        self.cursors[player_id] = self.seq
+        self.tokens[player_id] = secrets.token_urlsafe(16)
+        seq = self._append("player_joined", {"player_id": player_id, "name": player_name})
+        return {"success": True, "seq": seq, "rejoined": False, "token": self.tokens[player_id]}
+
+    @synchronized
+    def leave(self, player_id: str):
+        if player_id not in self.game.players:
+            return
+        self.game.remove_player(player_id)
+        self.cursors.pop(player_id, None)
+        self.tokens.pop(player_id, None)
+        self._append("player_left", {"player_id": player_id})
+
+    @synchronized
+    def trigger_event(self, event_type: EventType, severity: int = 5) -> GameEvent:
+        """触发共享事件；非对称事件的处理要点只推给侦察方"""
+        self.last_active = self.clock()
+        event = self.game.event_manager.trigger_event(event_type, severity)
+        private = event_type in PRIVATE_EVENT_TYPES
+        self._append("event", _event_payload(event, detailed=not private))
+        if private:
+            self._append("intel", _event_payload(event, detailed=True), audience=self.scout_player_id)
+        return event
+
+    @synchronized
+    def submit(self, player_id: str, action: PlayerAction,
+               idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        提交玩家动作，结算后把状态增量追加到日志
+
+        Returns:
+            dict: success, seq（该动作对应的日志序号）, resolved_event, duplicate
+        """
+        if player_id not in self.game.players:
+            return {"success": False, "message": "玩家不在会话中"}
+        self.last_active = self.clock()
+        if idempotency_key is not None:
+            cached = self._results.get((player_id, idempotency_key))
+            if cached is not None:
+                self.duplicates += 1
+                return dict(cached, duplicate=True)
+
+        state = self.game.sync_action(player_id, action)
+        self.scoring.record_action(action)
+        snapshot = export_dataclass(state)
+        delta = state_delta(self._shadow, snapshot)
+        self._shadow = snapshot
+        resolved = self.game.last_resolved
+        player = self.game.players[player_id]
+        seq = self._append("action", {
+            "player_id": player_id,
+            "action_type": action.action_type.value,
+            "resolved_event": resolved.id if resolved else None,
+            "delta": delta,
+            "individual_kpi": player["individual_kpi"],
+            "actions_count": player["actions_count"],
+        })
+        result = {"success": True, "seq": seq,
+                  "resolved_event": resolved.id if resolved else None, "duplicate": False}
+
+        if idempotency_key is not None:
+            self._results[(player_id, idempotency_key)] = result
+            if len(self._results) > self.max_idempotency_keys:
+                self._results.popitem(last=False)
+        return result
+
+    # ---------- 读取 ----------
+
+    @synchronized
+    def snapshot(self, player_id: str) -> Dict[str, Any]:
+        """完整状态（新订阅者或游标落后太多时使用）"""
+        scout = player_id == self.scout_player_id
+        return {
+            "seq": self.seq,
+            "shared_state": dict(self._shadow),
+            "players": {pid: {"name": p["name"], "individual_kpi": p["individual_kpi"],
+                              "actions_count": p["actions_count"],
+                              "metrics": self.scoring.get_player_metrics(pid)}
+                        for pid, p in self.game.players.items()},
+            "active_events": [
+                _event_payload(event, detailed=scout or event.event_type not in PRIVATE_EVENT_TYPES)
+                for event in self.game.event_manager.active_events.values()
+            ],
+        }
+
+    @synchronized
+    def read(self, player_id: str, cursor: Optional[int] = None) -> Tuple[List[bytes], int]:
+        """
+        取出游标之后该玩家可见的帧，并把玩家游标推进到最新序号
+
+        Args:
+            cursor: 客户端已收到的最后序号（SSE 的 Last-Event-ID）；None 表示使用服务端记录的游标
+        """
+        self.last_active = self.clock()   # 订阅中的流每个保活周期都会读一次
+        if cursor is None:
+            cursor = self.cursors.get(player_id, self.seq)
+        if cursor >= self.seq:
+            return [], self.seq
+        oldest = self._log[0][0] if self._log else self.seq + 1
+        if cursor < oldest - 1:
+            frames = [encode_frame(self.seq, "snapshot", self.snapshot(player_id))]
+        else:
+            # 序号连续，只需从尾部取出 seq - cursor 条
+            tail = itertools.islice(reversed(self._log), self.seq - cursor)
+            frames = [frame for _, audience, frame in tail if audience is None or audience == player_id]
+            frames.reverse()
+        if player_id in self.cursors:
+            self.cursors[player_id] = self.seq
+        return frames, self.seq
+
+    def wait(self, player_id: str, cursor: Optional[int] = None,
+             timeout: Optional[float] = None) -> Tuple[List[bytes], int]:
+        """阻塞直到有新的可见帧或超时（超时返回空列表）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            frames, cursor = self.read(player_id, cursor)
+            while not frames:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+                frames, cursor = self.read(player_id, cursor)
+            return frames, cursor
+
+    async def wait_async(self, player_id: str, cursor: Optional[int] = None,
+                         timeout: Optional[float] = None) -> Tuple[List[bytes], int]:
+        """wait() 的协程版本，不占用线程"""
+        loop = asyncio.get_running_loop()
+        while True:
+            future = loop.create_future()
+            with self._lock:
+                frames, cursor = self.read(player_id, cursor)
+                if frames:
+                    return frames, cursor
+                self._async_waiters.append((loop, future))
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if (loop, future) in self._async_waiters:
+                        self._async_waiters.remove((loop, future))
+                return [], cursor
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "players": list(self.game.players),
+                "seq": self.seq,
+                "log": len(self._log),
+                "cursor_lag": {pid: self.seq - cursor for pid, cursor in self.cursors.items()},
+                "active_events": len(self.game.event_manager.active_events),
+                "duplicates": self.duplicates,
+            }
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class CoopHub:
+    """会话id -> 协作会话（最后一名玩家离开或空闲超过 idle_seconds 时回收）"""
+
+    def __init__(self, max_log: int = 1024, idle_seconds: float = 1800, sweep_interval: float = 60,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_log = max_log
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._sessions: Dict[str, CoopSession] = {}
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+        self.expired = 0
+
+    def create(self, session_id: str, host_player_id: str, host_name: str = "房主") -> CoopSession:
+        """创建会话；已存在时返回原会话"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = CoopSession(
+                    session_id, host_player_id, host_name, max_log=self.max_log, clock=self.clock)
+            return session
+
+    def get(self, session_id: str) -> CoopSession:
+        """取出会话，不存在时抛出 KeyError"""
+        session = self.find(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def find(self, session_id: str) -> Optional[CoopSession]:
+        """取出会话，不存在（或刚被空闲回收）时返回 None；一次查找，没有先判断再取的竞争"""
+        if self.idle_seconds and self.clock() - self._last_sweep >= self.sweep_interval:
+            self.expire_idle()
+        return self._sessions.get(session_id)
+
+    def leave(self, session_id: str, player_id: str) -> bool:
+        """玩家离开；最后一名玩家离开时回收会话，返回会话是否已回收"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return False
+        session.leave(player_id)
+        if not session.game.players:
+            return self.remove(session_id)
+        return False
+
+    def remove(self, session_id: str) -> bool:
+        """回收会话：剩余玩家全部离开（唤醒并结束他们的推送流）"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        for player_id in list(session.game.players):
+            session.leave(player_id)
+        return True
+
+    def expire_idle(self, now: Optional[float] = None) -> int:
+        """回收空闲超时的会话，返回回收数"""
+        now = self.clock() if now is None else now
+        self._last_sweep = now
+        idle = [session_id for session_id, session in list(self._sessions.items())
+                if now - session.last_active >= self.idle_seconds]
+        removed = sum(self.remove(session_id) for session_id in idle)
+        self.expired += removed
+        return removed
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "players": sum(len(session.game.players) for session in sessions),
+            "expired": self.expired,
+        }
+
+
+def parse_action(data: Dict[str, Any], player_id: str) -> PlayerAction:
+    """请求体 -> PlayerAction（action_type 取 ActionType 的值）"""
+    return PlayerAction(
+        action_type=ActionType(data["action_type"]),
+        response_time=float(data.get("response_time", 0)),
+        success=bool(data.get("success", True)),
+        player_id=player_id,
+        extra_data=data.get("extra_data") or {},
+    )
+
+
+def parse_event(data: Dict[str, Any]) -> Tuple[EventType, int]:
+    """请求体 -> (事件类型, 严重程度)；严重程度须为 1-10 的整数"""
+    event_type = EventType(data.get("event_type", EventType.EXPLOSIVE_DIAPER.value))
+    severity = data.get("severity", 5)
+    if isinstance(severity, bool) or not isinstance(severity, (int, str)):
+        raise ValueError(f"severity 须为整数: {severity!r}")
+    severity = int(severity)
+    if not 1 <= severity <= 10:
+        raise ValueError(f"severity 须在 1-10 之间: {severity}")
+    return event_type, severity
+
+
+# 进程内的协作会话（多 worker 时依赖调度器按 ?session= 把同一会话的请求路由到同一个 worker）
+hub = CoopHub(idle_seconds=float(os.environ.get("COOP_IDLE_SECONDS", "1800")))
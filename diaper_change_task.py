@@ -4,15 +4,13 @@
 点击任务显示哭脸，成功后显示笑脸
 """
 
-from flask import Blueprint, render_template_string, request, jsonify
-from hardcore_parenting_game import HardcoreParentingGame
+from flask import Blueprint, request, jsonify
+from game_sessions import registry, resolve_session_id
+from warm_start import render_page
 
 # 创建 Blueprint
 diaper_bp = Blueprint('diaper', __name__, url_prefix='/diaper')
 
-# 创建游戏实例
-game = HardcoreParentingGame()
-
 # 换尿布任务HTML模板
 DIAPER_TASK_HTML = '''
 <!DOCTYPE html>
@@ -485,7 +483,7 @@ DIAPER_TASK_HTML = '''
 @diaper_bp.route('/')
 def diaper_task():
     """换尿布任务主页面"""
-    return render_template_string(DIAPER_TASK_HTML)
+    return render_page(DIAPER_TASK_HTML)
 
 
 @diaper_bp.route('/execute', methods=['POST'])
@@ -499,6 +497,7 @@ def execute_diaper_task():
         diaper_placement = data.get('diaper_placement', 'correct')
         
         # 执行任务
+        game = registry.get(resolve_session_id(request))
         result = game.execute_diaper_task(
             lift_speed=lift_speed,
             wipe_thoroughness=wipe_thoroughness,
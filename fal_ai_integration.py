@@ -7,17 +7,18 @@ fal.ai 集成示例
 import os
 from typing import List, Dict, Any
 from chinese_baby_prompts import get_fal_ai_config
+from feature_registry import features
+from providers import providers
+from tracing import traced
 
-# 尝试导入 fal_client
-try:
-    import fal_client
-    FAL_AVAILABLE = True
-except ImportError:
-    FAL_AVAILABLE = False
+# 通过 providers.get("fal") 调用（GENERATION_PROVIDER=fake 时走本地假服务，见 providers）
+FAL_AVAILABLE = features.available("fal")
+if not FAL_AVAILABLE:
     print("警告: fal_client 未安装")
     print("请运行: pip install fal-client")
 
 
+@traced()
 def generate_single_photo(
     age_stage: str = "newborn_0_3",
     gender: str = None,
@@ -38,7 +39,8 @@ def generate_single_photo(
     Returns:
         dict: 包含图片URL和元数据的字典
     """
-    if not FAL_AVAILABLE:
+    provider = providers.get("fal")
+    if not provider.available():
         return {
             "success": False,
             "error": "fal_client 未安装",
@@ -48,7 +50,7 @@ def generate_single_photo(
     # 设置 API 密钥
     if api_key:
         os.environ["FAL_KEY"] = api_key
-    elif not os.environ.get("FAL_KEY"):
+    elif not provider.configured():
         return {
             "success": False,
             "error": "API 密钥未设置",
@@ -66,9 +68,10 @@ def generate_single_photo(
         print(f"场景: {scene}")
         
         # 调用 fal.ai API
-        result = fal_client.subscribe(
+        result = provider.generate(
+            "flux_schnell",
             "fal-ai/flux/schnell",  # 使用 Flux Schnell 快速模型
-            arguments={
+            {
                 "prompt": config["prompt"],
                 "negative_prompt": config["negative_prompt"],
                 "image_size": config["image_size"],
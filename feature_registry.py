@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+可选子系统的延迟加载
+fal / replicate / pygame 这些可选依赖，以及照片生成、面部融合、背景音乐这些
+构造时就有副作用（初始化混音器、创建目录）的子系统，原来都在模块导入时完成，
+每个 gunicorn worker 冷启动都要付一遍，哪怕这个 worker 从来用不到它们。
+
+现在统一登记在 features 里：
+- available(name)：只用 importlib.util.find_spec 检查依赖是否安装，不执行导入
+- get(name)：第一次使用时才导入/构造，结果缓存；依赖缺失或加载失败抛 FeatureUnavailable
+- lazy(name)：返回一个代理对象，访问属性时才触发 get(name)，模块里可以直接写
+  fal_client = features.lazy("fal")，原来的 fal_client.subscribe(...) 调用不用改
+- preload()：提前加载（gunicorn preload 模式下在 master 里调用，fork 后各 worker 共享）
+
+加载失败的结果同样会缓存，不会每个请求都重试一次导入。
+"""
+
+import importlib
+import importlib.util
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+class FeatureUnavailable(ImportError):
+    """可选子系统不可用（依赖未安装或加载失败）"""
+
+
+class Feature:
+    """一个可选子系统"""
+
+    def __init__(self, name: str, loader: Callable[[], Any], requires: Tuple[str, ...] = (),
+                 description: str = ""):
+        self.name = name
+        self.loader = loader
+        self.requires = requires
+        self.description = description
+        self.value: Any = None
+        self.loaded = False
+        self.error: Optional[BaseException] = None
+        self.load_ms: Optional[float] = None
+        self._available: Optional[bool] = None
+
+    def available(self) -> bool:
+        if self._available is None:
+            self._available = all(importlib.util.find_spec(module) is not None for module in self.requires)
+        return self._available
+
+
+class LazyFeature:
+    """子系统的延迟代理：第一次访问属性时加载"""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: "FeatureRegistry", name: str):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self) -> str:
+        return f"<LazyFeature {self._name}>"
+
+
+class FeatureRegistry:
+    """名称 -> 可选子系统"""
+
+    def __init__(self):
+        self._features: Dict[str, Feature] = {}
+        self._lock = threading.RLock()   # 可重入：子系统的加载函数可以再 get 别的子系统
+
+    def register(self, name: str, loader: Callable[[], Any], requires: Iterable[str] = (),
+                 description: str = "") -> Feature:
+        if name in self._features:
+            raise ValueError(f"子系统已登记: {name}")
+        feature = self._features[name] = Feature(name, loader, tuple(requires), description)
+        return feature
+
+    def _feature(self, name: str) -> Feature:
+        try:
+            return self._features[name]
+        except KeyError:
+            raise FeatureUnavailable(f"未登记的子系统: {name}") from None
+
+    def available(self, name: str) -> bool:
+        """依赖是否已安装（不导入）"""
+        return self._feature(name).available()
+
+    def loaded(self, name: str) -> bool:
+        return self._feature(name).loaded
+
+    def get(self, name: str) -> Any:
+        """取出子系统，第一次调用时加载"""
+        feature = self._feature(name)
+        if feature.loaded:
+            return feature.value
+        with self._lock:
+            if not feature.loaded and feature.error is None:
+                self._load(feature)
+        if feature.error is not None:
+            raise FeatureUnavailable(f"{name} 不可用: {feature.error}") from feature.error
+        return feature.value
+
+    def _load(self, feature: Feature):
+        if not feature.available():
+            feature.error = ModuleNotFoundError(f"缺少依赖 {', '.join(feature.requires)}")
+            return
+        start = time.perf_counter()
+        try:
+            feature.value = feature.loader()
+            feature.loaded = True
+        except Exception as e:
+            feature.error = e
+        finally:
+            feature.load_ms = round((time.perf_counter() - start) * 1000, 3)
+
+    def lazy(self, name: str) -> LazyFeature:
+        self._feature(name)
+        return LazyFeature(self, name)
+
+    def preload(self, names: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        """提前加载（默认全部已安装的子系统），返回 名称 -> 是否加载成功"""
+        results = {}
+        for name in names if names is not None else list(self._features):
+            try:
+                self.get(name)
+                results[name] = True
+            except FeatureUnavailable:
+                results[name] = False
+        return results
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """各子系统的状态（只检查不加载，供 /health 使用）"""
+        return {
+            name: {
+                "available": feature.available(),
+                "loaded": feature.loaded,
+                "load_ms": feature.load_ms,
+                "error": None if feature.error is None else str(feature.error),
+            }
+            for name, feature in self._features.items()
+        }
+
+
+def _import(module: str) -> Callable[[], Any]:
+    return lambda: importlib.import_module(module)
+
+
+def _construct(module: str, cls: str) -> Callable[[], Any]:
+    return lambda: getattr(importlib.import_module(module), cls)()
+
+
+features = FeatureRegistry()
+features.register("fal", _import("fal_client"), requires=("fal_client",), description="fal.ai 图像生成客户端")
+features.register("replicate", _import("replicate"), requires=("replicate",), description="Replicate 客户端")
+features.register("pygame", _import("pygame"), requires=("pygame",), description="音频播放")
+features.register("photo", _construct("baby_photo_integration", "BabyPhotoGenerator"),
+                  description="宝宝照片生成器")
+features.register("fusion", _construct("baby_face_fusion", "BabyFaceFusion"), description="父母照片面部融合生成器")
+features.register("music", _construct("background_music", "BackgroundMusicPlayer"),
+                  description="背景音乐播放器（初始化混音器、创建音乐目录）")
@@ -3,11 +3,11 @@
 冲奶粉任务 - Web 界面
 """
 
-from flask import Blueprint, render_template_string, request, jsonify
-from hardcore_parenting_game import HardcoreParentingGame
+from flask import Blueprint, request, jsonify
+from game_sessions import registry, resolve_session_id
+from warm_start import render_page
 
 feeding_bp = Blueprint('feeding', __name__, url_prefix='/game/feeding')
-game = HardcoreParentingGame()
 
 FEEDING_HTML = '''
 <!DOCTYPE html>
@@ -213,12 +213,13 @@ FEEDING_HTML = '''
 
 @feeding_bp.route('/')
 def feeding_task():
-    return render_template_string(FEEDING_HTML)
+    return render_page(FEEDING_HTML)
 
 @feeding_bp.route('/execute', methods=['POST'])
 def execute_feeding():
     try:
         data = request.get_json()
+        game = registry.get(resolve_session_id(request))
         result = game.execute_feeding_task(
             water_temp=data.get('water_temp', 40),
             shake_intensity=data.get('shake_intensity', 10),
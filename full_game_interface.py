@@ -3,15 +3,14 @@
 完整游戏界面 - 所有任务的 Web 实现
 """
 
-from flask import Blueprint, render_template_string, request, jsonify
-from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from flask import Blueprint, request, jsonify
+from hardcore_parenting_game import GameMode, BabyPersonality
+from game_sessions import registry, resolve_session_id, status_response
+from warm_start import render_page
 
 # 创建 Blueprint
 game_bp = Blueprint('game', __name__, url_prefix='/game')
 
-# 创建游戏实例
-game = HardcoreParentingGame()
-
 # 主游戏页面 HTML
 GAME_MAIN_HTML = '''
 <!DOCTYPE html>
@@ -330,15 +329,15 @@ GAME_MAIN_HTML = '''
 @game_bp.route('/')
 def game_main():
     """游戏主页面"""
-    return render_template_string(GAME_MAIN_HTML)
+    return render_page(GAME_MAIN_HTML)
 
 
 @game_bp.route('/status')
 def game_status():
     """获取游戏状态"""
     try:
-        status = game.get_game_status()
-        return jsonify(status)
+        game = registry.get(resolve_session_id(request))
+        return status_response(game, request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
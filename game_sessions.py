@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+游戏会话注册表
+按会话id管理 HardcoreParentingGame 实例。配置了日志目录时每个会话挂载
+SessionJournal，worker 重启后首次访问会从快照 + 日志尾部恢复。
+
+空闲超过 idle_seconds 的会话会被编码（state_codec.encode_game）写入休眠目录
+并从内存移除；下次访问时透明恢复，并按离开的时长一次性补算数值衰减。
+
+会话id由客户端给出，热会话数超过 max_sessions 时淘汰最久未访问的会话（配置了休眠目录时
+休眠，否则丢弃；开了日志的会话下次访问时从日志恢复），客户端不断换id也不会让内存无限增长。
+
+会话id依次从查询参数 ?session=、请求头 X-Session-Id、Cookie session_id 读取，
+都没有时使用 "default"（与原先每个模块一个全局游戏实例的行为一致）。
+
+每个会话的日志只允许一个进程写入（见 session_journal.JournalLocked）：多 worker 部署时
+需要 session_dispatcher 把同一会话固定到同一进程，否则后打开的进程对该会话不写日志。
+
+休眠同样默认关闭；开启后多个 worker 共用休眠目录时也需要 session_dispatcher，否则两个
+worker 可能同时恢复同一个会话。
+
+环境变量：
+    GAME_JOURNAL_DIR     日志目录，默认不设置（不持久化）
+    GAME_HIBERNATE_DIR   休眠目录，默认不设置（不休眠）
+    GAME_IDLE_SECONDS    设置了休眠目录时空闲多久后休眠，0 表示不休眠
+    GAME_MAX_SESSIONS    每个进程最多保留的热会话数，0 表示不限
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import metrics
+import state_codec
+from hardcore_parenting_game import HardcoreParentingGame
+from session_journal import JournalLocked, SessionJournal, safe_session_name
+from streaming_stats import QuantileSketch
+
+DEFAULT_SESSION_ID = "default"
+SESSION_QUERY_PARAM = "session"
+SESSION_HEADER = "X-Session-Id"
+SESSION_COOKIE = "session_id"
+
+
+def resolve_session_id(req) -> str:
+    """从 Flask request 中取出会话id"""
+    return (req.args.get(SESSION_QUERY_PARAM)
+            or req.headers.get(SESSION_HEADER)
+            or req.cookies.get(SESSION_COOKIE)
+            or DEFAULT_SESSION_ID)
+
+
+def status_response(game: HardcoreParentingGame, req) -> Tuple[bytes, int, Dict[str, str]]:
+    """
+    /game/status 的响应（Flask 视图直接返回这个三元组）
+    - ?since=<ETag 值>：只返回该版本之后变化的字段，没有变化时 304
+    - If-None-Match 与当前 ETag 一致：304，不带响应体
+    - 否则返回按版本缓存的完整状态JSON
+
+    ETag 为 game.state_tag()（实例标识 + 版本号）：标记来自另一个实例（其它 worker、
+    重启或休眠恢复前）时实例标识对不上，一律返回完整状态。
+    """
+    epoch, _, since = (req.args.get("since") or "").rpartition("-")
+    if epoch == game.state_epoch and since.isdigit():
+        delta = game.get_status_since(int(since))
+        version = delta["state_version"]
+        not_modified = not delta["changes"]
+        body = b"" if not_modified else json.dumps(delta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    else:
+        version, body = game.get_status_body()
+        not_modified = f'"{game.state_tag(version)}"' in (req.headers.get("If-None-Match") or "")
+    headers = {
+        "Content-Type": "application/json",
+        "ETag": f'"{game.state_tag(version)}"',
+        "Cache-Control": "no-cache",   # 浏览器每次都带 If-None-Match 回来校验
+    }
+    if not_modified:
+        return b"", 304, headers
+    return body, 200, headers
+
+
+class GameSessionRegistry:
+    """会话id -> 游戏实例（内存中的热会话 + 磁盘上的休眠会话）"""
+
+    def __init__(self, journal_dir: Optional[str] = None, snapshot_every: int = 500,
+                 factory: Callable[[], HardcoreParentingGame] = HardcoreParentingGame,
+                 hibernate_dir: Optional[str] = None, idle_seconds: float = 0,
+                 sweep_interval: float = 60, max_sessions: int = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.journal_dir = journal_dir
+        self.snapshot_every = snapshot_every
+        self.factory = factory
+        self.hibernate_dir = hibernate_dir
+        self.idle_seconds = idle_seconds if hibernate_dir else 0
+        self.sweep_interval = sweep_interval
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions: Dict[str, HardcoreParentingGame] = {}
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()   # 按访问先后排列，最久未访问的在前
+        self._hibernated: Set[str] = set(self._scan_hibernated())
+        self._journals: Dict[str, SessionJournal] = {}   # 休眠会话的日志对象（保留序号）
+        self._last_sweep = clock()
+        self._lock = threading.RLock()
+        self.hibernations = 0
+        self.evictions = 0
+        self.rehydrations = 0
+        self.rehydrate_ms = QuantileSketch()
+
+    def get(self, session_id: str = DEFAULT_SESSION_ID) -> HardcoreParentingGame:
+        """取出会话：热会话直接返回，休眠会话恢复，不存在时创建（有日志则从日志恢复）"""
+        # 查找和刷新访问时间在同一把锁内完成，清扫不会把刚取出的会话当成空闲会话休眠掉
+        with self._lock:
+            now = self.clock()
+            game = self._sessions.get(session_id)
+            if game is None:
+                if self.hibernate_dir and os.path.exists(self._hibernate_path(session_id)):
+                    # 也可能是其它 worker 休眠的（分片模式下共用休眠目录）
+                    game = self._rehydrate(session_id)
+                else:
+                    game = self._create(session_id)
+                self._sessions[session_id] = game
+            self._last_access[session_id] = now
+            self._last_access.move_to_end(session_id)
+            if self.max_sessions and len(self._sessions) > self.max_sessions:
+                self._evict_lru(keep=session_id)
+        if self.idle_seconds and now - self._last_sweep >= self.sweep_interval:
+            self.hibernate_idle(now)
+        return game
+
+    def _create(self, session_id: str) -> HardcoreParentingGame:
+        game = self.factory()
+        journal = self._open_journal(session_id)
+        if journal is not None:
+            replayed = game.attach_journal(journal)
+            if replayed:
+                print(f"♻️ 会话 {session_id} 已从日志恢复（回放 {replayed} 条）")
+        return game
+
+    def _open_journal(self, session_id: str) -> Optional[SessionJournal]:
+        """打开会话日志；日志由其它进程持有时该会话不写日志（避免两个进程交错写同一文件）"""
+        if not self.journal_dir:
+            return None
+        try:
+            return SessionJournal(self.journal_dir, session_id, self.snapshot_every)
+        except JournalLocked:
+            print(f"⚠️ 会话 {session_id} 的日志由其它进程持有，本进程不记录日志（需要 session_dispatcher）")
+            return None
+
+    def _evict_lru(self, keep: str):
+        """热会话超过上限时淘汰最久未访问的（正在处理请求的跳过）"""
+        for session_id in list(self._last_access):
+            if len(self._sessions) <= self.max_sessions:
+                return
+            if session_id == keep or session_id not in self._sessions:
+                continue
+            if self.hibernate_dir:
+                self.evictions += self.hibernate(session_id, wait=False)
+            else:
+                self.evictions += self._drop(session_id)
+
+    def _drop(self, session_id: str) -> bool:
+        """不保存直接移出内存（日志写盘后交出，下次访问从日志恢复）"""
+        game = self._sessions[session_id]
+        if not game._lock.acquire(blocking=False):
+            return False
+        try:
+            del self._sessions[session_id]
+            self._last_access.pop(session_id, None)
+            if game.journal is not None:
+                game.journal.close()
+        finally:
+            game._lock.release()
+        return True
+
+    # ==================== 休眠 ====================
+
+    def _scan_hibernated(self) -> List[str]:
+        if not self.hibernate_dir or not os.path.isdir(self.hibernate_dir):
+            return []
+        return [name[:-len(".bin")] for name in os.listdir(self.hibernate_dir) if name.endswith(".bin")]
+
+    def _hibernate_path(self, session_id: str) -> str:
+        return os.path.join(self.hibernate_dir, safe_session_name(session_id) + ".bin")
+
+    def hibernate_idle(self, now: Optional[float] = None) -> int:
+        """把空闲超时的会话写入休眠目录并移出内存，返回休眠的会话数"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            self._last_sweep = now
+            idle = [session_id for session_id, last in list(self._last_access.items())
+                    if now - last >= self.idle_seconds and session_id in self._sessions]
+            return sum(self.hibernate(session_id, wait=False) for session_id in idle)
+
+    def hibernate(self, session_id: str, wait: bool = True) -> bool:
+        """休眠指定会话；wait=False 时正在处理请求的会话跳过（下次清扫再试）"""
+        with self._lock:
+            game = self._sessions[session_id]
+            if not game._lock.acquire(blocking=wait):
+                return False
+            try:
+                del self._sessions[session_id]
+                self._last_access.pop(session_id, None)
+                os.makedirs(self.hibernate_dir, exist_ok=True)
+                path = self._hibernate_path(session_id)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(state_codec.encode_game(game))
+                os.replace(tmp_path, path)
+            finally:
+                game._lock.release()
+            if game.journal is not None:
+                self._journals[session_id] = game.journal
+            self._hibernated.add(safe_session_name(session_id))
+            self.hibernations += 1
+            return True
+
+    def _rehydrate(self, session_id: str) -> HardcoreParentingGame:
+        start = time.perf_counter()
+        path = self._hibernate_path(session_id)
+        with open(path, "rb") as f:
+            game = state_codec.decode_game(f.read(), self.factory())
+        os.remove(path)
+        self._hibernated.discard(safe_session_name(session_id))
+
+        # 闭式补算休眠期间的线性衰减（基于 last_update 到现在的时长）
+        game._update_passive_decay()
+        self._reattach_journal(session_id, game)
+
+        self.rehydrations += 1
+        self.rehydrate_ms.add((time.perf_counter() - start) * 1000)
+        return game
+
+    def _reattach_journal(self, session_id: str, game: HardcoreParentingGame):
+        """给从编码数据恢复的会话接回日志（状态以编码数据为准，日志只用于接上序号）"""
+        journal = self._journals.pop(session_id, None)
+        if journal is None:
+            journal = self._open_journal(session_id)
+            if journal is not None:
+                journal.recover()
+        if journal is not None:
+            game.attach_journal(journal, recover=False)
+
+    # ==================== 分片迁移 ====================
+
+    def release(self, session_id: str) -> Optional[bytes]:
+        """交出会话所有权：编码后从本进程移除，会话不在内存中时返回None（见 session_dispatcher）"""
+        with self._lock:
+            game = self._sessions.pop(session_id, None)
+            if game is None:
+                return None
+            self._last_access.pop(session_id, None)
+            with game._lock:   # 等正在执行的请求结束
+                if game.journal is not None:
+                    game.journal.close()   # 交出写入权，接管的 worker 才能打开日志
+                return state_codec.encode_game(game)
+
+    def adopt(self, session_id: str, data: bytes) -> HardcoreParentingGame:
+        """接管其它 worker 交出的会话"""
+        game = state_codec.decode_game(data, self.factory())
+        with self._lock:
+            self._reattach_journal(session_id, game)
+            self._sessions[session_id] = game
+            self._last_access[session_id] = self.clock()
+        return game
+
+    # ==================== 查询 ====================
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions or safe_session_name(session_id) in self._hibernated
+
+    def hot_count(self) -> int:
+        """内存中的会话数"""
+        return len(self._sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions) + len(self._hibernated)
+
+    def session_ids(self) -> List[str]:
+        """内存中的热会话id"""
+        return list(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        """热/休眠会话数量与恢复耗时分位数（毫秒）"""
+        def ms(q):
+            value = self.rehydrate_ms.quantile(q)
+            return round(value, 3) if value is not None else None
+
+        return {
+            "hot": len(self._sessions),
+            "hibernated": len(self._hibernated),
+            "hibernations": self.hibernations,
+            "evictions": self.evictions,
+            "rehydrations": self.rehydrations,
+            "rehydrate_ms_p50": ms(0.5),
+            "rehydrate_ms_p90": ms(0.9),
+            "rehydrate_ms_p99": ms(0.99),
+        }
+
+    def sync(self):
+        """等待所有会话日志写盘"""
+        for game in list(self._sessions.values()):
+            if game.journal is not None:
+                game.journal.sync()
+
+
+registry = GameSessionRegistry(
+    journal_dir=os.environ.get("GAME_JOURNAL_DIR") or None,
+    hibernate_dir=os.environ.get("GAME_HIBERNATE_DIR") or None,
+    idle_seconds=float(os.environ.get("GAME_IDLE_SECONDS", "1800")),
+    max_sessions=int(os.environ.get("GAME_MAX_SESSIONS", "10000")),
+)
+metrics.track_sessions(registry.hot_count)
@@ -0,0 +1,58 @@
+"""
+gunicorn 配置
+gunicorn 默认读取当前目录下的 gunicorn.conf.py，Procfile / railway.json 里的
+gunicorn main:app ... 不用改；命令行上的 --workers / --bind / --timeout 优先于这里。
+
+预 fork 热启动（默认开启，GUNICORN_PRELOAD=0 关闭）：
+1. master 启动时先关闭 GC，导入应用期间不做分代回收
+2. 应用加载完成、fork worker 之前（when_ready）调用 warm_start.warm() 构建全部只读目录、
+   预渲染页面，再 warm_start.freeze() 把这些对象冻结到永久代
+3. 冻结后立即重新开启 GC（master 和之后 fork 出的 worker 都继承），分代回收只扫描冻结之后
+   新建的对象，不会写到共享的页面；master 重建 worker、处理信号期间产生的垃圾也照常回收
+
+worker 类型默认 gthread（GUNICORN_WORKER_CLASS / GUNICORN_THREADS 可改）：/game/watch 和
+/coop/stream 是长连接，sync worker 一个连接就占满整个进程；gthread 下每条流只占一个线程，
+流本身也有时长上限（到期后客户端按 retry 自动重连），不会长期占住线程。
+
+各 worker 的指标写到同一个 METRICS_DIR，/metrics 汇总全部 worker（见 metrics）；
+没有设置时在 master 启动时创建一个临时目录。worker 退出时（child_exit）把它的计数并入
+归档文件，pid 被复用后新 worker 不会覆盖旧计数。
+
+注意：preload 模式下修改代码需要重启 master，kill -HUP 只会用 master 里已加载的旧代码重建 worker。
+"""
+
+import gc
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+timeout = 120
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+if preload_app:
+    gc.disable()
+
+if not os.environ.get("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="babysitter-metrics-")
+
+
+def when_ready(server):
+    """master 已加载应用、即将 fork worker"""
+    if not preload_app:
+        return
+    import warm_start
+    try:
+        timings = warm_start.warm(server.app.wsgi())
+        frozen = warm_start.freeze()
+    finally:
+        gc.enable()   # 预热失败也要恢复 GC，否则 master 和全部 worker 都不再回收
+    server.log.info("预热完成 %s，冻结 %d 个对象", timings, frozen)
+
+
+def child_exit(server, worker):
+    """worker 已退出（master 回收后、pid 被复用前）：归档它的指标文件"""
+    from metrics import registry
+    registry.archive(worker.pid)
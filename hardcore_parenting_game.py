@@ -13,14 +13,25 @@
 - 高敏宝宝：负面事件70%，正面事件30%
 """
 
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
+from functools import lru_cache, wraps
 import random
+import secrets
 import time
 import json
 
+from achievement_engine import AchievementDefinition, AchievementEngine
+from concurrency import new_lock, synchronized
+from metrics import observe_task
+from tracing import span
+from alias_sampling import AliasTable
+from session_journal import SessionJournal, export_dataclass, import_dataclass, state_delta
+from task_history import TaskHistory
+
 
 class GameMode(Enum):
     """游戏模式"""
@@ -68,6 +79,159 @@ class TaskType(Enum):
     EMOTION_TALK = "emotion_talk"               # 笑(通) - 完整表达
 
 
+# 各年龄阶段可用任务
+AGE_STAGE_TASKS: Dict[AgeStage, Tuple[TaskType, ...]] = {
+    AgeStage.NEWBORN_0_3: (
+        TaskType.FEEDING_HUNGRY,
+        TaskType.SLEEP_TIRED,
+        TaskType.DIAPER_DIRTY,
+        TaskType.MEDICINE_SICK,
+        TaskType.HUG_HAPPY
+    ),
+    AgeStage.INFANT_3_12: (
+        TaskType.TALK_PLAY,
+        TaskType.FOOD_HUNGRY,
+        TaskType.SAFETY_DANGER,
+        TaskType.FIRST_WORD
+    ),
+    AgeStage.TODDLER_1_2: (
+        TaskType.DANGER_TOUCH,
+        TaskType.TOY_CONFLICT,
+        TaskType.BAD_WORD
+    ),
+    AgeStage.PRESCHOOL_2_3: (
+        TaskType.DRESSING_WILD,
+        TaskType.EMOTION_TALK
+    )
+}
+
+# 正面和负面事件
+POSITIVE_EVENTS = frozenset([TaskType.HUG_HAPPY, TaskType.TALK_PLAY, TaskType.FIRST_WORD])
+NEGATIVE_EVENTS = frozenset([
+    TaskType.FEEDING_HUNGRY, TaskType.SLEEP_TIRED, TaskType.DIAPER_DIRTY,
+    TaskType.MEDICINE_SICK, TaskType.FOOD_HUNGRY, TaskType.SAFETY_DANGER,
+    TaskType.DANGER_TOUCH, TaskType.TOY_CONFLICT, TaskType.BAD_WORD,
+    TaskType.DRESSING_WILD
+])
+
+
+def event_probabilities(age_stage: AgeStage, negative_weight: float) -> Dict[TaskType, float]:
+    """
+    计算某年龄阶段在给定负面权重下每个事件的精确概率
+    
+    规则：以negative_weight的概率从可用负面事件中均匀抽取；否则从可用正面事件中均匀抽取；
+    没有可用正面事件时从全部可用任务中均匀抽取
+    """
+    available = AGE_STAGE_TASKS.get(age_stage, ())
+    negatives = [t for t in available if t in NEGATIVE_EVENTS]
+    positives = [t for t in available if t in POSITIVE_EVENTS]
+    probabilities = {t: 0.0 for t in available}
+    
+    p_negative = negative_weight if negatives else 0.0
+    for t in negatives:
+        probabilities[t] += p_negative / len(negatives)
+    fallback = positives or list(available)
+    for t in fallback:
+        probabilities[t] += (1.0 - p_negative) / len(fallback)
+    return probabilities
+
+
+@lru_cache(maxsize=256)
+def event_table(age_stage: AgeStage, negative_weight: float) -> Optional[AliasTable]:
+    """获取（并缓存）某年龄阶段/负面权重组合的事件别名表"""
+    probabilities = event_probabilities(age_stage, negative_weight)
+    if not probabilities:
+        return None
+    return AliasTable.build(list(probabilities), list(probabilities.values()))
+
+
+# 按默认性格权重预热全部 年龄阶段 x 性格 组合
+DEFAULT_NEGATIVE_WEIGHTS = {
+    BabyPersonality.ANGEL: 0.3,
+    BabyPersonality.FUSSY: 0.7
+}
+for _stage in AgeStage:
+    for _weight in DEFAULT_NEGATIVE_WEIGHTS.values():
+        event_table(_stage, _weight)
+
+
+# 事件权重配置（只读，所有会话共用）
+EVENT_WEIGHTS = {
+    BabyPersonality.ANGEL: {
+        "negative": DEFAULT_NEGATIVE_WEIGHTS[BabyPersonality.ANGEL],  # 负面事件30%
+        "positive": 0.7   # 正面事件70%
+    },
+    BabyPersonality.FUSSY: {
+        "negative": DEFAULT_NEGATIVE_WEIGHTS[BabyPersonality.FUSSY],  # 负面事件70%
+        "positive": 0.3   # 正面事件30%
+    }
+}
+
+# 模式配置（只读，所有会话共用）
+MODE_CONFIGS = {
+    GameMode.EASY: {
+        "decay_rate": 0.5,      # 数值衰减速度50%
+        "offline_pause": True,   # 离线暂停
+        "night_protection": True # 夜间保护
+    },
+    GameMode.NORMAL: {
+        "decay_rate": 1.0,      # 正常衰减速度
+        "offline_pause": False,  # 离线缓慢衰减
+        "night_protection": False
+    },
+    GameMode.HARD: {
+        "decay_rate": 1.5,      # 加速衰减
+        "offline_pause": False,
+        "night_protection": False,
+        "real_time_sync": True,  # 真实时间同步
+        "midnight_alarm": True,  # 午夜凶铃
+        "phantom_cries": True    # 幻听系统
+    }
+}
+
+
+def records_task(task_type: TaskType):
+    """
+    任务方法装饰器：所有任务执行的统一入口
+    执行前按 64 位会话种子 + 任务序号为本次任务播种 self.rng（种子写入日志，可复现；
+    不再从上一次的随机数里抽 32 位种子，各任务的随机序列不会收敛到 2^32 种），
+    执行后把结果计入 task_history 和 metrics，并在挂载日志时追加一条日志，最后通知状态监听者。
+    整个过程持有会话锁，多线程 worker 下同一会话的任务串行执行；
+    链路追踪的 span 从等锁开始计时
+    """
+    def decorator(method):
+        span_name = f"task.{task_type.value}"
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with span(span_name) as task_span, self._lock:
+                self._task_seq += 1
+                seed = (self.rng_seed << 64) | self._task_seq
+                self.rng.seed(seed)
+                start = time.perf_counter()
+                result = method(self, *args, **kwargs)
+                observe_task(task_type.value, result.success, time.perf_counter() - start)
+                task_span.set_attribute("success", result.success)
+                self.task_history.record(task_type.value, result)
+                if self.journal is not None:
+                    self._journal_task(task_type, method.__name__, args, kwargs, seed, result)
+                self._notify_changed()
+                return result
+        wrapper.task_type = task_type
+        return wrapper
+    return decorator
+
+
+# 游戏内成就目录：id即展示名，条件只读取声明的统计键
+GAME_ACHIEVEMENTS = (
+    AchievementDefinition(
+        "初次发声", "初次发声", "成功录下宝宝第一次叫爹妈",
+        lambda stats: stats.get("first_word_recorded", 0) >= 1,
+        ("first_word_recorded",)
+    ),
+)
+
+
 @dataclass
 class GameState:
     """游戏状态"""
@@ -120,43 +284,73 @@ class HardcoreParentingGame:
     
     def __init__(self):
         self.state = GameState()
-        self.task_history: List[TaskResult] = []
-        self.achievements: List[str] = []
-        
-        # 事件权重配置
-        self.event_weights = {
-            BabyPersonality.ANGEL: {
-                "negative": 0.3,  # 负面事件30%
-                "positive": 0.7   # 正面事件70%
-            },
-            BabyPersonality.FUSSY: {
-                "negative": 0.7,  # 负面事件70%
-                "positive": 0.3   # 正面事件30%
-            }
-        }
-        
-        # 模式配置
-        self.mode_configs = {
-            GameMode.EASY: {
-                "decay_rate": 0.5,      # 数值衰减速度50%
-                "offline_pause": True,   # 离线暂停
-                "night_protection": True # 夜间保护
-            },
-            GameMode.NORMAL: {
-                "decay_rate": 1.0,      # 正常衰减速度
-                "offline_pause": False,  # 离线缓慢衰减
-                "night_protection": False
-            },
-            GameMode.HARD: {
-                "decay_rate": 1.5,      # 加速衰减
-                "offline_pause": False,
-                "night_protection": False,
-                "real_time_sync": True,  # 真实时间同步
-                "midnight_alarm": True,  # 午夜凶铃
-                "phantom_cries": True    # 幻听系统
-            }
-        }
+        self.task_history = TaskHistory(capacity=256)
+        self.stats: Dict[str, int] = {}
+        self.achievement_engine = AchievementEngine(GAME_ACHIEVEMENTS)
+        self.rng = random.Random()
+        self.rng_seed = random.getrandbits(64)   # 会话种子，与任务序号一起决定每个任务的随机序列
+        self._task_seq = 0
+        self.journal: Optional[SessionJournal] = None
+        self._journal_shadow: Dict[str, Any] = {}
+        self._lock = new_lock()
+        self.listeners: List[Callable[["HardcoreParentingGame"], None]] = []   # 状态变化监听（观战推送等）
+        self._batch_depth = 0   # >0 时处于批量执行中，监听者在批次结束时统一通知一次
+        # 状态版本号：以实例创建时的微秒时间戳为起点，每次变化 +1。
+        # 变化次数追不上时间流逝，所以休眠恢复/重启后的新实例版本号一定更大
+        self.state_version = time.time_ns() // 1000
+        # 实例标识：与版本号一起组成 ETag（见 state_tag）。多个 worker 各自的实例版本号可能
+        # 恰好相同，只比版本号会对另一个实例的旧状态误回 304
+        self.state_epoch = secrets.token_hex(4)
+        self._status_cache: Optional[Dict[str, Any]] = None
+        self._status_cache_version: Optional[int] = None
+        self._status_body: Optional[bytes] = None
+        self._field_versions: Dict[str, int] = {}   # 状态字段 -> 最后一次变化时的版本号
+        
+        # 事件权重 / 模式配置：外层按实例浅拷贝（平衡性扫描会整体替换某个性格/模式的配置），
+        # 内层字典所有会话共用
+        self.event_weights = dict(EVENT_WEIGHTS)
+        self.mode_configs = dict(MODE_CONFIGS)
+    
+    _PLAYER = "player"  # 单机游戏在成就引擎中的玩家id
     
+    @property
+    def achievements(self) -> List[str]:
+        """已获得的成就（按目录顺序）"""
+        return self.achievement_engine.earned_ids(self._PLAYER)
+    
+    def _notify_changed(self):
+        """状态发生变化：版本号 +1 并通知监听者（持有会话锁时调用）"""
+        self.state_version += 1
+        if not self._batch_depth:
+            self._notify_listeners()
+    
+    def _notify_listeners(self):
+        for listener in list(self.listeners):
+            listener(self)
+    
+    @contextmanager
+    def batched(self):
+        """
+        批量执行多个任务：整个批次持有会话锁，其它请求不会插在中间；
+        每个任务照常递增版本号、写日志，但监听者（观战推送等）只在批次结束时通知一次
+        """
+        with self._lock:
+            version = self.state_version
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth and self.state_version != version:
+                    self._notify_listeners()
+    
+    def _record_stats(self, **increments: int) -> List[str]:
+        """累加统计值并增量检查成就，返回新获得的成就"""
+        for key, value in increments.items():
+            self.stats[key] = self.stats.get(key, 0) + value
+        return self.achievement_engine.update(self._PLAYER, self.stats, increments.keys())
+    
+    @synchronized
     def start_game(self, mode: GameMode, baby_personality: BabyPersonality, 
                    age_months: int = 0) -> Dict[str, Any]:
         """开始游戏"""
@@ -167,6 +361,12 @@ class HardcoreParentingGame:
         
         if mode == GameMode.HARD:
             self.state.hell_week_day = 1
+        
+        # 新开局直接写快照，重启后不会丢失模式/性格设置
+        if self.journal is not None:
+            self._journal_shadow = self.export_state()
+            self.journal.snapshot(self._journal_shadow)
+        self._notify_changed()
             
         return {
             "message": f"开始{mode.value}模式，宝宝{age_months}个月，性格：{baby_personality.value}",
@@ -204,26 +404,32 @@ class HardcoreParentingGame:
             # 简单模式离线暂停，这里假设在线
             pass
         
-        # 计算衰减
+        before = (self.state.hunger, self.state.cleanliness, self.state.happiness)
+        self._apply_decay_hours(time_diff)
+        self.state.last_update = now
+        if (self.state.hunger, self.state.cleanliness, self.state.happiness) != before:
+            self._notify_changed()
+
+    def _apply_decay_hours(self, hours: float):
+        """按小时数应用线性衰减（不读取时钟，供模拟器/离线推演复用）"""
         decay_rate = self.mode_configs[self.state.mode]["decay_rate"]
-        base_decay = time_diff * decay_rate
-        
+        base_decay = hours * decay_rate
+
         # 饥饿度增加
         hunger_increase = int(base_decay * 10)  # 每小时增加10点
         self.state.hunger = min(100, self.state.hunger + hunger_increase)
-        
+
         # 清洁度下降
         clean_decrease = int(base_decay * 5)   # 每小时下降5点
         self.state.cleanliness = max(0, self.state.cleanliness - clean_decrease)
-        
+
         # 快乐度缓慢下降
         happy_decrease = int(base_decay * 3)   # 每小时下降3点
         self.state.happiness = max(0, self.state.happiness - happy_decrease)
-        
-        self.state.last_update = now
     
     # ==================== 0-3月任务实现 ====================
     
+    @records_task(TaskType.FEEDING_HUNGRY)
     def execute_feeding_task(self, water_temp: float, shake_intensity: int, 
                            tilt_angle: int) -> TaskResult:
         """冲奶粉小游戏：调节水温 -> 摇晃混匀 -> 倾斜喂奶"""
@@ -286,6 +492,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.SLEEP_TIRED)
     def execute_sleep_task(self, shake_frequency: float, duration: int, 
                           app_switched: bool) -> TaskResult:
         """摇晃抱哄：利用陀螺仪保持特定频率摇晃60秒"""
@@ -347,6 +554,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.DIAPER_DIRTY)
     def execute_diaper_task(self, lift_speed: float, wipe_thoroughness: int, 
                            diaper_placement: str) -> TaskResult:
         """换尿布：上滑提腿 -> 点击擦拭 -> 拖拽新尿布"""
@@ -359,7 +567,7 @@ class HardcoreParentingGame:
         # 检查动作速度
         if lift_speed > 5.0:  # 动作太慢
             # 触发喷射袭击！
-            if random.random() < 0.3:  # 30%概率
+            if self.rng.random() < 0.3:  # 30%概率
                 success = False
                 message = "💩 手慢了！触发喷射袭击事件，屏幕被糊满！"
                 state_changes["cleanliness"] = +25  # 只恢复50%
@@ -408,6 +616,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.MEDICINE_SICK)
     def execute_medicine_task(self, medicine_choice: str) -> TaskResult:
         """选药任务：观察症状，从药箱三选一"""
         
@@ -454,6 +663,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.HUG_HAPPY)
     def execute_hug_task(self, press_duration: float) -> TaskResult:
         """拥抱任务：长按屏幕，手机震动模拟心跳"""
         
@@ -483,6 +693,7 @@ class HardcoreParentingGame:
     
     # ==================== 3-12月任务实现 ====================
     
+    @records_task(TaskType.TALK_PLAY)
     def execute_talk_task(self, speech_keywords: List[str], voice_duration: float) -> TaskResult:
         """叽里咕噜对话：玩家说话，系统幼态化回放"""
         
@@ -497,7 +708,7 @@ class HardcoreParentingGame:
         
         if matched_keywords:
             # 宝宝尝试模仿
-            imitated_word = random.choice(matched_keywords)
+            imitated_word = self.rng.choice(matched_keywords)
             message = f"👶 宝宝试图模仿说'{imitated_word}'，发出了'{imitated_word[0]}uai~'的可爱声音"
             state_changes["language_ability"] = +10
             state_changes["intimacy"] = +15
@@ -525,6 +736,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.FOOD_HUNGRY)
     def execute_food_task(self, food_choice: str, cutting_skill: int) -> TaskResult:
         """做辅食：选择食材 -> 切碎 -> 喂入嘴里"""
         
@@ -586,6 +798,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.SAFETY_DANGER)
     def execute_safety_task(self, reaction_time: float, button_clicked: bool) -> TaskResult:
         """防摔倒QTE：2秒内点击"扶住"按钮"""
         
@@ -623,17 +836,19 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.FIRST_WORD)
     def execute_first_word_task(self, recorded: bool, reaction_time: float) -> TaskResult:
         """叫爹妈彩蛋：语音识别，需立刻点击录制"""
         
         # 随机选择第一个词
         first_words = ["Ma", "Ba", "Mama", "Baba"]
-        word = random.choice(first_words)
+        word = self.rng.choice(first_words)
         
         success = recorded and reaction_time <= 3.0
         message = ""
         state_changes = {}
         special_effects = ["满屏烟花", "录制按钮"]
+        new_achievements = []
         
         if success:
             message = f"🎉 珍贵时刻！宝宝说出了'{word}'，成功录制保存到收藏夹"
@@ -643,9 +858,8 @@ class HardcoreParentingGame:
             special_effects.append("音频保存动画")
             
             # 解锁成就
-            achievement = "初次发声"
-            if achievement not in self.achievements:
-                self.achievements.append(achievement)
+            new_achievements = self._record_stats(first_word_recorded=1)
+            for achievement in new_achievements:
                 special_effects.append(f"解锁成就：{achievement}")
         else:
             message = f"😢 错过了！宝宝说了'{word}'但没有录制，珍贵时刻无法补救"
@@ -660,11 +874,12 @@ class HardcoreParentingGame:
             message=message,
             state_changes=state_changes,
             special_effects=special_effects,
-            unlock_achievements=[achievement] if success else []
+            unlock_achievements=new_achievements
         )
     
     # ==================== 1-2岁任务实现 ====================
     
+    @records_task(TaskType.DANGER_TOUCH)
     def execute_danger_touch_task(self, swipe_direction: str, danger_type: str) -> TaskResult:
         """触摸禁区：手伸向插座/水壶，滑动拨开"""
         
@@ -705,6 +920,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.TOY_CONFLICT)
     def execute_toy_conflict_task(self, solution_choice: str) -> TaskResult:
         """玩具断案：狗叼走兔子玩偶，孩子大哭"""
         
@@ -753,6 +969,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.BAD_WORD)
     def execute_bad_word_task(self, correction_method: str, bad_word: str) -> TaskResult:
         """词汇纠正：孩子说脏话"""
         
@@ -801,6 +1018,7 @@ class HardcoreParentingGame:
     
     # ==================== 2-3岁任务实现 ====================
     
+    @records_task(TaskType.DRESSING_WILD)
     def execute_dressing_task(self, completion_time: int, time_limit: int) -> TaskResult:
         """出门穿衣：限时拖拽游戏"""
         
@@ -841,6 +1059,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @records_task(TaskType.EMOTION_TALK)
     def execute_emotion_talk_task(self, response_choice: str) -> TaskResult:
         """情感对话：孩子表达复杂情感"""
         
@@ -890,6 +1109,7 @@ class HardcoreParentingGame:
     
     # ==================== 困难模式专属机制 ====================
     
+    @synchronized
     def trigger_midnight_alarm(self) -> TaskResult:
         """午夜凶铃：凌晨3点强制事件"""
         
@@ -910,6 +1130,7 @@ class HardcoreParentingGame:
         ]
         
         self._apply_state_changes(state_changes)
+        self._notify_changed()
         
         return TaskResult(
             success=True,
@@ -918,6 +1139,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @synchronized
     def trigger_phantom_cry(self) -> TaskResult:
         """幻听系统：播放假哭声"""
         
@@ -926,6 +1148,7 @@ class HardcoreParentingGame:
         
         # 激活幻听
         self.state.phantom_cry_active = True
+        self._notify_changed()
         
         message = "👻 幻听系统激活！播放极短暂假哭声，但监控画面显示孩子在睡觉"
         state_changes = {}
@@ -943,6 +1166,7 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    @synchronized
     def check_phantom_cry_response(self, screen_checks: int) -> TaskResult:
         """检查幻听响应：频繁检查屏幕的后果"""
         
@@ -967,6 +1191,7 @@ class HardcoreParentingGame:
             state_changes["parent_anxiety"] = -5
         
         self._apply_state_changes(state_changes)
+        self._notify_changed()
         
         return TaskResult(
             success=screen_checks < 5,
@@ -975,6 +1200,66 @@ class HardcoreParentingGame:
             special_effects=special_effects
         )
     
+    # ==================== 持久化 ====================
+    
+    @synchronized
+    def export_state(self) -> Dict[str, Any]:
+        """导出可持久化的完整状态（扁平dict，可直接JSON序列化）"""
+        data = export_dataclass(self.state)
+        data["stats"] = dict(self.stats)
+        data["achievement_bits"] = self.achievement_engine.earned_bits(self._PLAYER)
+        data["task_counters"] = self.task_history.export_counters()
+        return data
+    
+    @synchronized
+    def import_state(self, data: Dict[str, Any]):
+        """从 export_state 的结果恢复状态"""
+        self.state = import_dataclass(GameState, data)
+        self.stats = dict(data.get("stats", {}))
+        self.achievement_engine.set_earned_bits(self._PLAYER, data.get("achievement_bits", 0))
+        self.task_history.import_counters(data.get("task_counters", {}))
+        self._notify_changed()
+    
+    @synchronized
+    def attach_journal(self, journal: SessionJournal, recover: bool = True) -> int:
+        """
+        挂载会话日志；日志已存在时先从快照 + 日志尾部恢复
+        
+        Returns:
+            回放的日志条数
+        """
+        entries = journal.restore_into(self) if recover else []
+        for entry in entries:
+            self.task_history.tally(entry["task"], entry["ok"])
+        self.journal = journal
+        self._journal_shadow = self.export_state()
+        journal.start(self._journal_shadow, len(entries))
+        return len(entries)
+    
+    @synchronized
+    def replay_task(self, entry: Dict[str, Any]) -> TaskResult:
+        """按日志条目用记录的随机种子重新执行任务（不计入历史和日志），用于校验/排查"""
+        method = getattr(type(self), entry["fn"]).__wrapped__
+        self.rng.seed(entry["seed"])
+        return method(self, *entry["args"], **entry["kw"])
+    
+    def _journal_task(self, task_type: TaskType, method_name: str, args: tuple,
+                      kwargs: Dict[str, Any], seed: int, result: TaskResult):
+        """追加任务日志：只记录相对上一条日志发生变化的状态字段"""
+        current = self.export_state()
+        self.journal.append({
+            "task": task_type.value,
+            "fn": method_name,
+            "args": list(args),
+            "kw": kwargs,
+            "seed": seed,
+            "ok": 1 if result.success else 0,
+            "d": state_delta(self._journal_shadow, current, skip=("task_counters",)),
+        })
+        self._journal_shadow = current
+        if self.journal.should_snapshot():
+            self.journal.snapshot(current)
+    
     # ==================== 辅助方法 ====================
     
     def _apply_state_changes(self, changes: Dict[str, int]):
@@ -1010,74 +1295,102 @@ class HardcoreParentingGame:
     
     def get_available_tasks(self) -> List[TaskType]:
         """获取当前年龄阶段可用的任务"""
-        age_stage = self._get_current_age_stage()
-        
-        task_mapping = {
-            AgeStage.NEWBORN_0_3: [
-                TaskType.FEEDING_HUNGRY,
-                TaskType.SLEEP_TIRED,
-                TaskType.DIAPER_DIRTY,
-                TaskType.MEDICINE_SICK,
-                TaskType.HUG_HAPPY
-            ],
-            AgeStage.INFANT_3_12: [
-                TaskType.TALK_PLAY,
-                TaskType.FOOD_HUNGRY,
-                TaskType.SAFETY_DANGER,
-                TaskType.FIRST_WORD
-            ],
-            AgeStage.TODDLER_1_2: [
-                TaskType.DANGER_TOUCH,
-                TaskType.TOY_CONFLICT,
-                TaskType.BAD_WORD
-            ],
-            AgeStage.PRESCHOOL_2_3: [
-                TaskType.DRESSING_WILD,
-                TaskType.EMOTION_TALK
-            ]
-        }
-        
-        return task_mapping.get(age_stage, [])
+        return list(AGE_STAGE_TASKS.get(self._get_current_age_stage(), ()))
     
+    @synchronized
+    def seed_rng(self, seed: int):
+        """固定会话种子（扫描、基准测试用）：之后的事件抽取和任务随机性都可复现"""
+        self.rng_seed = seed & (2 ** 64 - 1)
+        self._task_seq = 0
+        self.rng.seed(seed)
+    
+    @synchronized
     def get_random_event(self) -> Optional[TaskType]:
-        """根据性格权重获取随机事件"""
-        available_tasks = self.get_available_tasks()
-        if not available_tasks:
-            return None
-        
-        # 根据性格确定事件类型权重
-        personality_weights = self.event_weights[self.state.baby_personality]
-        
-        # 定义正面和负面事件
-        positive_events = [TaskType.HUG_HAPPY, TaskType.TALK_PLAY, TaskType.FIRST_WORD]
-        negative_events = [
-            TaskType.FEEDING_HUNGRY, TaskType.SLEEP_TIRED, TaskType.DIAPER_DIRTY,
-            TaskType.MEDICINE_SICK, TaskType.FOOD_HUNGRY, TaskType.SAFETY_DANGER,
-            TaskType.DANGER_TOUCH, TaskType.TOY_CONFLICT, TaskType.BAD_WORD,
-            TaskType.DRESSING_WILD
-        ]
-        
-        # 筛选当前可用的正面和负面事件
-        available_positive = [t for t in available_tasks if t in positive_events]
-        available_negative = [t for t in available_tasks if t in negative_events]
-        
-        # 根据权重随机选择
-        if random.random() < personality_weights["negative"] and available_negative:
-            return random.choice(available_negative)
-        elif available_positive:
-            return random.choice(available_positive)
-        else:
-            return random.choice(available_tasks) if available_tasks else None
+        """根据性格权重获取随机事件（查预计算的别名表，一次随机数）"""
+        table = event_table(self._get_current_age_stage(),
+                            self.event_weights[self.state.baby_personality]["negative"])
+        return table.draw(self.rng.random) if table else None
+    
+    @synchronized
+    def draw_random_events(self, n: int, rng: Optional[random.Random] = None) -> List[TaskType]:
+        """批量抽取n个随机事件，供模拟/压测使用"""
+        table = event_table(self._get_current_age_stage(),
+                            self.event_weights[self.state.baby_personality]["negative"])
+        if not table:
+            return []
+        return table.draw_many(n, (rng or self.rng).random)
     
+    @synchronized
     def get_game_status(self) -> Dict[str, Any]:
         """获取完整游戏状态"""
         self._update_passive_decay()
-        
+        return self._build_status()
+    
+    @synchronized
+    def get_status_body(self) -> Tuple[int, bytes]:
+        """
+        (版本号, 完整状态的JSON字节)
+        序列化结果按版本号缓存，只有状态变化后才重新生成
+        """
+        self._update_passive_decay()
+        self._refresh_status_cache()
+        if self._status_body is None:
+            body = dict(self._status_cache, state_version=self.state_version)
+            self._status_body = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return self.state_version, self._status_body
+    
+    def state_tag(self, version: Optional[int] = None) -> str:
+        """ETag / ?since= 使用的状态标记：<实例标识>-<版本号>"""
+        return f"{self.state_epoch}-{self.state_version if version is None else version}"
+    
+    @synchronized
+    def get_status_since(self, since: int) -> Dict[str, Any]:
+        """
+        since 版本之后变化过的状态字段
+        
+        Returns:
+            dict: state_version, since, changes（结构同 get_game_status，只含变化的字段；
+                  game_state 只含变化的子字段）
+        """
+        self._update_passive_decay()
+        self._refresh_status_cache()
+        changes: Dict[str, Any] = {}
+        for path, version in self._field_versions.items():
+            if version <= since:
+                continue
+            key, _, sub = path.partition(".")
+            if sub:
+                changes.setdefault(key, {})[sub] = self._status_cache[key][sub]
+            else:
+                changes[key] = self._status_cache[key]
+        return {"state_version": self.state_version, "since": since, "changes": changes}
+    
+    def _refresh_status_cache(self):
+        """版本号变化后重建状态快照，逐字段比较并记录变化时的版本号"""
+        if self._status_cache_version == self.state_version:
+            return
+        status = self._build_status()
+        previous = self._status_cache
+        version = self.state_version
+        for key, value in status.items():
+            if key == "game_state":
+                old_state = previous["game_state"] if previous else {}
+                for field_name, field_value in value.items():
+                    if previous is None or old_state.get(field_name) != field_value:
+                        self._field_versions[f"game_state.{field_name}"] = version
+            elif previous is None or previous.get(key) != value:
+                self._field_versions[key] = version
+        self._status_cache = status
+        self._status_cache_version = version
+        self._status_body = None
+    
+    def _build_status(self) -> Dict[str, Any]:
         return {
             "game_state": self._get_state_dict(),
             "available_tasks": [task.value for task in self.get_available_tasks()],
             "current_age_stage": self._get_current_age_stage().value,
             "task_history_count": len(self.task_history),
+            "task_stats": self.task_history.summary(),
             "achievements_count": len(self.achievements),
             "mode_config": self.mode_configs[self.state.mode]
         }
\ No newline at end of file
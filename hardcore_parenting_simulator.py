@@ -9,11 +9,19 @@ Hardcore Parenting Simulator: Pre-Combat Training - Core Task Interface
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, List, Optional, Callable, Any
+from typing import Dict, Iterable, List, Optional, Callable, Any, Tuple
 from datetime import datetime, timedelta
 import random
 import asyncio
+import copy
+import itertools
 import json
+from contextlib import asynccontextmanager
+
+from achievement_engine import AchievementDefinition, AchievementEngine
+from concurrency import new_lock, synchronized
+from session_journal import SessionJournal, export_dataclass, import_dataclass, state_delta
+from streaming_stats import PlayerActionStats
 
 
 class GameMode(Enum):
@@ -129,6 +137,51 @@ class TaskInterface(ABC):
     def calculate_score_impact(self, action: PlayerAction, game_state: GameState) -> Dict[str, int]:
         """计算行动对各项数值的影响"""
         pass
+    
+    def reset(self):
+        """恢复到新建时的状态，归还对象池前调用（无状态任务无需覆盖）"""
+        pass
+
+
+# 各类事件的持续时间范围（秒）、所需动作与描述
+EVENT_CONFIGS: Dict[EventType, Dict[str, Any]] = {
+    EventType.CRYING: {
+        "duration": (30, 300),
+        "required_actions": [ActionType.COMFORT, ActionType.ROCK_TO_SLEEP],
+        "description": "宝宝开始哭闹，需要安抚"
+    },
+    EventType.DIAPER_CHANGE: {
+        "duration": (60, 180),
+        "required_actions": [ActionType.CHANGE_DIAPER],
+        "description": "需要更换尿布"
+    },
+    EventType.EXPLOSIVE_DIAPER: {
+        "duration": (120, 300),
+        "required_actions": [ActionType.CHANGE_DIAPER, ActionType.APPLY_CREAM],
+        "description": "💥 生化危机！炸屎事件发生！"
+    },
+    EventType.MIDNIGHT_TERROR: {
+        "duration": (300, 900),
+        "required_actions": [ActionType.COMFORT, ActionType.ROCK_TO_SLEEP],
+        "description": "🌙 午夜凶铃：凌晨3点的肠绞痛攻击"
+    },
+    EventType.STROLLER_TETRIS: {
+        "duration": (180, 600),
+        "required_actions": [ActionType.ROTATE_ITEM, ActionType.PLACE_ITEM, ActionType.DISASSEMBLE],
+        "description": "🧩 后备箱俄罗斯方块：出行打包大挑战"
+    },
+    EventType.PICKY_EATER_NEGOTIATION: {
+        "duration": (300, 1200),
+        "required_actions": [ActionType.PLAY_CARD, ActionType.NEGOTIATE, ActionType.DISTRACT],
+        "description": "🥦 挑食谈判专家：西兰花大作战"
+    }
+}
+
+DEFAULT_EVENT_CONFIG: Dict[str, Any] = {
+    "duration": (60, 60),
+    "required_actions": [ActionType.COMFORT],
+    "description": "未知事件"
+}
 
 
 class GameEventManager:
@@ -137,59 +190,29 @@ class GameEventManager:
     def __init__(self):
         self.active_events: Dict[str, GameEvent] = {}
         self.event_handlers: Dict[EventType, Callable] = {}
+        self._next_id = itertools.count(1)
         
     def register_event_handler(self, event_type: EventType, handler: Callable):
         """注册事件处理器"""
         self.event_handlers[event_type] = handler
     
-    def trigger_event(self, event_type: EventType, severity: int = 5) -> GameEvent:
-        """触发游戏事件"""
-        event_id = f"{event_type.value}_{datetime.now().timestamp()}"
-        
-        event_configs = {
-            EventType.CRYING: {
-                "duration": random.randint(30, 300),
-                "required_actions": [ActionType.COMFORT, ActionType.ROCK_TO_SLEEP],
-                "description": "宝宝开始哭闹，需要安抚"
-            },
-            EventType.DIAPER_CHANGE: {
-                "duration": random.randint(60, 180),
-                "required_actions": [ActionType.CHANGE_DIAPER],
-                "description": "需要更换尿布"
-            },
-            EventType.EXPLOSIVE_DIAPER: {
-                "duration": random.randint(120, 300),
-                "required_actions": [ActionType.CHANGE_DIAPER, ActionType.APPLY_CREAM],
-                "description": "💥 生化危机！炸屎事件发生！"
-            },
-            EventType.MIDNIGHT_TERROR: {
-                "duration": random.randint(300, 900),
-                "required_actions": [ActionType.COMFORT, ActionType.ROCK_TO_SLEEP],
-                "description": "🌙 午夜凶铃：凌晨3点的肠绞痛攻击"
-            },
-            EventType.STROLLER_TETRIS: {
-                "duration": random.randint(180, 600),
-                "required_actions": [ActionType.ROTATE_ITEM, ActionType.PLACE_ITEM, ActionType.DISASSEMBLE],
-                "description": "🧩 后备箱俄罗斯方块：出行打包大挑战"
-            },
-            EventType.PICKY_EATER_NEGOTIATION: {
-                "duration": random.randint(300, 1200),
-                "required_actions": [ActionType.PLAY_CARD, ActionType.NEGOTIATE, ActionType.DISTRACT],
-                "description": "🥦 挑食谈判专家：西兰花大作战"
-            }
-        }
+    def trigger_event(self, event_type: EventType, severity: int = 5,
+                      duration_roll: Optional[float] = None) -> GameEvent:
+        """触发游戏事件；duration_roll 为 [0,1) 的均匀随机数，批量调度时由调用方统一生成"""
+        event_id = f"{event_type.value}_{datetime.now().timestamp()}_{next(self._next_id)}"
         
-        config = event_configs.get(event_type, {
-            "duration": 60,
-            "required_actions": [ActionType.COMFORT],
-            "description": "未知事件"
-        })
+        config = EVENT_CONFIGS.get(event_type, DEFAULT_EVENT_CONFIG)
+        low, high = config["duration"]
+        if duration_roll is None:
+            duration = random.randint(low, high)
+        else:
+            duration = low + int(duration_roll * (high - low + 1))
         
         event = GameEvent(
             id=event_id,
             event_type=event_type,
             severity=severity,
-            duration=config["duration"],
+            duration=duration,
             required_actions=config["required_actions"],
             description=config["description"]
         )
@@ -349,28 +372,37 @@ class MidnightTerrorTask(TaskInterface):
         return game_state.sanity < self.hallucination_threshold
 
 
+# 后备箱物品目录：(名称, 形状, 优先级)，只读
+TETRIS_ITEM_SPECS: Tuple[Tuple[str, Tuple[Tuple[int, ...], ...], int], ...] = (
+    ("婴儿车", ((1,1,1), (0,1,0), (0,1,0)), 5),
+    ("妈咪包", ((1,1), (1,1)), 4),
+    ("辅食机", ((1,1,1), (1,0,1)), 3),
+    ("备用衣物", ((1,1,1),), 2),
+    ("玩具箱", ((1,1), (1,0)), 2),
+    ("折叠椅", ((1,), (1,), (1,), (1,)), 1),
+    ("尿布包", ((1,1,1,1),), 3),
+    ("奶瓶保温袋", ((1,1),), 2),
+)
+
+
 class StrollerTetrisTask(TaskInterface):
     """后备箱俄罗斯方块：出行打包任务"""
     
     def __init__(self):
         self.trunk_size = (8, 6)  # 后备箱尺寸 8x6
+        self.time_pressure = True
+        self._lock = new_lock()   # 打包进度是实例状态，execute 需串行
+        self.reset()
+    
+    def reset(self):
+        """重新生成物品、清空后备箱"""
         self.items = self._generate_items()
         self.trunk_grid = [[0 for _ in range(self.trunk_size[1])] for _ in range(self.trunk_size[0])]
-        self.time_pressure = True
         
     def _generate_items(self) -> List[TetrisItem]:
-        """生成需要打包的物品"""
-        items = [
-            TetrisItem("婴儿车", [[1,1,1], [0,1,0], [0,1,0]], priority=5),
-            TetrisItem("妈咪包", [[1,1], [1,1]], priority=4),
-            TetrisItem("辅食机", [[1,1,1], [1,0,1]], priority=3),
-            TetrisItem("备用衣物", [[1,1,1]], priority=2),
-            TetrisItem("玩具箱", [[1,1], [1,0]], priority=2),
-            TetrisItem("折叠椅", [[1], [1], [1], [1]], priority=1),
-            TetrisItem("尿布包", [[1,1,1,1]], priority=3),
-            TetrisItem("奶瓶保温袋", [[1,1]], priority=2)
-        ]
-        return items
+        """按物品目录生成需要打包的物品（旋转/拆解会修改物品，每轮都是新实例）"""
+        return [TetrisItem(name, [list(row) for row in shape], priority=priority)
+                for name, shape, priority in TETRIS_ITEM_SPECS]
     
     def _can_place_item(self, item: TetrisItem, x: int, y: int) -> bool:
         """检查物品是否可以放置在指定位置"""
@@ -406,6 +438,7 @@ class StrollerTetrisTask(TaskInterface):
                     self.trunk_grid[x + i][y + j] = hash(item.name) % 9 + 1
         return True
     
+    @synchronized
     async def execute(self, game_state: GameState, player_action: Optional[PlayerAction] = None) -> GameState:
         if not player_action:
             # 时间耗尽，打包失败
@@ -480,75 +513,79 @@ class StrollerTetrisTask(TaskInterface):
         }
 
 
+# 谈判卡牌组（只读，所有谈判任务实例共用；卡牌本身不会被修改）
+NEGOTIATION_DECK: Tuple[NegotiationCard, ...] = (
+    NegotiationCard(
+        "飞机勺", "strategy", 7,
+        {"attention": -10, "resistance": -15},
+        "张开嘴巴，飞机要降落啦！"
+    ),
+    NegotiationCard(
+        "藏在肉里", "strategy", 5,
+        {"resistance": 25},  # 被发现后抗拒增加
+        "偷偷把蔬菜藏在肉里，50%成功率"
+    ),
+    NegotiationCard(
+        "看动画片", "distraction", 9,
+        {"attention": -30, "bad_habit": 1},
+        "100%有效，但会养成坏习惯"
+    ),
+    NegotiationCard(
+        "威逼利诱", "bribe", 6,
+        {"resistance": -20, "future_expectation": 1},
+        "吃完这个给糖吃！"
+    ),
+    NegotiationCard(
+        "营养科普", "education", 3,
+        {"attention": -5},
+        "西兰花含有丰富的维生素C..."
+    ),
+    NegotiationCard(
+        "同伴示范", "social", 8,
+        {"resistance": -25},
+        "看，小明都在吃西兰花呢！"
+    ),
+    NegotiationCard(
+        "饥饿战术", "patience", 4,
+        {"hunger": 20, "resistance": -10},
+        "不吃就饿着，看谁先妥协"
+    ),
+    NegotiationCard(
+        "游戏化", "strategy", 7,
+        {"attention": 10, "resistance": -20},
+        "我们来玩吃西兰花小怪兽的游戏！"
+    ),
+    NegotiationCard(
+        "情感绑架", "threat", 2,
+        {"resistance": 30, "trust": -10},
+        "你不吃妈妈就不爱你了..."
+    ),
+    NegotiationCard(
+        "放弃", "surrender", 0,
+        {"parent_dignity": -50},
+        "算了，今天就不吃了..."
+    ),
+)
+
+
 class PickyEaterNegotiationTask(TaskInterface):
     """挑食谈判专家：卡牌对战系统"""
     
     def __init__(self):
         self.target_food = "西兰花"
+        self.cards_deck = NEGOTIATION_DECK
+        self.max_rounds = 10
+        self._lock = new_lock()   # 谈判进度是实例状态，execute 需串行
+        self.reset()
+    
+    def reset(self):
+        """开始新一轮谈判（卡牌组不变）"""
         self.child_resistance = 80  # 孩子的抗拒值 (0-100)
         self.child_attention = 100  # 注意力值 (0-100)
         self.child_hunger = 60     # 饥饿度 (0-100)
         self.parent_patience = 100  # 父母耐心值 (0-100)
-        self.cards_deck = self._generate_cards()
         self.used_cards = []
         self.negotiation_rounds = 0
-        self.max_rounds = 10
-        
-    def _generate_cards(self) -> List[NegotiationCard]:
-        """生成谈判卡牌"""
-        cards = [
-            NegotiationCard(
-                "飞机勺", "strategy", 7,
-                {"attention": -10, "resistance": -15},
-                "张开嘴巴，飞机要降落啦！"
-            ),
-            NegotiationCard(
-                "藏在肉里", "strategy", 5,
-                {"resistance": 25},  # 被发现后抗拒增加
-                "偷偷把蔬菜藏在肉里，50%成功率"
-            ),
-            NegotiationCard(
-                "看动画片", "distraction", 9,
-                {"attention": -30, "bad_habit": 1},
-                "100%有效，但会养成坏习惯"
-            ),
-            NegotiationCard(
-                "威逼利诱", "bribe", 6,
-                {"resistance": -20, "future_expectation": 1},
-                "吃完这个给糖吃！"
-            ),
-            NegotiationCard(
-                "营养科普", "education", 3,
-                {"attention": -5},
-                "西兰花含有丰富的维生素C..."
-            ),
-            NegotiationCard(
-                "同伴示范", "social", 8,
-                {"resistance": -25},
-                "看，小明都在吃西兰花呢！"
-            ),
-            NegotiationCard(
-                "饥饿战术", "patience", 4,
-                {"hunger": 20, "resistance": -10},
-                "不吃就饿着，看谁先妥协"
-            ),
-            NegotiationCard(
-                "游戏化", "strategy", 7,
-                {"attention": 10, "resistance": -20},
-                "我们来玩吃西兰花小怪兽的游戏！"
-            ),
-            NegotiationCard(
-                "情感绑架", "threat", 2,
-                {"resistance": 30, "trust": -10},
-                "你不吃妈妈就不爱你了..."
-            ),
-            NegotiationCard(
-                "放弃", "surrender", 0,
-                {"parent_dignity": -50},
-                "算了，今天就不吃了..."
-            )
-        ]
-        return cards
     
     def _calculate_card_effectiveness(self, card: NegotiationCard) -> int:
         """计算卡牌在当前状态下的有效性"""
@@ -566,6 +603,7 @@ class PickyEaterNegotiationTask(TaskInterface):
             
         return base_effectiveness
     
+    @synchronized
     async def execute(self, game_state: GameState, player_action: Optional[PlayerAction] = None) -> GameState:
         if not player_action:
             # 超时，孩子获胜
@@ -672,37 +710,42 @@ class PickyEaterNegotiationTask(TaskInterface):
         }
 
 
+# 模式配置（只读，所有模式管理器共用）
+GAME_MODE_CONFIGS = {
+    GameMode.EASY: {
+        "event_frequency": 0.3,      # 事件频率倍数
+        "night_protection": True,     # 夜间保护
+        "offline_pause": True,        # 离线暂停
+        "sanity_decay_rate": 0.5     # 理智值衰减率
+    },
+    GameMode.NORMAL: {
+        "event_frequency": 1.0,
+        "night_protection": False,
+        "offline_pause": False,
+        "sanity_decay_rate": 1.0
+    },
+    GameMode.HARD: {
+        "event_frequency": 1.8,
+        "night_protection": False,
+        "offline_pause": False,
+        "sanity_decay_rate": 1.5,
+        "force_notifications": True,  # 强制通知
+        "sleep_disruption": True      # 专门在深睡期触发事件
+    }
+}
+
+
 class GameModeManager:
     """游戏模式管理器"""
     
     def __init__(self):
-        self.mode_configs = {
-            GameMode.EASY: {
-                "event_frequency": 0.3,      # 事件频率倍数
-                "night_protection": True,     # 夜间保护
-                "offline_pause": True,        # 离线暂停
-                "sanity_decay_rate": 0.5     # 理智值衰减率
-            },
-            GameMode.NORMAL: {
-                "event_frequency": 1.0,
-                "night_protection": False,
-                "offline_pause": False,
-                "sanity_decay_rate": 1.0
-            },
-            GameMode.HARD: {
-                "event_frequency": 1.8,
-                "night_protection": False,
-                "offline_pause": False,
-                "sanity_decay_rate": 1.5,
-                "force_notifications": True,  # 强制通知
-                "sleep_disruption": True      # 专门在深睡期触发事件
-            }
-        }
+        self.mode_configs = GAME_MODE_CONFIGS
     
     def get_mode_config(self, mode: GameMode) -> Dict[str, Any]:
         return self.mode_configs.get(mode, self.mode_configs[GameMode.NORMAL])
     
-    def should_trigger_event(self, mode: GameMode, current_time: datetime) -> bool:
+    def should_trigger_event(self, mode: GameMode, current_time: datetime,
+                             roll: Optional[float] = None) -> bool:
         config = self.get_mode_config(mode)
         
         # 夜间保护检查
@@ -713,7 +756,11 @@ class GameModeManager:
         base_probability = 0.1  # 基础10%概率每分钟
         adjusted_probability = base_probability * config["event_frequency"]
         
-        return random.random() < adjusted_probability
+        if roll is None:
+            roll = random.random()
+        return roll < adjusted_probability
+
+
 class MultiplayerSession:
     """多人协作会话管理"""
     
@@ -722,8 +769,11 @@ class MultiplayerSession:
         self.host_player_id = host_player_id
         self.players: Dict[str, Dict] = {}
         self.shared_state = GameState()
+        self.event_manager = GameEventManager()
         self.is_active = True
         self.created_at = datetime.now()
+        self.last_resolved: Optional[GameEvent] = None   # 最近一次 sync_action 结算的事件
+        self._handlers: Dict[EventType, TaskInterface] = {}
         
     def add_player(self, player_id: str, player_name: str) -> bool:
         """添加玩家到会话"""
@@ -744,31 +794,78 @@ class MultiplayerSession:
             del self.players[player_id]
             
     def sync_action(self, player_id: str, action: PlayerAction) -> GameState:
-        """同步玩家行动"""
-        if player_id in self.players:
-            self.players[player_id]["actions_count"] += 1
-            # 这里可以添加个人表现跟踪逻辑
-            
+        """同步玩家行动：结算第一个需要该动作的共享事件，KPI 同时计入共享状态和个人"""
+        self.last_resolved = None
+        if player_id not in self.players:
+            return self.shared_state
+        
+        player = self.players[player_id]
+        player["actions_count"] += 1
+        for event in list(self.event_manager.active_events.values()):
+            if action.action_type not in event.required_actions:
+                continue
+            handler_type = TASK_HANDLER_TYPES.get(event.event_type)
+            if handler_type is not None:
+                handler = self._handlers.get(event.event_type)
+                if handler is None:
+                    handler = self._handlers[event.event_type] = handler_type()
+                kpi = handler.calculate_score_impact(action, self.shared_state).get("kpi", 0)
+                self.shared_state.parenting_kpi = max(0, min(100, self.shared_state.parenting_kpi + kpi))
+                player["individual_kpi"] = max(0, min(100, player["individual_kpi"] + kpi))
+            self.event_manager.resolve_event(event.id, action)
+            self.last_resolved = event
+            break
+        
         return self.shared_state
 
 
 class ScoringSystem:
     """评分系统"""
     
-    def __init__(self):
+    def __init__(self, window_size: int = 20):
         self.score_weights = {
             "response_time": 0.3,
             "action_accuracy": 0.4,
             "cooperation": 0.2,
             "consistency": 0.1
         }
+        self.window_size = window_size
+        self.player_aggregates: Dict[str, PlayerActionStats] = {}
+    
+    def record_action(self, action: PlayerAction) -> PlayerActionStats:
+        """把行动计入该玩家的流式聚合（O(1)）"""
+        stats = self.player_aggregates.get(action.player_id)
+        if stats is None:
+            stats = self.player_aggregates[action.player_id] = PlayerActionStats(self.window_size)
+        stats.record(action.response_time, action.success)
+        return stats
     
-    def calculate_kpi(self, game_state: GameState, recent_actions: List[PlayerAction]) -> int:
-        """计算综合KPI分数"""
+    def get_player_metrics(self, player_id: str) -> Dict[str, Any]:
+        """玩家响应时间/成功率汇总（含p50/p90）"""
+        stats = self.player_aggregates.get(player_id)
+        return stats.snapshot() if stats else PlayerActionStats(self.window_size).snapshot()
+    
+    def calculate_kpi(self, game_state: GameState, recent_actions: Optional[List[PlayerAction]] = None,
+                      player_id: Optional[str] = None) -> int:
+        """
+        计算综合KPI分数
+        
+        传入 recent_actions 时按列表计算；只传 player_id 时直接读取该玩家
+        最近 window_size 次行动的滑动窗口聚合，不再遍历历史
+        """
         base_score = game_state.parenting_kpi
         
+        if recent_actions is None and player_id is not None:
+            stats = self.player_aggregates.get(player_id)
+            has_actions = bool(stats and len(stats.response_window))
+            avg_response_time = stats.response_window.mean() if has_actions else 0
+            success_rate = stats.success_window.mean() if has_actions else 0
+        else:
+            recent_actions = recent_actions or []
+            avg_response_time = sum(a.response_time for a in recent_actions) / len(recent_actions) if recent_actions else 0
+            success_rate = sum(1 for a in recent_actions if a.success) / len(recent_actions) if recent_actions else 0
+        
         # 响应时间评分
-        avg_response_time = sum(a.response_time for a in recent_actions) / len(recent_actions) if recent_actions else 0
         if avg_response_time <= 30:
             response_bonus = 10
         elif avg_response_time <= 60:
@@ -777,7 +874,6 @@ class ScoringSystem:
             response_bonus = -5
             
         # 成功率评分
-        success_rate = sum(1 for a in recent_actions if a.success) / len(recent_actions) if recent_actions else 0
         accuracy_bonus = int(success_rate * 20) - 10
         
         # 理智值影响
@@ -812,96 +908,239 @@ class AchievementSystem:
             "bomb_defuser": {
                 "name": "拆弹专家",
                 "description": "在生化危机事件中未沾染任何衣物",
-                "condition": lambda stats: stats.get("explosive_diaper_perfect", 0) >= 1
+                "condition": lambda stats: stats.get("explosive_diaper_perfect", 0) >= 1,
+                "depends_on": ("explosive_diaper_perfect",)
             },
             "time_master": {
                 "name": "时间管理大师", 
                 "description": "一边喂奶一边完成了工作邮件回复",
-                "condition": lambda stats: stats.get("multitask_success", 0) >= 1
+                "condition": lambda stats: stats.get("multitask_success", 0) >= 1,
+                "depends_on": ("multitask_success",)
             },
             "survival_mode": {
                 "name": "生存模式",
                 "description": "在困难模式下坚持7天",
-                "condition": lambda stats: stats.get("hard_mode_days", 0) >= 7
+                "condition": lambda stats: stats.get("hard_mode_days", 0) >= 7,
+                "depends_on": ("hard_mode_days",)
             },
             "sanity_keeper": {
                 "name": "理智守护者",
                 "description": "理智值从未低于50",
-                "condition": lambda stats: stats.get("min_sanity", 100) >= 50
+                "condition": lambda stats: stats.get("min_sanity", 100) >= 50,
+                "depends_on": ("min_sanity",)
             },
             "tetris_master": {
                 "name": "打包大师",
                 "description": "完美完成后备箱俄罗斯方块挑战",
-                "condition": lambda stats: stats.get("tetris_perfect", 0) >= 1
+                "condition": lambda stats: stats.get("tetris_perfect", 0) >= 1,
+                "depends_on": ("tetris_perfect",)
             },
             "negotiation_expert": {
                 "name": "谈判专家",
                 "description": "在挑食谈判中不使用威逼利诱获胜",
-                "condition": lambda stats: stats.get("clean_negotiation_win", 0) >= 1
+                "condition": lambda stats: stats.get("clean_negotiation_win", 0) >= 1,
+                "depends_on": ("clean_negotiation_win",)
             },
             "card_master": {
                 "name": "卡牌大师",
                 "description": "在一次谈判中使用超过5张不同卡牌",
-                "condition": lambda stats: stats.get("max_cards_used", 0) >= 5
+                "condition": lambda stats: stats.get("max_cards_used", 0) >= 5,
+                "depends_on": ("max_cards_used",)
             },
             "efficiency_king": {
                 "name": "效率之王",
                 "description": "在3分钟内完成俄罗斯方块打包",
-                "condition": lambda stats: stats.get("tetris_speed_record", 999) <= 180
+                "condition": lambda stats: stats.get("tetris_speed_record", 999) <= 180,
+                "depends_on": ("tetris_speed_record",)
             }
         }
+        self.engine = AchievementEngine(
+            AchievementDefinition(achievement_id, a["name"], a["description"], a["condition"], a["depends_on"])
+            for achievement_id, a in self.achievements.items()
+        )
     
     def check_achievements(self, player_stats: Dict[str, Any]) -> List[str]:
-        """检查并返回新获得的成就"""
-        earned = []
-        for achievement_id, achievement in self.achievements.items():
-            if achievement_id not in player_stats.get("earned_achievements", []):
-                if achievement["condition"](player_stats):
-                    earned.append(achievement_id)
-        return earned
+        """全量检查并返回新获得的成就（按earned_achievements列表判断是否已获得）"""
+        earned_mask = self.engine.mask_for(player_stats.get("earned_achievements", []))
+        return self.engine.check(player_stats, earned_mask)
+    
+    def update_stats(self, player_id: str, player_stats: Dict[str, Any],
+                     changed_keys: Iterable[str]) -> List[str]:
+        """统计值变化后增量检查，只评估依赖这些键的成就"""
+        return self.engine.update(player_id, player_stats, changed_keys)
+
+
+DEFAULT_PLAYER_ID = "default"
+RANDOM_EVENT_ROLLS = 5   # 一次随机事件用到的均匀随机数个数：触发、特色任务、事件类型、严重度、持续时间
+
+# 事件类型 -> 任务处理器类型
+TASK_HANDLER_TYPES: Dict[EventType, Callable[[], TaskInterface]] = {
+    EventType.CRYING: CryingTask,
+    EventType.EXPLOSIVE_DIAPER: ExplosiveDiaperTask,
+    EventType.MIDNIGHT_TERROR: MidnightTerrorTask,
+    EventType.STROLLER_TETRIS: StrollerTetrisTask,
+    EventType.PICKY_EATER_NEGOTIATION: PickyEaterNegotiationTask,
+}
+
+
+class TaskHandlerPool:
+    """
+    任务处理器对象池
+    每个事件独占一个处理器实例（俄罗斯方块的后备箱、谈判的卡牌进度互不干扰），
+    事件结束后 reset() 并放回空闲列表复用，避免为每个事件重新生成物品和卡牌
+    """
+    
+    def __init__(self, handler_types: Dict[EventType, Callable[[], TaskInterface]] = TASK_HANDLER_TYPES,
+                 max_idle: int = 1024):
+        self.handler_types = handler_types
+        self.max_idle = max_idle
+        self._idle: Dict[EventType, List[TaskInterface]] = {event_type: [] for event_type in handler_types}
+        # 每种类型一个共享实例，只用于不读写进度的方法（例如 is_hallucinating）
+        self.prototypes = {event_type: factory() for event_type, factory in handler_types.items()}
+        self.created = 0
+        self.reused = 0
+    
+    def acquire(self, event_type: EventType) -> Optional[TaskInterface]:
+        idle = self._idle.get(event_type)
+        if idle is None:
+            return None
+        if idle:
+            self.reused += 1
+            return idle.pop()
+        self.created += 1
+        return self.handler_types[event_type]()
+    
+    def release(self, event_type: EventType, handler: TaskInterface):
+        idle = self._idle[event_type]
+        if len(idle) < self.max_idle:
+            handler.reset()
+            idle.append(handler)
+    
+    def stats(self) -> Dict[str, int]:
+        return {"created": self.created, "reused": self.reused,
+                "idle": sum(len(idle) for idle in self._idle.values())}
+
+
+@dataclass
+class PlayerContext:
+    """单个玩家的游戏状态、事件和事件独占的任务处理器"""
+    player_id: str
+    game_state: GameState = field(default_factory=GameState)
+    event_manager: GameEventManager = field(default_factory=GameEventManager)
+    handlers: Dict[str, TaskInterface] = field(default_factory=dict)   # 事件id -> 处理器
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)          # 同一事件循环内串行
+    mutex: Any = field(default_factory=new_lock)                      # 多线程 worker 下跨线程串行
+
+
 class HardcoreParentingSimulator:
-    """育儿模拟器主控制器"""
+    """
+    育儿模拟器主控制器
+    每个玩家一个 PlayerContext，不同玩家的行动可在同一事件循环中并发处理，
+    同一玩家的行动按到达顺序串行。未指定 player_id 的方法作用于当前玩家
+    （最近一次 start_game 的玩家，初始为 "default"）
+    """
     
     def __init__(self):
-        self.game_state = GameState()
-        self.event_manager = GameEventManager()
         self.mode_manager = GameModeManager()
         self.scoring_system = ScoringSystem()
         self.achievement_system = AchievementSystem()
         self.active_sessions: Dict[str, MultiplayerSession] = {}
         self.player_stats: Dict[str, Dict] = {}
-        
-        # 注册任务处理器
-        self.task_handlers = {
-            EventType.CRYING: CryingTask(),
-            EventType.EXPLOSIVE_DIAPER: ExplosiveDiaperTask(),
-            EventType.MIDNIGHT_TERROR: MidnightTerrorTask(),
-            EventType.STROLLER_TETRIS: StrollerTetrisTask(),
-            EventType.PICKY_EATER_NEGOTIATION: PickyEaterNegotiationTask()
+        self.players: Dict[str, PlayerContext] = {}
+        self.current_player_id = DEFAULT_PLAYER_ID
+        self.handler_pool = TaskHandlerPool()
+        self.journal: Optional[SessionJournal] = None
+        self._journal_shadow: Dict[str, Any] = {}
+        self._lock = new_lock()   # 保护玩家表和跨玩家共享的评分/成就/日志
+    
+    # ==================== 玩家上下文 ====================
+    
+    @synchronized
+    def get_player(self, player_id: Optional[str] = None) -> PlayerContext:
+        """取出（必要时创建）玩家上下文"""
+        player_id = player_id or self.current_player_id
+        context = self.players.get(player_id)
+        if context is None:
+            context = self.players[player_id] = PlayerContext(player_id)
+            self.player_stats.setdefault(player_id, self._new_player_stats())
+        return context
+    
+    def find_player(self, player_id: str) -> Optional[PlayerContext]:
+        """取出玩家上下文，不存在时返回None（不创建）"""
+        return self.players.get(player_id)
+    
+    @staticmethod
+    def _new_player_stats() -> Dict[str, Any]:
+        return {
+            "total_playtime": 0,
+            "actions_taken": 0,
+            "earned_achievements": [],
+            "best_kpi": 0,
+            "min_sanity": 100
         }
     
+    @asynccontextmanager
+    async def _player_turn(self, player_id: Optional[str]):
+        """独占一个玩家：先取线程锁再取协程锁（跨线程时 asyncio.Lock 不会被争用）"""
+        context = self.get_player(player_id)
+        with context.mutex:
+            async with context.lock:
+                yield context
+    
+    def _release_handlers(self, context: PlayerContext):
+        for event_id, handler in context.handlers.items():
+            event = context.event_manager.active_events.get(event_id)
+            if event is not None:
+                self.handler_pool.release(event.event_type, handler)
+        context.handlers.clear()
+    
+    @synchronized
+    def remove_player(self, player_id: str):
+        """玩家离开：归还其任务处理器并释放上下文（统计保留）"""
+        context = self.players.pop(player_id, None)
+        if context is not None:
+            self._release_handlers(context)
+    
+    # 兼容单玩家用法：这些属性指向当前玩家
+    @property
+    def game_state(self) -> GameState:
+        return self.get_player().game_state
+    
+    @game_state.setter
+    def game_state(self, state: GameState):
+        self.get_player().game_state = state
+    
+    @property
+    def event_manager(self) -> GameEventManager:
+        return self.get_player().event_manager
+    
+    @property
+    def task_handlers(self) -> Dict[EventType, TaskInterface]:
+        return self.handler_pool.prototypes
+    
+    # ==================== 游戏流程 ====================
+    
     async def start_game(self, player_id: str, mode: GameMode = GameMode.NORMAL) -> GameState:
-        """开始游戏"""
-        self.game_state = GameState(game_mode=mode)
-        
-        # 初始化玩家统计
-        if player_id not in self.player_stats:
-            self.player_stats[player_id] = {
-                "total_playtime": 0,
-                "actions_taken": 0,
-                "earned_achievements": [],
-                "best_kpi": 0,
-                "min_sanity": 100
-            }
-        
-        return self.game_state
+        """开始游戏（只重置该玩家的状态和事件）"""
+        async with self._player_turn(player_id) as context:
+            self._release_handlers(context)
+            context.game_state = GameState(game_mode=mode)
+            context.event_manager = GameEventManager()
+            self.current_player_id = player_id
+            return context.game_state
     
     async def process_action(self, player_id: str, action: PlayerAction, 
                            session_id: Optional[str] = None) -> Dict[str, Any]:
         """处理玩家行动"""
+        async with self._player_turn(player_id) as context:
+            return await self._process_action(context, action)
+    
+    async def _process_action(self, context: PlayerContext, action: PlayerAction) -> Dict[str, Any]:
+        player_id = context.player_id
+        game_state = context.game_state
         result = {
             "success": False,
-            "new_state": self.game_state,
+            "new_state": game_state,
             "score_impact": {},
             "message": "",
             "achievements": []
@@ -909,7 +1148,7 @@ class HardcoreParentingSimulator:
         
         # 查找对应的活跃事件
         active_event = None
-        for event in self.event_manager.active_events.values():
+        for event in context.event_manager.active_events.values():
             if action.action_type in event.required_actions:
                 active_event = event
                 break
@@ -918,102 +1157,208 @@ class HardcoreParentingSimulator:
             result["message"] = "当前没有需要这个行动的事件"
             return result
         
-        # 获取对应的任务处理器
-        task_handler = self.task_handlers.get(active_event.event_type)
-        if not task_handler:
-            result["message"] = "未找到对应的任务处理器"
-            return result
+        # 获取该事件独占的任务处理器（首次行动时从对象池取出）
+        task_handler = context.handlers.get(active_event.id)
+        if task_handler is None:
+            task_handler = self.handler_pool.acquire(active_event.event_type)
+            if task_handler is None:
+                result["message"] = "未找到对应的任务处理器"
+                return result
+            context.handlers[active_event.id] = task_handler
         
         # 验证行动
-        if not task_handler.validate_action(action, self.game_state):
+        if not task_handler.validate_action(action, game_state):
             result["message"] = "无效的行动"
             return result
         
         # 执行任务
-        self.game_state = await task_handler.execute(self.game_state, action)
+        game_state = context.game_state = await task_handler.execute(game_state, action)
         
         # 计算分数影响
-        score_impact = task_handler.calculate_score_impact(action, self.game_state)
+        score_impact = task_handler.calculate_score_impact(action, game_state)
         
         # 更新KPI
         for key, value in score_impact.items():
             if key == "kpi":
-                self.game_state.parenting_kpi = max(0, min(100, self.game_state.parenting_kpi + value))
+                game_state.parenting_kpi = max(0, min(100, game_state.parenting_kpi + value))
         
-        # 解决事件
-        event_resolved = self.event_manager.resolve_event(active_event.id, action)
+        # 解决事件，处理器重置后归还对象池
+        event_resolved = context.event_manager.resolve_event(active_event.id, action)
+        if event_resolved:
+            self.handler_pool.release(active_event.event_type, context.handlers.pop(active_event.id))
         
-        # 更新玩家统计
-        self.player_stats[player_id]["actions_taken"] += 1
-        self.player_stats[player_id]["min_sanity"] = min(
-            self.player_stats[player_id]["min_sanity"], 
-            self.game_state.sanity
-        )
-        
-        # 检查成就
-        new_achievements = self.achievement_system.check_achievements(self.player_stats[player_id])
-        if new_achievements:
-            self.player_stats[player_id]["earned_achievements"].extend(new_achievements)
+        with self._lock:
+            self.scoring_system.record_action(action)
+            
+            # 更新玩家统计
+            stats = self.player_stats[player_id]
+            stats["actions_taken"] += 1
+            stats["min_sanity"] = min(stats["min_sanity"], game_state.sanity)
+            
+            # 检查成就（只评估依赖本次变化统计的成就）
+            new_achievements = self.achievement_system.update_stats(
+                player_id, stats, ("actions_taken", "min_sanity")
+            )
+            if new_achievements:
+                stats["earned_achievements"].extend(new_achievements)
+            
+            if self.journal is not None:
+                self._journal_action(context, active_event.event_type, action, event_resolved)
         
         # 检查失败条件
-        if self.game_state.comfort <= 0:
+        if game_state.comfort <= 0:
             result["message"] = "💀 任务失败！宝宝舒适度归零！"
-        elif self.game_state.parenting_kpi < 50:
+        elif game_state.parenting_kpi < 50:
             result["message"] = "⚠️ 警告：育儿KPI过低，面临剥夺抚养权风险！"
         
         result.update({
             "success": event_resolved,
-            "new_state": self.game_state,
+            "new_state": game_state,
             "score_impact": score_impact,
             "achievements": new_achievements,
-            "message": result["message"] or self.scoring_system.get_performance_feedback(self.game_state.parenting_kpi)
+            "message": result["message"] or self.scoring_system.get_performance_feedback(game_state.parenting_kpi)
         })
         
         return result
     
-    async def trigger_random_event(self) -> Optional[GameEvent]:
-        """触发随机事件"""
-        current_time = datetime.now()
+    # ==================== 持久化 ====================
+    
+    def _export_player(self, player_id: str) -> Dict[str, Any]:
+        data = {f"player:{player_id}": copy.deepcopy(self.player_stats[player_id])}
+        context = self.players.get(player_id)
+        if context is not None:
+            data[f"state:{player_id}"] = export_dataclass(context.game_state)
+        return data
+    
+    @synchronized
+    def export_state(self) -> Dict[str, Any]:
+        """导出可持久化状态，每个玩家的统计和游戏状态各占一个顶层键，便于只记录变化的玩家"""
+        data = {"current_player": self.current_player_id}
+        for player_id in self.player_stats:
+            data.update(self._export_player(player_id))
+        return data
+    
+    @synchronized
+    def import_state(self, data: Dict[str, Any]):
+        """从 export_state 的结果恢复状态"""
+        self.players = {}
+        self.player_stats = {}
+        self.current_player_id = data.get("current_player", DEFAULT_PLAYER_ID)
+        if "game_state" in data:
+            # 旧格式：所有玩家共用一个游戏状态
+            self.get_player().game_state = import_dataclass(GameState, data["game_state"])
+        for key, value in data.items():
+            if key.startswith("player:"):
+                player_id = key[len("player:"):]
+                self.player_stats[player_id] = copy.deepcopy(value)
+                self.achievement_system.engine.set_earned_bits(
+                    player_id, self.achievement_system.engine.mask_for(value.get("earned_achievements", []))
+                )
+            elif key.startswith("state:"):
+                self.get_player(key[len("state:"):]).game_state = import_dataclass(GameState, value)
+    
+    @synchronized
+    def attach_journal(self, journal: SessionJournal, recover: bool = True) -> int:
+        """挂载会话日志，日志已存在时先恢复，返回回放的日志条数"""
+        entries = journal.restore_into(self) if recover else []
+        self.journal = journal
+        self._journal_shadow = self.export_state()
+        journal.start(self._journal_shadow, len(entries))
+        return len(entries)
+    
+    def _journal_action(self, context: PlayerContext, event_type: EventType, action: PlayerAction, resolved: bool):
+        # 只比较本玩家的键，开销与玩家总数无关
+        current = self._export_player(context.player_id)
+        self.journal.append({
+            "task": event_type.value,
+            "player": context.player_id,
+            "args": {"action": action.action_type.value, "rt": action.response_time,
+                     "success": action.success, "extra": action.extra_data},
+            "ok": 1 if resolved else 0,
+            "d": state_delta(self._journal_shadow, current),
+        })
+        self._journal_shadow.update(current)
+        if self.journal.should_snapshot():
+            self.journal.snapshot(self.export_state())
+    
+    async def trigger_random_event(self, player_id: Optional[str] = None) -> Optional[GameEvent]:
+        """为玩家触发随机事件"""
+        async with self._player_turn(player_id) as context:
+            rolls = [random.random() for _ in range(RANDOM_EVENT_ROLLS)]
+            return self._roll_random_event(context, datetime.now(), rolls)
+    
+    def roll_random_event(self, player_id: str, current_time: datetime,
+                          rolls: List[float]) -> Optional[GameEvent]:
+        """
+        用外部给定的随机数为玩家掷一次随机事件（批量调度器用，随机数整批预先生成）
+        
+        Args:
+            rolls: RANDOM_EVENT_ROLLS 个 [0,1) 均匀随机数
+        """
+        context = self.find_player(player_id)
+        if context is None:   # 玩家已离开
+            return None
+        with context.mutex:
+            return self._roll_random_event(context, current_time, rolls)
+    
+    def _roll_random_event(self, context: PlayerContext, current_time: datetime,
+                           rolls: List[float]) -> Optional[GameEvent]:
+        trigger_roll, extra_roll, choice_roll, severity_roll, duration_roll = rolls
+        game_state = context.game_state
         
-        if not self.mode_manager.should_trigger_event(self.game_state.game_mode, current_time):
+        if not self.mode_manager.should_trigger_event(game_state.game_mode, current_time, trigger_roll):
             return None
         
         # 根据时间和模式选择事件类型
         possible_events = [EventType.CRYING, EventType.DIAPER_CHANGE, EventType.FEEDING]
         
         # 困难模式下的特殊事件
-        if self.game_state.game_mode == GameMode.HARD:
+        if game_state.game_mode == GameMode.HARD:
             if 2 <= current_time.hour <= 5:  # 凌晨时段
                 possible_events.extend([EventType.MIDNIGHT_TERROR, EventType.COLIC_ATTACK])
             possible_events.extend([EventType.EXPLOSIVE_DIAPER, EventType.STROLLER_TETRIS, EventType.PICKY_EATER_NEGOTIATION])
-        elif self.game_state.game_mode == GameMode.NORMAL:
+        elif game_state.game_mode == GameMode.NORMAL:
             # 普通模式偶尔触发特色任务
-            if random.random() < 0.3:
+            if extra_roll < 0.3:
                 possible_events.extend([EventType.STROLLER_TETRIS, EventType.PICKY_EATER_NEGOTIATION])
         
-        event_type = random.choice(possible_events)
-        severity = random.randint(3, 8) if self.game_state.game_mode != GameMode.HARD else random.randint(6, 10)
+        event_type = possible_events[int(choice_roll * len(possible_events))]
+        # 普通/简单模式 3-8 级，困难模式 6-10 级
+        if game_state.game_mode != GameMode.HARD:
+            severity = 3 + int(severity_roll * 6)
+        else:
+            severity = 6 + int(severity_roll * 5)
         
-        return self.event_manager.trigger_event(event_type, severity)
+        return context.event_manager.trigger_event(event_type, severity, duration_roll)
     
-    def get_game_status(self) -> Dict[str, Any]:
-        """获取当前游戏状态"""
-        return {
-            "game_state": {
-                "comfort": self.game_state.comfort,
-                "sanity": self.game_state.sanity,
-                "parenting_kpi": self.game_state.parenting_kpi,
-                "mode": self.game_state.game_mode.value
-            },
-            "active_events": [
-                {
-                    "id": event.id,
-                    "type": event.event_type.value,
-                    "description": event.description,
-                    "severity": event.severity,
-                    "required_actions": [action.value for action in event.required_actions]
-                }
-                for event in self.event_manager.active_events.values()
-            ],
-            "is_hallucinating": self.game_state.sanity < 30
-        }
\ No newline at end of file
+    def get_game_status(self, player_id: Optional[str] = None) -> Dict[str, Any]:
+        """获取玩家的游戏状态；未指定玩家时返回当前玩家状态和所有玩家的指标"""
+        context = self.get_player(player_id)
+        with context.mutex:
+            game_state = context.game_state
+            status = {
+                "game_state": {
+                    "comfort": game_state.comfort,
+                    "sanity": game_state.sanity,
+                    "parenting_kpi": game_state.parenting_kpi,
+                    "mode": game_state.game_mode.value
+                },
+                "active_events": [
+                    {
+                        "id": event.id,
+                        "type": event.event_type.value,
+                        "description": event.description,
+                        "severity": event.severity,
+                        "required_actions": [action.value for action in event.required_actions]
+                    }
+                    for event in context.event_manager.active_events.values()
+                ],
+                "is_hallucinating": game_state.sanity < 30,
+            }
+        with self._lock:
+            player_ids = [player_id] if player_id else list(self.scoring_system.player_aggregates)
+            status["player_metrics"] = {
+                pid: self.scoring_system.get_player_metrics(pid)
+                for pid in player_ids if pid in self.scoring_system.player_aggregates
+            }
+        return status
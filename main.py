@@ -1,10 +1,20 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 import os
 import sys
+import time
+
+import metrics
+import provider_router
+import request_profiler
+import tracing
+from feature_registry import features
 
 # 导入游戏逻辑
 try:
     from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+    from game_sessions import registry, resolve_session_id, status_response
+    from spectator import spectators
+    from task_batch import batch_response
     game_available = True
     print("成功导入游戏模块")
 except ImportError as e:
@@ -36,11 +46,37 @@ except ImportError as e:
     print(f"导入冲奶粉任务失败: {e}")
     feeding_available = False
 
+try:
+    from coop_api import coop_bp
+    coop_available = True
+    print("成功导入双人协作模块")
+except ImportError as e:
+    print(f"导入双人协作模块失败: {e}")
+    coop_available = False
+
+# 照片接口调用付费的 fal 服务且没有鉴权，需要显式开启（负载测试脚本会设置）
+baby_photo_available = False
+if os.environ.get('ENABLE_PHOTO_API') == '1':
+    try:
+        from baby_photo_api import baby_photo_bp
+        baby_photo_available = True
+        print("成功导入宝宝照片模块")
+    except ImportError as e:
+        print(f"导入宝宝照片模块失败: {e}")
+else:
+    print("宝宝照片接口未启用（设置 ENABLE_PHOTO_API=1 开启）")
+
 print("开始启动应用...")
 print(f"Python版本: {sys.version}")
 print(f"当前工作目录: {os.getcwd()}")
 
+WATCH_STREAM_SECONDS = float(os.environ.get("WATCH_STREAM_SECONDS", "60"))   # 单条观战流的最长时长
+
 app = Flask(__name__)
+metrics.instrument_app(app)
+request_profiler.install(app)
+tracing.install(app)
+provider_router.install(app)
 
 # 注册所有任务 Blueprint
 if diaper_task_available:
@@ -55,12 +91,19 @@ if feeding_available:
     app.register_blueprint(feeding_bp)
     print("冲奶粉任务已注册")
 
-# 创建游戏实例
+if coop_available:
+    app.register_blueprint(coop_bp)
+    print("双人协作已注册")
+    if int(os.environ.get("WEB_CONCURRENCY", "2")) > 1 and not os.environ.get('GAME_SHARD_MODE'):
+        print("⚠️ 协作会话只在进程内存中，多 worker 部署需要 session_dispatcher 把同一会话路由到同一 worker")
+
+if baby_photo_available:
+    app.register_blueprint(baby_photo_bp)
+    print("宝宝照片接口已注册")
+
+# 游戏实例按会话创建（见 game_sessions），此处只打印持久化配置
 if game_available:
-    game = HardcoreParentingGame()
-    print("游戏实例创建成功")
-else:
-    game = None
+    print(f"游戏会话日志目录: {registry.journal_dir or '未启用'}")
 
 @app.route('/')
 def home():
@@ -153,20 +196,72 @@ def health():
     return jsonify({
         'status': 'healthy', 
         'message': '应用运行正常',
-        'game_available': game_available
+        'game_available': game_available,
+        'sessions': registry.stats() if game_available else None,
+        'features': features.status(),   # 可选子系统只报告是否可用/已加载，不会触发加载
+        'providers': provider_router.router.status()   # 生成服务的熔断状态、成功/失败次数、p95
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 文本格式，汇总全部 worker（见 metrics）"""
+    return Response(metrics.registry.render(), mimetype=metrics.CONTENT_TYPE)
+
 @app.route('/game/status')
 def game_status():
     if not game_available:
         return jsonify({'error': '游戏模块不可用'})
     
     try:
-        status = game.get_game_status()
-        return jsonify(status)
+        game = registry.get(resolve_session_id(request))
+        return status_response(game, request)
     except Exception as e:
         return jsonify({'error': f'获取游戏状态失败: {str(e)}'})
 
+@app.route('/game/watch')
+def watch_game():
+    """观战：SSE 推送状态快照（所有观众共用同一份编码）"""
+    if not game_available:
+        return jsonify({'error': '游戏模块不可用'})
+    
+    session_id = resolve_session_id(request)
+    subscription = spectators.subscribe(session_id, registry.get(session_id))
+    channel = subscription.channel
+    
+    def frames():
+        # 流有时长上限，到期结束后 EventSource 按 retry 重连，不会长期占住 worker 线程
+        deadline = time.monotonic() + WATCH_STREAM_SECONDS
+        try:
+            yield b"retry: 2000\n\n"
+            while time.monotonic() < deadline:
+                batch = subscription.get(timeout=channel.refresh_seconds)
+                if batch:
+                    yield batch[-1]   # 都是完整快照，只需最新一帧
+                else:
+                    # 没有任务执行时按节拍刷新（会话休眠恢复后重新绑定新实例）
+                    spectators.channel(session_id, registry.get(session_id)).refresh()
+        finally:
+            subscription.close()
+            spectators.release(session_id)
+    
+    return Response(stream_with_context(frames()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/game/batch', methods=['POST'])
+def batch_tasks():
+    """按顺序批量执行任务（一次会话锁），大批次以 NDJSON 逐行返回"""
+    if not game_available:
+        return jsonify({'error': '游戏模块不可用'})
+    
+    try:
+        game = registry.get(resolve_session_id(request))
+        body, status, headers = batch_response(game, request.get_json(silent=True), request)
+        return Response(body, status=status, headers=headers)
+    except Exception as e:
+        return jsonify({'error': f'批量执行任务失败: {str(e)}'}), 500
+
 @app.route('/game/start', methods=['POST'])
 def start_game():
     if not game_available:
@@ -182,6 +277,7 @@ def start_game():
         mode = GameMode(mode_str)
         personality = BabyPersonality(personality_str)
         
+        game = registry.get(resolve_session_id(request))
         result = game.start_game(mode, personality, age)
         return jsonify(result)
     except Exception as e:
@@ -194,6 +290,7 @@ def game_demo():
     
     try:
         # 演示游戏功能
+        game = registry.get(resolve_session_id(request))
         result = game.start_game(GameMode.NORMAL, BabyPersonality.ANGEL, 0)
         status = game.get_game_status()
         
@@ -205,6 +302,25 @@ def game_demo():
     except Exception as e:
         return jsonify({'error': f'游戏演示失败: {str(e)}'})
 
+# 分片模式：由 session_dispatcher 启动，每个 worker 只监听自己的 Unix socket，
+# 调度器通过以下内部接口在扩缩容时迁移会话（调度器不会转发外部的 /internal/ 请求）
+if game_available and os.environ.get('GAME_SHARD_MODE'):
+    @app.route('/internal/sessions')
+    def internal_sessions():
+        return jsonify({'sessions': registry.session_ids()})
+
+    @app.route('/internal/sessions/release', methods=['POST'])
+    def internal_release():
+        data = registry.release(resolve_session_id(request))
+        if data is None:
+            return '', 404
+        return data, 200, {'Content-Type': 'application/octet-stream'}
+
+    @app.route('/internal/sessions/adopt', methods=['POST'])
+    def internal_adopt():
+        registry.adopt(resolve_session_id(request), request.get_data())
+        return '', 204
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print(f"启动应用，端口: {port}")
@@ -7,6 +7,8 @@
 from flask import Flask, render_template_string
 import os
 
+import provider_router
+
 # 导入面部融合 API
 try:
     from baby_face_fusion_api import baby_fusion_bp
@@ -18,6 +20,7 @@ except ImportError as e:
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 限制上传文件大小为 16MB
+provider_router.install(app)   # 生成请求受截止时间限制（X-Request-Timeout-Ms / ROUTER_REQUEST_TIMEOUT）
 
 # 注册面部融合 API
 if fusion_api_available:
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Prometheus 风格的指标
+不依赖 prometheus_client。每个进程在内存里累计计数器、直方图和仪表盘，记录时只是
+一次字典查找加几次整数运算；配置了 METRICS_DIR 时，后台线程每 flush_interval 秒
+把本进程的快照原子地写到 <METRICS_DIR>/<pid>.json。/metrics 读取目录下所有进程
+的快照合并后输出文本格式，因此不管请求落在哪个 gunicorn worker（或哪个分片）上，
+看到的都是全部 worker 的汇总：
+
+- 计数器、直方图：各进程相加；已退出 worker 的计数并入 archive.json 后删除它的文件
+  （gunicorn 的 child_exit 钩子在 pid 被复用前归档；其它启动方式下，新进程第一次刷盘时
+  发现同 pid 的旧文件也会先归档），累计值不会倒退
+- 仪表盘按 mode 合并：livesum（存活进程求和）、max（存活进程取最大）、
+  all（每个存活进程一条，带 pid 标签）
+
+没有配置 METRICS_DIR 时只输出当前进程的数据（本地开发、单进程）。
+gunicorn.conf.py 会在 master 启动时创建一个临时目录并写入 METRICS_DIR。
+
+内置指标：
+- http_request_duration_seconds{blueprint,route,method,status}   instrument_app 挂到 Flask
+- game_task_duration_seconds{task} / game_tasks_total{task,success}   records_task 记录
+- provider_request_duration_seconds{provider,operation} / provider_errors_total  track_provider
+- game_sessions_active、process_resident_memory_bytes   采集快照时回调取值
+"""
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import tracing
+
+try:
+    import fcntl
+except ImportError:   # Windows：不做跨进程互斥
+    fcntl = None
+
+# 秒：0.5ms ~ 10s，覆盖内存里的任务执行到外部图像生成接口
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+GAUGE_MODES = ("livesum", "max", "all")
+ARCHIVE_FILE = "archive.json"   # 已退出进程的计数器、直方图累计值
+
+
+class Metric:
+    """一个指标族：标签值元组 -> 数值"""
+
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labels: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _dump(self) -> dict:
+        with self._lock:
+            samples = [[list(key), self._copy(value)] for key, value in self._values.items()]
+        return {"type": self.kind, "help": self.documentation, "labels": list(self.labels), "samples": samples}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+        self.registry.dirty = True
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, registry, name, documentation, labels, mode: str = "livesum",
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(registry, name, documentation, labels)
+        if mode not in GAUGE_MODES:
+            raise ValueError(f"未知的仪表盘合并方式: {mode}")
+        self.mode = mode
+        self.function = function   # 无标签仪表盘可以在采集快照时回调取值
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+        self.registry.dirty = True
+
+    def _dump(self) -> dict:
+        if self.function is not None:
+            try:
+                self.set(self.function())
+            except Exception:
+                pass
+        data = super()._dump()
+        data["mode"] = self.mode
+        return data
+
+
+class Histogram(Metric):
+    """每组标签一个 [各桶计数..., +Inf 桶计数, 总和] 列表（桶计数不累计，输出时再累加）"""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labels, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(label_values)
+            if counts is None:
+                counts = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+        self.registry.dirty = True
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+    def _dump(self) -> dict:
+        data = super()._dump()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """一个进程的全部指标，以及跨进程的快照合并"""
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.dirty = False
+        self._metrics: Dict[str, Metric] = {}
+        self._flusher_pid: Optional[int] = None
+        self._written_pid: Optional[int] = None
+        self._flush_lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+        # fork 出的 worker 从零开始累计（master 里的数值已经在 master 自己的文件里）
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        for metric in self._metrics.values():
+            metric._reset()
+        self._flush_lock = threading.Lock()
+        self._flusher_pid = None
+        self._written_pid = None
+        self.dirty = False
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已存在: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = (), mode: str = "livesum",
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labels, mode, function))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labels, buckets))
+
+    # ---------- 快照 ----------
+
+    def snapshot(self) -> dict:
+        return {"pid": os.getpid(), "metrics": {name: m._dump() for name, m in self._metrics.items()}}
+
+    def flush(self):
+        """把本进程的快照原子地写入目录"""
+        if not self.directory:
+            return
+        with self._flush_lock:
+            self.dirty = False
+            data = json.dumps(self.snapshot(), separators=(",", ":"))
+            pid = os.getpid()
+            path = os.path.join(self.directory, f"{pid}.json")
+            tmp = f"{path}.tmp"
+            try:
+                if self._written_pid != pid:
+                    # 同 pid 的旧文件属于已退出的进程（pid 被复用），先归档再覆盖
+                    self._written_pid = pid
+                    self.archive(pid)
+                with open(tmp, "w") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError:
+                pass   # 目录已被清理（如退出时临时目录先删了），丢掉这一份快照
+
+    def archive(self, pid: int) -> bool:
+        """
+        把已退出进程的快照并入归档文件并删除它（gunicorn 的 child_exit 调用），
+        返回是否归档了文件；仪表盘只统计存活进程，直接丢弃
+        """
+        if not self.directory:
+            return False
+        path = os.path.join(self.directory, f"{pid}.json")
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+        with self._archive_lock():
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                return False
+            try:
+                with open(archive_path) as f:
+                    archived = json.load(f)
+            except FileNotFoundError:
+                archived = {"pid": 0, "archived": True, "metrics": {}}
+            _merge_totals(archived["metrics"], snapshot["metrics"])
+            tmp = f"{archive_path}.tmp"
+            with open(tmp, "w") as f:
+                f.write(json.dumps(archived, separators=(",", ":")))
+            os.replace(tmp, archive_path)
+            os.remove(path)
+        return True
+
+    @contextmanager
+    def _archive_lock(self):
+        """归档是读改写，多个进程同时归档时用文件锁串行"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, "archive.lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def ensure_flusher(self):
+        """当前进程还没有后台刷盘线程时启动一个（fork 之后各 worker 各自启动）"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name="metrics-flusher", daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            if self.dirty:
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+    def _snapshots(self) -> List[dict]:
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for entry in os.listdir(self.directory):
+            if not entry.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, entry)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue   # 正在被替换或已被清理
+        return snapshots
+
+    # ---------- 合并与输出 ----------
+
+    def collect(self) -> Dict[str, dict]:
+        """合并所有进程的快照：指标名 -> {type, help, labels, samples: {标签值元组: 数值}}"""
+        merged: Dict[str, dict] = {}
+        for snapshot in self._snapshots():
+            pid = snapshot["pid"]
+            alive = not snapshot.get("archived") and _pid_alive(pid)
+            for name, data in snapshot["metrics"].items():
+                kind = data["type"]
+                if kind == "gauge" and not alive:
+                    continue
+                family = merged.setdefault(name, {
+                    "type": kind, "help": data["help"], "labels": list(data["labels"]),
+                    "buckets": data.get("buckets"), "samples": {},
+                })
+                samples = family["samples"]
+                if kind == "gauge" and data["mode"] == "all":
+                    family["labels"] = list(data["labels"]) + ["pid"]
+                for label_values, value in data["samples"]:
+                    key = tuple(label_values)
+                    if kind == "histogram":
+                        current = samples.get(key)
+                        samples[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+                    elif kind == "gauge" and data["mode"] == "all":
+                        samples[key + (str(pid),)] = value
+                    elif kind == "gauge" and data["mode"] == "max":
+                        samples[key] = max(samples.get(key, value), value)
+                    else:
+                        samples[key] = samples.get(key, 0) + value
+        return merged
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        lines: List[str] = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            labels = family["labels"]
+            for key, value in sorted(family["samples"].items()):
+                if family["type"] == "histogram":
+                    lines.extend(_histogram_lines(name, labels, key, family["buckets"], value))
+                else:
+                    lines.append(f"{name}{_format_labels(labels, key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge_totals(archived: Dict[str, dict], metrics: Dict[str, dict]):
+    """把一个快照的计数器、直方图累加进归档（两边都是快照格式）"""
+    for name, data in metrics.items():
+        kind = data["type"]
+        if kind == "gauge":
+            continue
+        family = archived.setdefault(name, dict(data, samples=[]))
+        samples = {tuple(key): value for key, value in family["samples"]}
+        for key, value in data["samples"]:
+            key = tuple(key)
+            current = samples.get(key)
+            if current is None:
+                samples[key] = value
+            elif kind == "histogram":
+                samples[key] = [a + b for a, b in zip(current, value)]
+            else:
+                samples[key] = current + value
+        family["samples"] = [[list(key), value] for key, value in samples.items()]
+
+
+def _histogram_lines(name: str, labels: List[str], key: Tuple[str, ...], buckets: List[float],
+                     value: List[float]) -> Iterator[str]:
+    cumulative = 0
+    for bound, count in zip(list(buckets) + [float("inf")], value[:-1]):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else _format_value(bound)
+        yield f"{name}_bucket{_format_labels(labels + ['le'], key + (le,))} {cumulative}"
+    yield f"{name}_sum{_format_labels(labels, key)} {_format_value(value[-1])}"
+    yield f"{name}_count{_format_labels(labels, key)} {cumulative}"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _resident_memory_bytes() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ==================== 全局指标 ====================
+
+registry = MetricsRegistry(os.environ.get("METRICS_DIR") or None)
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（按蓝图、路由模板、方法、状态码）",
+    ("blueprint", "route", "method", "status"))
+TASK_LATENCY = registry.histogram(
+    "game_task_duration_seconds", "游戏任务执行耗时（按 TaskType）", ("task",))
+TASKS_TOTAL = registry.counter(
+    "game_tasks_total", "游戏任务执行次数（按 TaskType、是否成功）", ("task", "success"))
+PROVIDER_LATENCY = registry.histogram(
+    "provider_request_duration_seconds", "外部生成服务调用耗时", ("provider", "operation"))
+PROVIDER_ERRORS = registry.counter(
+    "provider_errors_total", "外部生成服务调用失败次数", ("provider", "operation"))
+PROVIDER_ROUTER_EVENTS = registry.counter(
+    "provider_router_events_total", "生成服务路由事件（hedge / failover / short_circuit / deadline）",
+    ("provider", "event"))
+PROVIDER_CIRCUIT_OPEN = registry.gauge(
+    "provider_circuit_open", "熔断器是否打开（任一 worker 打开即为 1）", ("provider",), mode="max")
+SESSIONS_ACTIVE = registry.gauge(
+    "game_sessions_active", "内存中的游戏会话数（各 worker 相加）", mode="livesum")
+RESIDENT_MEMORY = registry.gauge(
+    "process_resident_memory_bytes", "进程常驻内存", mode="all", function=_resident_memory_bytes)
+
+
+def observe_task(task: str, success: bool, seconds: float):
+    """records_task 在每个任务执行后调用"""
+    TASK_LATENCY.observe(seconds, task)
+    TASKS_TOTAL.inc(task, "true" if success else "false")
+
+
+@contextmanager
+def track_provider(provider: str, operation: str):
+    """外部生成服务调用计时，抛出异常时同时计入失败次数；同时记一个链路追踪 span"""
+    start = time.perf_counter()
+    try:
+        with tracing.span(f"{provider}.{operation}", provider=provider, operation=operation):
+            yield
+    except Exception:
+        PROVIDER_ERRORS.inc(provider, operation)
+        raise
+    finally:
+        PROVIDER_LATENCY.observe(time.perf_counter() - start, provider, operation)
+
+
+def track_sessions(count: Callable[[], int]):
+    """登记会话数的取值函数（采集快照时调用）"""
+    SESSIONS_ACTIVE.function = count
+
+
+def instrument_app(app):
+    """给 Flask 应用挂上请求计时（路由用规则模板，避免把会话id之类的变量展开成标签）"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        registry.ensure_flusher()
+
+    @app.after_request
+    def _observe_request(response):
+        start = getattr(g, "_metrics_start", None)
+        if start is not None:
+            rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            REQUEST_LATENCY.observe(time.perf_counter() - start, request.blueprint or "app", rule,
+                                    request.method, str(response.status_code))
+        return response
+
+    return app
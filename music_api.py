@@ -5,13 +5,13 @@
 """
 
 from flask import Blueprint, jsonify, request
-from background_music import BackgroundMusicPlayer
+from feature_registry import features
 
 # 创建 Blueprint
 music_bp = Blueprint('music', __name__, url_prefix='/api/music')
 
-# 创建全局音乐播放器
-music_player = BackgroundMusicPlayer()
+# 全局音乐播放器：第一次调用音乐接口时才创建（初始化混音器、创建音乐目录）
+music_player = features.lazy("music")
 
 
 @music_bp.route('/status', methods=['GET'])
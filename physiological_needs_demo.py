@@ -75,7 +75,7 @@ async def emergency_scenario():
     # 评估体温需求
     temp_task = manager.tasks[PhysiologicalNeedType.TEMPERATURE]
     temp_urgency = await temp_task.assess_need(manager.state)
-    temp_status = temp_task.get_temperature_status(manager.state)
+    temp_status = await temp_task.get_temperature_status(manager.state)
     
     print(f"体温状态: {temp_status['status']} (紧急程度: {temp_urgency}/100)")
     print(f"建议: {temp_status['recommendation']}")
@@ -110,7 +110,7 @@ async def sleep_training_scenario():
     
     # 获取睡眠建议
     sleep_task = manager.tasks[PhysiologicalNeedType.SLEEP]
-    recommendations = sleep_task.get_sleep_recommendations(manager.state)
+    recommendations = await sleep_task.get_sleep_recommendations(manager.state)
     
     print("睡眠建议:")
     print(f"  紧急程度: {recommendations['urgency']}/100")
@@ -168,7 +168,7 @@ async def feeding_optimization_scenario():
         
         # 获取喂食建议
         feeding_task = manager.tasks[PhysiologicalNeedType.HUNGER]
-        recommendations = feeding_task.get_feeding_recommendations(
+        recommendations = await feeding_task.get_feeding_recommendations(
             manager.state, scenario['age_months']
         )
         
@@ -12,6 +12,8 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import random
 
+from concurrency import new_lock, synchronized
+
 
 class PhysiologicalNeedType(Enum):
     """生理需求类型"""
@@ -213,7 +215,7 @@ class FeedingTask(PhysiologicalNeedTask):
         
         return max(0, min(1, base_effectiveness))
     
-    def get_feeding_recommendations(self, state: PhysiologicalState, baby_age_months: int) -> Dict[str, Any]:
+    async def get_feeding_recommendations(self, state: PhysiologicalState, baby_age_months: int) -> Dict[str, Any]:
         """获取喂食建议"""
         recommendations = {
             "urgency": await self.assess_need(state),
@@ -460,7 +462,7 @@ class SleepTask(PhysiologicalNeedTask):
         
         return max(0, min(1, base_effectiveness))
     
-    def get_sleep_recommendations(self, state: PhysiologicalState) -> Dict[str, Any]:
+    async def get_sleep_recommendations(self, state: PhysiologicalState) -> Dict[str, Any]:
         """获取睡眠建议"""
         urgency = await self.assess_need(state)
         
@@ -593,7 +595,7 @@ class TemperatureRegulationTask(PhysiologicalNeedTask):
         
         return 0.5
     
-    def get_temperature_status(self, state: PhysiologicalState) -> Dict[str, Any]:
+    async def get_temperature_status(self, state: PhysiologicalState) -> Dict[str, Any]:
         """获取体温状态"""
         temp = state.body_temperature
         
@@ -740,7 +742,9 @@ class PhysiologicalNeedsManager:
             PhysiologicalNeedType.COMFORT: ComfortTask()
         }
         self.state = PhysiologicalState()
+        self._lock = new_lock()
     
+    @synchronized
     async def assess_all_needs(self) -> Dict[PhysiologicalNeedType, int]:
         """评估所有生理需求"""
         needs_assessment = {}
@@ -751,6 +755,7 @@ class PhysiologicalNeedsManager:
         
         return needs_assessment
     
+    @synchronized
     async def get_priority_needs(self, threshold: int = 50) -> List[tuple]:
         """获取优先级需求列表"""
         needs = await self.assess_all_needs()
@@ -764,6 +769,7 @@ class PhysiologicalNeedsManager:
         priority_needs.sort(key=lambda x: x[1], reverse=True)
         return priority_needs
     
+    @synchronized
     async def execute_care_action(self, need_type: PhysiologicalNeedType, 
                                  action_data: Dict[str, Any]) -> Dict[str, Any]:
         """执行护理行动"""
@@ -835,6 +841,7 @@ class PhysiologicalNeedsManager:
         need_name = need_names.get(need_type, "护理")
         return f"{need_name}执行{level}！效果评分: {effectiveness:.1%}"
     
+    @synchronized
     def get_comprehensive_status(self) -> Dict[str, Any]:
         """获取综合状态报告"""
         return {
@@ -914,8 +921,14 @@ class PhysiologicalNeedsManager:
             }
         }
     
+    @synchronized
     async def simulate_time_passage(self, hours: float):
         """模拟时间流逝对生理状态的影响"""
+        self.advance_time(hours)
+    
+    @synchronized
+    def advance_time(self, hours: float):
+        """simulate_time_passage 的同步版本（没有随机成分，批量调度器直接调用）"""
         # 饥饿增加
         hunger_increase = hours * 15  # 每小时增加15点饥饿
         self.state.hunger_level = min(100, self.state.hunger_level + hunger_increase)
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+生成服务路由：健康统计、熔断、请求截止时间、对冲请求、故障转移
+
+调用方给出按优先级排列的候选路线（Route：服务名 + 操作 + 模型 + 参数，不同服务的模型和参数不同），
+router.generate(routes) 负责选路：
+1. 熔断：每个服务一个 CircuitBreaker，连续失败 failure_threshold 次后打开，reset_timeout 秒内
+   直接跳过该服务；到时间后半开，只放行一个试探请求，成功则关闭、失败则重新打开
+2. 截止时间：HTTP 请求进来时按 X-Request-Timeout-Ms 记下截止时间（上限 ROUTER_REQUEST_TIMEOUT 秒，
+   默认 30，存在 contextvars 里），到期还没有结果就抛 ProviderTimeout，
+   不会一直卡到 gunicorn 的 120 秒超时把 worker 杀掉
+3. 对冲：主请求超过该服务最近成功耗时的 p95 还没返回，向下一条路线（只有一条时同一路线）再发一个，
+   谁先成功用谁；对冲次数不超过请求数的 hedge_ratio，避免服务整体变慢时请求量翻倍
+4. 故障转移：某条路线失败（或被熔断跳过）立刻尝试下一条
+
+外部客户端的阻塞调用无法中途取消，所以每次尝试在线程池里执行：截止时间一到调用方直接返回，
+落后的尝试在后台跑完，按真实结果计入健康统计。截止时间可以由客户端请求头缩短，所以它不影响熔断：
+只有真实失败、以及耗时超过服务端时限 ROUTER_REQUEST_TIMEOUT 的成功才算失败。
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import tracing
+from metrics import PROVIDER_CIRCUIT_OPEN, PROVIDER_ROUTER_EVENTS
+from providers import ProviderError, ProviderRegistry, ProviderTimeout, providers
+
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+DEFAULT_REQUEST_TIMEOUT = 30.0
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+
+@dataclass(frozen=True)
+class Route:
+    """一条候选路线"""
+    provider: str
+    operation: str
+    model: str
+    arguments: Dict[str, Any] = field(hash=False, compare=False)
+
+
+class CircuitOpen(ProviderError):
+    """服务处于熔断状态，请求被跳过"""
+
+    def __init__(self, provider: str):
+        super().__init__(f"{provider} 已熔断", status=503, retryable=True)
+
+
+# ---------- 截止时间 ----------
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[float]:
+    """在 seconds 秒后截止（已有更早的截止时间时保留更早的）"""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """当前请求剩余的时间（秒），没有截止时间时为 None"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def request_budget(header: Optional[str]) -> float:
+    """请求头给出的时限（毫秒）与 ROUTER_REQUEST_TIMEOUT 取较小值"""
+    limit = float(os.environ.get("ROUTER_REQUEST_TIMEOUT", DEFAULT_REQUEST_TIMEOUT))
+    try:
+        asked = float(header) / 1000 if header else limit
+    except ValueError:
+        asked = limit
+    return max(0.0, min(asked, limit))
+
+
+# ---------- 健康统计与熔断 ----------
+
+class CircuitBreaker:
+    """连续失败计数熔断器：closed -> open -> half_open -> closed / open"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """能否发请求；半开状态下只放行一个试探请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial = False
+            if self.state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            changed = self.state != self.CLOSED
+            self.state = self.CLOSED
+            self.failures = 0
+        if changed:
+            PROVIDER_CIRCUIT_OPEN.set(0, self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                opened = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                self._trial = False
+            else:
+                opened = False
+        if opened:
+            PROVIDER_CIRCUIT_OPEN.set(1, self.name)
+
+
+class ProviderHealth:
+    """一个服务的健康统计：最近成功耗时（对冲延迟用）、成功/失败次数、熔断器"""
+
+    def __init__(self, breaker: CircuitBreaker, window: int = 200):
+        self.breaker = breaker
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+
+    def record(self, success: bool, seconds: float):
+        if success:
+            self.successes += 1
+            self.latencies.append(seconds)
+            self.breaker.record_success()
+        else:
+            self.failures += 1
+            self.breaker.record_failure()
+
+    def p95(self, min_samples: int = 20) -> Optional[float]:
+        """最近成功耗时的 p95，样本不足时为 None"""
+        values = sorted(self.latencies)
+        if len(values) < min_samples:
+            return None
+        return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95(1)
+        return {
+            "state": self.breaker.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+        }
+
+
+class _Attempt:
+    __slots__ = ("route", "kind", "started")
+
+    def __init__(self, route: Route, kind: str, started: float):
+        self.route = route
+        self.kind = kind          # primary / hedge / failover
+        self.started = started
+
+
+# ---------- 路由 ----------
+
+class ProviderRouter:
+    """按健康状况选路，带截止时间、对冲和故障转移"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, hedge: bool = True,
+                 hedge_ratio: float = 0.1, default_hedge_delay: float = 5.0, min_hedge_samples: int = 20,
+                 max_workers: int = 32, slow_call: float = DEFAULT_REQUEST_TIMEOUT,
+                 registry: ProviderRegistry = providers):
+        """
+        Args:
+            failure_threshold / reset_timeout: 熔断器参数（连续失败次数、打开后多久半开）
+            hedge: 是否发对冲请求
+            hedge_ratio: 对冲请求数占总请求数的上限
+            default_hedge_delay: p95 样本不足 min_hedge_samples 个时的对冲延迟（秒）
+            max_workers: 执行尝试的线程数上限
+            slow_call: 服务端时限（秒），成功但耗时超过它的尝试按失败计入熔断器
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge = hedge
+        self.hedge_ratio = hedge_ratio
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_samples = min_hedge_samples
+        self.slow_call = slow_call
+        self.registry = registry
+        self.requests = 0
+        self.hedges = 0
+        self._health: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="provider")
+
+    @classmethod
+    def from_env(cls) -> "ProviderRouter":
+        env = os.environ
+        return cls(failure_threshold=int(env.get("ROUTER_FAILURE_THRESHOLD", "5")),
+                   reset_timeout=float(env.get("ROUTER_RESET_TIMEOUT", "30")),
+                   hedge=env.get("ROUTER_HEDGE", "1") != "0",
+                   hedge_ratio=float(env.get("ROUTER_HEDGE_RATIO", "0.1")),
+                   slow_call=float(env.get("ROUTER_REQUEST_TIMEOUT", DEFAULT_REQUEST_TIMEOUT)))
+
+    def health(self, provider: str) -> ProviderHealth:
+        health = self._health.get(provider)
+        if health is None:
+            with self._lock:
+                health = self._health.get(provider)
+                if health is None:
+                    breaker = CircuitBreaker(provider, self.failure_threshold, self.reset_timeout)
+                    health = self._health[provider] = ProviderHealth(breaker)
+        return health
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """各服务的健康状况（供 /health 使用）"""
+        return {name: health.snapshot() for name, health in self._health.items()}
+
+    def hedge_delay(self, provider: str) -> float:
+        p95 = self.health(provider).p95(self.min_hedge_samples)
+        return self.default_hedge_delay if p95 is None else p95
+
+    def _run(self, attempt: _Attempt) -> Dict[str, Any]:
+        """执行一次尝试并按真实结果计入健康统计（调用方已经因截止时间返回时同样计入）"""
+        route = attempt.route
+        health = self.health(route.provider)
+        try:
+            result = self.registry.get(route.provider).generate(route.operation, route.model, route.arguments)
+        except Exception:
+            health.record(False, time.monotonic() - attempt.started)
+            raise
+        elapsed = time.monotonic() - attempt.started
+        health.record(elapsed <= self.slow_call, elapsed)
+        return result
+
+    def _launch(self, route: Route, kind: str, inflight: Dict[Future, _Attempt],
+                errors: List[BaseException]) -> bool:
+        if not self.health(route.provider).breaker.allow():
+            PROVIDER_ROUTER_EVENTS.inc(route.provider, "short_circuit")
+            errors.append(CircuitOpen(route.provider))
+            return False
+        attempt = _Attempt(route, kind, time.monotonic())
+        inflight[self._executor.submit(tracing.wrap(self._run), attempt)] = attempt
+        if kind != "primary":
+            PROVIDER_ROUTER_EVENTS.inc(route.provider, kind)
+        return True
+
+    def _launch_next(self, pending: List[Route], kind: str, inflight: Dict[Future, _Attempt],
+                     errors: List[BaseException]) -> bool:
+        while pending:
+            if self._launch(pending.pop(0), kind, inflight, errors):
+                return True
+        return False
+
+    def _launch_hedge(self, pending: List[Route], primary: Route, inflight: Dict[Future, _Attempt],
+                      errors: List[BaseException]) -> bool:
+        """
+        在对冲预算内发对冲请求：优先下一条候选路线，没有时再打一次主路线
+        预算用完时不动 pending，留给故障转移；被熔断跳过的不占预算
+        """
+        with self._lock:
+            if self.hedges >= self.hedge_ratio * self.requests:
+                return False
+            self.hedges += 1
+        route = pending.pop(0) if pending else primary
+        if self._launch(route, "hedge", inflight, errors):
+            return True
+        with self._lock:
+            self.hedges -= 1
+        return False
+
+    def generate(self, routes: Sequence[Route], timeout: Optional[float] = None) -> Tuple[Dict[str, Any], Route]:
+        """
+        按顺序尝试候选路线，返回 (结果, 实际使用的路线)
+
+        Args:
+            routes: 按优先级排列的候选路线
+            timeout: 本次调用的时限（秒），与请求的截止时间取较早者
+
+        Raises:
+            ProviderTimeout: 截止时间内没有成功结果
+            ProviderError / 其它异常: 全部路线失败或被熔断时，抛最后一个错误
+        """
+        if not routes:
+            raise ValueError("至少需要一条路线")
+        now = time.monotonic()
+        deadline = _deadline.get()
+        if timeout is not None:
+            deadline = now + timeout if deadline is None else min(deadline, now + timeout)
+        with self._lock:
+            self.requests += 1
+
+        pending = list(routes)
+        inflight: Dict[Future, _Attempt] = {}
+        errors: List[BaseException] = []
+        hedge_at = primary = None
+        if self._launch_next(pending, "primary", inflight, errors) and self.hedge:
+            primary = next(iter(inflight.values())).route
+            hedge_at = now + self.hedge_delay(primary.provider)
+            if deadline is not None and hedge_at >= deadline:
+                hedge_at = None
+
+        while inflight or pending:
+            if not inflight:
+                if not self._launch_next(pending, "failover", inflight, errors):
+                    break
+                continue
+            now = time.monotonic()
+            wake = deadline
+            if hedge_at is not None:
+                wake = hedge_at if wake is None else min(wake, hedge_at)
+            done, _ = wait(list(inflight), None if wake is None else max(0.0, wake - now),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt = inflight.pop(future)
+                if future.exception() is None:
+                    return future.result(), attempt.route
+                errors.append(future.exception())
+            if done:
+                continue
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                # 截止时间可能来自客户端，不计入熔断；落后的尝试跑完后自己记录结果
+                for attempt in inflight.values():
+                    PROVIDER_ROUTER_EVENTS.inc(attempt.route.provider, "deadline")
+                raise ProviderTimeout(f"截止时间内没有结果（{', '.join(r.provider for r in routes)}）")
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                self._launch_hedge(pending, primary, inflight, errors)
+
+        if errors:
+            raise errors[-1]
+        raise ProviderError("没有可用的路线")
+
+
+router = ProviderRouter.from_env()
+
+
+def install(app):
+    """每个 Flask 请求按 X-Request-Timeout-Ms / ROUTER_REQUEST_TIMEOUT 设定截止时间"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_deadline():
+        budget = request_budget(request.headers.get(TIMEOUT_HEADER))
+        g._deadline_token = _deadline.set(time.monotonic() + budget)
+
+    @app.teardown_request
+    def _end_deadline(exc):
+        token = g.pop("_deadline_token", None)
+        if token is not None:
+            _deadline.reset(token)
+
+    return app
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+生成服务接口
+照片、面部融合模块原来直接调用 fal_client.subscribe / replicate.run，没有网络就跑不起来，
+任务队列、缓存、并发限制也没法离线测试。现在统一通过 providers.get(name) 取得服务对象：
+- FalProvider / ReplicateProvider：真实服务（客户端按需加载，见 feature_registry）
+- FakeProvider：本地假服务
+  * 返回确定性的占位图（SVG data URI，同样的模型和参数得到同样的图片）
+  * 按录制的延迟/错误分布回放（LatencyProfile）
+  * 可注入故障：超时、5xx、冷启动慢（Faults）
+
+GENERATION_PROVIDER=fake 时 get() 为每个服务名各返回一个假服务（调用计数、故障注入、随机序列互不影响，
+路由器的熔断和对冲仍按服务区分）；FAKE_PROVIDER_PROFILE 指向录制的分布文件，
+由 python providers.py record 从 METRICS_DIR 里各 worker 的指标快照生成。
+测试和基准测试用 providers.override(name, provider) 临时替换某个服务。
+
+generate() 统一经过 metrics.track_provider（耗时直方图、失败计数、链路追踪 span）。
+"""
+
+import abc
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from alias_sampling import AliasTable
+from feature_registry import features
+from metrics import track_provider
+
+PROVIDER_ENV = "GENERATION_PROVIDER"
+PROFILE_ENV = "FAKE_PROVIDER_PROFILE"
+SEED_ENV = "FAKE_PROVIDER_SEED"
+
+# fal 的 image_size 预设 -> 占位图尺寸
+IMAGE_SIZES = {
+    "square": (512, 512),
+    "square_hd": (1024, 1024),
+    "portrait_4_3": (768, 1024),
+    "portrait_16_9": (576, 1024),
+    "landscape_4_3": (1024, 768),
+    "landscape_16_9": (1024, 576),
+}
+
+
+class ProviderError(Exception):
+    """生成服务调用失败"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+class ProviderTimeout(ProviderError):
+    """生成服务调用超时"""
+
+    def __init__(self, message: str):
+        super().__init__(message, status=504, retryable=True)
+
+
+class Provider(abc.ABC):
+    """生成服务：generate() 返回 fal 格式的结果 {"images": [{"url": ...}, ...], ...}"""
+
+    name = "provider"
+
+    def available(self) -> bool:
+        """客户端依赖是否已安装"""
+        return True
+
+    def configured(self, api_key: Optional[str] = None) -> bool:
+        """依赖已安装且有密钥（api_key 为调用方自己持有的密钥）"""
+        return self.available()
+
+    def generate(self, operation: str, model: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        调用一次生成
+
+        Args:
+            operation: 操作名（指标标签、分布文件的键），如 flux_schnell
+            model: 服务端模型id，如 fal-ai/flux/schnell
+            arguments: 模型参数
+        """
+        with track_provider(self.name, operation):
+            return self._generate(operation, model, arguments)
+
+    @abc.abstractmethod
+    def _generate(self, operation: str, model: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """子类实现实际调用"""
+
+
+class FalProvider(Provider):
+    """fal.ai（fal_client.subscribe，密钥读 FAL_KEY）"""
+
+    name = "fal"
+
+    def available(self) -> bool:
+        return features.available("fal")
+
+    def configured(self, api_key: Optional[str] = None) -> bool:
+        return self.available() and bool(api_key or os.environ.get("FAL_KEY"))
+
+    def _generate(self, operation, model, arguments):
+        return features.get("fal").subscribe(model, arguments=arguments)
+
+
+class ReplicateProvider(Provider):
+    """Replicate（replicate.run，密钥读 REPLICATE_API_TOKEN），输出统一成 fal 格式"""
+
+    name = "replicate"
+
+    def available(self) -> bool:
+        return features.available("replicate")
+
+    def configured(self, api_key: Optional[str] = None) -> bool:
+        return self.available() and bool(api_key or os.environ.get("REPLICATE_API_TOKEN"))
+
+    def _generate(self, operation, model, arguments):
+        output = features.get("replicate").run(model, input=arguments)
+        return {"images": [{"url": str(item)} for item in output]}
+
+
+# ---------- 假服务 ----------
+
+@dataclass
+class LatencyProfile:
+    """
+    一个操作的延迟/错误分布
+    samples 为录制的原始耗时（秒），直接回放；否则按直方图 buckets [(桶上界秒, 次数), ...]
+    抽桶（别名表），在桶内均匀取值。都没有时延迟为 0。
+    """
+    buckets: Tuple[Tuple[float, int], ...] = ()
+    samples: Tuple[float, ...] = ()
+    error_rate: float = 0.0
+    _table: Optional[AliasTable] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.buckets = tuple((float(upper), int(count)) for upper, count in self.buckets)
+        self.samples = tuple(float(s) for s in self.samples)
+        weights = [count for _, count in self.buckets]
+        if any(weights):
+            self._table = AliasTable.build(list(range(len(weights))), weights)
+
+    def sample(self, rand: Callable[[], float] = random.random) -> float:
+        """抽一次延迟（秒）"""
+        if self.samples:
+            return self.samples[int(rand() * len(self.samples))]
+        if self._table is None:
+            return 0.0
+        index = self._table.draw(rand)
+        lower = self.buckets[index - 1][0] if index else 0.0
+        upper = self.buckets[index][0]
+        if math.isinf(upper):
+            upper = lower * 2
+        return lower + (upper - lower) * rand()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyProfile":
+        return cls(buckets=tuple(tuple(b) for b in data.get("buckets", ())),
+                   samples=tuple(data.get("samples", ())),
+                   error_rate=data.get("error_rate", 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"error_rate": self.error_rate}
+        if self.samples:
+            data["samples"] = list(self.samples)
+        if self.buckets:
+            data["buckets"] = [list(b) for b in self.buckets]
+        return data
+
+
+@dataclass
+class Faults:
+    """
+    故障注入（可以在运行中修改）
+    - timeout_rate：按概率超时，等满 timeout_s 后抛 ProviderTimeout；抽到的延迟超过 timeout_s 时同样超时
+    - error_rate：按概率返回 5xx（status），在录制的错误率之外额外叠加
+    - slow_start_calls / slow_start_s：前 N 次调用额外慢 slow_start_s 秒（冷启动），加上后超过 timeout_s 同样超时
+    """
+    timeout_rate: float = 0.0
+    timeout_s: float = 120.0
+    error_rate: float = 0.0
+    status: int = 503
+    slow_start_calls: int = 0
+    slow_start_s: float = 0.0
+
+
+def _svg_placeholder(label: str, digest: bytes, width: int, height: int) -> str:
+    color = digest[:3].hex()
+    svg = (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">'
+           f'<rect width="100%" height="100%" fill="#{color}"/>'
+           f'<text x="50%" y="50%" font-size="{max(12, width // 20)}" text-anchor="middle" '
+           f'fill="#fff">{label}</text></svg>')
+    return "data:image/svg+xml;base64," + base64.b64encode(svg.encode()).decode()
+
+
+def placeholder_images(operation: str, model: str, arguments: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+    """确定性占位图：同样的模型和参数得到同样的图片和 seed"""
+    key = json.dumps([model, arguments], sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(key.encode()).digest()
+    size = arguments.get("image_size")
+    if isinstance(size, dict):
+        width, height = int(size.get("width", 512)), int(size.get("height", 512))
+    else:
+        width, height = IMAGE_SIZES.get(size, (512, 512))
+    count = arguments.get("num_images") or arguments.get("num_outputs") or 1
+    images = []
+    for i in range(count):
+        image_digest = hashlib.sha256(digest + bytes([i % 256])).digest()
+        images.append({"url": _svg_placeholder(f"{operation} #{i + 1}", image_digest, width, height),
+                       "width": width, "height": height, "content_type": "image/svg+xml"})
+    return images, int.from_bytes(digest[:4], "big")
+
+
+class FakeProvider(Provider):
+    """本地假服务：占位图 + 回放延迟/错误分布 + 故障注入，不访问网络"""
+
+    name = "fake"
+
+    def __init__(self, profiles: Optional[Dict[str, LatencyProfile]] = None, faults: Optional[Faults] = None,
+                 seed: int = 0, sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            profiles: 操作名 -> 延迟/错误分布，"*" 为其它操作的默认分布
+            faults: 故障注入配置
+            seed: 随机种子（同样的种子、同样的调用顺序得到同样的延迟和故障）
+            sleep: 等待函数，测试里可以换成只记录不等待的假函数
+        """
+        self.profiles = dict(profiles or {})
+        self.faults = faults or Faults()
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def profile(self, operation: str) -> LatencyProfile:
+        return self.profiles.get(operation) or self.profiles.get("*") or LatencyProfile()
+
+    def _generate(self, operation, model, arguments):
+        faults = self.faults
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            rand = self._rng.random
+            profile = self.profile(operation)
+            latency = profile.sample(rand)
+            if call <= faults.slow_start_calls:
+                latency += faults.slow_start_s
+            timed_out = rand() < faults.timeout_rate or latency > faults.timeout_s
+            failed = rand() < profile.error_rate or rand() < faults.error_rate
+        if timed_out:
+            self._sleep(faults.timeout_s)
+            raise ProviderTimeout(f"{model} 超时（{faults.timeout_s:g}s）")
+        self._sleep(latency)
+        if failed:
+            raise ProviderError(f"{model} 返回 {faults.status}", status=faults.status,
+                                retryable=faults.status >= 500)
+        images, seed = placeholder_images(operation, model, arguments)
+        return {"images": images, "seed": seed, "timings": {"inference": round(latency, 6)}}
+
+
+def load_profiles(path: str) -> Dict[str, LatencyProfile]:
+    """读取分布文件：{操作名: {"buckets": [[上界秒, 次数], ...] 或 "samples": [...], "error_rate": ...}}"""
+    with open(path, encoding="utf-8") as f:
+        return {operation: LatencyProfile.from_dict(data) for operation, data in json.load(f).items()}
+
+
+def record_profiles(collected: Optional[Dict[str, dict]] = None) -> Dict[str, LatencyProfile]:
+    """
+    从指标（默认 metrics.registry.collect() 合并全部 worker）生成各操作的分布，
+    跳过假服务自己产生的数据；不同服务的同名操作合并
+    """
+    if collected is None:
+        from metrics import registry
+        collected = registry.collect()
+    latency = collected.get("provider_request_duration_seconds")
+    if not latency:
+        return {}
+    errors = collected.get("provider_errors_total", {}).get("samples", {})
+    uppers = list(latency["buckets"]) + [math.inf]
+    counts: Dict[str, List[int]] = {}
+    failures: Dict[str, float] = {}
+    for (provider, operation), values in latency["samples"].items():
+        if provider == FakeProvider.name:
+            continue
+        merged = counts.setdefault(operation, [0] * len(uppers))
+        for i, count in enumerate(values[:len(uppers)]):
+            merged[i] += int(count)
+        failures[operation] = failures.get(operation, 0) + errors.get((provider, operation), 0)
+    profiles = {}
+    for operation, merged in counts.items():
+        total = sum(merged)
+        if total:
+            profiles[operation] = LatencyProfile(
+                buckets=tuple((upper, count) for upper, count in zip(uppers, merged)),
+                error_rate=round(failures[operation] / total, 4))
+    return profiles
+
+
+def fake_from_env(name: str = "") -> FakeProvider:
+    """
+    按 FAKE_PROVIDER_PROFILE / FAKE_PROVIDER_SEED 构造假服务
+    name 为替代的服务名，种子按服务名错开，各服务的延迟和故障序列互不相同
+    """
+    path = os.environ.get(PROFILE_ENV)
+    seed = int(os.environ.get(SEED_ENV, "0"))
+    if name:
+        seed += zlib.crc32(name.encode())
+    return FakeProvider(profiles=load_profiles(path) if path else None, seed=seed)
+
+
+class ProviderRegistry:
+    """服务名 -> 服务对象（第一次 get 时构造）"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Provider]] = {}
+        self._instances: Dict[str, Provider] = {}
+        self._fakes: Dict[str, Provider] = {}
+        self._overrides: Dict[str, Provider] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Provider]):
+        if name in self._factories:
+            raise ValueError(f"服务已登记: {name}")
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Provider:
+        """取出服务：先看临时替换，GENERATION_PROVIDER=fake 时返回该服务名专属的假服务"""
+        provider = self._overrides.get(name)
+        if provider is not None:
+            return provider
+        instances, factory = self._instances, self._factories.get(name)
+        if os.environ.get(PROVIDER_ENV) == FakeProvider.name and name != FakeProvider.name:
+            instances, factory = self._fakes, (lambda: fake_from_env(name)) if factory else None
+        provider = instances.get(name)
+        if provider is None:
+            if factory is None:
+                raise KeyError(f"未登记的服务: {name}")
+            with self._lock:
+                provider = instances.get(name)
+                if provider is None:
+                    provider = instances[name] = factory()
+        return provider
+
+    @contextmanager
+    def override(self, name: str, provider: Provider) -> Iterator[Provider]:
+        """临时把某个服务换成 provider（测试、基准测试用）"""
+        previous = self._overrides.get(name)
+        self._overrides[name] = provider
+        try:
+            yield provider
+        finally:
+            if previous is None:
+                self._overrides.pop(name, None)
+            else:
+                self._overrides[name] = previous
+
+
+providers = ProviderRegistry()
+providers.register("fal", FalProvider)
+providers.register("replicate", ReplicateProvider)
+providers.register("fake", fake_from_env)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="生成服务分布录制（读取 METRICS_DIR 下的指标快照）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    record = sub.add_parser("record", help="把各操作的耗时直方图和错误率写成 FAKE_PROVIDER_PROFILE 文件")
+    record.add_argument("--out", default="provider_profiles.json")
+    args = parser.parse_args()
+
+    profiles = record_profiles()
+    if not profiles:
+        print("⚠️ 没有生成服务的调用记录（检查 METRICS_DIR）")
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({op: p.to_dict() for op, p in profiles.items()}, f, ensure_ascii=False, indent=2)
+        for operation, profile in profiles.items():
+            total = sum(count for _, count in profile.buckets)
+            print(f"📼 {operation}: {total} 次调用，错误率 {profile.error_rate:.1%}")
+        print(f"💾 已写入 {args.out}，使用：GENERATION_PROVIDER=fake {PROFILE_ENV}={args.out}")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+按需请求剖析
+线上某个路由（/upload-and-generate、/game/status ……）变慢时，对单个请求开启剖析，
+不需要重启、也不影响其它请求。
+
+开启方式（环境变量，都不设置时不挂任何钩子，零开销）：
+- PROFILE_SECRET：允许带签名令牌的请求触发剖析。令牌绑定请求路径并带过期时间，
+  放在 X-Profile-Token 请求头或 _profile 查询参数里，用
+  python request_profiler.py token /game/status 生成
+- PROFILE_SAMPLE_RATE：按比例随机剖析请求（如 0.001）
+- PROFILE_MODE：sample（默认，统计采样）或 cprofile（确定性），
+  单个请求可用 X-Profile-Mode 头 / _profile_mode 参数覆盖
+- PROFILE_DIR / PROFILE_MAX：剖析结果目录（默认系统临时目录）与最多保留的份数
+
+每份剖析保存为 <id>.json（路由、耗时、状态码等）加上：
+- sample：<id>.folded，火焰图折叠栈格式（flamegraph.pl / speedscope 可直接打开）
+- cprofile：<id>.pstats，可用 pstats / snakeviz 查看；元数据里附累计耗时最高的函数
+超过 PROFILE_MAX 份时删除最旧的，各 worker 共用同一个目录。
+
+GET /debug/profiles 列出剖析结果，GET /debug/profiles/<id>/<folded|pstats> 下载，
+两者都需要为 /debug/profiles 签发的令牌，否则返回 404。
+
+注意：
+- 流式响应（/game/watch 等）只剖析到视图函数返回为止
+- 采样间隔 5ms，比这更短的请求没有样本，改用 cprofile
+- 同一进程同时只能有一个 cProfile 在运行（3.12 起第二个 enable() 直接报错），
+  另一个请求正在 cprofile 剖析时，新的剖析改用 sample
+"""
+
+import cProfile
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+TOKEN_HEADER = "X-Profile-Token"
+TOKEN_PARAM = "_profile"
+MODE_HEADER = "X-Profile-Mode"
+MODE_PARAM = "_profile_mode"
+MODES = ("sample", "cprofile")
+DEBUG_PATH = "/debug/profiles"
+SAMPLE_INTERVAL = 0.005       # 采样间隔（秒），200 Hz
+TOP_FUNCTIONS = 25
+
+_PROFILE_ID = re.compile(r"^[0-9]+-[0-9]+-[0-9a-f]{6}$")
+_cprofile_lock = threading.Lock()   # 进程内同时只允许一个 cProfile
+
+
+def sign(secret: str, path: str, expires: int) -> str:
+    """签发令牌：过期时间戳.HMAC(路径:过期时间)"""
+    digest = hmac.new(secret.encode(), f"{path}:{expires}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{digest[:32]}"
+
+
+class StackSampler:
+    """统计采样：后台线程定时读取目标线程的调用栈，按折叠栈计数"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """剖析结果目录，最多保留 max_profiles 份"""
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        os.makedirs(directory, exist_ok=True)
+
+    def new_id(self) -> str:
+        return f"{int(time.time() * 1000):013d}-{os.getpid()}-{os.urandom(3).hex()}"
+
+    def path(self, profile_id: str, kind: str) -> Optional[str]:
+        """结果文件路径；id 不合法或文件不存在时返回 None"""
+        if not _PROFILE_ID.match(profile_id) or kind not in ("json", "folded", "pstats"):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{kind}")
+        return path if os.path.exists(path) else None
+
+    def save(self, meta: dict, folded: Optional[str] = None, profile: Optional[cProfile.Profile] = None):
+        base = os.path.join(self.directory, meta["id"])
+        if folded is not None:
+            with open(f"{base}.folded", "w") as f:
+                f.write(folded)
+        if profile is not None:
+            profile.dump_stats(f"{base}.pstats")
+        # 元数据最后写（原子替换），列表里出现的剖析文件一定是完整的
+        with open(f"{base}.json.tmp", "w") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(f"{base}.json.tmp", f"{base}.json")
+        self.prune()
+
+    def _ids(self) -> List[str]:
+        try:
+            return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def prune(self):
+        ids = self._ids()
+        for profile_id in ids[:max(0, len(ids) - self.max_profiles)]:
+            for kind in ("json", "folded", "pstats"):
+                try:
+                    os.remove(os.path.join(self.directory, f"{profile_id}.{kind}"))
+                except FileNotFoundError:
+                    pass   # 其它 worker 已经删掉了
+
+    def list(self) -> List[dict]:
+        """全部剖析的元数据，最新的在前"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+
+class ActiveProfile:
+    """一次正在进行的剖析"""
+
+    def __init__(self, mode: str, trigger: str):
+        self.mode = mode
+        self.trigger = trigger
+        self.start = time.perf_counter()
+        self.sampler: Optional[StackSampler] = None
+        self.profile: Optional[cProfile.Profile] = None
+        if mode == "cprofile" and _cprofile_lock.acquire(blocking=False):
+            try:
+                self.profile = cProfile.Profile()
+                self.profile.enable()
+            except ValueError:   # 调试器等其它剖析工具占用中
+                self.profile = None
+                _cprofile_lock.release()
+        if self.profile is None:
+            self.mode = "sample"   # cProfile 忙时退回统计采样
+            self.sampler = StackSampler(threading.get_ident())
+            self.sampler.start()
+
+    def stop(self) -> float:
+        if self.profile is not None:
+            self.profile.disable()
+            _cprofile_lock.release()
+        if self.sampler is not None:
+            self.sampler.stop()
+        return time.perf_counter() - self.start
+
+
+class RequestProfiler:
+    """决定哪些请求要剖析，并保存结果"""
+
+    def __init__(self, secret: Optional[str] = None, sample_rate: float = 0.0, mode: str = "sample",
+                 directory: Optional[str] = None, max_profiles: int = 50,
+                 clock: Callable[[], float] = time.time):
+        if mode not in MODES:
+            raise ValueError(f"未知的剖析方式: {mode}")
+        self.secret = secret or None
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "babysitter-profiles")
+        self.max_profiles = max_profiles
+        self.clock = clock
+        self._store: Optional[ProfileStore] = None
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "RequestProfiler":
+        return cls(secret=environ.get("PROFILE_SECRET"),
+                   sample_rate=float(environ.get("PROFILE_SAMPLE_RATE") or 0),
+                   mode=environ.get("PROFILE_MODE") or "sample",
+                   directory=environ.get("PROFILE_DIR"),
+                   max_profiles=int(environ.get("PROFILE_MAX") or 50))
+
+    @property
+    def enabled(self) -> bool:
+        return self.secret is not None or self.sample_rate > 0
+
+    @property
+    def store(self) -> ProfileStore:
+        if self._store is None:
+            self._store = ProfileStore(self.directory, self.max_profiles)
+        return self._store
+
+    # ---------- 触发 ----------
+
+    def make_token(self, path: str, ttl: int = 3600) -> str:
+        if self.secret is None:
+            raise ValueError("没有设置 PROFILE_SECRET")
+        return sign(self.secret, path, int(self.clock()) + ttl)
+
+    def verify(self, token: Optional[str], path: str) -> bool:
+        if not token or self.secret is None:
+            return False
+        expires, _, _ = token.partition(".")
+        if not expires.isdigit() or int(expires) < self.clock():
+            return False
+        return hmac.compare_digest(token, sign(self.secret, path, int(expires)))
+
+    def authorized(self, req, path: str) -> bool:
+        return self.verify(req.headers.get(TOKEN_HEADER) or req.args.get(TOKEN_PARAM), path)
+
+    def should_profile(self, req) -> Optional[str]:
+        """需要剖析时返回触发方式（token / sample），否则 None"""
+        if self.secret is not None:
+            token = req.headers.get(TOKEN_HEADER) or req.args.get(TOKEN_PARAM)
+            if token and self.verify(token, req.path):
+                return "token"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def start(self, req, trigger: str) -> ActiveProfile:
+        mode = req.headers.get(MODE_HEADER) or req.args.get(MODE_PARAM) or self.mode
+        return ActiveProfile(mode if mode in MODES else self.mode, trigger)
+
+    # ---------- 保存 ----------
+
+    def finish(self, active: ActiveProfile, req, status: int) -> str:
+        seconds = active.stop()
+        meta = {
+            "id": self.store.new_id(),
+            "created": self.clock(),
+            "pid": os.getpid(),
+            "method": req.method,
+            "path": req.path,
+            "route": req.url_rule.rule if getattr(req, "url_rule", None) is not None else None,
+            "status": status,
+            "duration_ms": round(seconds * 1000, 3),
+            "mode": active.mode,
+            "trigger": active.trigger,
+        }
+        if active.sampler is not None:
+            meta["samples"] = sum(active.sampler.stacks.values())
+            meta["files"] = ["folded"]
+            self.store.save(meta, folded=active.sampler.folded())
+        else:
+            meta["top"] = top_functions(active.profile)
+            meta["files"] = ["pstats"]
+            self.store.save(meta, profile=active.profile)
+        return meta["id"]
+
+
+def top_functions(profile: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> List[Dict]:
+    """累计耗时最高的函数"""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({"function": f"{name} ({os.path.basename(filename)}:{line})", "calls": calls,
+                     "total_ms": round(total * 1000, 3), "cumulative_ms": round(cumulative * 1000, 3)})
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:limit]
+
+
+def install(app, profiler: Optional[RequestProfiler] = None) -> RequestProfiler:
+    """给 Flask 应用挂上剖析钩子和 /debug/profiles；没有开启时什么都不挂"""
+    profiler = profiler or RequestProfiler.from_env()
+    if not profiler.enabled:
+        return profiler
+
+    from flask import Response, g, jsonify, request, send_file
+
+    @app.before_request
+    def _start_profile():
+        trigger = profiler.should_profile(request)
+        if trigger is not None:
+            g._profile = profiler.start(request, trigger)
+
+    @app.after_request
+    def _finish_profile(response):
+        active = g.pop("_profile", None)
+        if active is not None:
+            response.headers["X-Profile-Id"] = profiler.finish(active, request, response.status_code)
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        active = g.pop("_profile", None)
+        if active is not None:   # 视图抛出异常，没有走到 after_request
+            profiler.finish(active, request, 500)
+
+    @app.route(DEBUG_PATH)
+    def list_profiles():
+        if not profiler.authorized(request, DEBUG_PATH):
+            return Response(status=404)
+        return jsonify({"profiles": profiler.store.list()})
+
+    @app.route(f"{DEBUG_PATH}/<profile_id>/<kind>")
+    def download_profile(profile_id, kind):
+        path = profiler.store.path(profile_id, kind) if profiler.authorized(request, DEBUG_PATH) else None
+        if path is None:
+            return Response(status=404)
+        return send_file(path, mimetype="text/plain" if kind == "folded" else "application/octet-stream",
+                         as_attachment=kind == "pstats")
+
+    return profiler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="生成剖析令牌（使用环境变量 PROFILE_SECRET）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    token = sub.add_parser("token", help="为某个路径签发令牌")
+    token.add_argument("path", help="请求路径，如 /game/status；列出结果用 /debug/profiles")
+    token.add_argument("--ttl", type=int, default=3600, help="有效期（秒）")
+    args = parser.parse_args()
+    print(RequestProfiler.from_env().make_token(args.path, args.ttl))
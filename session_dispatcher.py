@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+"""
+会话分片调度器
+在 gunicorn 前面运行的轻量HTTP转发进程：启动 N 个单 worker 的 gunicorn 实例，
+各自监听一个 Unix socket；按会话id做一致性哈希，把请求转发给拥有该会话的 worker。
+会话状态常驻在所属 worker 的内存中，不需要跨 worker 读取共享存储。
+
+扩缩容（与 gunicorn 相同的信号约定）：
+    kill -TTIN <调度器pid>   增加一个 worker
+    kill -TTOU <调度器pid>   减少一个 worker
+一致性哈希保证只有约 1/N 的会话换主；这些会话通过 worker 的内部接口
+（/internal/sessions/release → /internal/sessions/adopt，数据为 state_codec.encode_game）
+迁移到新 worker，迁移期间发往这些会话的请求会暂时等待。
+单个会话迁移失败不影响其它会话：交出失败的会话固定路由到原 worker，接管失败的会话
+退回原 worker；连原 worker 也接不回时保留编码数据，下次请求到来时交给当前所属 worker。
+
+用法：
+    python session_dispatcher.py --workers 4 --port 8000
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import posixpath
+import signal
+import subprocess
+import sys
+import tempfile
+from hashlib import md5
+from http.cookies import CookieError, SimpleCookie
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote
+
+from game_sessions import DEFAULT_SESSION_ID, SESSION_COOKIE, SESSION_HEADER, SESSION_QUERY_PARAM
+
+MAX_HEAD_BYTES = 64 * 1024
+INTERNAL_PREFIX = "/internal/"
+
+
+# ==================== 一致性哈希环 ====================
+
+def _hash(key: str) -> int:
+    return int.from_bytes(md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """带虚拟节点的一致性哈希环"""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 160):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def node_for(self, key: str) -> str:
+        """顺时针找到第一个虚拟节点"""
+        if not self._points:
+            raise LookupError("哈希环为空")
+        index = bisect.bisect(self._points, _hash(key))
+        return self._owners[index % len(self._points)]
+
+    def copy(self) -> "HashRing":
+        ring = HashRing(vnodes=self.vnodes)
+        ring.nodes = list(self.nodes)
+        ring._points = list(self._points)
+        ring._owners = list(self._owners)
+        return ring
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+# ==================== HTTP 辅助 ====================
+
+def parse_head(head: bytes) -> Tuple[str, List[Tuple[str, str]]]:
+    """拆出起始行和头部列表（保持原顺序和大小写）"""
+    lines = head.decode("latin-1").split("\r\n")
+    headers = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, _, value = line.partition(":")
+        headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+
+def header_value(headers: List[Tuple[str, str]], name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def build_head(start_line: str, headers: List[Tuple[str, str]]) -> bytes:
+    lines = [start_line] + [f"{name}: {value}" for name, value in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def session_id_for(target: str, headers: List[Tuple[str, str]]) -> str:
+    """与 game_sessions.resolve_session_id 相同的查找顺序：查询参数、请求头、Cookie"""
+    query = parse_qs(target.partition("?")[2])
+    if query.get(SESSION_QUERY_PARAM, [""])[0]:
+        return query[SESSION_QUERY_PARAM][0]
+    value = header_value(headers, SESSION_HEADER)
+    if value:
+        return value
+    cookie_header = header_value(headers, "Cookie")
+    if cookie_header:
+        try:
+            cookie = SimpleCookie(cookie_header)
+        except CookieError:
+            cookie = {}
+        if SESSION_COOKIE in cookie and cookie[SESSION_COOKIE].value:
+            return cookie[SESSION_COOKIE].value
+    return DEFAULT_SESSION_ID
+
+
+def is_internal(target: str) -> bool:
+    """按 worker 解码后的路径判断（防止 %69nternal、//internal 之类绕过）"""
+    path = posixpath.normpath("/" + unquote(target.split("?", 1)[0]).lstrip("/"))
+    return (path + "/").startswith(INTERNAL_PREFIX)
+
+
+_HOP_BY_HOP = {"connection", "keep-alive", "proxy-connection", "te", "trailer", "upgrade"}
+
+
+def _simple_response(status: str, body: bytes = b"", keep_alive: bool = False) -> bytes:
+    return build_head(f"HTTP/1.1 {status}", [
+        ("Content-Type", "text/plain; charset=utf-8"),
+        ("Content-Length", str(len(body))),
+        ("Connection", "keep-alive" if keep_alive else "close"),
+    ]) + body
+
+
+# ==================== 调度器 ====================
+
+class SessionDispatcher:
+    """按会话id把请求转发到所属 worker 的 Unix socket"""
+
+    def __init__(self, worker_sockets: Iterable[str], vnodes: int = 160):
+        self.ring = HashRing(worker_sockets, vnodes)
+        self._routing = asyncio.Event()          # 再平衡统计会话分布期间暂停路由
+        self._routing.set()
+        self._migrating: Dict[str, asyncio.Event] = {}
+        self._pinned: Dict[str, str] = {}       # 迁移失败、暂留在原 worker 的会话 -> worker
+        self._stranded: Dict[str, bytes] = {}   # 交出后没有 worker 接住的会话 -> 编码数据
+        self._inflight = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._rebalance_lock = asyncio.Lock()
+        self.requests = 0
+        self.migrated = 0
+
+    # ---------- 客户端连接 ----------
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个客户端连接（支持 keep-alive）"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(_simple_response("431 Request Header Fields Too Large"))
+                    break
+                request_line, headers = parse_head(head)
+                parts = request_line.split(" ")
+                if len(parts) != 3:
+                    writer.write(_simple_response("400 Bad Request"))
+                    break
+                method, target, version = parts
+                if header_value(headers, "Transfer-Encoding"):
+                    writer.write(_simple_response("411 Length Required"))
+                    break
+                length = header_value(headers, "Content-Length") or "0"
+                if not length.isdigit():
+                    writer.write(_simple_response("400 Bad Request"))
+                    break
+                body = await reader.readexactly(int(length))
+                connection = (header_value(headers, "Connection") or "").lower()
+                keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+
+                if is_internal(target):
+                    writer.write(_simple_response("403 Forbidden", keep_alive=keep_alive))
+                    await writer.drain()
+                    if keep_alive:
+                        continue
+                    break
+
+                keep_alive = await self.forward(request_line, target, headers, body, writer, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def forward(self, request_line: str, target: str, headers: List[Tuple[str, str]],
+                      body: bytes, writer: asyncio.StreamWriter, keep_alive: bool) -> bool:
+        """转发一个请求并把响应流式写回客户端，返回连接是否可以继续复用"""
+        session_id = session_id_for(target, headers)
+        while True:
+            await self._routing.wait()
+            migrating = self._migrating.get(session_id)
+            if migrating is not None:
+                await migrating.wait()
+            elif session_id in self._stranded:
+                if not await self._restore(session_id):
+                    writer.write(_simple_response("503 Service Unavailable", b"session migration pending",
+                                                  keep_alive))
+                    await writer.drain()
+                    return keep_alive
+            else:
+                break
+
+        # 从这里到计入 inflight 之间没有 await，再平衡不会漏掉这个请求
+        worker = self._pinned.get(session_id) or self.ring.node_for(session_id)
+        self._inflight += 1
+        self._drained.clear()
+        self.requests += 1
+        counted = True
+        try:
+            try:
+                up_reader, up_writer = await asyncio.open_unix_connection(worker, limit=MAX_HEAD_BYTES)
+            except OSError:
+                writer.write(_simple_response("502 Bad Gateway", b"worker unavailable", keep_alive))
+                await writer.drain()
+                return keep_alive
+            try:
+                upstream_headers = [(k, v) for k, v in headers if k.lower() not in _HOP_BY_HOP]
+                upstream_headers.append(("Connection", "close"))
+                up_writer.write(build_head(request_line, upstream_headers) + body)
+                await up_writer.drain()
+
+                status_line, response_headers = parse_head(await up_reader.readuntil(b"\r\n\r\n"))
+                framed = (header_value(response_headers, "Content-Length") is not None
+                          or header_value(response_headers, "Transfer-Encoding") is not None)
+                keep_alive = keep_alive and framed
+                response_headers = [(k, v) for k, v in response_headers if k.lower() not in _HOP_BY_HOP]
+                response_headers.append(("Connection", "keep-alive" if keep_alive else "close"))
+                writer.write(build_head(status_line, response_headers))
+                if (header_value(response_headers, "Content-Type") or "").startswith("text/event-stream"):
+                    # SSE 是长连接推送，不能让再平衡一直等它结束
+                    counted = False
+                    self._release_inflight()
+
+                # worker 收到 Connection: close，响应结束后会关闭连接
+                while True:
+                    chunk = await up_reader.read(65536)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    await writer.drain()
+                return keep_alive
+            finally:
+                up_writer.close()
+        finally:
+            if counted:
+                self._release_inflight()
+
+    def _release_inflight(self):
+        self._inflight -= 1
+        if not self._inflight:
+            self._drained.set()
+
+    # ---------- 内部接口 ----------
+
+    async def _call(self, worker: str, method: str, path: str, body: bytes = b"") -> Tuple[int, bytes]:
+        reader, writer = await asyncio.open_unix_connection(worker)
+        try:
+            writer.write(build_head(f"{method} {path} HTTP/1.1", [
+                ("Host", "dispatcher"),
+                ("Content-Length", str(len(body))),
+                ("Content-Type", "application/octet-stream"),
+                ("Connection", "close"),
+            ]) + body)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        head, _, payload = response.partition(b"\r\n\r\n")
+        status_line, headers = parse_head(head + b"\r\n\r\n")
+        length = header_value(headers, "Content-Length")
+        if length is not None:
+            payload = payload[:int(length)]
+        return int(status_line.split(" ")[1]), payload
+
+    async def _list_sessions(self, worker: str) -> List[str]:
+        status, payload = await self._call(worker, "GET", "/internal/sessions")
+        if status != 200:
+            raise RuntimeError(f"无法获取 {worker} 的会话列表: HTTP {status}")
+        return json.loads(payload)["sessions"]
+
+    async def _adopt(self, worker: str, session_id: str, data: bytes) -> bool:
+        query = f"?{SESSION_QUERY_PARAM}={quote(session_id, safe='')}"
+        try:
+            status, _ = await self._call(worker, "POST", "/internal/sessions/adopt" + query, data)
+        except Exception as e:
+            print(f"⚠️ {worker} 接管会话 {session_id} 失败: {e}")
+            return False
+        if status >= 300:
+            print(f"⚠️ {worker} 接管会话 {session_id} 失败: HTTP {status}")
+            return False
+        return True
+
+    async def _move(self, session_id: str, source: str, target: str) -> bool:
+        """迁移一个会话；失败时会话留在原 worker（固定路由过去），不抛异常"""
+        query = f"?{SESSION_QUERY_PARAM}={quote(session_id, safe='')}"
+        try:
+            status, data = await self._call(source, "POST", "/internal/sessions/release" + query)
+        except Exception as e:
+            status, data = str(e), b""
+        if status == 404:
+            return False   # 已不在内存中（例如刚被休眠），新主会从休眠目录恢复
+        if status != 200:
+            print(f"⚠️ {source} 交出会话 {session_id} 失败: {status}，暂留原 worker")
+            self._pinned[session_id] = source
+            return False
+        if await self._adopt(target, session_id, data):
+            self._pinned.pop(session_id, None)
+            return True
+        # 已从原 worker 移除：退回原 worker，状态不能丢
+        if await self._adopt(source, session_id, data):
+            self._pinned[session_id] = source
+        else:
+            self._pinned.pop(session_id, None)
+            self._stranded[session_id] = data
+        return False
+
+    async def _restore(self, session_id: str) -> bool:
+        """把没有 worker 接住的会话交给当前所属 worker（期间该会话的其它请求等待）"""
+        event = self._migrating[session_id] = asyncio.Event()
+        try:
+            data = self._stranded.get(session_id)
+            if data is None:
+                return True
+            if not await self._adopt(self.ring.node_for(session_id), session_id, data):
+                return False
+            del self._stranded[session_id]
+            return True
+        finally:
+            self._migrating.pop(session_id, None)
+            event.set()
+
+    def pinned(self, worker: str) -> List[str]:
+        """迁移失败、仍留在该 worker 上的会话"""
+        return [session_id for session_id, owner in self._pinned.items() if owner == worker]
+
+    # ---------- 扩缩容 ----------
+
+    async def add_worker(self, worker: str) -> int:
+        """加入 worker 并迁移换主的会话，返回迁移数量"""
+        async with self._rebalance_lock:
+            previous = self.ring.copy()
+            self.ring.add(worker)
+            return await self._rebalance(previous)
+
+    async def remove_worker(self, worker: str) -> int:
+        """移出 worker（其会话迁移到新主后才可停止该进程），返回迁移数量"""
+        async with self._rebalance_lock:
+            previous = self.ring.copy()
+            self.ring.remove(worker)
+            return await self._rebalance(previous)
+
+    async def _rebalance(self, previous: HashRing) -> int:
+        # 暂停路由并等待进行中的请求结束，再统计需要换主的会话
+        self._routing.clear()
+        try:
+            await self._drained.wait()
+            moves = []
+            # 之前迁移失败的会话可能留在已移出哈希环的 worker 上，一并重试
+            leftover = [worker for worker in dict.fromkeys(self._pinned.values()) if worker not in previous.nodes]
+            for worker in list(previous.nodes) + leftover:
+                for session_id in await self._list_sessions(worker):
+                    target = self.ring.node_for(session_id)
+                    if target != worker:
+                        moves.append((session_id, worker, target))
+                    elif self._pinned.get(session_id) == worker:
+                        del self._pinned[session_id]   # 又回到了所属 worker
+            for session_id, _, _ in moves:
+                self._migrating[session_id] = asyncio.Event()
+        except BaseException:
+            self.ring = previous   # 统计失败，还没有迁移任何会话，恢复原来的哈希环
+            raise
+        finally:
+            self._routing.set()
+
+        moved = 0
+        try:
+            for session_id, source, target in moves:
+                moved += await self._move(session_id, source, target)
+                self._migrating.pop(session_id).set()
+        finally:
+            # 异常或取消时也要放行所有还在等待的会话
+            for session_id, _, _ in moves:
+                event = self._migrating.pop(session_id, None)
+                if event is not None:
+                    event.set()
+        self.migrated += moved
+        return moved
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "workers": list(self.ring.nodes),
+            "requests": self.requests,
+            "inflight": self._inflight,
+            "migrated": self.migrated,
+            "pinned": len(self._pinned),
+            "stranded": len(self._stranded),
+        }
+
+
+# ==================== worker 进程管理 ====================
+
+def spawn_worker(socket_path: str, app: str = "main:app", timeout: int = 120) -> subprocess.Popen:
+    """启动监听 Unix socket 的单 worker gunicorn（会话只在这个进程里）"""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    env = dict(os.environ, GAME_SHARD_MODE="1")
+    return subprocess.Popen([
+        sys.executable, "-m", "gunicorn", app,
+        "--bind", f"unix:{socket_path}",
+        "--workers", "1",
+        "--timeout", str(timeout),
+    ], env=env)
+
+
+async def wait_for_socket(socket_path: str, timeout: float = 30.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_unix_connection(socket_path)
+            writer.close()
+            return
+        except OSError:
+            if loop.time() > deadline:
+                raise TimeoutError(f"worker 未就绪: {socket_path}")
+            await asyncio.sleep(0.1)
+
+
+async def run(workers: int, host: str, port: int, socket_dir: str, app: str):
+    processes: Dict[str, subprocess.Popen] = {}
+    counter = 0
+
+    def next_socket() -> str:
+        nonlocal counter
+        counter += 1
+        return os.path.join(socket_dir, f"worker-{counter}.sock")
+
+    for _ in range(workers):
+        path = next_socket()
+        processes[path] = spawn_worker(path, app)
+    for path in processes:
+        await wait_for_socket(path)
+
+    dispatcher = SessionDispatcher(processes)
+    server = await asyncio.start_server(dispatcher.handle_client, host, port, limit=MAX_HEAD_BYTES)
+    print(f"🔀 会话调度器已启动: http://{host}:{port}，{workers} 个 worker")
+
+    def reap():
+        """停止已移出哈希环、也没有滞留会话的 worker"""
+        for path in list(processes):
+            if path not in dispatcher.ring.nodes and not dispatcher.pinned(path):
+                processes.pop(path).terminate()
+
+    async def scale_up():
+        path = next_socket()
+        processes[path] = spawn_worker(path, app)
+        await wait_for_socket(path)
+        try:
+            moved = await dispatcher.add_worker(path)
+        except Exception as e:
+            print(f"⚠️ 新增 worker {path} 失败: {e}")
+            processes.pop(path).terminate()
+            return
+        print(f"➕ 新增 worker {path}，迁移 {moved} 个会话")
+        reap()
+
+    async def scale_down():
+        if len(dispatcher.ring) <= 1:
+            print("⚠️ 至少保留一个 worker")
+            return
+        path = dispatcher.ring.nodes[-1]
+        try:
+            moved = await dispatcher.remove_worker(path)
+        except Exception as e:
+            print(f"⚠️ 移除 worker {path} 失败: {e}")
+            return
+        stuck = dispatcher.pinned(path)
+        if stuck:
+            print(f"⚠️ 移除 worker {path}：{len(stuck)} 个会话迁移失败，进程保留到下次扩缩容")
+        print(f"➖ 移除 worker {path}，迁移 {moved} 个会话")
+        reap()
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTTIN, lambda: asyncio.ensure_future(scale_up()))
+    loop.add_signal_handler(signal.SIGTTOU, lambda: asyncio.ensure_future(scale_down()))
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    loop.add_signal_handler(signal.SIGINT, stop.set)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按会话一致性哈希分片的调度器")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 2)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--socket-dir", default=None, help="worker socket 目录（默认临时目录）")
+    parser.add_argument("--app", default="main:app")
+    args = parser.parse_args()
+    socket_dir = args.socket_dir or tempfile.mkdtemp(prefix="babysitter-shards-")
+    os.makedirs(socket_dir, exist_ok=True)
+    # 所有分片写同一个指标目录，任一分片的 /metrics 都是全部分片的汇总
+    os.environ.setdefault("METRICS_DIR", os.path.join(socket_dir, "metrics"))
+    asyncio.run(run(args.workers, args.host, args.port, socket_dir, args.app))
+
+
+if __name__ == "__main__":
+    main()
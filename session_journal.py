@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+游戏会话日志 (append-only journal + 定期快照)
+
+每次任务执行追加一条紧凑的JSON日志（任务、输入、随机种子、状态增量），
+每隔 snapshot_every 条写一次完整快照并截断日志。
+恢复时加载最新快照，再按顺序合并日志尾部的增量。
+
+日志写入采用组提交：调用方只把行放入内存队列，后台线程每隔
+commit_interval 秒把这段时间内所有会话的日志一次性写盘，
+因此单次任务的额外开销只有序列化 + 入队。
+
+每个会话的日志只能有一个写入进程：SessionJournal 创建时对 <会话>.lock 加 fcntl.flock 排它锁，
+其它进程（例如没有分发器时的另一个 gunicorn worker）再打开同一会话的日志会得到 JournalLocked，
+而不是各自维护序号、互相截断对方的日志。同一进程内可以重复打开（引用计数），close() 释放。
+"""
+
+import atexit
+import dataclasses
+import json
+import os
+import re
+import threading
+import time
+import typing
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from enum import Enum
+from functools import lru_cache
+from hashlib import sha1
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:   # Windows：不做跨进程互斥
+    fcntl = None
+
+
+# ==================== 状态导入导出辅助 ====================
+
+def _to_plain(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return round(value.timestamp(), 3)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return value
+
+
+def export_dataclass(obj: Any) -> Dict[str, Any]:
+    """把状态dataclass转换为可JSON序列化的dict（枚举取值，时间取时间戳，时长取秒数）"""
+    return {f.name: _to_plain(getattr(obj, f.name)) for f in dataclasses.fields(obj)}
+
+
+@lru_cache(maxsize=None)
+def _field_types(cls) -> Dict[str, Any]:
+    hints = typing.get_type_hints(cls)
+    types = {}
+    for f in dataclasses.fields(cls):
+        hint = hints[f.name]
+        if typing.get_origin(hint) is typing.Union:
+            hint = next(arg for arg in typing.get_args(hint) if arg is not type(None))
+        types[f.name] = hint
+    return types
+
+
+def import_dataclass(cls, data: Dict[str, Any]):
+    """export_dataclass 的逆操作，未知字段忽略，缺失字段使用默认值"""
+    kwargs = {}
+    for name, hint in _field_types(cls).items():
+        if name not in data:
+            continue
+        value = data[name]
+        if value is not None and isinstance(hint, type):
+            if issubclass(hint, Enum):
+                value = hint(value)
+            elif issubclass(hint, datetime):
+                value = datetime.fromtimestamp(value)
+            elif issubclass(hint, timedelta):
+                value = timedelta(seconds=value)
+        kwargs[name] = value
+    return cls(**kwargs)
+
+
+def state_delta(before: Dict[str, Any], after: Dict[str, Any], skip: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """顶层键比较，返回发生变化的键及其新值"""
+    return {key: value for key, value in after.items()
+            if key not in skip and before.get(key) != value}
+
+
+# ==================== 组提交写入器 ====================
+
+class GroupCommitWriter:
+    """
+    后台组提交写入线程，多个日志文件共用
+    submit() 只入队；sync() 阻塞到此前提交的内容全部写盘
+    """
+
+    def __init__(self, commit_interval: float = 0.002, fsync: bool = False, max_open_files: int = 256):
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+        self.max_open_files = max_open_files
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._pending: Dict[str, List[str]] = {}
+        self._submitted = 0
+        self._committed = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._files: "OrderedDict[str, Any]" = OrderedDict()
+        self.batches = 0   # 已执行的组提交次数
+
+    def submit(self, path: str, line: str):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("写入器已关闭")
+            self._pending.setdefault(path, []).append(line)
+            self._submitted += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def sync(self, timeout: Optional[float] = None) -> bool:
+        """等待此前提交的日志全部写盘"""
+        with self._cond:
+            target = self._submitted
+            return self._cond.wait_for(lambda: self._committed >= target, timeout)
+
+    def truncate(self, path: str):
+        """清空日志文件（调用前应先 sync）"""
+        with self._io_lock:
+            handle = self._files.pop(path, None)
+            if handle:
+                handle.close()
+            open(path, "w").close()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+        with self._io_lock:
+            for handle in self._files.values():
+                handle.close()
+            self._files.clear()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed and not self._pending:
+                    return
+            # 等一个提交窗口，把窗口内的写入合并成一批
+            if not self._closed:
+                time.sleep(self.commit_interval)
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                target = self._submitted
+            with self._io_lock:
+                for path, lines in batch.items():
+                    handle = self._open(path)
+                    handle.write("\n".join(lines) + "\n")
+                    handle.flush()
+                    if self.fsync:
+                        os.fsync(handle.fileno())
+            with self._cond:
+                self._committed = target
+                self.batches += 1
+                self._cond.notify_all()
+
+    def _open(self, path: str):
+        handle = self._files.get(path)
+        if handle is None:
+            if len(self._files) >= self.max_open_files:
+                _, oldest = self._files.popitem(last=False)
+                oldest.close()
+            handle = self._files[path] = open(path, "a", encoding="utf-8")
+        else:
+            self._files.move_to_end(path)
+        return handle
+
+
+_default_writer: Optional[GroupCommitWriter] = None
+_default_writer_lock = threading.Lock()
+
+
+def default_writer() -> GroupCommitWriter:
+    """进程内共享的写入器，退出时自动刷盘"""
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = GroupCommitWriter()
+            atexit.register(_default_writer.close)
+        return _default_writer
+
+
+# ==================== 会话日志 ====================
+
+class JournalLocked(RuntimeError):
+    """会话日志正由其它进程写入"""
+
+
+_owned_locks: Dict[str, List[int]] = {}   # 锁文件路径 -> [文件描述符, 引用计数]
+_owned_lock = threading.Lock()
+
+
+def _acquire_owner(lock_path: str):
+    """取得会话日志的写入权（本进程已持有时只增加引用计数）"""
+    with _owned_lock:
+        owned = _owned_locks.get(lock_path)
+        if owned is not None:
+            owned[1] += 1
+            return
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                raise JournalLocked(f"会话日志正由其它进程写入: {lock_path}") from None
+        _owned_locks[lock_path] = [fd, 1]
+
+
+def _release_owner(lock_path: str):
+    with _owned_lock:
+        owned = _owned_locks.get(lock_path)
+        if owned is None:
+            return
+        owned[1] -= 1
+        if owned[1] <= 0:
+            del _owned_locks[lock_path]
+            os.close(owned[0])   # 关闭描述符即释放 flock
+
+
+def _forget_inherited_locks():
+    """fork 出的子进程不继承写入权（锁仍属于父进程打开的描述符）"""
+    for fd, _ in _owned_locks.values():
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+    _owned_locks.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_inherited_locks)
+
+def safe_session_name(session_id: str) -> str:
+    """会话id转文件名：简单id原样使用，其余取哈希"""
+    if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", session_id):
+        return session_id
+    return "s_" + sha1(session_id.encode("utf-8")).hexdigest()
+
+
+class SessionJournal:
+    """单个会话的日志 + 快照"""
+
+    def __init__(self, directory: str, session_id: str, snapshot_every: int = 500,
+                 writer: Optional[GroupCommitWriter] = None):
+        os.makedirs(directory, exist_ok=True)
+        name = safe_session_name(session_id)
+        self.session_id = session_id
+        self.journal_path = os.path.join(directory, f"{name}.journal")
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot.json")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        _acquire_owner(self.lock_path)
+        self.closed = False
+        self.snapshot_every = snapshot_every
+        self.writer = writer or default_writer()
+        self.seq = 0
+        self.snapshot_seq = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+
+    def append(self, entry: Dict[str, Any]) -> int:
+        """追加一条日志（异步组提交），返回序号"""
+        self.seq += 1
+        entry["seq"] = self.seq
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+        self.writer.submit(self.journal_path, line)
+        return self.seq
+
+    def should_snapshot(self) -> bool:
+        return self.seq - self.snapshot_seq >= self.snapshot_every
+
+    def snapshot(self, state: Dict[str, Any]):
+        """写入完整快照（原子替换），随后截断已被快照覆盖的日志"""
+        self.writer.sync()
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": self.seq, "state": state}, f, ensure_ascii=False,
+                      separators=(",", ":"), default=str)
+        os.replace(tmp_path, self.snapshot_path)
+        self.writer.truncate(self.journal_path)
+        self.snapshot_seq = self.seq
+
+    def sync(self):
+        self.writer.sync()
+
+    def close(self):
+        """写盘并交出写入权（会话迁移到其它进程前调用）"""
+        if not self.closed:
+            self.closed = True
+            self.writer.sync()
+            _release_owner(self.lock_path)
+
+    def recover(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        读取最新快照和其后的日志
+
+        Returns:
+            (快照状态或None, 快照之后的日志条目)
+        """
+        state = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            state = snapshot["state"]
+            self.snapshot_seq = snapshot["seq"]
+        entries = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break   # 崩溃时写了一半的最后一行
+                    if entry["seq"] > self.snapshot_seq:
+                        entries.append(entry)
+        self.seq = entries[-1]["seq"] if entries else self.snapshot_seq
+        return state, entries
+
+    def recover_state(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """恢复合并后的状态：快照 + 依次合并日志增量"""
+        state, entries = self.recover()
+        if state is None:
+            return None, entries
+        state = dict(state)
+        for entry in entries:
+            state.update(entry.get("d", {}))
+        return state, entries
+
+    def restore_into(self, session: Any) -> List[Dict[str, Any]]:
+        """把恢复出的状态导入 session（需实现 import_state），返回回放的日志条目"""
+        if not self.exists():
+            return []
+        state, entries = self.recover_state()
+        if state is None:
+            return []
+        session.import_state(state)
+        return entries
+
+    def start(self, state: Dict[str, Any], replayed: int = 0):
+        """挂载完成后调用：新会话写初始快照，日志尾部过长时顺便压缩"""
+        if not os.path.exists(self.snapshot_path) or replayed >= self.snapshot_every:
+            self.snapshot(state)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+观战推送
+一局游戏可以被很多人同时围观（例如爷爷奶奶看地狱周直播）。观众不直接调用
+get_game_status（每次都会重新计算衰减、重新序列化整份状态），而是订阅
+SpectatorChannel：游戏状态每变化一次，频道只生成一次状态快照并编码成不可变
+的 SSE 帧（bytes），所有观众共用同一份字节。
+
+每个观众有一个有界队列。队列满了说明对方消费太慢，此时丢弃积压、只保留最新
+快照（快照是完整状态，跳过中间帧不影响显示）。
+
+没有任务执行时，频道按 refresh_seconds 节拍补发一次快照，让离线衰减在观战
+画面上可见；同一节拍内多个观众超时也只刷新一次。
+
+游戏状态变化时（持有会话锁）频道只打一个脏标记并唤醒观众，快照的序列化和分发由
+被唤醒的观众一侧完成（同一时刻只有一个线程编码），任务执行路径上没有 json.dumps
+和按观众数的分发开销。
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from hardcore_parenting_game import HardcoreParentingGame
+
+
+class Subscription:
+    """一个观众的有界队列"""
+
+    def __init__(self, channel: "SpectatorChannel", maxsize: int):
+        self.channel = channel
+        self.maxsize = maxsize
+        self.queue: Deque[bytes] = deque()
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+        self._waiter: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = None
+
+    def _offer(self, frame: bytes, current_loop: Optional[asyncio.AbstractEventLoop]):
+        """频道锁内调用：入队，满了就丢弃积压只留最新帧"""
+        if len(self.queue) >= self.maxsize:
+            self.dropped += len(self.queue)
+            self.queue.clear()
+        self.queue.append(frame)
+        self._wake(current_loop)
+
+    def _wake(self, current_loop: Optional[asyncio.AbstractEventLoop]):
+        """频道锁内调用：唤醒等待中的协程"""
+        if self._waiter is not None:
+            loop, future = self._waiter
+            self._waiter = None
+            if loop is current_loop:
+                _wake(future)
+            else:
+                loop.call_soon_threadsafe(_wake, future)
+
+    def _drain(self) -> List[bytes]:
+        frames = list(self.queue)
+        self.queue.clear()
+        self.delivered += len(frames)
+        return frames
+
+    def get(self, timeout: Optional[float] = None) -> List[bytes]:
+        """阻塞取出积压的帧；超时返回空列表"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        channel = self.channel
+        cond = channel._cond
+        while True:
+            channel.catch_up()
+            with cond:
+                if self.queue or self.closed:
+                    return self._drain()
+                if channel._stale:
+                    continue
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return self._drain()
+                cond.wait(remaining)
+
+    async def get_async(self, timeout: Optional[float] = None) -> List[bytes]:
+        """get() 的协程版本"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        channel = self.channel
+        while True:
+            channel.catch_up()
+            with channel._cond:
+                if self.queue or self.closed:
+                    return self._drain()
+                if channel._stale:
+                    continue
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    return self._drain()
+                future = loop.create_future()
+                self._waiter = (loop, future)
+            try:
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                pass
+            with channel._cond:
+                self._waiter = None
+
+    def close(self):
+        self.channel.unsubscribe(self)
+
+
+class SpectatorChannel:
+    """一局游戏的观战频道"""
+
+    def __init__(self, game: HardcoreParentingGame, queue_size: int = 4, refresh_seconds: float = 5.0,
+                 clock=time.monotonic):
+        self.queue_size = queue_size
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self.version = 0
+        self.latest: Optional[bytes] = None
+        self.published_at = 0.0
+        self.encodes = 0
+        self._stale = False    # 上次快照之后状态变过，下一个取帧的观众先重新编码
+        self._subscribers: List[Subscription] = []
+        self._cond = threading.Condition()
+        self._publish_lock = threading.Lock()   # 同一时刻只有一个线程生成快照，版本顺序与状态顺序一致
+        self.game: Optional[HardcoreParentingGame] = None
+        self.bind(game)
+
+    def bind(self, game: HardcoreParentingGame):
+        """绑定游戏实例（会话休眠后恢复出的是新实例，需要重新绑定）"""
+        if self.game is game:
+            return
+        if self.game is not None and self._on_change in self.game.listeners:
+            self.game.listeners.remove(self._on_change)
+        self.game = game
+        game.listeners.append(self._on_change)
+        self.publish()
+
+    def _on_change(self, game: HardcoreParentingGame):
+        """状态变化（调用方持有游戏锁）：只打脏标记并唤醒观众，不在这里编码"""
+        with self._cond:
+            self._stale = True
+            current_loop = _running_loop()
+            for subscription in self._subscribers:
+                subscription._wake(current_loop)
+            self._cond.notify_all()
+
+    def catch_up(self) -> bool:
+        """状态变过时生成一次快照（多个观众同时发现也只编码一次）"""
+        if not self._stale:
+            return False
+        with self._publish_lock:
+            if not self._stale:
+                return False
+            self._publish()
+            return True
+
+    def publish(self) -> int:
+        """生成一次快照并分发给所有观众，返回新版本号"""
+        with self._publish_lock:
+            return self._publish()
+
+    def _publish(self) -> int:
+        game = self.game
+        with game._lock:   # 只在取状态时持有游戏锁；之后的变化会重新打脏标记
+            self._stale = False
+            status = game.get_game_status()
+        data = json.dumps(status, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._cond:
+            self.version += 1
+            frame = f"id: {self.version}\nevent: status\ndata: {data}\n\n".encode("utf-8")
+            self.latest = frame
+            self.published_at = self.clock()
+            self.encodes += 1
+            current_loop = _running_loop()
+            for subscription in self._subscribers:
+                subscription._offer(frame, current_loop)
+            self._cond.notify_all()
+            return self.version
+
+    def refresh(self) -> bool:
+        """距上次快照超过 refresh_seconds 时补发一次（多个观众同时超时只刷新一次）"""
+        if self.clock() - self.published_at < self.refresh_seconds:
+            return False
+        self.publish()
+        return True
+
+    def subscribe(self) -> Subscription:
+        """新观众：队列里先放入当前最新快照"""
+        self.catch_up()
+        subscription = Subscription(self, self.queue_size)
+        with self._cond:
+            if self.latest is not None:
+                subscription.queue.append(self.latest)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._cond:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+            subscription.closed = True
+            self._cond.notify_all()
+
+    def detach(self):
+        """不再监听游戏状态（频道被回收时调用）"""
+        if self._on_change in self.game.listeners:
+            self.game.listeners.remove(self._on_change)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "spectators": len(self._subscribers),
+                "version": self.version,
+                "encodes": self.encodes,
+                "delivered": sum(s.delivered for s in self._subscribers),
+                "dropped": sum(s.dropped for s in self._subscribers),
+            }
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SpectatorRegistry:
+    """会话id -> 观战频道"""
+
+    def __init__(self, **channel_options):
+        self.channel_options = channel_options
+        self._channels: Dict[str, SpectatorChannel] = {}
+        self._lock = threading.Lock()
+
+    def channel(self, session_id: str, game: HardcoreParentingGame) -> SpectatorChannel:
+        """取出会话的频道，游戏实例变化时重新绑定"""
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None:
+                channel = self._channels[session_id] = SpectatorChannel(game, **self.channel_options)
+                return channel
+        channel.bind(game)
+        return channel
+
+    def subscribe(self, session_id: str, game: HardcoreParentingGame) -> Subscription:
+        """
+        取出（必要时创建）频道并订阅；与 release 在同一把锁内，
+        不会订阅到刚被另一个观众断开时回收的频道
+        """
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None:
+                channel = self._channels[session_id] = SpectatorChannel(game, **self.channel_options)
+            else:
+                channel.bind(game)
+            return channel.subscribe()
+
+    def release(self, session_id: str) -> bool:
+        """会话已没有观众时回收频道"""
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None or channel._subscribers:
+                return False
+            del self._channels[session_id]
+        channel.detach()
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        channels = list(self._channels.values())
+        return {"channels": len(channels), "spectators": sum(len(c._subscribers) for c in channels)}
+
+
+spectators = SpectatorRegistry()
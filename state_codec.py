@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+状态二进制编码
+用于持久化和跨worker传输，比 _get_state_dict 的JSON紧凑得多：
+- 0-100 数值用 1 字节，超出范围时自动改用 4 字节整数
+- 枚举存序号（枚举成员只能在末尾追加）
+- 时间存 epoch 秒
+
+格式：
+    头部  magic(2) | 格式版本(u8) | schema id(u8) | 字段数(u16)
+    字段  tag(u8) | kind(u8) | 数据（长度由 kind 决定）
+
+每个字段带 tag 和 kind，解码端遇到不认识的 tag 直接跳过，缺失的字段取默认值，
+因此新增字段只需分配一个新 tag（已用的 tag 不能复用或改含义）。
+"""
+
+import dataclasses
+import json
+import struct
+import typing
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from age_based_parenting_system import ChildState, ParentState
+from hardcore_parenting_game import GameState, HardcoreParentingGame
+from physiological_needs_tasks import PhysiologicalState
+
+MAGIC = b"HS"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<2sBBH")
+_GAME_HEADER = struct.Struct("<2sBI")   # magic | 格式版本 | GameState编码长度
+GAME_MAGIC = b"HG"
+
+# 字段类型
+KIND_U8 = 1       # 0-255 整数
+KIND_I32 = 2      # 有符号32位整数
+KIND_F64 = 3      # 浮点数
+KIND_ENUM = 4     # 枚举序号 (u8)
+KIND_TIME = 5     # epoch 秒 (u32)
+KIND_NONE = 6     # 空值，无数据
+KIND_BOOL = 7     # 布尔 (u8)
+KIND_BYTES = 8    # u32长度 + 原始字节（预留给变长字段）
+
+_I32 = struct.Struct("<i")
+_F64 = struct.Struct("<d")
+_U32 = struct.Struct("<I")
+
+
+class CodecField(NamedTuple):
+    tag: int
+    name: str
+    python_type: Any
+    enum_members: Tuple[Any, ...]   # 枚举字段的成员（按序号），非枚举为空
+
+
+class Schema(NamedTuple):
+    schema_id: int
+    cls: type
+    fields: Tuple[CodecField, ...]
+    by_tag: Dict[int, CodecField]
+
+
+_SCHEMAS_BY_ID: Dict[int, Schema] = {}
+_SCHEMAS_BY_TYPE: Dict[type, Schema] = {}
+
+
+def register_schema(schema_id: int, cls: type, tags: Dict[str, int]) -> Schema:
+    """
+    注册dataclass的编码方案
+
+    Args:
+        tags: 字段名 -> tag，tag 一经发布不可修改；未列出的字段不编码
+    """
+    if schema_id in _SCHEMAS_BY_ID:
+        raise ValueError(f"schema id 已被占用: {schema_id}")
+    if len(set(tags.values())) != len(tags):
+        raise ValueError(f"{cls.__name__} 的 tag 重复")
+    hints = typing.get_type_hints(cls)
+    declared = {f.name for f in dataclasses.fields(cls)}
+    fields = []
+    for name, tag in tags.items():
+        if name not in declared:
+            raise ValueError(f"{cls.__name__} 没有字段 {name}")
+        hint = hints[name]
+        if typing.get_origin(hint) is typing.Union:
+            hint = next(arg for arg in typing.get_args(hint) if arg is not type(None))
+        members = tuple(hint) if isinstance(hint, type) and issubclass(hint, Enum) else ()
+        fields.append(CodecField(tag, name, hint, members))
+    schema = Schema(schema_id, cls, tuple(fields), {f.tag: f for f in fields})
+    _SCHEMAS_BY_ID[schema_id] = schema
+    _SCHEMAS_BY_TYPE[cls] = schema
+    return schema
+
+
+_ENUM_ORDINALS: Dict[type, Dict[Enum, int]] = {}
+_STRUCTS: Dict[str, struct.Struct] = {}
+
+
+def _enum_ordinal(value: Enum) -> int:
+    ordinals = _ENUM_ORDINALS.get(type(value))
+    if ordinals is None:
+        ordinals = _ENUM_ORDINALS[type(value)] = {member: i for i, member in enumerate(type(value))}
+    return ordinals[value]
+
+
+def encode(obj: Any) -> bytes:
+    """把已注册的状态dataclass编码为字节串"""
+    schema = _SCHEMAS_BY_TYPE.get(type(obj))
+    if schema is None:
+        raise TypeError(f"未注册编码方案: {type(obj).__name__}")
+    # 按值选择 kind，拼出整体格式后一次 pack（同一布局的 Struct 会被缓存）
+    fmt = ["<2sBBH"]
+    values: List[Any] = [MAGIC, FORMAT_VERSION, schema.schema_id, len(schema.fields)]
+    for f in schema.fields:
+        value = getattr(obj, f.name)
+        if value is None:
+            fmt.append("BB")
+            values += (f.tag, KIND_NONE)
+        elif value is True or value is False:
+            fmt.append("BBB")
+            values += (f.tag, KIND_BOOL, value)
+        elif isinstance(value, Enum):
+            fmt.append("BBB")
+            values += (f.tag, KIND_ENUM, _enum_ordinal(value))
+        elif isinstance(value, int):
+            if 0 <= value <= 255:
+                fmt.append("BBB")
+                values += (f.tag, KIND_U8, value)
+            else:
+                fmt.append("BBi")
+                values += (f.tag, KIND_I32, value)
+        elif isinstance(value, float):
+            fmt.append("BBd")
+            values += (f.tag, KIND_F64, value)
+        elif isinstance(value, datetime):
+            fmt.append("BBI")
+            values += (f.tag, KIND_TIME, int(value.timestamp()))
+        elif isinstance(value, bytes):
+            fmt.append(f"BBI{len(value)}s")
+            values += (f.tag, KIND_BYTES, len(value), value)
+        else:
+            raise TypeError(f"不支持编码的类型: {type(value).__name__}")
+    key = "".join(fmt)
+    packer = _STRUCTS.get(key)
+    if packer is None:
+        packer = _STRUCTS[key] = struct.Struct(key)
+    return packer.pack(*values)
+
+
+def decode(data: bytes) -> Any:
+    """解码 encode 的输出；不认识的字段跳过，缺失字段用默认值"""
+    magic, version, schema_id, count = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("不是状态快照数据")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"不支持的快照格式版本: {version}")
+    schema = _SCHEMAS_BY_ID.get(schema_id)
+    if schema is None:
+        raise ValueError(f"未知的 schema id: {schema_id}")
+
+    by_tag = schema.by_tag
+    offset = _HEADER.size
+    kwargs = {}
+    for _ in range(count):
+        tag = data[offset]
+        kind = data[offset + 1]
+        offset += 2
+        if kind == KIND_U8 or kind == KIND_ENUM or kind == KIND_BOOL:
+            value = data[offset]
+            offset += 1
+        elif kind == KIND_TIME:
+            value = _U32.unpack_from(data, offset)[0]
+            offset += 4
+        elif kind == KIND_I32:
+            value = _I32.unpack_from(data, offset)[0]
+            offset += 4
+        elif kind == KIND_F64:
+            value = _F64.unpack_from(data, offset)[0]
+            offset += 8
+        elif kind == KIND_NONE:
+            value = None
+        elif kind == KIND_BYTES:
+            length = _U32.unpack_from(data, offset)[0]
+            value = data[offset + 4:offset + 4 + length]
+            offset += 4 + length
+        else:
+            raise ValueError(f"未知的字段类型 kind={kind}，无法跳过（需要升级解码器）")
+
+        f = by_tag.get(tag)
+        if f is None:
+            continue   # 新版本追加的字段
+        if kind == KIND_ENUM:
+            if value >= len(f.enum_members):
+                continue   # 新版本追加的枚举成员，保留默认值
+            value = f.enum_members[value]
+        elif kind == KIND_TIME:
+            value = datetime.fromtimestamp(value)
+        elif kind == KIND_BOOL:
+            value = bool(value)
+        elif f.python_type is float and (kind == KIND_U8 or kind == KIND_I32):
+            value = float(value)
+        kwargs[f.name] = value
+    return schema.cls(**kwargs)
+
+
+def encode_game(game: HardcoreParentingGame) -> bytes:
+    """
+    编码整局游戏：GameState 用二进制编码，其余少量附加数据（统计、成就位图、
+    任务计数）用紧凑JSON追加在后面。用于休眠和跨worker迁移
+    """
+    state = encode(game.state)
+    extras = json.dumps({
+        "stats": game.stats,
+        "achievement_bits": game.achievement_engine.earned_bits(game._PLAYER),
+        "task_counters": game.task_history.export_counters(),
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _GAME_HEADER.pack(GAME_MAGIC, FORMAT_VERSION, len(state)) + state + extras
+
+
+def decode_game(data: bytes, game: HardcoreParentingGame = None) -> HardcoreParentingGame:
+    """encode_game 的逆操作，可传入一个新建的游戏实例（例如带自定义配置的）"""
+    magic, version, state_length = _GAME_HEADER.unpack_from(data, 0)
+    if magic != GAME_MAGIC:
+        raise ValueError("不是游戏存档数据")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"不支持的存档格式版本: {version}")
+    start = _GAME_HEADER.size
+    game = game or HardcoreParentingGame()
+    game.state = decode(data[start:start + state_length])
+    extras = json.loads(data[start + state_length:].decode("utf-8"))
+    game.stats = extras.get("stats", {})
+    game.achievement_engine.set_earned_bits(game._PLAYER, extras.get("achievement_bits", 0))
+    game.task_history.import_counters(extras.get("task_counters", {}))
+    return game
+
+
+# ==================== 编码方案 ====================
+# tag 一经发布不可修改；新增字段请分配新的 tag
+
+GAME_STATE_SCHEMA = register_schema(1, GameState, {
+    "mode": 1, "baby_age_months": 2, "baby_personality": 3,
+    "health": 4, "hunger": 5, "cleanliness": 6, "happiness": 7, "intimacy": 8,
+    "social_ability": 9, "language_ability": 10, "confidence": 11, "imagination": 12,
+    "rationality": 13, "parent_stress": 14, "parent_anxiety": 15,
+    "is_sleeping": 16, "sleep_end_time": 17, "last_update": 18,
+    "hell_week_day": 19, "phantom_cry_active": 20,
+})
+
+CHILD_STATE_SCHEMA = register_schema(2, ChildState, {
+    "age_months": 1, "happiness": 2, "energy_level": 3,
+    "hunger_level": 4, "sleep_debt": 5, "comfort_level": 6,
+    "curiosity": 7, "motor_skills": 8, "language_skills": 9,
+    "emotional_regulation": 10, "social_confidence": 11, "learning_motivation": 12,
+    "current_emotion": 13, "last_feeding": 14, "last_sleep": 15,
+    "diaper_wetness": 16,
+})
+
+PARENT_STATE_SCHEMA = register_schema(3, ParentState, {
+    "confidence": 1, "stress_level": 2, "patience": 3, "parenting_skills": 4,
+    "successful_interventions": 5, "failed_interventions": 6, "total_parenting_score": 7,
+})
+
+PHYSIOLOGICAL_STATE_SCHEMA = register_schema(4, PhysiologicalState, {
+    "hunger_level": 1, "diaper_wetness": 2, "sleep_debt": 3, "body_temperature": 4,
+    "comfort_level": 5, "last_feeding": 6, "last_diaper_change": 7, "last_sleep": 8,
+    "current_sleep_state": 9,
+})
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+流式统计
+每次记录 O(1) 更新，查询不再遍历历史：
+- EWMA：指数加权移动平均
+- SlidingWindow：最近N个样本的滑动窗口（环形数组 + 累计和）
+- QuantileSketch：对数分桶分位数草图，相对误差有上界
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+
+class EWMA:
+    """指数加权移动平均"""
+
+    def __init__(self, alpha: float = 0.2):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha 必须在 (0, 1] 区间内")
+        self.alpha = alpha
+        self.value: Optional[float] = None
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        self.count += 1
+        if self.value is None:
+            self.value = float(x)
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class SlidingWindow:
+    """最近 size 个样本的滑动窗口，均值和计数都是O(1)"""
+
+    def __init__(self, size: int = 20):
+        if size <= 0:
+            raise ValueError("窗口大小必须大于0")
+        self.size = size
+        self._values: List[float] = [0.0] * size
+        self._next = 0
+        self._count = 0
+        self.total = 0.0
+
+    def add(self, x: float):
+        if self._count == self.size:
+            self.total -= self._values[self._next]
+        else:
+            self._count += 1
+        self._values[self._next] = x
+        self.total += x
+        self._next = (self._next + 1) % self.size
+        if self._next == 0:
+            # 每转一圈重算一次累计和，避免浮点误差累积（摊销O(1)）
+            self.total = sum(self._values)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def mean(self) -> float:
+        return self.total / self._count if self._count else 0.0
+
+
+class QuantileSketch:
+    """
+    对数分桶分位数草图
+    值 x 落入桶 ceil(log_gamma(x))，估计值相对误差不超过 relative_accuracy；
+    桶数超过 max_buckets 时合并最小的桶（只牺牲低分位的精度）
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy 必须在 (0, 1) 区间内")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self._buckets: Dict[int, int] = {}
+        self._zero_count = 0         # 小于等于0的样本（例如0秒响应）
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, x: float):
+        self.count += 1
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        if x <= 0:
+            self._zero_count += 1
+            return
+        key = math.ceil(math.log(x) / self._log_gamma)
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+        if len(self._buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        """把最小的两个桶合并，保持桶数上限"""
+        lowest, second = sorted(self._buckets)[:2]
+        self._buckets[second] += self._buckets.pop(lowest)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """返回第q分位数估计值（q∈[0,1]），无样本时返回None"""
+        if not self.count:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("q 必须在 [0, 1] 区间内")
+        rank = q * (self.count - 1)
+        if rank < self._zero_count:
+            return self.min
+        seen = self._zero_count
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen > rank:
+                estimate = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def merge(self, other: "QuantileSketch"):
+        """合并另一个相同精度的草图"""
+        if other.gamma != self.gamma:
+            raise ValueError("只能合并相同精度的草图")
+        for key, n in other._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + n
+        self._zero_count += other._zero_count
+        self.count += other.count
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        while len(self._buckets) > self.max_buckets:
+            self._collapse()
+
+
+class PlayerActionStats:
+    """单个玩家的行动聚合：响应时间与成功率的EWMA、滑动窗口，以及响应时间分位数"""
+
+    def __init__(self, window_size: int = 20, alpha: float = 0.2):
+        self.response_window = SlidingWindow(window_size)
+        self.success_window = SlidingWindow(window_size)
+        self.response_ewma = EWMA(alpha)
+        self.success_ewma = EWMA(alpha)
+        self.response_sketch = QuantileSketch()
+
+    def record(self, response_time: float, success: bool):
+        outcome = 1.0 if success else 0.0
+        self.response_window.add(response_time)
+        self.success_window.add(outcome)
+        self.response_ewma.update(response_time)
+        self.success_ewma.update(outcome)
+        self.response_sketch.add(response_time)
+
+    @property
+    def total_actions(self) -> int:
+        return self.response_sketch.count
+
+    def snapshot(self) -> Dict[str, Any]:
+        """状态接口展示用的汇总"""
+        def rounded(value):
+            return round(value, 2) if value is not None else None
+
+        return {
+            "total_actions": self.total_actions,
+            "window_actions": len(self.response_window),
+            "avg_response_time": rounded(self.response_window.mean()),
+            "success_rate": rounded(self.success_window.mean()),
+            "ewma_response_time": rounded(self.response_ewma.value),
+            "ewma_success_rate": rounded(self.success_ewma.value),
+            "p50_response_time": rounded(self.response_sketch.quantile(0.5)),
+            "p90_response_time": rounded(self.response_sketch.quantile(0.9)),
+        }
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+批量任务执行
+回放工具和机器人客户端原来要为每个小游戏结果单独请求一次对应的任务接口，
+一局回放动辄几百次往返。POST /game/batch 一次提交按顺序排列的任务调用：
+
+    {"tasks": [{"task": "feeding_hungry", "args": {"water_temp": 38, "shake_intensity": 10, "tilt_angle": 45}},
+               {"task": "diaper_dirty", "args": {...}}]}
+
+task 取 TaskType 的值（与 get_game_status 里的 available_tasks 一致），args 是对应
+execute_*_task 方法的关键字参数。整个批次在一次会话锁内按顺序执行（game.batched()），
+单个任务参数错误或执行出错只影响该条结果，后面的任务继续执行。
+
+响应包含逐条结果和批次结束后的一份完整状态。请求头 Accept 为 application/x-ndjson，
+或没有指定 application/json 且任务数超过 STREAM_THRESHOLD 时，按 NDJSON 逐行返回
+（每条结果一行，最后一行是最终状态）。结果在锁内生成，锁释放后再编码写给客户端，
+慢客户端不会拖住会话锁。
+"""
+
+import inspect
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+from hardcore_parenting_game import HardcoreParentingGame
+
+MAX_BATCH_TASKS = 5000
+STREAM_THRESHOLD = 200
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def _task_methods() -> Dict[str, Tuple[str, inspect.Signature]]:
+    methods = {}
+    for name, member in vars(HardcoreParentingGame).items():
+        task_type = getattr(member, "task_type", None)
+        if task_type is not None:
+            methods[task_type.value] = (name, inspect.signature(member))
+    return methods
+
+
+# TaskType 值 -> (方法名, 方法签名)；只有 records_task 装饰的任务方法可以批量调用
+TASK_METHODS = _task_methods()
+
+
+def parse_batch(data: Any) -> List[Any]:
+    """请求体 -> 任务列表（也接受直接提交的列表），整体格式不对时抛 ValueError"""
+    tasks = data.get("tasks") if isinstance(data, dict) else data
+    if not isinstance(tasks, list):
+        raise ValueError("请求体需要 tasks 列表")
+    if len(tasks) > MAX_BATCH_TASKS:
+        raise ValueError(f"单批最多 {MAX_BATCH_TASKS} 个任务，收到 {len(tasks)} 个")
+    return tasks
+
+
+def _execute(game: HardcoreParentingGame, index: int, item: Any) -> Dict[str, Any]:
+    task = item.get("task") if isinstance(item, dict) else None
+    entry: Dict[str, Any] = {"index": index, "task": task}
+    spec = TASK_METHODS.get(task)
+    if spec is None:
+        entry["error"] = f"未知任务: {task}"
+        return entry
+    name, signature = spec
+    args = item.get("args") or {}
+    try:
+        signature.bind(game, **args)   # 参数不对的任务不进入执行（不消耗随机种子、不写日志）
+        result = getattr(game, name)(**args)
+    except Exception as e:
+        entry["error"] = str(e)
+        return entry
+    entry.update(
+        success=result.success,
+        message=result.message,
+        state_changes=result.state_changes,
+        special_effects=result.special_effects,
+        unlock_achievements=result.unlock_achievements,
+    )
+    return entry
+
+
+def run_batch(game: HardcoreParentingGame, tasks: Iterable[Any]) -> Tuple[List[Dict[str, Any]], int, bytes]:
+    """
+    在一次会话锁内按顺序执行任务
+
+    Returns:
+        (逐条结果, 最终状态版本号, 最终状态JSON字节)
+    """
+    with game.batched():
+        results = [_execute(game, index, item) for index, item in enumerate(tasks)]
+        version, status = game.get_status_body()
+    return results, version, status
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _final_fields(results: List[Dict[str, Any]], version: int, status: bytes) -> bytes:
+    failed = sum(1 for r in results if "error" in r)
+    # 状态JSON直接拼接，复用 get_status_body 按版本缓存的字节
+    return b'"completed":%d,"failed":%d,"state_version":%d,"status":%s' % (
+        len(results) - failed, failed, version, status)
+
+
+def encode_json(results: List[Dict[str, Any]], version: int, status: bytes) -> bytes:
+    """一次性的 JSON 响应体"""
+    return (b'{"results":[' + b",".join(map(_dumps, results)) + b"],"
+            + _final_fields(results, version, status) + b"}")
+
+
+def iter_ndjson(results: List[Dict[str, Any]], version: int, status: bytes) -> Iterator[bytes]:
+    """NDJSON：每条结果一行，最后一行是最终状态"""
+    for result in results:
+        yield _dumps(result) + b"\n"
+    yield b'{"final":true,' + _final_fields(results, version, status) + b"}\n"
+
+
+def _wants_ndjson(accept: str, count: int) -> bool:
+    """Accept 明确指定时按指定格式，否则超过阈值的大批次用 NDJSON"""
+    if NDJSON_MIMETYPE in accept:
+        return True
+    if "application/json" in accept:
+        return False
+    return count > STREAM_THRESHOLD
+
+
+def batch_response(game: HardcoreParentingGame, data: Any, req) -> Tuple[Union[bytes, Iterator[bytes]], int, Dict[str, str]]:
+    """
+    /game/batch 的响应：(响应体, 状态码, 响应头)，响应体是 bytes 或逐行产出的迭代器
+    """
+    try:
+        tasks = parse_batch(data)
+    except ValueError as e:
+        return _dumps({"error": str(e)}), 400, {"Content-Type": "application/json"}
+    results, version, status = run_batch(game, tasks)
+    headers = {"ETag": f'"{game.state_tag(version)}"', "Cache-Control": "no-store"}
+    if _wants_ndjson(req.headers.get("Accept") or "", len(tasks)):
+        headers["Content-Type"] = NDJSON_MIMETYPE
+        return iter_ndjson(results, version, status), 200, headers
+    headers["Content-Type"] = "application/json"
+    return encode_json(results, version, status), 200, headers
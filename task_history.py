@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+有界任务历史
+- RingBuffer：固定容量的环形数组，写满后覆盖最旧的元素
+- TaskHistory：最近的任务结果 + 按任务类型预聚合的成功/失败计数，
+  被挤出环形数组的旧记录可选择以紧凑JSONL追加到磁盘
+每个长期会话的内存占用有硬上限：capacity 条记录 + 每种任务类型一组计数
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class RingBuffer:
+    """固定容量环形缓冲区"""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("容量必须大于0")
+        self.capacity = capacity
+        self._items: List[Any] = [None] * capacity
+        self._start = 0       # 最旧元素的位置
+        self._size = 0
+        self.total = 0        # 累计写入数量（含已被覆盖的）
+
+    def append(self, item: Any) -> Optional[Any]:
+        """写入元素，缓冲区已满时返回被覆盖的最旧元素"""
+        self.total += 1
+        if self._size < self.capacity:
+            self._items[(self._start + self._size) % self.capacity] = item
+            self._size += 1
+            return None
+        evicted = self._items[self._start]
+        self._items[self._start] = item
+        self._start = (self._start + 1) % self.capacity
+        return evicted
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Any]:
+        """从旧到新遍历"""
+        for i in range(self._size):
+            yield self._items[(self._start + i) % self.capacity]
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("RingBuffer 下标越界")
+        return self._items[(self._start + index) % self.capacity]
+
+    def recent(self, n: int) -> List[Any]:
+        """最近n个元素（从旧到新）"""
+        n = max(0, min(n, self._size))
+        return [self[i] for i in range(self._size - n, self._size)]
+
+    def clear(self):
+        self._items = [None] * self.capacity
+        self._start = 0
+        self._size = 0
+
+
+class TaskHistory:
+    """
+    任务结果历史
+    len() 返回累计记录数（含已溢出到磁盘的），按类型统计为O(1)
+    """
+
+    def __init__(self, capacity: int = 256, spill_path: Optional[str] = None, spill_batch: int = 64):
+        self._recent = RingBuffer(capacity)
+        self._counters: Dict[str, List[int]] = {}   # 任务类型 -> [成功, 失败]
+        self.spill_path = spill_path
+        self.spill_batch = spill_batch
+        self._pending_spill: List[str] = []
+        self.spilled = 0
+        self.total = 0
+
+    def tally(self, task_type: str, success: bool):
+        """只累加计数（日志回放时使用）"""
+        counters = self._counters.get(task_type)
+        if counters is None:
+            counters = self._counters[task_type] = [0, 0]
+        counters[0 if success else 1] += 1
+        self.total += 1
+
+    def record(self, task_type: str, result: Any):
+        """记录一次任务结果（result 需有 success / state_changes / timestamp 属性）"""
+        self.tally(task_type, result.success)
+        evicted = self._recent.append((task_type, result))
+        if evicted is not None and self.spill_path:
+            self._pending_spill.append(self._encode(*evicted))
+            if len(self._pending_spill) >= self.spill_batch:
+                self.flush()
+
+    @staticmethod
+    def _encode(task_type: str, result: Any) -> str:
+        """溢出记录只保留任务类型、成败、时间戳和数值变化"""
+        return json.dumps({
+            "t": task_type,
+            "s": 1 if result.success else 0,
+            "ts": round(result.timestamp.timestamp(), 3),
+            "d": result.state_changes,
+        }, ensure_ascii=False, separators=(",", ":"))
+
+    def flush(self):
+        """把待溢出的记录追加写入磁盘"""
+        if not self._pending_spill or not self.spill_path:
+            return
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(self._pending_spill) + "\n")
+        self.spilled += len(self._pending_spill)
+        self._pending_spill.clear()
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __iter__(self) -> Iterator[Any]:
+        """遍历内存中最近的任务结果（从旧到新）"""
+        return (result for _, result in self._recent)
+
+    def recent(self, n: int = 10) -> List[Any]:
+        return [result for _, result in self._recent.recent(n)]
+
+    def stats(self, task_type: str) -> Dict[str, int]:
+        success, failure = self._counters.get(task_type, (0, 0))
+        return {"success": success, "failure": failure}
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """全部任务类型的成功/失败计数"""
+        return {task_type: self.stats(task_type) for task_type in self._counters}
+
+    def export_counters(self) -> Dict[str, List[int]]:
+        return {task_type: list(counts) for task_type, counts in self._counters.items()}
+
+    def import_counters(self, counters: Dict[str, List[int]]):
+        self._counters = {task_type: list(counts) for task_type, counts in counters.items()}
+        self.total = sum(success + failure for success, failure in self._counters.values())
@@ -0,0 +1,61 @@
+"""
+数值平衡参数扫描测试
+"""
+
+import json
+
+import pytest
+
+from balance_sweep import SweepSettings, grid_points, latin_hypercube_points, run_sweep
+from hardcore_parenting_game import GameMode, BabyPersonality
+
+SETTINGS = SweepSettings(max_hours=12, events_per_hour=2.0)
+
+
+class TestSampling:
+    """测试网格与拉丁超立方采样"""
+
+    def test_grid_is_cartesian_product(self):
+        """网格为所有取值的笛卡尔积，未扫描的维度沿用游戏默认值"""
+        points = grid_points({"decay_rate": [0.5, 1.5]}, [GameMode.NORMAL, GameMode.HARD],
+                             [BabyPersonality.ANGEL])
+        assert [(p.mode, p.decay_rate) for p in points] == [
+            (GameMode.NORMAL.value, 0.5), (GameMode.NORMAL.value, 1.5),
+            (GameMode.HARD.value, 0.5), (GameMode.HARD.value, 1.5),
+        ]
+        assert len({p.negative_weight for p in points}) == 1
+
+    def test_lhs_hits_every_stratum_once(self):
+        """每个维度切成n层，每层恰好一个样本，同一种子结果相同"""
+        ranges = {"decay_rate": (0.0, 1.0), "negative_weight": (0.2, 0.6)}
+        points = latin_hypercube_points(8, ranges, [GameMode.NORMAL], [BabyPersonality.FUSSY], seed=3)
+        assert sorted(int(p.decay_rate * 8) for p in points) == list(range(8))
+        assert sorted(int((p.negative_weight - 0.2) / 0.4 * 8) for p in points) == list(range(8))
+        assert points == latin_hypercube_points(8, ranges, [GameMode.NORMAL], [BabyPersonality.FUSSY], seed=3)
+
+
+class TestRunSweep:
+    """测试扫描执行与断点续跑"""
+
+    def setup_method(self):
+        self.points = grid_points({"decay_rate": [0.5, 2.0]}, [GameMode.NORMAL], [BabyPersonality.FUSSY])
+
+    def test_resume_from_checkpoint(self, tmp_path):
+        """续跑时已完成的块不再重算，结果与一次跑完相同；块大小变了则拒绝续跑"""
+        path = tmp_path / "sweep.jsonl"
+        full = run_sweep(self.points, lifetimes=6, settings=SETTINGS, workers=1, chunk_size=2,
+                         checkpoint=str(path))
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert json.loads(lines[0])["header"]["chunk_size"] == 2 and len(lines) == 1 + 2 * 3
+
+        # 模拟中途被杀：只剩参数头、两个完整块和半行
+        path.write_text("\n".join(lines[:3]) + "\n" + lines[3][:10], encoding="utf-8")
+        resumed = run_sweep(self.points, lifetimes=6, settings=SETTINGS, workers=1, chunk_size=2,
+                            checkpoint=str(path))
+        assert resumed == full
+        records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()[:3]]
+        records += [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()[4:]]
+        assert len(records) == 1 + 2 * 3   # 半行之后的新记录各自成行
+
+        with pytest.raises(ValueError):
+            run_sweep(self.points, lifetimes=6, settings=SETTINGS, workers=1, chunk_size=3, checkpoint=str(path))
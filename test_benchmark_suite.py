@@ -0,0 +1,36 @@
+"""
+基准测试套件测试：用例能跑通，基线比较判定正确
+"""
+
+import asyncio
+
+from benchmarks.suite import CASES, compare
+
+
+def results(**relative):
+    return {"results": {name.replace("_", "."): {"relative": value} for name, value in relative.items()}}
+
+
+class TestBenchmarkSuite:
+    """测试用例登记与回归判定"""
+
+    def test_every_case_runs(self):
+        """每个用例的单步都能执行一次（游戏、模拟器、分龄、生理需求、提示词全部覆盖）"""
+        prefixes = {name.split(".")[0] for name in CASES}
+        assert prefixes == {"game", "simulator", "age_based", "physiological", "prompts"}
+        for name, item in CASES.items():
+            step = item.factory()
+            if asyncio.iscoroutinefunction(step):
+                asyncio.run(step())
+            else:
+                step()
+
+    def test_compare_against_baseline(self):
+        """按 relative 判定回归/提升，列出新增和缺失的用例"""
+        baseline = results(game_hug=1.0, game_talk=1.0, game_sleep=1.0, prompts_old=1.0)
+        current = results(game_hug=1.4, game_talk=0.6, game_sleep=1.1, prompts_new=1.0)
+        report = compare(current, baseline, threshold=0.25)
+        assert report["regressions"] == [("game.hug", 1.4)]
+        assert report["improvements"] == [("game.talk", 0.6)]
+        assert [name for name, _ in report["unchanged"]] == ["game.sleep"]
+        assert report["new"] == ["prompts.new"] and report["missing"] == ["prompts.old"]
@@ -0,0 +1,129 @@
+"""
+并发安全测试：32个线程同时操作同一会话
+"""
+
+import asyncio
+import sys
+import threading
+
+from concurrency import new_lock, synchronized
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from hardcore_parenting_simulator import (
+    ActionType, GameState, PickyEaterNegotiationTask, PlayerAction
+)
+
+THREADS = 32
+ROUNDS = 200
+
+NUMERIC_FIELDS = ("health", "hunger", "cleanliness", "happiness", "intimacy", "social_ability",
+                  "language_ability", "confidence", "imagination", "rationality",
+                  "parent_stress", "parent_anxiety")
+
+
+def hammer(worker):
+    """32个线程同时开跑；调小线程切换间隔，让竞争窗口尽量暴露"""
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            worker(index)
+        except Exception as e:   # 汇总到主线程断言
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors, errors
+
+
+class TestSessionConcurrency:
+    """同一会话被多线程并发访问时的不变量"""
+
+    def test_game_tasks(self):
+        """任务计数不丢失、统计与历史一致、数值始终在0-100之间"""
+        game = HardcoreParentingGame()
+        game.start_game(GameMode.HARD, BabyPersonality.FUSSY, 8)
+        first_words = []
+
+        def worker(index):
+            for _ in range(ROUNDS):
+                game.execute_diaper_task(2.0, 8, "correct")
+                if game.execute_first_word_task(True, 1.0).success:
+                    first_words.append(1)
+                game.execute_talk_task(["宝宝"], 20.0)
+                game.get_game_status()
+
+        hammer(worker)
+        assert len(game.task_history) == THREADS * ROUNDS * 3
+        assert sum(sum(c) for c in game.task_history.export_counters().values()) == THREADS * ROUNDS * 3
+        assert game.task_history.stats("first_word")["success"] == len(first_words)
+        assert game.stats.get("first_word_recorded", 0) == len(first_words)
+        for name in NUMERIC_FIELDS:
+            assert 0 <= getattr(game.state, name) <= 100, name
+
+    def test_negotiation_task(self):
+        """谈判任务的回合数不超过上限，卡牌不会被重复使用"""
+        task = PickyEaterNegotiationTask()
+        cards = [card.name for card in task.cards_deck]
+
+        def worker(index):
+            async def play():
+                for i in range(ROUNDS):
+                    action = PlayerAction(ActionType.PLAY_CARD, 10.0, True, f"p{index}",
+                                          extra_data={"card_name": cards[(index + i) % len(cards)]})
+                    await task.execute(GameState(), action)
+                    await task.execute(GameState(), PlayerAction(ActionType.NEGOTIATE, 10.0, True, f"p{index}"))
+            asyncio.run(play())
+
+        hammer(worker)
+        assert task.negotiation_rounds == task.max_rounds
+        assert len(task.used_cards) == len(set(id(card) for card in task.used_cards))
+
+
+class Counter:
+    def __init__(self):
+        self._lock = new_lock()
+        self.held = []
+
+    @synchronized
+    async def tick(self, suspended: asyncio.Event, resume: asyncio.Event):
+        self.held.append(self._lock._is_owned())
+        suspended.set()
+        await resume.wait()
+        self.held.append(self._lock._is_owned())
+
+
+class TestSynchronizedCoroutine:
+    """协程方法只在同步执行的片段里持锁"""
+
+    def test_lock_released_while_suspended(self):
+        """协程挂起期间其它线程可以取到会话锁，恢复后重新持锁"""
+        counter = Counter()
+        acquired = []
+
+        def other_thread():
+            acquired.append(counter._lock.acquire(timeout=1))
+            counter._lock.release()
+
+        async def scenario():
+            suspended, resume = asyncio.Event(), asyncio.Event()
+            task = asyncio.ensure_future(counter.tick(suspended, resume))
+            await suspended.wait()
+            thread = threading.Thread(target=other_thread)
+            thread.start()
+            thread.join()
+            resume.set()
+            await task
+
+        asyncio.run(scenario())
+        assert acquired == [True] and counter.held == [True, True]
+        assert not counter._lock._is_owned()
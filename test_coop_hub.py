@@ -0,0 +1,160 @@
+"""
+双人协作会话中心测试
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from coop_hub import CoopHub, CoopSession, parse_event
+from hardcore_parenting_simulator import ActionType, EventType, PlayerAction
+
+
+def decode(frames):
+    """SSE 帧 -> [(id, event, data)]"""
+    events = []
+    for frame in b"".join(frames).decode("utf-8").split("\n\n"):
+        if not frame:
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def action(player_id, action_type=ActionType.CHANGE_DIAPER):
+    return PlayerAction(action_type, 10.0, True, player_id)
+
+
+class TestCoopSession:
+    """测试有序日志、游标、幂等键与非对称信息"""
+
+    def setup_method(self):
+        self.session = CoopSession("coop-1", "mom", "妈妈")
+        self.session.join("dad", "爸爸")
+
+    def test_cursors_and_asymmetric_events(self):
+        """两名玩家按序收到同一份帧；炸屎事件的处理要点只推给侦察方"""
+        self.session.read("mom")
+        self.session.read("dad")
+        event = self.session.trigger_event(EventType.EXPLOSIVE_DIAPER, 8)
+        result = self.session.submit("dad", action("dad"))
+
+        mom_frames, _ = self.session.read("mom")
+        dad_frames, _ = self.session.read("dad")
+        mom, dad = decode(mom_frames), decode(dad_frames)
+        assert [kind for _, kind, _ in mom] == ["event", "intel", "action"]
+        assert [kind for _, kind, _ in dad] == ["event", "action"]
+        assert "required_actions" not in dad[0][2] and "required_actions" in mom[1][2]
+        assert mom_frames[0] is dad_frames[0]   # 同一条更新只编码一次
+        assert result["resolved_event"] == event.id == dad[1][2]["resolved_event"]
+        assert self.session.read("dad") == ([], self.session.seq)
+
+    def test_idempotent_actions(self):
+        """重复的幂等键不会重复结算"""
+        self.session.trigger_event(EventType.DIAPER_CHANGE)
+        self.session.trigger_event(EventType.DIAPER_CHANGE)
+        first = self.session.submit("mom", action("mom"), idempotency_key="k1")
+        retry = self.session.submit("mom", action("mom"), idempotency_key="k1")
+        assert retry == dict(first, duplicate=True)
+        assert len(self.session.game.event_manager.active_events) == 1
+        assert self.session.game.players["mom"]["actions_count"] == 1
+        assert self.session.submit("dad", action("dad"), idempotency_key="k1")["seq"] > first["seq"]
+
+    def test_snapshot_when_cursor_is_truncated(self):
+        """游标落后到已截断的日志之前时改发完整快照"""
+        session = CoopSession("coop-2", "mom", max_log=4)
+        for _ in range(10):
+            session.submit("mom", action("mom", ActionType.COMFORT))
+        events = decode(session.read("mom", cursor=0)[0])
+        assert [(seq, kind) for seq, kind, _ in events] == [(10, "snapshot")]
+        assert events[0][2]["players"]["mom"]["actions_count"] == 10
+        metrics = events[0][2]["players"]["mom"]["metrics"]
+        assert metrics["total_actions"] == 10 and metrics["p50_response_time"] == metrics["p90_response_time"] == 10.0
+        assert [seq for seq, _, _ in decode(session.read("mom", cursor=7)[0])] == [8, 9, 10]
+
+    def test_waiters_wake_on_append(self):
+        """阻塞和协程订阅者在新条目写入时被唤醒"""
+        self.session.read("mom")
+        self.session.read("dad")
+        received = []
+        thread = threading.Thread(target=lambda: received.append(self.session.wait("mom", timeout=5)))
+        thread.start()
+
+        async def scenario():
+            waiter = asyncio.ensure_future(self.session.wait_async("dad", timeout=5))
+            await asyncio.sleep(0.01)
+            self.session.submit("mom", action("mom", ActionType.COMFORT))
+            return await waiter
+
+        frames, cursor = asyncio.run(scenario())
+        thread.join()
+        assert cursor == self.session.seq and decode(frames)[-1][1] == "action"
+        assert decode(received[0][0])[-1][1] == "action"
+        assert self.session.wait("dad", timeout=0.01) == ([], self.session.seq)
+
+    def test_player_identity_is_token_bound(self):
+        """只有持有服务端令牌才能以某个玩家身份重连或读取侦察方情报"""
+        mom_token = self.session.tokens["mom"]
+        assert self.session.authenticate(mom_token) == "mom"
+        assert self.session.authenticate("mom") is None and self.session.authenticate("") is None
+        hijack = self.session.join("mom", "冒充者")
+        assert not hijack["success"] and "token" not in hijack
+        assert self.session.join("mom", "妈妈", mom_token) == {
+            "success": True, "seq": self.session.seq, "rejoined": True, "token": mom_token}
+        dad_token = self.session.tokens["dad"]
+        self.session.leave("dad")
+        assert self.session.authenticate(dad_token) is None
+
+
+class TestCoopHub:
+    def test_create_is_idempotent(self):
+        """重复创建返回同一会话"""
+        hub = CoopHub()
+        assert hub.create("s", "mom") is hub.create("s", "someone-else")
+        assert hub.stats() == {"sessions": 1, "players": 1, "expired": 0}
+
+    def test_sessions_expire(self):
+        """最后一名玩家离开或空闲超时后回收会话，并结束剩余玩家的推送"""
+        clock = FakeClock()
+        hub = CoopHub(idle_seconds=100, sweep_interval=10, clock=clock)
+        hub.create("a", "mom").join("dad", "爸爸")
+        assert not hub.leave("a", "mom")
+        assert hub.leave("a", "dad") and "a" not in hub
+
+        idle = hub.create("idle", "mom")
+        busy = hub.create("busy", "mom")
+        clock.now = 60
+        busy.read("mom")   # 推送流的保活读取也算活动
+        clock.now = 120
+        assert hub.get("busy") is busy
+        assert "idle" not in hub and hub.stats()["expired"] == 1
+        assert "mom" not in idle.game.players
+
+    def test_find_after_idle_expiry(self):
+        """find 一次查找：会话在本次查找触发的空闲回收中被回收时返回 None 而不是抛异常"""
+        clock = FakeClock()
+        hub = CoopHub(idle_seconds=100, sweep_interval=10, clock=clock)
+        session = hub.create("s", "mom")
+        assert hub.find("s") is session and hub.find("missing") is None
+        clock.now = 200
+        assert hub.find("s") is None
+        with pytest.raises(KeyError):
+            hub.get("s")
+
+    def test_parse_event_validates_severity(self):
+        """严重程度须为 1-10 的整数，否则抛 ValueError（接口返回 400）"""
+        assert parse_event({"event_type": EventType.CRYING.value, "severity": "7"}) == (EventType.CRYING, 7)
+        assert parse_event({}) == (EventType.EXPLOSIVE_DIAPER, 5)
+        for severity in ("abc", None, 0, 11, True, [3], 2.5):
+            with pytest.raises(ValueError):
+                parse_event({"severity": severity})
@@ -0,0 +1,65 @@
+"""
+随机事件别名表测试
+验证预计算别名表与原有抽取规则的概率分布完全一致
+"""
+
+import random
+import pytest
+
+from alias_sampling import AliasTable
+from hardcore_parenting_game import (
+    HardcoreParentingGame, GameMode, BabyPersonality, AgeStage, TaskType,
+    event_probabilities, event_table
+)
+
+
+class TestAliasTable:
+    """测试别名表本身"""
+
+    def test_exact_probabilities(self):
+        """别名表还原出的概率应与输入权重一致"""
+        table = AliasTable.build(["a", "b", "c"], [1, 2, 5])
+        probs = dict(table.outcome_probabilities())
+        assert probs["a"] == pytest.approx(1 / 8)
+        assert probs["b"] == pytest.approx(2 / 8)
+        assert probs["c"] == pytest.approx(5 / 8)
+
+    def test_invalid_weights(self):
+        """空表或零权重应报错"""
+        with pytest.raises(ValueError):
+            AliasTable.build([], [])
+        with pytest.raises(ValueError):
+            AliasTable.build(["a"], [0])
+
+
+class TestEventTables:
+    """测试游戏事件采样表"""
+
+    def test_newborn_fussy_distribution(self):
+        """0-3月高敏宝宝：4个负面事件平分70%，拥抱占30%"""
+        probs = event_probabilities(AgeStage.NEWBORN_0_3, 0.7)
+        assert probs[TaskType.HUG_HAPPY] == pytest.approx(0.3)
+        assert probs[TaskType.FEEDING_HUNGRY] == pytest.approx(0.7 / 4)
+
+    def test_preschool_fallback(self):
+        """2-3岁没有正面事件，非负面分支从全部可用任务中均匀抽取"""
+        probs = event_probabilities(AgeStage.PRESCHOOL_2_3, 0.3)
+        assert probs[TaskType.DRESSING_WILD] == pytest.approx(0.3 + 0.7 / 2)
+        assert probs[TaskType.EMOTION_TALK] == pytest.approx(0.7 / 2)
+
+    @pytest.mark.parametrize("stage", list(AgeStage))
+    @pytest.mark.parametrize("weight", [0.3, 0.7])
+    def test_table_matches_rule(self, stage, weight):
+        """别名表概率与规则计算的概率一致"""
+        expected = event_probabilities(stage, weight)
+        actual = dict(event_table(stage, weight).outcome_probabilities())
+        for task, p in expected.items():
+            assert actual[task] == pytest.approx(p)
+
+    def test_batch_draw(self):
+        """批量抽取只返回当前阶段可用任务"""
+        game = HardcoreParentingGame()
+        game.start_game(GameMode.NORMAL, BabyPersonality.ANGEL, 18)
+        events = game.draw_random_events(500, random.Random(1))
+        assert len(events) == 500
+        assert set(events) <= set(game.get_available_tasks())
@@ -0,0 +1,51 @@
+"""
+可选子系统延迟加载测试
+"""
+
+import sys
+
+import pytest
+
+from feature_registry import FeatureRegistry, FeatureUnavailable
+
+
+class TestFeatureRegistry:
+    """测试按需加载、失败缓存与状态报告"""
+
+    def test_loads_once_on_first_use(self):
+        """登记时不加载，第一次访问代理属性时加载一次并缓存"""
+        calls = []
+        registry = FeatureRegistry()
+        registry.register("clock", lambda: calls.append(1) or __import__("time"))
+        clock = registry.lazy("clock")
+        assert not calls and registry.status()["clock"]["loaded"] is False
+
+        assert clock.monotonic() > 0 and clock.sleep is not None
+        assert calls == [1] and registry.loaded("clock")
+        assert registry.status()["clock"]["load_ms"] is not None
+
+    def test_missing_dependency_is_reported_without_importing(self):
+        """缺失的依赖只用 find_spec 检查，get 抛 FeatureUnavailable（也是 ImportError）"""
+        registry = FeatureRegistry()
+        registry.register("ghost", lambda: __import__("no_such_module_xyz"), requires=("no_such_module_xyz",))
+        assert registry.available("ghost") is False
+        with pytest.raises(ImportError):
+            registry.get("ghost")
+        assert registry.preload() == {"ghost": False}
+        assert "no_such_module_xyz" not in sys.modules
+
+    def test_failed_loader_is_cached(self):
+        """加载函数出错后不再重试，错误写进状态"""
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise RuntimeError("混音器初始化失败")
+
+        registry = FeatureRegistry()
+        registry.register("music", broken)
+        for _ in range(2):
+            with pytest.raises(FeatureUnavailable):
+                registry.get("music")
+        assert calls == [1]
+        assert registry.status()["music"]["error"] == "混音器初始化失败"
@@ -0,0 +1,145 @@
+"""
+会话注册表测试
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from game_sessions import GameSessionRegistry, status_response
+from hardcore_parenting_game import GameMode, BabyPersonality
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestHibernation:
+    """测试空闲会话休眠与恢复"""
+
+    def test_hibernate_and_rehydrate(self, tmp_path):
+        """空闲会话写入磁盘后移出内存，再次访问时恢复并补算离开期间的衰减"""
+        clock = FakeClock()
+        registry = GameSessionRegistry(hibernate_dir=str(tmp_path), idle_seconds=60,
+                                       sweep_interval=10, clock=clock)
+        game = registry.get("alice")
+        game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+        game.execute_first_word_task(True, 1.0)
+        registry.get("bob")
+
+        game.state.last_update = datetime.now() - timedelta(hours=5)
+        hunger = game.state.hunger
+        clock.now = 30
+        registry.get("bob")
+        clock.now = 100
+        registry.get("bob")   # 触发清扫：alice 空闲 100s，bob 刚被访问
+
+        assert registry.session_ids() == ["bob"]
+        assert "alice" in registry and len(registry) == 2
+        assert registry.stats()["hibernated"] == 1
+
+        restored = registry.get("alice")
+        assert restored is not game
+        assert restored.state.hunger > hunger
+        assert restored.achievements == ["初次发声"]
+        assert restored.task_history.stats("first_word")["success"] == 1
+
+        stats = registry.stats()
+        assert (stats["hot"], stats["hibernated"]) == (2, 0)
+        assert (stats["hibernations"], stats["rehydrations"]) == (1, 1)
+        assert stats["rehydrate_ms_p50"] is not None
+        assert not list(tmp_path.iterdir())
+
+    def test_hibernated_sessions_survive_restart(self, tmp_path):
+        """新的注册表实例能发现休眠目录中已有的会话"""
+        registry = GameSessionRegistry(hibernate_dir=str(tmp_path), idle_seconds=60)
+        registry.get("carol").start_game(GameMode.HARD, BabyPersonality.ANGEL, 3)
+        registry.hibernate("carol")
+
+        reopened = GameSessionRegistry(hibernate_dir=str(tmp_path), idle_seconds=60)
+        assert "carol" in reopened
+        assert reopened.get("carol").state.mode == GameMode.HARD
+
+
+class TestSessionCap:
+    """测试热会话上限"""
+
+    def test_least_recently_used_sessions_are_evicted(self, tmp_path):
+        """超过上限时淘汰最久未访问的会话；配置了休眠目录时淘汰即休眠，再访问可以恢复"""
+        registry = GameSessionRegistry(max_sessions=2)
+        for session_id in ("a", "b", "a", "c"):
+            registry.get(session_id)
+        assert sorted(registry.session_ids()) == ["a", "c"]
+        assert registry.stats()["evictions"] == 1
+
+        registry = GameSessionRegistry(hibernate_dir=str(tmp_path), max_sessions=2)
+        registry.get("a").start_game(GameMode.HARD, BabyPersonality.ANGEL, 3)
+        for i in range(50):
+            registry.get(f"spam-{i}")
+        assert registry.hot_count() == 2 and "a" in registry
+        assert registry.get("a").state.mode == GameMode.HARD
+
+
+class FakeRequest:
+    def __init__(self, args=None, headers=None):
+        self.args = args or {}
+        self.headers = headers or {}
+
+
+class TestConditionalStatus:
+    """测试 /game/status 的版本号、304 与增量响应"""
+
+    def test_etag_and_cached_body(self):
+        """未变化时复用同一份序列化结果并对 If-None-Match 返回304，任务执行后版本号递增"""
+        registry = GameSessionRegistry()
+        game = registry.get("alice")
+        game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+
+        body, status, headers = status_response(game, FakeRequest())
+        again, _, _ = status_response(game, FakeRequest())
+        assert status == 200 and again is body
+        assert json.loads(body)["state_version"] == game.state_version
+        assert status_response(game, FakeRequest(headers={"If-None-Match": headers["ETag"]}))[1] == 304
+
+        game.execute_first_word_task(True, 1.0)
+        body2, status, headers2 = status_response(game, FakeRequest(headers={"If-None-Match": headers["ETag"]}))
+        assert status == 200 and body2 != body
+        assert int(headers2["ETag"].strip('"').split("-")[1]) > int(headers["ETag"].strip('"').split("-")[1])
+
+    def test_tag_from_another_instance_gets_full_body(self):
+        """另一个实例（其它 worker）的 ETag 即使版本号相同也不会得到 304 或增量"""
+        first = GameSessionRegistry().get("alice")
+        second = GameSessionRegistry().get("alice")
+        for game in (first, second):
+            game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+        second.state_version = first.state_version
+        etag = status_response(first, FakeRequest())[2]["ETag"]
+
+        body, status, headers = status_response(second, FakeRequest(headers={"If-None-Match": etag}))
+        assert status == 200 and headers["ETag"] != etag
+        assert json.loads(body)["state_version"] == second.state_version
+        body, status, _ = status_response(second, FakeRequest(args={"since": etag.strip('"')}))
+        assert status == 200 and "changes" not in json.loads(body)
+        assert status_response(first, FakeRequest(args={"since": etag.strip('"')}))[1] == 304
+
+    def test_since_returns_changed_fields(self):
+        """?since= 只返回该版本之后变化的字段；更早的版本（例如另一个实例的）拿到全部字段"""
+        game = GameSessionRegistry().get("alice")
+        game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+        version, _ = game.get_status_body()
+
+        assert game.get_status_since(version)["changes"] == {}
+        game.execute_talk_task(["宝宝"], 20.0)
+        delta = game.get_status_since(version)
+        assert delta["state_version"] > version
+        assert "mode_config" not in delta["changes"] and "available_tasks" not in delta["changes"]
+        assert delta["changes"]["task_history_count"] == 1
+        assert set(delta["changes"]["game_state"]) < set(game.get_game_status()["game_state"])
+
+        restored = GameSessionRegistry().get("alice")
+        assert restored.state_version > game.state_version
+        full = restored.get_status_since(game.state_version)["changes"]
+        assert set(full) == set(restored.get_game_status())
@@ -0,0 +1,51 @@
+"""
+压测工具测试：fal 替身走本地模拟服务，饱和点判定正确
+"""
+
+import importlib.util
+import os
+
+import pytest
+
+from benchmarks.fal_stub import FalStub
+from benchmarks.loadtest import STATUS_LABEL, STUBS_DIR, find_saturation, percentile, summarize
+
+
+def level(concurrency, throughput, p95_ms=10.0, error_rate=0.0):
+    return {"concurrency": concurrency, "throughput": throughput, "error_rate": error_rate,
+            "endpoints": {STATUS_LABEL: {"p95_ms": p95_ms}}}
+
+
+class TestLoadTest:
+    """测试 fal 模拟服务与压测统计"""
+
+    def test_fal_client_shim_hits_stub(self, monkeypatch):
+        """替身 fal_client.subscribe 请求模拟服务，返回与 fal 相同结构；失败时抛异常"""
+        spec = importlib.util.spec_from_file_location("fal_client_shim", os.path.join(STUBS_DIR, "fal_client.py"))
+        shim = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(shim)
+        stub = FalStub(latency_ms=5).start()
+        try:
+            monkeypatch.setenv("FAL_STUB_URL", stub.url)
+            result = shim.subscribe("fal-ai/flux/schnell", arguments={"prompt": "baby", "image_size": "square"})
+            assert result["images"][0]["url"].startswith("https://fal-stub.local/")
+            stub.error_rate = 1.0
+            with pytest.raises(shim.FalStubError):
+                shim.subscribe("fal-ai/flux/schnell", arguments={})
+            assert stub.calls == 2
+        finally:
+            stub.stop()
+
+    def test_percentiles_and_saturation(self):
+        """按接口统计百分位；吞吐停止增长、错误率或状态 p95 超标的第一级为饱和点"""
+        assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 95) == 10
+        assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 50) == 5
+        summary = summarize([(STATUS_LABEL, 0.001 * i, i != 7) for i in range(1, 101)], elapsed=10)
+        assert summary["throughput"] == 10 and summary["error_rate"] == 0.01
+        assert summary["endpoints"][STATUS_LABEL]["p99_ms"] == 99
+
+        assert find_saturation([level(1, 10), level(2, 20), level(4, 39)]) is None
+        sat = find_saturation([level(1, 10), level(2, 20), level(4, 21)])
+        assert sat["concurrency"] == 4 and sat["sustainable_concurrency"] == 2
+        assert find_saturation([level(1, 10), level(2, 20, p95_ms=800)])["sustainable_throughput"] == 10
+        assert find_saturation([level(1, 10, error_rate=0.05)])["sustainable_concurrency"] == 0
@@ -0,0 +1,107 @@
+"""
+指标汇总测试
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from metrics import MetricsRegistry
+
+
+def dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def worker_registry(directory):
+    registry = MetricsRegistry(str(directory))
+    return (registry,
+            registry.counter("tasks_total", "任务数", ("task",)),
+            registry.histogram("task_seconds", "任务耗时", ("task",), buckets=(0.01, 0.1)),
+            registry.gauge("sessions", "会话数"),
+            registry.gauge("rss_bytes", "内存", mode="all"))
+
+
+def flush_as(registry, pid: int):
+    """把快照写成另一个进程的文件（模拟其它 worker）"""
+    snapshot = registry.snapshot()
+    snapshot["pid"] = pid
+    with open(os.path.join(registry.directory, f"{pid}.json"), "w") as f:
+        json.dump(snapshot, f)
+
+
+class TestMetricsRegistry:
+    """测试跨进程汇总与文本格式"""
+
+    def test_aggregates_across_workers(self, tmp_path):
+        """计数器/直方图累加所有进程（含已退出的），仪表盘只算存活进程"""
+        live, dead = os.getppid(), dead_pid()
+        for pid, sessions in ((live, 3), (dead, 100)):
+            registry, tasks, seconds, gauge, rss = worker_registry(tmp_path)
+            tasks.inc("feeding_hungry", amount=2)
+            seconds.observe(0.05, "feeding_hungry")
+            gauge.set(sessions)
+            rss.set(1000)
+            flush_as(registry, pid)
+
+        registry, tasks, seconds, gauge, rss = worker_registry(tmp_path)
+        tasks.inc("feeding_hungry")
+        seconds.observe(0.5, "feeding_hungry")
+        gauge.set(4)
+        rss.set(2000)
+        merged = registry.collect()
+
+        assert merged["tasks_total"]["samples"] == {("feeding_hungry",): 5}
+        assert merged["task_seconds"]["samples"][("feeding_hungry",)] == [0, 2, 1, pytest.approx(0.6)]
+        assert merged["sessions"]["samples"] == {(): 7}
+        assert merged["rss_bytes"]["samples"] == {(str(live),): 1000, (str(os.getpid()),): 2000}
+
+    def test_text_exposition(self, tmp_path):
+        """直方图输出累计桶、_sum、_count，标签值转义"""
+        registry, tasks, seconds, _, _ = worker_registry(tmp_path)
+        seconds.observe(0.005, 'a"b')
+        seconds.observe(0.05, 'a"b')
+        tasks.inc("x")
+        text = registry.render()
+        assert '# TYPE task_seconds histogram' in text
+        assert 'task_seconds_bucket{task="a\\"b",le="0.01"} 1' in text
+        assert 'task_seconds_bucket{task="a\\"b",le="+Inf"} 2' in text
+        assert 'task_seconds_count{task="a\\"b"} 2' in text
+        assert 'tasks_total{task="x"} 1' in text
+
+    def test_dead_worker_archived_before_pid_reuse(self, tmp_path):
+        """退出的 worker 归档后删除文件；pid 被复用后新进程的计数不会覆盖旧计数"""
+        pid = dead_pid()
+        registry, tasks, seconds, gauge, _ = worker_registry(tmp_path)
+        tasks.inc("feeding_hungry", amount=2)
+        seconds.observe(0.05, "feeding_hungry")
+        gauge.set(100)
+        flush_as(registry, pid)
+
+        reader, *_ = worker_registry(tmp_path)
+        assert reader.archive(pid) and not reader.archive(pid)
+        assert not os.path.exists(tmp_path / f"{pid}.json")
+
+        registry, tasks, seconds, gauge, _ = worker_registry(tmp_path)
+        tasks.inc("feeding_hungry")
+        seconds.observe(0.5, "feeding_hungry")
+        gauge.set(1)
+        flush_as(registry, pid)   # 复用同一 pid 的新 worker
+        merged = reader.collect()
+        assert merged["tasks_total"]["samples"] == {("feeding_hungry",): 3}
+        assert merged["task_seconds"]["samples"][("feeding_hungry",)] == [0, 1, 1, pytest.approx(0.55)]
+        assert merged["sessions"]["samples"] == {}
+
+        # 没有 child_exit 时：本进程第一次刷盘前发现同 pid 的旧文件，先归档再覆盖
+        own, tasks, *_ = worker_registry(tmp_path)
+        tasks.inc("feeding_hungry", amount=5)
+        flush_as(own, os.getpid())
+        fresh, tasks, *_ = worker_registry(tmp_path)
+        tasks.inc("feeding_hungry")
+        fresh.flush()
+        assert fresh.collect()["tasks_total"]["samples"][("feeding_hungry",)] == 3 + 5 + 1
@@ -0,0 +1,119 @@
+"""
+生成服务路由测试：熔断、故障转移、对冲、截止时间
+"""
+
+import time
+
+import pytest
+
+import baby_face_fusion
+from baby_face_fusion import BabyFaceFusion
+from provider_router import (CircuitBreaker, CircuitOpen, ProviderRouter, Route, deadline_scope,
+                             request_budget)
+from providers import FakeProvider, LatencyProfile, ProviderError, ProviderTimeout, providers
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fake(latency=0.0, error_rate=0.0):
+    return FakeProvider(profiles={"*": LatencyProfile(samples=(latency,), error_rate=error_rate)})
+
+
+def route(provider):
+    return Route(provider, "flux_lora", f"{provider}/model", {"prompt": "baby"})
+
+
+class TestProviderRouter:
+    """测试路由的熔断、对冲与故障转移"""
+
+    def test_circuit_breaker(self):
+        """连续失败达到阈值后打开；到时间半开只放行一个试探；试探成功关闭、失败重新打开"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("fal", failure_threshold=3, reset_timeout=30, clock=clock)
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.allow() and breaker.state == breaker.CLOSED
+        breaker.record_failure()
+        assert breaker.state == breaker.OPEN and not breaker.allow()
+
+        clock.now = 30
+        assert breaker.allow() and not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == breaker.OPEN and not breaker.allow()
+
+        clock.now = 60
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == breaker.CLOSED and breaker.allow()
+
+    def test_failover_and_hedge(self, monkeypatch):
+        """fal 报错时切到 Replicate；fal 超过 p95 还没返回时向 Replicate 发对冲请求，先到先用"""
+        router = ProviderRouter(min_hedge_samples=1)
+        monkeypatch.setattr(baby_face_fusion, "router", router)
+        generator = BabyFaceFusion(fal_key="k", replicate_key="k")
+        replicate = fake(latency=0.01)
+
+        with providers.override("fal", fake(error_rate=1.0)), providers.override("replicate", replicate):
+            result = generator.generate_baby_from_parents("https://example.com/p1.jpg", baby_age="1year")
+        assert result["success"] and result["metadata"]["provider"] == "replicate"
+        assert len(result["images"]) == 4 and router.health("fal").failures == 1
+
+        router.health("fal").latencies.extend([0.02] * 20)
+        start = time.perf_counter()
+        with providers.override("fal", fake(latency=0.5)), providers.override("replicate", replicate):
+            result = generator.generate_baby_from_parents("https://example.com/p1.jpg")
+        assert result["metadata"]["provider"] == "replicate"
+        assert time.perf_counter() - start < 0.3
+        assert router.hedges == 1 and replicate.calls == 2
+
+    def test_deadline_and_short_circuit(self):
+        """截止时间到了直接抛 ProviderTimeout；真实失败达到阈值后熔断，之后不再等待直接失败"""
+        assert request_budget("250") == 0.25
+        assert request_budget("abc") == request_budget(None) == request_budget("999999")
+
+        router = ProviderRouter(failure_threshold=1, hedge=False)
+        with providers.override("fal", fake(latency=0.5)):
+            start = time.perf_counter()
+            with deadline_scope(0.1), pytest.raises(ProviderTimeout):
+                router.generate([route("fal")])
+            assert time.perf_counter() - start < 0.3
+
+        with providers.override("fal", fake(error_rate=1.0)):
+            with pytest.raises(ProviderError):
+                router.generate([route("fal")])
+            assert router.health("fal").breaker.state == CircuitBreaker.OPEN
+            start = time.perf_counter()
+            with pytest.raises(CircuitOpen):
+                router.generate([route("fal")])
+            assert time.perf_counter() - start < 0.05
+
+    def test_client_deadline_does_not_trip_breaker(self):
+        """客户端给的极短时限只让自己的请求超时，不打开熔断器；落后的尝试跑完后按成功计入"""
+        router = ProviderRouter(failure_threshold=5, hedge=False)
+        with providers.override("fal", fake(latency=0.05)):
+            for _ in range(5):
+                with deadline_scope(request_budget("1")), pytest.raises(ProviderTimeout):
+                    router.generate([route("fal")])
+            result, used = router.generate([route("fal")])
+            assert used.provider == "fal" and result["images"]
+            time.sleep(0.1)
+        health = router.health("fal")
+        assert health.breaker.state == CircuitBreaker.CLOSED
+        assert health.successes == 6 and health.failures == 0
+
+    def test_failover_after_hedge_budget_spent(self):
+        """对冲预算用完时下一条路线仍留给故障转移"""
+        router = ProviderRouter(failure_threshold=100, hedge_ratio=0.1, min_hedge_samples=1)
+        router.health("fal").latencies.extend([0.001] * 20)
+        replicate = fake()
+        with providers.override("fal", fake(latency=0.03, error_rate=1.0)), \
+                providers.override("replicate", replicate):
+            used = [router.generate([route("fal"), route("replicate")])[1].provider for _ in range(3)]
+        assert used == ["replicate"] * 3
+        assert router.hedges == 1 and replicate.calls == 3
@@ -0,0 +1,111 @@
+"""
+生成服务接口测试：假服务离线生成、回放录制的分布、故障注入
+"""
+
+import pytest
+
+from baby_photo_integration import BabyPhotoGenerator
+from metrics import MetricsRegistry
+from providers import (Faults, FakeProvider, LatencyProfile, Provider, ProviderError, ProviderRegistry,
+                       ProviderTimeout, fake_from_env, providers, record_profiles)
+
+
+class FakeSleep:
+    """只记录等待时长，不真的等"""
+
+    def __init__(self):
+        self.waits = []
+
+    def __call__(self, seconds):
+        self.waits.append(seconds)
+
+
+class TestProviders:
+    """测试 FakeProvider 与服务替换"""
+
+    def test_photo_generator_runs_offline(self):
+        """替换成假服务后照片生成不需要 fal_client 和密钥；同样参数得到同样的占位图"""
+        fake = FakeProvider(sleep=FakeSleep())
+        generator = BabyPhotoGenerator(api_key=None)
+        with providers.override("fal", fake):
+            first = generator.generate_baby_photo(6, gender="girl", expression="happy")
+            again = generator.generate_baby_photo(6, gender="girl", expression="happy")
+            other = generator.generate_baby_photo(18, gender="boy", expression="curious")
+        assert first["success"] and first["image_url"].startswith("data:image/svg+xml;base64,")
+        assert first["image_url"] == again["image_url"] != other["image_url"]
+        assert fake.calls == 3
+        assert providers.get("fal") is not fake
+
+    def test_replays_recorded_distribution(self, tmp_path):
+        """从指标直方图录制分布，回放的延迟落在录制的桶内、错误率接近录制值"""
+        source = MetricsRegistry(str(tmp_path))
+        latency = source.histogram("provider_request_duration_seconds", "", ("provider", "operation"),
+                                   buckets=(0.5, 1.0, 2.0))
+        errors = source.counter("provider_errors_total", "", ("provider", "operation"))
+        for value in [0.8] * 90 + [1.5] * 10:
+            latency.observe(value, "fal", "flux_schnell")
+        latency.observe(0.01, "fake", "flux_schnell")
+        errors.inc("fal", "flux_schnell", amount=20)
+        source.flush()
+        profiles = record_profiles(source.collect())
+        assert profiles["flux_schnell"].error_rate == 0.2
+        assert LatencyProfile.from_dict(profiles["flux_schnell"].to_dict()) == profiles["flux_schnell"]
+
+        sleep = FakeSleep()
+        fake = FakeProvider(profiles=profiles, seed=3, sleep=sleep)
+        failures = 0
+        for _ in range(500):
+            try:
+                fake.generate("flux_schnell", "fal-ai/flux/schnell", {"prompt": "baby"})
+            except ProviderError:
+                failures += 1
+        assert all(0.5 <= wait <= 2.0 for wait in sleep.waits)
+        assert sum(wait > 1.0 for wait in sleep.waits) / len(sleep.waits) == pytest.approx(0.1, abs=0.04)
+        assert failures / 500 == pytest.approx(0.2, abs=0.05)
+
+    def test_fault_injection(self):
+        """冷启动前几次额外变慢；超时等满 timeout_s 后抛 ProviderTimeout；5xx 可重试"""
+        sleep = FakeSleep()
+        fake = FakeProvider(profiles={"*": LatencyProfile(samples=(0.2,))},
+                            faults=Faults(slow_start_calls=2, slow_start_s=3.0), sleep=sleep)
+        for _ in range(3):
+            fake.generate("sdxl", "stability-ai/sdxl", {"num_outputs": 4})
+        assert sleep.waits == pytest.approx([3.2, 3.2, 0.2])
+
+        fake.faults = Faults(timeout_rate=1.0, timeout_s=30.0)
+        with pytest.raises(ProviderTimeout):
+            fake.generate("sdxl", "stability-ai/sdxl", {})
+        assert sleep.waits[-1] == 30.0
+
+        fake.faults = Faults(error_rate=1.0, status=502)
+        with pytest.raises(ProviderError) as excinfo:
+            fake.generate("sdxl", "stability-ai/sdxl", {})
+        assert excinfo.value.status == 502 and excinfo.value.retryable
+
+        # 冷启动的额外延迟计入超时判断
+        fake = FakeProvider(faults=Faults(slow_start_calls=1, slow_start_s=5.0, timeout_s=4.0), sleep=sleep)
+        with pytest.raises(ProviderTimeout):
+            fake.generate("sdxl", "stability-ai/sdxl", {})
+        assert sleep.waits[-1] == 4.0
+        fake.generate("sdxl", "stability-ai/sdxl", {})
+
+    def test_fake_mode_gives_each_provider_its_own_fake(self, monkeypatch):
+        """GENERATION_PROVIDER=fake 时每个服务名一个假服务；Provider 子类必须实现 _generate"""
+        registry = ProviderRegistry()
+        registry.register("fal", lambda: pytest.fail("fake 模式不应构造真实服务"))
+        registry.register("replicate", lambda: pytest.fail("fake 模式不应构造真实服务"))
+        registry.register("fake", fake_from_env)
+        monkeypatch.setenv("GENERATION_PROVIDER", "fake")
+        fal, replicate = registry.get("fal"), registry.get("replicate")
+        assert isinstance(fal, FakeProvider) and isinstance(replicate, FakeProvider)
+        assert fal is registry.get("fal") and fal is not replicate is not registry.get("fake")
+        fal.faults = Faults(error_rate=1.0)
+        assert replicate.faults == Faults()
+        with pytest.raises(KeyError):
+            registry.get("missing")
+
+        class Incomplete(Provider):
+            name = "incomplete"
+
+        with pytest.raises(TypeError):
+            Incomplete()
@@ -0,0 +1,89 @@
+"""
+按需请求剖析测试
+"""
+
+import time
+
+from request_profiler import RequestProfiler, TOKEN_HEADER, MODE_PARAM
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeRequest:
+    def __init__(self, path, headers=None, args=None):
+        self.path = path
+        self.method = "GET"
+        self.url_rule = None
+        self.headers = headers or {}
+        self.args = args or {}
+
+
+class TestRequestProfiler:
+    """测试令牌触发与结果保存"""
+
+    def test_token_bound_to_path_and_expiry(self, tmp_path):
+        """令牌只对签发的路径有效，过期后失效；不带令牌的请求不剖析"""
+        clock = FakeClock()
+        profiler = RequestProfiler(secret="s3cret", directory=str(tmp_path), clock=clock)
+        token = profiler.make_token("/game/status", ttl=60)
+
+        assert profiler.should_profile(FakeRequest("/game/status", {TOKEN_HEADER: token})) == "token"
+        assert profiler.should_profile(FakeRequest("/game/start", {TOKEN_HEADER: token})) is None
+        assert profiler.should_profile(FakeRequest("/game/status")) is None
+        assert profiler.should_profile(FakeRequest("/game/status", {TOKEN_HEADER: token[:-1] + "0"})) is None
+        clock.now += 61
+        assert profiler.should_profile(FakeRequest("/game/status", {TOKEN_HEADER: token})) is None
+        assert not RequestProfiler(directory=str(tmp_path)).enabled
+
+    def test_saves_profiles_and_keeps_newest(self, tmp_path):
+        """采样模式写折叠栈，cprofile 模式写 pstats；超过上限删除最旧的"""
+        profiler = RequestProfiler(sample_rate=1.0, directory=str(tmp_path), max_profiles=2)
+        ids = []
+        for mode in ("sample", "cprofile", "cprofile"):
+            request = FakeRequest("/slow", args={MODE_PARAM: mode})
+            active = profiler.start(request, profiler.should_profile(request))
+            time.sleep(0.03)
+            ids.append(profiler.finish(active, request, 200))
+
+        listed = profiler.store.list()
+        assert [meta["id"] for meta in listed] == ids[:0:-1]
+        assert listed[0]["mode"] == "cprofile" and listed[0]["trigger"] == "sample"
+        assert any("sleep" in row["function"] for row in listed[0]["top"])
+        assert profiler.store.path(ids[0], "folded") is None
+        assert profiler.store.path(ids[1], "pstats") is not None
+        assert profiler.store.path("../etc", "json") is None
+
+    def test_sampler_collects_folded_stacks(self, tmp_path):
+        """采样结果是 根;...;叶 计数 的折叠栈"""
+        profiler = RequestProfiler(sample_rate=1.0, directory=str(tmp_path))
+        request = FakeRequest("/slow")
+        active = profiler.start(request, "sample")
+        time.sleep(0.05)
+        profile_id = profiler.finish(active, request, 200)
+
+        meta = profiler.store.list()[0]
+        assert meta["samples"] > 0
+        with open(profiler.store.path(profile_id, "folded")) as f:
+            line = f.readline()
+        assert "test_sampler_collects_folded_stacks" in line and line.rstrip().split()[-1].isdigit()
+
+    def test_concurrent_cprofile_falls_back_to_sampler(self, tmp_path):
+        """已有请求在 cprofile 剖析时，新的 cprofile 剖析改用采样，结束后恢复"""
+        profiler = RequestProfiler(sample_rate=1.0, directory=str(tmp_path))
+        request = FakeRequest("/slow", args={MODE_PARAM: "cprofile"})
+        first = profiler.start(request, "sample")
+        second = profiler.start(request, "sample")
+        assert (first.mode, second.mode) == ("cprofile", "sample")
+        profiler.finish(second, request, 200)
+        profiler.finish(first, request, 200)
+
+        third = profiler.start(request, "sample")
+        assert third.mode == "cprofile"
+        profiler.finish(third, request, 200)
+        assert sorted(meta["mode"] for meta in profiler.store.list()) == ["cprofile", "cprofile", "sample"]
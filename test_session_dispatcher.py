@@ -0,0 +1,170 @@
+"""
+会话分片调度器测试
+"""
+
+import asyncio
+import json
+from collections import Counter
+
+import pytest
+
+from game_sessions import GameSessionRegistry
+from hardcore_parenting_game import GameMode, BabyPersonality
+from session_dispatcher import HashRing, SessionDispatcher, build_head, header_value, parse_head
+
+
+class TestHashRing:
+    """测试一致性哈希"""
+
+    def test_balance_and_minimal_movement(self):
+        """虚拟节点让分布大致均匀；加一个节点只有约 1/N 的键换主，且都换到新节点"""
+        keys = [f"session-{i}" for i in range(4000)]
+        ring = HashRing(["a", "b", "c"])
+        before = {key: ring.node_for(key) for key in keys}
+        counts = Counter(before.values())
+        assert min(counts.values()) > len(keys) / 3 * 0.75
+
+        ring.add("d")
+        moved = [key for key in keys if ring.node_for(key) != before[key]]
+        assert 0.15 < len(moved) / len(keys) < 0.35
+        assert all(ring.node_for(key) == "d" for key in moved)
+
+        ring.remove("d")
+        assert all(ring.node_for(key) == before[key] for key in keys)
+
+
+class TestSessionMigration:
+    """测试会话交出与接管"""
+
+    def test_release_and_adopt(self):
+        source, target = GameSessionRegistry(), GameSessionRegistry()
+        game = source.get("alice")
+        game.start_game(GameMode.HARD, BabyPersonality.FUSSY, 4)
+        game.execute_first_word_task(True, 1.0)
+
+        data = source.release("alice")
+        assert "alice" not in source and source.release("alice") is None
+        adopted = target.adopt("alice", data)
+        assert target.get("alice") is adopted
+        restored, original = adopted.export_state(), game.export_state()
+        assert abs(restored.pop("last_update") - original.pop("last_update")) < 1   # 时间按秒编码
+        assert restored == original
+
+
+async def stub_worker(name: str, sessions: dict, reader, writer, failing: frozenset = frozenset()):
+    """模拟分片 worker：内部迁移接口 + 按会话计数，每个请求后关闭连接（同 gunicorn sync worker）"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    request_line, headers = parse_head(head)
+    body = await reader.readexactly(int(header_value(headers, "Content-Length") or 0))
+    method, target, _ = request_line.split(" ")
+    path, _, query = target.partition("?")
+    session_id = query.partition("=")[2] or header_value(headers, "X-Session-Id")
+    if path in failing:   # 模拟内部接口出错
+        writer.write(build_head("HTTP/1.1 500 Internal Server Error", [("Content-Length", "0")]))
+        await writer.drain()
+        writer.close()
+        return
+    if path == "/internal/sessions":
+        payload = json.dumps({"sessions": list(sessions)}).encode()
+    elif path == "/internal/sessions/release":
+        payload = sessions.pop(session_id)
+    elif path == "/internal/sessions/adopt":
+        sessions[session_id] = body
+        payload = b""
+    else:
+        count = int(sessions.get(session_id, b"0")) + 1
+        sessions[session_id] = str(count).encode()
+        payload = json.dumps({"worker": name, "count": count}).encode()
+    writer.write(build_head("HTTP/1.1 200 OK", [("Content-Length", str(len(payload)))]) + payload)
+    await writer.drain()
+    writer.close()
+
+
+async def request(reader, writer, session_id: str) -> dict:
+    writer.write(build_head("GET /game/status HTTP/1.1", [("Host", "x"), ("X-Session-Id", session_id)]))
+    await writer.drain()
+    _, headers = parse_head(await reader.readuntil(b"\r\n\r\n"))
+    return json.loads(await reader.readexactly(int(header_value(headers, "Content-Length"))))
+
+
+class TestSessionDispatcher:
+    """端到端：调度器 + 模拟 worker"""
+
+    def test_routing_and_rebalance(self, tmp_path):
+        async def scenario():
+            stores = {}
+            servers = []
+            for name in ("w1", "w2", "w3"):
+                path = str(tmp_path / f"{name}.sock")
+                stores[path] = {}
+                servers.append(await asyncio.start_unix_server(
+                    lambda r, w, n=name, s=stores[path]: stub_worker(n, s, r, w), path))
+            sockets = list(stores)
+            dispatcher = SessionDispatcher(sockets[:2])
+            front = await asyncio.start_server(dispatcher.handle_client, "127.0.0.1", 0)
+            port = front.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+            sessions = [f"player-{i}" for i in range(60)]
+            for session_id in sessions:
+                first = await request(reader, writer, session_id)
+                again = await request(reader, writer, session_id)   # 同一连接 keep-alive
+                assert again == {"worker": first["worker"], "count": 2}
+
+            moved = await dispatcher.add_worker(sockets[2])
+            assert moved == len(stores[sockets[2]]) > 0
+            for session_id in sessions:
+                result = await request(reader, writer, session_id)
+                assert result["count"] == 3   # 计数随会话迁移
+                assert stores[dispatcher.ring.node_for(session_id)][session_id] == b"3"
+
+            writer.write(build_head("GET /%69nternal/sessions HTTP/1.1", [("Host", "x")]))
+            await writer.drain()
+            assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 403")
+
+            writer.close()
+            front.close()
+            for server in servers:
+                server.close()
+
+        asyncio.run(scenario())
+
+    def test_failed_migrations_keep_sessions(self, tmp_path):
+        """接管失败时会话退回原 worker、请求不会卡住；统计失败时哈希环回滚；Content-Length 非法返回400"""
+        async def scenario():
+            stores, failing, servers = {}, {}, []
+            for name in ("w1", "w2", "w3"):
+                path = str(tmp_path / f"{name}.sock")
+                stores[path], failing[path] = {}, set()
+                servers.append(await asyncio.start_unix_server(
+                    lambda r, w, n=name, p=path: stub_worker(n, stores[p], r, w, frozenset(failing[p])), path))
+            sockets = list(stores)
+            dispatcher = SessionDispatcher(sockets[:2])
+            front = await asyncio.start_server(dispatcher.handle_client, "127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", front.sockets[0].getsockname()[1])
+            sessions = [f"player-{i}" for i in range(60)]
+            for session_id in sessions:
+                await request(reader, writer, session_id)
+
+            failing[sockets[0]].add("/internal/sessions")
+            with pytest.raises(RuntimeError):
+                await dispatcher.add_worker(sockets[2])
+            assert dispatcher.ring.nodes == sockets[:2]
+            failing[sockets[0]].clear()
+
+            failing[sockets[2]].add("/internal/sessions/adopt")
+            assert await dispatcher.add_worker(sockets[2]) == 0
+            assert not dispatcher._migrating and dispatcher.stats()["pinned"] > 0
+            for session_id in sessions:
+                assert (await asyncio.wait_for(request(reader, writer, session_id), 1))["count"] == 2
+
+            writer.write(b"POST /game/status HTTP/1.1\r\nHost: x\r\nContent-Length: -1\r\n\r\n")
+            await writer.drain()
+            assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 400")
+
+            writer.close()
+            front.close()
+            for server in servers:
+                server.close()
+
+        asyncio.run(scenario())
@@ -0,0 +1,113 @@
+"""
+会话日志测试
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+from game_sessions import GameSessionRegistry
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from session_journal import GroupCommitWriter, JournalLocked, SessionJournal, fcntl
+
+HOLDER = """
+import sys
+from session_journal import SessionJournal
+journal = SessionJournal(sys.argv[1], "shared")
+print("locked", flush=True)
+sys.stdin.readline()
+journal.close()
+"""
+
+
+def play(game: HardcoreParentingGame, rounds: int):
+    for _ in range(rounds):
+        game.execute_diaper_task(2.0, 8, "correct")
+        game.execute_first_word_task(True, 1.0)
+        game.execute_talk_task(["宝宝"], 20.0)
+
+
+class TestSessionJournal:
+    """测试日志恢复"""
+
+    def setup_method(self):
+        self.writer = GroupCommitWriter(commit_interval=0.0005)
+
+    def teardown_method(self):
+        self.writer.close()
+
+    def test_recover_snapshot_and_tail(self, tmp_path):
+        """快照 + 日志尾部恢复出与原会话完全一致的状态"""
+        game = HardcoreParentingGame()
+        game.attach_journal(SessionJournal(str(tmp_path), "s1", snapshot_every=10, writer=self.writer))
+        game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+        play(game, 7)
+        game.journal.sync()
+
+        restored = HardcoreParentingGame()
+        replayed = restored.attach_journal(SessionJournal(str(tmp_path), "s1", snapshot_every=10, writer=self.writer))
+        assert replayed == 21 % 10
+        assert restored.export_state() == game.export_state()
+        assert restored.achievements == ["初次发声"]
+        assert len(restored.task_history) == 21
+
+    def test_torn_last_line_ignored(self, tmp_path):
+        """崩溃时写了一半的最后一行被忽略"""
+        game = HardcoreParentingGame()
+        journal = SessionJournal(str(tmp_path), "s2", writer=self.writer)
+        game.attach_journal(journal)
+        play(game, 2)
+        journal.sync()
+        with open(journal.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 99, "d": {"heal')
+
+        restored = HardcoreParentingGame()
+        assert restored.attach_journal(SessionJournal(str(tmp_path), "s2", writer=self.writer)) == 6
+        assert restored.export_state() == game.export_state()
+
+    def test_seed_makes_task_replayable(self, tmp_path):
+        """日志中的随机种子可以复现任务结果"""
+        game = HardcoreParentingGame()
+        journal = SessionJournal(str(tmp_path), "s3", writer=self.writer)
+        game.attach_journal(journal)
+        game.start_game(GameMode.NORMAL, BabyPersonality.ANGEL, 6)
+        first = game.execute_first_word_task(True, 1.0)
+        later = [game.execute_first_word_task(True, 1.0) for _ in range(3)]
+        journal.sync()
+        _, entries = journal.recover()
+
+        replay = HardcoreParentingGame()
+        replay.start_game(GameMode.NORMAL, BabyPersonality.ANGEL, 6)
+        assert replay.replay_task(entries[0]).message == first.message
+        assert replay.replay_task(entries[-1]).message == later[-1].message
+        # 种子由 64 位会话种子和任务序号组成，不是从上一次的随机序列里截出的 32 位
+        seeds = [entry["seed"] for entry in entries]
+        assert len(set(seeds)) == len(seeds) and {seed >> 64 for seed in seeds} == {game.rng_seed}
+        assert [seed & (2 ** 64 - 1) for seed in seeds] == [1, 2, 3, 4]
+
+
+@pytest.mark.skipif(fcntl is None, reason="需要 fcntl")
+class TestSingleWriter:
+    """测试跨进程单写入者"""
+
+    def test_second_process_cannot_journal_same_session(self, tmp_path):
+        """另一个进程持有日志时本进程拿不到写入权，会话照常运行但不写日志；对方释放后可以接管"""
+        holder = subprocess.Popen([sys.executable, "-c", HOLDER, str(tmp_path)],
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        try:
+            assert holder.stdout.readline().strip() == "locked"
+            with pytest.raises(JournalLocked):
+                SessionJournal(str(tmp_path), "shared")
+
+            registry = GameSessionRegistry(journal_dir=str(tmp_path))
+            game = registry.get("shared")
+            assert game.journal is None
+            assert registry.get("other").journal is not None
+        finally:
+            holder.communicate("\n", timeout=10)
+
+        journal = SessionJournal(str(tmp_path), "shared")
+        again = SessionJournal(str(tmp_path), "shared")   # 同一进程内可重复打开
+        again.close()
+        journal.close()
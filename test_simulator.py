@@ -241,6 +241,100 @@ class TestGameModeManager:
         assert hard_config.get("force_notifications") == True
 
 
+class TestAchievementSystem:
+    """测试成就系统"""
+
+    def setup_method(self):
+        from hardcore_parenting_simulator import AchievementSystem
+        self.system = AchievementSystem()
+
+    def test_incremental_matches_full_check(self):
+        """增量检查只评估依赖变化键的成就，结果与全量检查一致"""
+        stats = {"min_sanity": 80, "tetris_perfect": 1, "earned_achievements": []}
+        assert set(self.system.check_achievements(stats)) == {"sanity_keeper", "tetris_master"}
+
+        assert self.system.update_stats("p1", stats, ["min_sanity"]) == ["sanity_keeper"]
+        assert self.system.update_stats("p1", stats, ["min_sanity"]) == []
+        assert self.system.update_stats("p1", stats, ["tetris_perfect"]) == ["tetris_master"]
+        assert self.system.engine.earned_ids("p1") == ["sanity_keeper", "tetris_master"]
+
+
+class TestScoringSystem:
+    """测试评分系统的流式聚合"""
+
+    def setup_method(self):
+        from hardcore_parenting_simulator import ScoringSystem
+        self.scoring = ScoringSystem(window_size=5)
+
+    def test_streaming_kpi_matches_list(self):
+        """按玩家聚合计算的KPI与传入最近行动列表的结果一致"""
+        actions = [
+            PlayerAction(ActionType.COMFORT, response_time=10 * i, success=i % 2 == 0, player_id="p1")
+            for i in range(12)
+        ]
+        for action in actions:
+            self.scoring.record_action(action)
+        state = GameState(parenting_kpi=70, sanity=45)
+        assert self.scoring.calculate_kpi(state, player_id="p1") == \
+            self.scoring.calculate_kpi(state, actions[-5:])
+
+    def test_response_time_percentiles(self):
+        """分位数草图的相对误差在1%以内"""
+        for i in range(1, 1001):
+            self.scoring.record_action(PlayerAction(ActionType.COMFORT, float(i), True, "p1"))
+        metrics = self.scoring.get_player_metrics("p1")
+        assert metrics["total_actions"] == 1000
+        assert metrics["p50_response_time"] == pytest.approx(500, rel=0.02)
+        assert metrics["p90_response_time"] == pytest.approx(900, rel=0.02)
+
+
+class TestPlayerIsolation:
+    """测试玩家之间的状态隔离"""
+
+    def setup_method(self):
+        self.simulator = HardcoreParentingSimulator()
+
+    def test_players_do_not_share_state(self):
+        """第二个玩家开始游戏不会覆盖第一个玩家的状态和事件"""
+        async def scenario():
+            await self.simulator.start_game("alice", GameMode.HARD)
+            self.simulator.get_player("alice").game_state.sanity = 40
+            self.simulator.get_player("alice").event_manager.trigger_event(EventType.CRYING)
+            await self.simulator.start_game("bob", GameMode.EASY)
+
+        asyncio.run(scenario())
+        alice, bob = self.simulator.get_player("alice"), self.simulator.get_player("bob")
+        assert (alice.game_state.sanity, alice.game_state.game_mode) == (40, GameMode.HARD)
+        assert len(alice.event_manager.active_events) == 1
+        assert bob.game_state.sanity == 100 and not bob.event_manager.active_events
+        assert self.simulator.game_state is bob.game_state   # 兼容属性指向当前玩家
+
+    def test_handlers_are_per_event_and_pooled(self):
+        """事件解决后处理器重置并归还对象池，后续事件复用同一个实例；未归还的处理器不会被重复借出"""
+        pool = self.simulator.handler_pool
+
+        async def round_of_negotiation():
+            for player in ("alice", "bob"):
+                self.simulator.get_player(player).event_manager.trigger_event(EventType.PICKY_EATER_NEGOTIATION)
+            return await asyncio.gather(*(
+                self.simulator.process_action(player, PlayerAction(ActionType.NEGOTIATE, 5.0, True, player))
+                for player in ("alice", "bob")
+            ))
+
+        async def scenario():
+            for player in ("alice", "bob"):
+                await self.simulator.start_game(player)
+            await round_of_negotiation()
+            await round_of_negotiation()
+
+        asyncio.run(scenario())
+        assert pool.stats() == {"created": 1, "reused": 3, "idle": 1}
+        held = [pool.acquire(EventType.PICKY_EATER_NEGOTIATION) for _ in range(2)]
+        assert held[0] is not held[1]
+        assert all(handler.negotiation_rounds == 0 for handler in held)
+        assert self.simulator.player_stats["alice"]["actions_taken"] == 2
+
+
 async def run_tests():
     """运行所有测试"""
     print("🧪 开始运行育儿模拟器测试...")
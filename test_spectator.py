@@ -0,0 +1,112 @@
+"""
+观战推送测试
+"""
+
+import asyncio
+
+import spectator
+
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from spectator import SpectatorChannel, SpectatorRegistry
+
+
+def new_game():
+    game = HardcoreParentingGame()
+    game.start_game(GameMode.HARD, BabyPersonality.FUSSY, 2)
+    return game
+
+
+class TestSpectatorChannel:
+    """测试一次编码多方共享与慢观众丢帧"""
+
+    def test_serialize_once_for_all_spectators(self):
+        """每次状态变化只编码一次，所有观众拿到同一个 bytes 对象"""
+        game = new_game()
+        channel = SpectatorChannel(game)
+        viewers = [channel.subscribe() for _ in range(3)]
+        assert all(len(v.get(timeout=0)) == 1 for v in viewers)   # 订阅时的当前快照
+
+        encodes = channel.encodes
+        game.execute_diaper_task(2.0, 8, "correct")
+        frames = [v.get(timeout=0) for v in viewers]
+        assert channel.encodes == encodes + 1
+        assert frames[0][0] is frames[1][0] is frames[2][0] is channel.latest
+        assert frames[0][0].startswith(f"id: {channel.version}\nevent: status\n".encode())
+
+    def test_slow_spectator_drops_to_latest(self):
+        """慢观众的队列不超过上限，积压被丢弃后仍能拿到最新快照"""
+        game = new_game()
+        channel = SpectatorChannel(game, queue_size=2)
+        fast, slow = channel.subscribe(), channel.subscribe()
+        fast.get(timeout=0)
+
+        received = []
+        for _ in range(5):
+            game.execute_talk_task(["宝宝"], 20.0)
+            received.extend(fast.get(timeout=0))
+            assert len(slow.queue) <= 2
+        assert len(received) == 5
+        backlog = slow.get(timeout=0)
+        assert backlog[-1] is channel.latest and slow.dropped == 6 - len(backlog)
+
+    def test_async_spectators_and_rebind(self):
+        """协程观众被唤醒；会话恢复成新实例后频道改为监听新实例"""
+        registry = SpectatorRegistry()
+        old_game, new_game_instance = new_game(), new_game()
+        channel = registry.channel("s1", old_game)
+        viewer = channel.subscribe()
+        viewer.get(timeout=0)
+
+        async def scenario():
+            waiter = asyncio.ensure_future(viewer.get_async(timeout=5))
+            await asyncio.sleep(0)
+            registry.channel("s1", new_game_instance)
+            new_game_instance.execute_diaper_task(2.0, 8, "correct")
+            return await waiter
+
+        frames = asyncio.run(scenario())
+        assert frames and frames[-1] is channel.latest
+        assert not old_game.listeners and len(new_game_instance.listeners) == 1
+
+        viewer.close()
+        assert registry.release("s1") and not new_game_instance.listeners
+
+
+class TestSpectatorHandoff:
+    """测试订阅与回收的原子性、快照在游戏锁外生成"""
+
+    def test_subscribe_and_release_share_registry_lock(self):
+        """registry.subscribe 拿到的频道不会被另一个观众断开时的 release 回收"""
+        registry = SpectatorRegistry()
+        game = new_game()
+        leaving = registry.subscribe("s1", game)
+        joining = registry.subscribe("s1", game)
+        assert joining.channel is leaving.channel
+
+        leaving.close()
+        assert not registry.release("s1")
+        assert registry.channel("s1", game) is joining.channel and len(game.listeners) == 1
+
+        joining.close()
+        assert registry.release("s1") and not game.listeners
+
+    def test_task_only_marks_channel_stale(self, monkeypatch):
+        """任务执行路径上不编码，观众取帧时才在游戏锁外生成一次快照"""
+        game = new_game()
+        channel = SpectatorChannel(game)
+        viewers = [channel.subscribe() for _ in range(2)]
+        for viewer in viewers:
+            viewer.get(timeout=0)
+        encodes = channel.encodes
+
+        game.execute_diaper_task(2.0, 8, "correct")
+        game.execute_talk_task(["宝宝"], 20.0)
+        assert channel.encodes == encodes
+
+        held = []
+        dumps = spectator.json.dumps
+        monkeypatch.setattr(spectator.json, "dumps",
+                            lambda *a, **kw: (held.append(game._lock._is_owned()), dumps(*a, **kw))[1])
+        frames = [viewer.get(timeout=0) for viewer in viewers]
+        assert channel.encodes == encodes + 1 and frames[0][-1] is frames[1][-1] is channel.latest
+        assert held == [False]
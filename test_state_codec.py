@@ -0,0 +1,51 @@
+"""
+状态二进制编码测试
+"""
+
+import struct
+from datetime import datetime
+
+import pytest
+
+import state_codec
+from age_based_parenting_system import ChildState, EmotionType, ParentState
+from hardcore_parenting_game import BabyPersonality, GameMode, GameState
+from physiological_needs_tasks import PhysiologicalState, SleepState
+
+
+class TestStateCodec:
+    """测试编码/解码"""
+
+    @pytest.mark.parametrize("state", [
+        GameState(mode=GameMode.HARD, baby_personality=BabyPersonality.FUSSY, baby_age_months=30,
+                  health=0, is_sleeping=True, sleep_end_time=datetime(2025, 1, 1, 3, 0), hell_week_day=7),
+        ChildState(age_months=48, current_emotion=EmotionType.WORRIED, hunger_level=-3),
+        ParentState(total_parenting_score=1000, failed_interventions=70000),
+        PhysiologicalState(body_temperature=38.25, current_sleep_state=SleepState.DEEP_SLEEP),
+    ])
+    def test_roundtrip(self, state):
+        """编码后解码得到相同状态（时间精确到秒）"""
+        for name in ("last_update", "last_feeding", "last_sleep", "last_diaper_change"):
+            if hasattr(state, name):
+                setattr(state, name, datetime(2025, 6, 1, 12, 30, 15))
+        assert state_codec.decode(state_codec.encode(state)) == state
+
+    def test_float_metric_kept(self):
+        """0-100 指标被写成浮点数时按浮点编码，不丢精度"""
+        child = ChildState(hunger_level=42.5)
+        assert state_codec.decode(state_codec.encode(child)).hunger_level == 42.5
+
+    def test_unknown_fields_skipped(self):
+        """新版本追加的字段（未知tag/枚举序号）被旧解码器跳过"""
+        data = bytearray(state_codec.encode(ParentState(patience=77)))
+        magic, version, schema_id, count = struct.unpack_from("<2sBBH", data)
+        data += struct.pack("<BBd", 200, state_codec.KIND_F64, 1.5)
+        data += struct.pack("<BBI", 201, state_codec.KIND_BYTES, 3) + b"new"
+        struct.pack_into("<2sBBH", data, 0, magic, version, schema_id, count + 2)
+        assert state_codec.decode(bytes(data)) == ParentState(patience=77)
+
+    def test_rejects_newer_format(self):
+        data = bytearray(state_codec.encode(ParentState()))
+        data[2] = state_codec.FORMAT_VERSION + 1
+        with pytest.raises(ValueError):
+            state_codec.decode(bytes(data))
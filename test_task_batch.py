@@ -0,0 +1,62 @@
+"""
+批量任务执行测试
+"""
+
+import json
+
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from task_batch import STREAM_THRESHOLD, batch_response, run_batch
+
+
+class FakeRequest:
+    def __init__(self, headers=None):
+        self.args = {}
+        self.headers = headers or {}
+
+
+def new_game():
+    game = HardcoreParentingGame()
+    game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+    return game
+
+
+class TestTaskBatch:
+    """测试按顺序批量执行、逐条错误与响应格式"""
+
+    def test_runs_in_order_and_isolates_errors(self):
+        """按顺序执行，未知任务和参数错误只影响该条，监听者在批次结束时只被通知一次"""
+        game = new_game()
+        notified = []
+        game.listeners.append(lambda g: notified.append(g.state_version))
+        tasks = [
+            {"task": "talk_play", "args": {"speech_keywords": ["宝宝"], "voice_duration": 20.0}},
+            {"task": "no_such_task"},
+            {"task": "first_word", "args": {"recorded": True}},
+            {"task": "first_word", "args": {"recorded": True, "reaction_time": 1.0}},
+        ]
+        results, version, status = run_batch(game, tasks)
+
+        assert [r["index"] for r in results] == [0, 1, 2, 3]
+        assert "error" in results[1] and "error" in results[2]
+        assert results[0]["success"] and "message" in results[3]
+        assert len(game.task_history) == 2 and set(game.task_history.summary()) == {"talk_play", "first_word"}
+        assert notified == [version] == [game.state_version]
+        assert json.loads(status)["state_version"] == version
+
+    def test_json_and_ndjson_responses(self):
+        """小批次返回一个JSON，请求NDJSON或超过阈值时逐行返回，最后一行是最终状态"""
+        tasks = [{"task": "hug_happy", "args": {"press_duration": 3.0}}] * 3
+        body, status, headers = batch_response(new_game(), {"tasks": tasks}, FakeRequest())
+        data = json.loads(body)
+        assert status == 200 and headers["Content-Type"] == "application/json"
+        assert data["completed"] == 3 and data["failed"] == 0 and len(data["results"]) == 3
+        assert headers["ETag"].endswith(f'-{data["state_version"]}"')
+
+        body, _, headers = batch_response(new_game(), tasks * STREAM_THRESHOLD, FakeRequest())
+        lines = [json.loads(line) for line in b"".join(body).splitlines()]
+        assert headers["Content-Type"] == "application/x-ndjson"
+        assert len(lines) == 3 * STREAM_THRESHOLD + 1
+        assert lines[-1]["final"] and lines[-1]["completed"] == 3 * STREAM_THRESHOLD
+
+        _, status, _ = batch_response(new_game(), {"tasks": "feeding"}, FakeRequest())
+        assert status == 400
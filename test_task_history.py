@@ -0,0 +1,43 @@
+"""
+有界任务历史测试
+"""
+
+import json
+
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality, TaskType
+from task_history import RingBuffer, TaskHistory
+
+
+class TestRingBuffer:
+    """测试环形缓冲区"""
+
+    def test_overwrites_oldest(self):
+        """写满后覆盖最旧元素，并返回被覆盖的元素"""
+        ring = RingBuffer(3)
+        assert [ring.append(i) for i in range(5)] == [None, None, None, 0, 1]
+        assert list(ring) == [2, 3, 4]
+        assert ring.recent(2) == [3, 4]
+        assert ring[-1] == 4
+        assert len(ring) == 3 and ring.total == 5
+
+
+class TestTaskHistory:
+    """测试任务历史"""
+
+    def test_counters_and_spill(self, tmp_path):
+        """计数覆盖全部历史，溢出的旧记录写入磁盘"""
+        game = HardcoreParentingGame()
+        game.start_game(GameMode.NORMAL, BabyPersonality.ANGEL, 0)
+        spill = tmp_path / "history.jsonl"
+        game.task_history = TaskHistory(capacity=4, spill_path=str(spill), spill_batch=2)
+
+        for _ in range(10):
+            game.execute_hug_task(5.0)
+        game.task_history.flush()
+
+        assert len(game.task_history) == 10
+        assert len(game.task_history.recent(100)) == 4
+        assert game.task_history.stats(TaskType.HUG_HAPPY.value)["success"] == 10
+        lines = spill.read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 6
+        assert json.loads(lines[0])["t"] == TaskType.HUG_HAPPY.value
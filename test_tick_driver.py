@@ -0,0 +1,114 @@
+"""
+批量时间推进调度器测试
+"""
+
+import asyncio
+
+from age_based_parenting_system import AgeBasedParentingManager
+from hardcore_parenting_simulator import GameMode, HardcoreParentingSimulator
+from physiological_needs_tasks import PhysiologicalNeedsManager
+from tick_driver import AGE_MANAGER, PHYSIOLOGY, SIMULATOR_PLAYER, TickDriver, TickKind
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTickDriver:
+    """测试到期调度与批量推进"""
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.driver = TickDriver(time_scale=60, seed=7, use_numpy=False, clock=self.clock)
+
+    def test_due_sessions_advance_in_batches(self):
+        """只推进到期会话；推进量按距上次的时长计算；超出 batch_size 的留到下一轮"""
+        managers = [PhysiologicalNeedsManager() for _ in range(5)]
+        for i, manager in enumerate(managers):
+            manager.state.hunger_level = 0
+            self.driver.register(i, PHYSIOLOGY, manager, period=60 if i < 3 else 120)
+        self.driver.batch_size = 2
+
+        self.clock.now = 60
+        assert asyncio.run(self.driver.tick()) == 2
+        assert self.driver.backlogged()
+        assert asyncio.run(self.driver.tick()) == 1
+        assert not self.driver.backlogged()
+        # 60秒 × 60倍速 = 1小时，每小时饥饿 +15
+        assert [m.state.hunger_level for m in managers] == [15, 15, 15, 0, 0]
+
+        self.driver.unregister(0)
+        self.driver.batch_size = 100
+        self.clock.now = 120
+        assert asyncio.run(self.driver.tick()) == 4
+        assert [m.state.hunger_level for m in managers] == [15, 30, 30, 30, 30]
+
+    def test_mixed_kinds_and_busy_players(self):
+        """三类会话同一批推进；玩家动作进行中时顺延到下个 tick"""
+        simulator = HardcoreParentingSimulator()
+
+        async def scenario():
+            for player in ("alice", "bob"):
+                await simulator.start_game(player, GameMode.HARD)
+            self.driver.register("alice", SIMULATOR_PLAYER, (simulator, "alice"), period=60)
+            self.driver.register("bob", SIMULATOR_PLAYER, (simulator, "bob"), period=60)
+            self.driver.register("age", AGE_MANAGER, AgeBasedParentingManager(), period=60)
+            self.driver.register("body", PHYSIOLOGY, PhysiologicalNeedsManager(), period=60)
+            self.clock.now = 60
+            async with simulator.get_player("bob").lock:
+                return await self.driver.tick()
+
+        assert asyncio.run(scenario()) == 3
+        assert self.driver.deferred == 1
+        assert self.driver.stats()["sessions"] == 4
+
+        self.clock.now = 61   # bob 顺延到下一个 tick
+        assert asyncio.run(self.driver.tick()) == 1
+
+    def test_failures_do_not_stop_other_sessions(self):
+        """一个会话的协程抛异常时其它会话照常推进；离开的玩家不会被调度器重新创建"""
+        class Flaky(TickKind):
+            name = "flaky"
+
+            def advance(self, target, hours, now, rolls):
+                async def fire():
+                    if target == "bad":
+                        raise RuntimeError("boom")
+                    return target
+                return fire()
+
+        simulator = HardcoreParentingSimulator()
+        simulator.get_player("alice")
+        simulator.remove_player("alice")
+        for key in ("bad", "good"):
+            self.driver.register(key, Flaky(), key, period=60)
+        self.driver.register("alice", SIMULATOR_PLAYER, (simulator, "alice"), period=60)
+        self.clock.now = 60
+
+        assert asyncio.run(self.driver.tick()) == 3
+        assert (self.driver.errors, self.driver.fired) == (1, 1)
+        assert "alice" not in simulator.players
+
+    def test_seeded_rolls_are_reproducible(self):
+        """同一种子下随机事件序列一致"""
+        def events(seed):
+            clock = FakeClock()
+            driver = TickDriver(seed=seed, use_numpy=False, clock=clock)
+            simulator = HardcoreParentingSimulator()
+            players = [f"p{i}" for i in range(50)]
+            for player in players:
+                simulator.get_player(player).game_state.game_mode = GameMode.HARD
+                driver.register(player, SIMULATOR_PLAYER, (simulator, player), period=60)
+            for minute in range(1, 11):
+                clock.now = minute * 60
+                asyncio.run(driver.tick())
+            return [[(e.event_type.value, e.severity, e.duration)
+                     for e in simulator.get_player(p).event_manager.active_events.values()]
+                    for p in players]
+
+        assert events(1) == events(1)
+        assert any(events(1))
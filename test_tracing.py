@@ -0,0 +1,85 @@
+"""
+链路追踪测试
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+import tracing
+from hardcore_parenting_game import HardcoreParentingGame, GameMode, BabyPersonality
+from tracing import Tracer, otlp_payload, span, wrap
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracing, "tracer", Tracer(sample_rate=1.0, exporter=exporter))
+    yield exporter
+
+
+class TestTracing:
+    """测试 span 树、跨线程/协程传播与采样"""
+
+    def test_propagates_through_tasks_threads_and_asyncio(self, exporter):
+        """游戏任务、线程、asyncio 子任务里的 span 都挂在请求根 span 下"""
+        game = HardcoreParentingGame()
+        game.start_game(GameMode.NORMAL, BabyPersonality.FUSSY, 6)
+
+        async def fetch():
+            with span("async.fetch"):
+                await asyncio.sleep(0)
+
+        def job():
+            with span("thread.job"):
+                pass
+
+        with span("GET /game/talk") as root:
+            game.execute_talk_task(["宝宝"], 20.0)
+            worker = threading.Thread(target=wrap(job))
+            worker.start()
+            worker.join()
+            asyncio.run(fetch())
+        tracing.tracer.flush()
+
+        by_name = {s["name"]: s for s in exporter.spans}
+        assert set(by_name) == {"GET /game/talk", "task.talk_play", "thread.job", "async.fetch"}
+        assert {s["trace_id"] for s in exporter.spans} == {root.trace_id}
+        for name in ("task.talk_play", "thread.job", "async.fetch"):
+            assert by_name[name]["parent_id"] == root.span_id
+        assert by_name["task.talk_play"]["attributes"]["success"] in (True, False)
+
+    def test_sampling_decided_once_per_trace(self, exporter):
+        """未采样的根下不记录任何子 span；上游 traceparent 的采样标记优先；异常记录在 span 上"""
+        tracing.tracer.sample_rate = 0.5
+        tracing.tracer.rng = lambda: 0.9
+        with span("GET /unsampled"):
+            with span("child") as child:
+                assert not child.sampled
+
+        upstream = "00-" + "ab" * 16 + "-" + "cd" * 8 + "-01"
+        with pytest.raises(ValueError):
+            with tracing.tracer.root("GET /upstream", upstream):
+                with span("fal.flux_schnell"):
+                    raise ValueError("超时")
+        with tracing.tracer.root("GET /refused", upstream[:-2] + "00"):
+            with span("child"):
+                pass
+        tracing.tracer.flush()
+
+        assert [s["name"] for s in exporter.spans] == ["fal.flux_schnell", "GET /upstream"]
+        failed, root = exporter.spans
+        assert root["trace_id"] == "ab" * 16 and root["parent_id"] == "cd" * 8
+        assert failed["error"] == "ValueError: 超时"
+        otlp = otlp_payload(exporter.spans)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert otlp[0]["status"] == {"code": 2, "message": "ValueError: 超时"}
+        assert otlp[1]["parentSpanId"] == "cd" * 8
@@ -0,0 +1,64 @@
+"""
+预 fork 热启动测试
+"""
+
+import gc
+import os
+import runpy
+from types import SimpleNamespace
+
+import pytest
+
+import warm_start
+from chinese_baby_prompts import generate_prompt
+from hardcore_parenting_game import HardcoreParentingGame, MODE_CONFIGS
+from hardcore_parenting_simulator import NEGOTIATION_DECK, PickyEaterNegotiationTask, StrollerTetrisTask
+
+
+class TestWarmStart:
+    """测试只读目录共享与预热/冻结"""
+
+    def test_catalogs_are_shared_but_mutable_state_is_not(self):
+        """卡牌组、模式配置在实例间共用；会被修改的后备箱物品每个实例各一份"""
+        a, b = PickyEaterNegotiationTask(), PickyEaterNegotiationTask()
+        assert a.cards_deck is b.cards_deck is NEGOTIATION_DECK
+
+        t1, t2 = StrollerTetrisTask(), StrollerTetrisTask()
+        t1.items[0].shape[0][0] = 0
+        assert t2.items[0].shape[0][0] == 1
+
+        g1, g2 = HardcoreParentingGame(), HardcoreParentingGame()
+        assert g1.mode_configs[g1.state.mode] is MODE_CONFIGS[g1.state.mode]
+        g1.mode_configs[g1.state.mode] = {"decay_rate": 9.0}   # 平衡性扫描的用法
+        assert g2.mode_configs[g2.state.mode] is MODE_CONFIGS[g2.state.mode]
+
+    def test_warm_builds_catalogs_and_freeze_moves_objects(self):
+        """warm 构建全部提示词组合，freeze 把现存对象移到永久代"""
+        timings = warm_start.warm()
+        assert set(timings) == {"modules", "prompts"}
+        assert generate_prompt("toddler_1_2", "boy", "curious", "outdoor")["positive"]
+        try:
+            assert warm_start.freeze() > 0
+        finally:
+            gc.unfreeze()
+        assert gc.get_freeze_count() == 0
+
+    def test_master_gc_reenabled_after_freeze(self, monkeypatch, tmp_path):
+        """gunicorn 配置：导入期间关闭 GC，when_ready 冻结后重新开启（预热失败也开启）"""
+        monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+        monkeypatch.delenv("GUNICORN_PRELOAD", raising=False)
+        server = SimpleNamespace(app=SimpleNamespace(wsgi=lambda: None), log=SimpleNamespace(info=print))
+        try:
+            config = runpy.run_path(os.path.join(os.path.dirname(__file__), "gunicorn.conf.py"))
+            assert not gc.isenabled()
+            config["when_ready"](server)
+            assert gc.isenabled() and gc.get_freeze_count() > 0
+
+            gc.disable()
+            monkeypatch.setattr(warm_start, "warm", lambda app: 1 / 0)
+            with pytest.raises(ZeroDivisionError):
+                config["when_ready"](server)
+            assert gc.isenabled()
+        finally:
+            gc.enable()
+            gc.unfreeze()
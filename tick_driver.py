@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+批量时间推进调度器
+一个 asyncio 事件循环驱动成千上万个会话的时间流逝：会话按各自周期排进一个最小堆，
+每个 tick 取出所有到期会话，按种类分组，每组用一次调用生成整批随机数，再逐个应用。
+不给每个会话建协程或定时器。
+
+支持三类会话：
+    SIMULATOR_PLAYER  HardcoreParentingSimulator 的一个玩家，掷随机事件（对应 trigger_random_event）
+    AGE_MANAGER       AgeBasedParentingManager（对应 simulate_time_passage）
+    PHYSIOLOGY        PhysiologicalNeedsManager（对应 simulate_time_passage）
+
+装了 numpy 时随机数用 Generator.random 一次生成矩阵，否则退回 random.Random。
+"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from hardcore_parenting_simulator import RANDOM_EVENT_ROLLS
+
+# 尝试导入 numpy
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DEFERRED = object()   # 会话正忙（玩家动作协程持有锁），下个 tick 再推进
+
+
+class UniformSource:
+    """整批生成 [0,1) 均匀随机数"""
+
+    def __init__(self, seed: Optional[int] = None, use_numpy: bool = NUMPY_AVAILABLE):
+        self.backend = "numpy" if use_numpy else "random"
+        if use_numpy:
+            self._generator = np.random.default_rng(seed)
+        else:
+            self._random = random.Random(seed)
+
+    def draw(self, rows: int, cols: int) -> Sequence[Sequence[float]]:
+        """rows 行 cols 列的随机数矩阵（按行给每个会话）"""
+        if cols == 0:
+            return [()] * rows
+        if self.backend == "numpy":
+            return self._generator.random((rows, cols)).tolist()
+        uniform = self._random.random
+        return [[uniform() for _ in range(cols)] for _ in range(rows)]
+
+
+class TickKind:
+    """一类会话的推进方式：rolls 为每个会话每次需要的随机数个数"""
+    name = "base"
+    rolls = 0
+
+    def advance(self, target: Any, hours: float, now: datetime, rolls: Sequence[float]) -> Any:
+        """
+        推进一个会话
+
+        Returns:
+            None、触发的结果、需要等待的协程，或 DEFERRED
+        """
+        raise NotImplementedError
+
+
+class SimulatorPlayerTick(TickKind):
+    """target 为 (simulator, player_id)；事件概率按分钟计，周期建议 60 秒"""
+    name = "simulator_player"
+    rolls = RANDOM_EVENT_ROLLS
+
+    def advance(self, target, hours, now, rolls):
+        simulator, player_id = target
+        context = simulator.find_player(player_id)   # 不用 get_player：玩家离开后不能被调度器重新创建
+        if context is None:
+            return None
+        if context.lock.locked():
+            return DEFERRED
+        return simulator.roll_random_event(player_id, now, rolls)
+
+
+class AgeManagerTick(TickKind):
+    """确定性部分同步推进，掷中惊喜时刻时才返回协程"""
+    name = "age_manager"
+    rolls = 3
+
+    def advance(self, manager, hours, now, rolls):
+        manager.advance_time(hours)
+        if rolls[0] * 100 < manager.surprise_probability():
+            return manager.trigger_surprise_moment(rolls)
+        return None
+
+
+class PhysiologyTick(TickKind):
+    name = "physiology"
+    rolls = 0
+
+    def advance(self, manager, hours, now, rolls):
+        manager.advance_time(hours)
+        return None
+
+
+SIMULATOR_PLAYER = SimulatorPlayerTick()
+AGE_MANAGER = AgeManagerTick()
+PHYSIOLOGY = PhysiologyTick()
+
+
+@dataclass
+class _Session:
+    kind: TickKind
+    target: Any
+    period: float
+    last: float        # 上次推进的时刻（调度时钟）
+    due: float = 0.0
+    seq: int = 0       # 堆里与之匹配的条目序号，不匹配的是已作废的旧条目
+
+
+class TickDriver:
+    """按到期时间批量推进会话"""
+
+    def __init__(self, tick_seconds: float = 1.0, batch_size: int = 50000, time_scale: float = 1.0,
+                 seed: Optional[int] = None, use_numpy: bool = NUMPY_AVAILABLE,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            tick_seconds: 两次 tick 之间的间隔
+            batch_size: 每个 tick 最多推进的会话数，积压时下一轮立即继续
+            time_scale: 游戏时间倍速（1 表示真实时间，60 表示一秒推进一分钟）
+        """
+        self.tick_seconds = tick_seconds
+        self.batch_size = batch_size
+        self.time_scale = time_scale
+        self.clock = clock
+        self.uniforms = UniformSource(seed, use_numpy)
+        self._sessions: Dict[Hashable, _Session] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self.ticks = 0
+        self.advanced = 0
+        self.fired = 0
+        self.deferred = 0
+        self.errors = 0
+
+    def register(self, key: Hashable, kind: TickKind, target: Any, period: float,
+                 first_due: Optional[float] = None):
+        """登记会话，默认一个周期后第一次推进；重复登记会替换原来的"""
+        now = self.clock()
+        session = _Session(kind, target, period, last=now)
+        self._sessions[key] = session
+        self._schedule(key, session, now + period if first_due is None else first_due)
+
+    def unregister(self, key: Hashable) -> bool:
+        """注销会话（堆里的旧条目出堆时丢弃）"""
+        return self._sessions.pop(key, None) is not None
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _schedule(self, key: Hashable, session: _Session, due: float):
+        session.due = due
+        session.seq = next(self._seq)
+        heapq.heappush(self._heap, (due, session.seq, key))
+
+    def _pop_due(self, now: float) -> List[Tuple[Hashable, _Session]]:
+        batch = []
+        heap = self._heap
+        while heap and heap[0][0] <= now and len(batch) < self.batch_size:
+            _, seq, key = heapq.heappop(heap)
+            session = self._sessions.get(key)
+            if session is not None and session.seq == seq:
+                batch.append((key, session))
+        return batch
+
+    def backlogged(self, now: Optional[float] = None) -> bool:
+        """是否还有已到期未推进的会话"""
+        now = self.clock() if now is None else now
+        return bool(self._heap) and self._heap[0][0] <= now
+
+    async def tick(self, now: Optional[float] = None) -> int:
+        """推进所有到期会话（最多 batch_size 个），返回推进的个数"""
+        now = self.clock() if now is None else now
+        batch = self._pop_due(now)
+        if not batch:
+            return 0
+        wall_now = datetime.now()
+
+        groups: Dict[TickKind, List[Tuple[Hashable, _Session]]] = {}
+        for item in batch:
+            groups.setdefault(item[1].kind, []).append(item)
+
+        advanced = 0
+        pending = []
+        for kind, items in groups.items():
+            rows = self.uniforms.draw(len(items), kind.rolls)
+            for (key, session), rolls in zip(items, rows):
+                hours = (now - session.last) * self.time_scale / 3600
+                try:
+                    result = kind.advance(session.target, hours, wall_now, rolls)
+                except Exception as e:
+                    print(f"⚠️ 会话 {key} 推进失败: {e}")
+                    self.errors += 1
+                    result = None
+                if result is DEFERRED:
+                    self.deferred += 1
+                    self._schedule(key, session, now + self.tick_seconds)
+                    continue
+                session.last = now
+                # 按原定节拍排下一次；落后超过一个周期时不补跑，从现在重新计
+                due = session.due + session.period
+                self._schedule(key, session, due if due > now else now + session.period)
+                advanced += 1
+                if inspect.isawaitable(result):
+                    pending.append((key, result))
+                elif result is not None:
+                    self.fired += 1
+
+        for key, coroutine in pending:
+            try:
+                if await coroutine is not None:
+                    self.fired += 1
+            except Exception as e:
+                # 单个会话失败不能中断 run()，否则所有会话都停止推进
+                print(f"⚠️ 会话 {key} 推进失败: {e}")
+                self.errors += 1
+
+        self.ticks += 1
+        self.advanced += advanced
+        return advanced
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        """按 tick_seconds 持续推进，直到 stop 被设置；有积压时不等待"""
+        while stop is None or not stop.is_set():
+            await self.tick()
+            await asyncio.sleep(0 if self.backlogged() else self.tick_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        now = self.clock()
+        lag = max(0.0, now - self._heap[0][0]) if self._heap else 0.0
+        return {
+            "sessions": len(self._sessions),
+            "ticks": self.ticks,
+            "advanced": self.advanced,
+            "fired": self.fired,
+            "deferred": self.deferred,
+            "errors": self.errors,
+            "lag_seconds": round(lag, 3),
+            "random_backend": self.uniforms.backend,
+        }
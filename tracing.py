@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+轻量链路追踪
+一次照片请求要经过 蓝图路由 → BabyPhotoGenerator → get_fal_ai_config → fal_client.subscribe，
+各层耗时都记成一个 span，同一个请求的 span 共享 trace_id，按 parent_id 组成调用树。
+
+    with span("photo.compose", expression="happy") as s:
+        ...
+        s.set_attribute("cached", True)
+
+    @traced()
+    def generate_for_game_state(self, game_state): ...
+
+当前 span 存在 contextvars 里：
+- asyncio 任务创建时自动复制上下文，子任务里的 span 自动挂到创建它的 span 下
+- 线程池 / 新线程不会继承上下文，提交前用 wrap(fn) 包一层
+
+采样在根 span（一般是 Flask 请求）上决定一次，整条链路要么全记、要么全不记；
+上游带 W3C traceparent 头时沿用它的 trace_id 和采样标记。
+没有被采样的请求里，每个 span 只多一次 contextvar 读取。
+
+环境变量：
+- TRACE_SAMPLE_RATE：采样比例（默认 0，关闭）
+- TRACE_FILE：JSONL 输出文件（每行一个 span，各 worker 追加写同一个文件）
+- OTEL_EXPORTER_OTLP_ENDPOINT：本地 OTLP/HTTP 收集器，如 http://127.0.0.1:4318，
+  以 OTLP JSON 格式 POST 到 /v1/traces
+两者都没设置而采样比例大于 0 时，写到系统临时目录下的 babysitter-traces.jsonl。
+
+span 在后台线程里批量导出，队列满时直接丢弃，不阻塞请求。
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+SERVICE_NAME = "babysitter"
+TRACEPARENT_HEADER = "traceparent"
+MAX_QUEUE = 16384
+MAX_BATCH = 512
+EXPORT_INTERVAL = 0.25
+
+_ids = random.Random()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_ids.seed)   # 各 worker 的 id 序列不能相同
+
+
+class Span:
+    """
+    一段被记录的调用
+    id 以整数保存，导出时（在后台线程里）才格式化成十六进制
+    """
+
+    __slots__ = ("tracer", "name", "trace", "span", "parent", "attributes", "error",
+                 "start_ns", "end_ns", "_token")
+    sampled = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace: int, parent: Optional[int],
+                 attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace = trace
+        self.span = _ids.getrandbits(64)
+        self.parent = parent
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self._token = None
+
+    @property
+    def trace_id(self) -> str:
+        return f"{self.trace:032x}"
+
+    @property
+    def span_id(self) -> str:
+        return f"{self.span:016x}"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.end_ns = time.time_ns()
+        _current.reset(self._token)
+        self.tracer.processor.submit(self)
+        return False
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": None if self.parent is None else f"{self.parent:016x}",
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """不记录的 span：未采样链路里的子 span 都是这一个单例"""
+
+    sampled = False
+    trace_id = None
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _UnsampledRoot(_NoopSpan):
+    """未采样的根：放进上下文，让下面的 span 知道这条链路不记录"""
+
+    def __init__(self):
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current.set(NOOP_SPAN)
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+
+
+# ---------- 导出 ----------
+
+class JsonlExporter:
+    """每行一个 span；一批只调用一次 write，多个 worker 追加写同一个文件不会交错"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[dict]):
+        data = "".join(json.dumps(s, ensure_ascii=False, separators=(",", ":")) + "\n" for s in spans)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP JSON，发送到本地收集器（OpenTelemetry Collector、Jaeger 等）"""
+
+    def __init__(self, endpoint: str, timeout: float = 2.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def export(self, spans: List[dict]):
+        body = json.dumps(otlp_payload(spans)).encode()
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout):
+            pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_payload(spans: List[dict]) -> Dict[str, Any]:
+    """span 字典列表 -> OTLP ExportTraceServiceRequest（JSON 编码）"""
+    by_pid: Dict[int, List[dict]] = {}
+    for s in spans:
+        otlp_span = {
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "name": s["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["end_ns"]),
+            "attributes": _otlp_attributes(s["attributes"]),
+            "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+        }
+        if s["parent_id"]:
+            otlp_span["parentSpanId"] = s["parent_id"]
+        by_pid.setdefault(s["pid"], []).append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME, "process.pid": pid})},
+        "scopeSpans": [{"scope": {"name": "babysitter.tracing"}, "spans": otlp_spans}],
+    } for pid, otlp_spans in by_pid.items()]}
+
+
+class BatchProcessor:
+    """
+    span 先进有界队列，后台线程定时转成字典、按批导出，请求线程只做一次 append；
+    fork 之后在子进程里第一次提交时重建队列和线程
+    """
+
+    def __init__(self, exporter=None, max_queue: int = MAX_QUEUE, interval: float = EXPORT_INTERVAL):
+        self.exporter = exporter
+        self.max_queue = max_queue
+        self.interval = interval
+        self.dropped = 0
+        self._pid = None
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+
+    def submit(self, span: Span):
+        if self.exporter is None:
+            return
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+        else:
+            self._queue.append(span)
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = deque()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """把队列里的 span 全部导出（后台线程定时调用；退出时、测试里直接调用）"""
+        if self._pid != os.getpid():
+            return
+        q, pid = self._queue, self._pid
+        while q:
+            batch = []
+            while q and len(batch) < MAX_BATCH:
+                span = q.popleft()
+                data = span.to_dict()
+                data["pid"] = pid
+                batch.append(data)
+            try:
+                self.exporter.export(batch)
+            except Exception:
+                self.dropped += len(batch)   # 收集器不可用时丢弃，不影响请求
+
+
+# ---------- 追踪器 ----------
+
+def parse_traceparent(header: Optional[str]):
+    """W3C traceparent -> (trace_id, parent_id, sampled)；格式不对返回 None"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.0, exporter=None, rng: Callable[[], float] = random.random):
+        self.sample_rate = sample_rate
+        self.processor = BatchProcessor(exporter)
+        self.rng = rng
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "Tracer":
+        sample_rate = float(environ.get("TRACE_SAMPLE_RATE") or 0)
+        endpoint = environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+        path = environ.get("TRACE_FILE")
+        if endpoint:
+            exporter = OtlpHttpExporter(endpoint)
+        elif path or sample_rate > 0:
+            exporter = JsonlExporter(path or os.path.join(tempfile.gettempdir(), "babysitter-traces.jsonl"))
+        else:
+            exporter = None
+        return cls(sample_rate, exporter)
+
+    def configure(self, sample_rate: Optional[float] = None, exporter=None):
+        """修改采样比例 / 导出方式（已在队列里的 span 按新的导出方式发送）"""
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if exporter is not None:
+            self.processor.exporter = exporter
+
+    def span(self, name: str, **attributes):
+        """在当前 span 下开一个子 span；没有当前 span 时作为根 span 按比例采样"""
+        parent = _current.get()
+        if parent is None:
+            return self.root(name, **attributes) if self.sample_rate else NOOP_SPAN
+        if parent is NOOP_SPAN:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace, parent.span, attributes)
+
+    def root(self, name: str, traceparent: Optional[str] = None, **attributes):
+        """开始一条新链路（忽略当前 span）；带上游 traceparent 时沿用它的 trace_id 和采样标记"""
+        upstream = parse_traceparent(traceparent)
+        if upstream is not None:
+            trace_id, parent_id, sampled = upstream
+            if not sampled:
+                return _UnsampledRoot()
+            return Span(self, name, int(trace_id, 16), int(parent_id, 16), attributes)
+        if not self.sample_rate:
+            return NOOP_SPAN
+        if self.rng() >= self.sample_rate:
+            return _UnsampledRoot()
+        return Span(self, name, _ids.getrandbits(128) or 1, None, attributes)
+
+    def flush(self):
+        self.processor.flush()
+
+
+tracer = Tracer.from_env()
+atexit.register(tracer.flush)
+
+
+def span(name: str, **attributes):
+    return tracer.span(name, **attributes)
+
+
+def current_span():
+    """当前 span（未采样时为不记录的 span，不在任何链路里时为 None）"""
+    return _current.get()
+
+
+def traced(name: Optional[str] = None):
+    """函数装饰器：每次调用记一个 span，默认以 模块.函数名 命名"""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def wrap(fn: Callable) -> Callable:
+    """把当前 span 带到另一个线程：executor.submit(wrap(fn), ...) / Thread(target=wrap(fn))"""
+    parent = _current.get()
+
+    @wraps(fn)
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+def install(app):
+    """每个 Flask 请求作为根 span：名称为 方法 + 路由模板，带蓝图、端点和状态码"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_trace():
+        rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        root = tracer.root(f"{request.method} {rule}", request.headers.get(TRACEPARENT_HEADER),
+                           **{"http.method": request.method, "http.route": rule,
+                              "flask.blueprint": request.blueprint or "app",
+                              "flask.endpoint": request.endpoint or ""})
+        if root is not NOOP_SPAN:
+            g._trace_root = root
+            g._trace_span = root.__enter__()
+
+    @app.after_request
+    def _tag_response(response):
+        active = g.get("_trace_span")
+        if active is not None and active.sampled:
+            active.set_attribute("http.status_code", response.status_code)
+            response.headers["X-Trace-Id"] = active.trace_id
+        return response
+
+    @app.teardown_request
+    def _end_trace(exc):
+        root = g.pop("_trace_root", None)
+        if root is not None:
+            root.__exit__(type(exc) if exc else None, exc, None)
+
+    return app
+
+
+if __name__ == "__main__":
+    # 演示：一个请求、两层调用、一个线程池任务，打印导出的 span
+    from concurrent.futures import ThreadPoolExecutor
+
+    class PrintExporter:
+        def export(self, spans):
+            for s in spans:
+                print(f"  {s['name']:<24} trace={s['trace_id'][:8]} parent={s['parent_id']} "
+                      f"{s['duration_ms']:.2f} ms")
+
+    def job():
+        with span("worker.job"):
+            time.sleep(0.005)
+
+    tracer.configure(sample_rate=1.0, exporter=PrintExporter())
+    with span("GET /demo"):
+        with span("compose", step=1):
+            time.sleep(0.01)
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(wrap(job)).result()
+    tracer.flush()
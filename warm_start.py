@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+预 fork 热启动
+gunicorn 以 preload_app 方式启动时（见 gunicorn.conf.py），master 先导入应用，
+再调用 warm() 把所有只读的目录和页面一次性准备好：
+- 提示词组合（chinese_baby_prompts）
+- 谈判卡牌组、后备箱物品目录、模式配置、事件别名表（导入游戏模块时构建）
+- 静态页面（完整游戏、换尿布、冲奶粉）：渲染一次后缓存成字符串
+
+随后 freeze() 执行 gc.freeze()，把 master 里现存的对象全部移到永久代。
+fork 出的 worker 做垃圾回收时不再遍历这些对象，不会改写它们的对象头，
+对应的内存页就一直与 master 共享（写时复制），每个 worker 只为自己新建的对象付内存。
+
+worker 里第一个请求也不用再导入模块、拼提示词、编译页面模板。
+"""
+
+import gc
+import importlib
+import time
+from typing import Any, Dict, Optional
+
+# 应用的全部模块：master 里导入一次，fork 后各 worker 共享
+APP_MODULES = (
+    "hardcore_parenting_game",
+    "hardcore_parenting_simulator",
+    "age_based_parenting_system",
+    "physiological_needs_tasks",
+    "state_codec",
+    "game_sessions",
+    "task_batch",
+    "spectator",
+    "coop_hub",
+    "chinese_baby_prompts",
+)
+
+# 静态页面：(模块, 页面源码常量)
+PAGES = (
+    ("full_game_interface", "GAME_MAIN_HTML"),
+    ("diaper_change_task", "DIAPER_TASK_HTML"),
+    ("feeding_task", "FEEDING_HTML"),
+)
+
+_rendered_pages: Dict[str, str] = {}
+
+
+def render_page(source: str) -> str:
+    """
+    渲染不含模板变量的静态页面，结果按源码缓存
+    （原来每个请求都 render_template_string 重新编译一遍模板）
+    """
+    page = _rendered_pages.get(source)
+    if page is None:
+        from flask import render_template_string
+        page = _rendered_pages[source] = render_template_string(source)
+    return page
+
+
+def warm(app: Optional[Any] = None) -> Dict[str, float]:
+    """
+    构建全部只读目录（传入 Flask app 时同时预渲染页面）
+
+    Returns:
+        dict: 步骤 -> 耗时毫秒
+    """
+    timings: Dict[str, float] = {}
+
+    def step(name, fn):
+        start = time.perf_counter()
+        fn()
+        timings[name] = round((time.perf_counter() - start) * 1000, 3)
+
+    step("modules", lambda: [importlib.import_module(module) for module in APP_MODULES])
+    step("prompts", lambda: importlib.import_module("chinese_baby_prompts").warm_prompt_catalog())
+    if app is not None:
+        def pages():
+            with app.app_context():
+                for module, attr in PAGES:
+                    try:
+                        render_page(getattr(importlib.import_module(module), attr))
+                    except ImportError:
+                        pass   # 与 main.py 一致：导入失败的蓝图不注册，也就不需要预渲染
+        step("pages", pages)
+    return timings
+
+
+def freeze() -> int:
+    """先回收一次已有的垃圾，再把剩下的对象全部冻结到永久代，返回冻结的对象数"""
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()